@@ -9,27 +9,114 @@ Architektura:
   - capture_payload() je non-blocking: vloží tuple do queue.Queue(maxsize=5000)
   - Daemon thread odebírá z fronty, zapisuje do SQLite v batchích (200 nebo 0.5s)
   - WAL journal mode, NORMAL synchronous – rychlé a bezpečné
-  - Pruning každých 600s na základě CAPTURE_RETENTION_DAYS
+  - Pruning každých 600s na základě CAPTURE_RETENTION_DAYS (range delete přes index ts_ms)
+  - Starší DB bez ts_ms se migrují online: writer doplňuje ts_ms po blocích
+    mezi dávkami a indexy vytvoří až po doplnění (index ts_ms jako poslední)
+  - select_frames()/count_by_table() pro analytické skripty – používají indexy,
+    na DB bez dokončené migrace se vrací k porovnání textového ts
+
+Výchozí formát "legacy" ukládá raw/raw_b64/parsed do sloupců tabulky
+frames a DB jde číst samotným sqlite3. Volitelný formát "compact"
+(CAPTURE_FORMAT=compact): surové bajty rámce jednou jako deflate BLOB se
+sdíleným trénovaným slovníkem (capture/frame_codec.py) v tabulce
+frame_blobs. View frames vrací původní sloupce (raw, raw_b64, parsed se
+odvozují při čtení) – čtenáři musí na spojení zavolat register_functions().
+Existující DB ve starém formátu se i s "compact" dál zapisují postaru;
+převod: python3 -m capture.frame_capture --compact DB
 """
 
 from __future__ import annotations
 
+import argparse
 import base64
 import datetime
-import json
 import logging
 import queue
 import sqlite3
+import sys
 import threading
 import time
 from contextlib import suppress
 from typing import Any
 
+import json_codec
+
+from .frame_codec import TRAIN_SAMPLES, FrameCodec, load_dictionaries, register_functions, train_dictionary
+
 logger = logging.getLogger(__name__)
 
+# ISO text (ts) -> epoch ms; stejný výraz pro zápis i doplnění starých řádků.
+_TS_MS_EXPR = "CAST(ROUND((julianday({}) - 2440587.5) * 86400000) AS INTEGER)"
+
 _INSERT_SQL = (
     "INSERT INTO frames "
-    "(ts, device_id, table_name, raw, raw_b64, parsed, direction, conn_id, peer, length) "
+    "(ts, device_id, table_name, raw, raw_b64, parsed, direction, conn_id, peer, length, ts_ms) "
+    f"VALUES (?1,?2,?3,?4,?5,?6,?7,?8,?9,?10,{_TS_MS_EXPR.format('?1')})"
+)
+_BACKFILL_SQL = (
+    f"UPDATE frames SET ts_ms = {_TS_MS_EXPR.format('ts')} "
+    "WHERE id >= ? AND id < ? AND ts_ms IS NULL"
+)
+# Pořadí je důležité: idx_frames_ts_ms vzniká poslední a jeho existence
+# znamená, že migrace doběhla (viz ts_index_ready).
+_INDEXES: tuple[tuple[str, str], ...] = (
+    ("idx_frames_conn_id", "frames(conn_id)"),
+    ("idx_frames_table_ts", "frames(table_name, ts_ms)"),
+    ("idx_frames_ts_ms", "frames(ts_ms)"),
+)
+FRAME_COLUMNS: tuple[str, ...] = (
+    "id", "ts", "ts_ms", "device_id", "table_name", "raw", "raw_b64",
+    "parsed", "direction", "conn_id", "peer", "length",
+)
+BACKFILL_CHUNK_ROWS = 5000
+
+CAPTURE_FORMATS: tuple[str, ...] = ("compact", "legacy")
+
+_COMPACT_TABLES_SQL = """
+    CREATE TABLE IF NOT EXISTS frame_blobs (
+        id         INTEGER PRIMARY KEY AUTOINCREMENT,
+        ts_ms      INTEGER NOT NULL,
+        device_id  TEXT,
+        table_name TEXT,
+        direction  TEXT,
+        conn_id    INTEGER,
+        peer       TEXT,
+        length     INTEGER,
+        dict_id    INTEGER,
+        with_b64   INTEGER NOT NULL DEFAULT 0,
+        data       BLOB NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS capture_dicts (
+        id         INTEGER PRIMARY KEY,
+        created_ms INTEGER NOT NULL,
+        samples    INTEGER NOT NULL,
+        zdict      BLOB NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_frame_blobs_ts_ms ON frame_blobs(ts_ms);
+    CREATE INDEX IF NOT EXISTS idx_frame_blobs_table_ts ON frame_blobs(table_name, ts_ms);
+    CREATE INDEX IF NOT EXISTS idx_frame_blobs_conn_id ON frame_blobs(conn_id);
+"""
+# Kompatibilní view se sloupci starého formátu; ts má stejný tvar jako _iso_now().
+_FRAMES_VIEW_SQL = """
+    CREATE VIEW IF NOT EXISTS frames AS
+    SELECT
+        id,
+        strftime('%Y-%m-%dT%H:%M:%S+00:00', ts_ms / 1000, 'unixepoch') AS ts,
+        device_id,
+        table_name,
+        capture_raw(dict_id, data) AS raw,
+        CASE WHEN with_b64 THEN capture_b64(dict_id, data) END AS raw_b64,
+        capture_parsed(dict_id, data) AS parsed,
+        direction,
+        conn_id,
+        peer,
+        length,
+        ts_ms
+    FROM frame_blobs
+"""
+_COMPACT_INSERT_SQL = (
+    "INSERT INTO frame_blobs "
+    "(ts_ms, device_id, table_name, direction, conn_id, peer, length, dict_id, with_b64, data) "
     "VALUES (?,?,?,?,?,?,?,?,?,?)"
 )
 
@@ -50,6 +137,8 @@ class FrameCapture:
         fc.start()
         fc.capture(device_id, table, raw_text, raw_bytes, parsed_dict, direction, conn_id, peer, length)
         fc.stop()
+
+    V kompaktním formátu se ``parsed_dict`` neukládá – view ho odvodí z raw.
     """
 
     def __init__(
@@ -57,13 +146,21 @@ class FrameCapture:
         db_path: str = "/data/payloads.db",
         capture_raw_bytes: bool = False,
         retention_days: int = 7,
+        capture_format: str = "legacy",
     ) -> None:
         self.db_path = db_path
         self.capture_raw_bytes = capture_raw_bytes
         self.retention_days = retention_days
+        self.capture_format = capture_format if capture_format in CAPTURE_FORMATS else "legacy"
+        # Skutečný formát se určí v _ensure_schema() podle existující DB.
+        self._compact = self.capture_format == "compact"
+        self._codec: FrameCodec | None = None
+        self._samples: list[bytes] = []
 
         self._queue: queue.Queue[tuple[Any, ...] | _Empty | None] = queue.Queue(maxsize=5000)
         self._thread: threading.Thread | None = None
+        # Rozsah id (od, do) řádků čekajících na doplnění ts_ms; None = hotovo.
+        self._backfill: tuple[int, int] | None = None
 
     def start(self) -> None:
         self._ensure_schema()
@@ -73,8 +170,9 @@ class FrameCapture:
             name="capture-writer",
         )
         self._thread.start()
-        logger.info("FrameCapture started: db=%s raw_bytes=%s retention=%dd",
-                    self.db_path, self.capture_raw_bytes, self.retention_days)
+        logger.info("FrameCapture started: db=%s format=%s raw_bytes=%s retention=%dd",
+                    self.db_path, "compact" if self._compact else "legacy",
+                    self.capture_raw_bytes, self.retention_days)
 
     def stop(self) -> None:
         if self._thread is not None and self._thread.is_alive():
@@ -99,6 +197,13 @@ class FrameCapture:
         length: int | None = None,
     ) -> None:
         try:
+            if self._compact:
+                data = raw_bytes if raw_bytes is not None else raw.encode("utf-8")
+                with_b64 = int(self.capture_raw_bytes and raw_bytes is not None)
+                self._queue.put_nowait(
+                    (int(time.time() * 1000), device_id, table, data, with_b64, direction, conn_id, peer, length)
+                )
+                return
             ts = _iso_now()
             raw_b64: str | None = None
             if self.capture_raw_bytes and raw_bytes is not None:
@@ -109,7 +214,7 @@ class FrameCapture:
                 table,
                 raw,
                 raw_b64,
-                json.dumps(parsed, ensure_ascii=False),
+                json_codec.dumps(parsed),
                 direction,
                 conn_id,
                 peer,
@@ -130,6 +235,20 @@ class FrameCapture:
         try:
             conn = sqlite3.connect(self.db_path, check_same_thread=False)
             _configure_pragmas(conn)
+            kind = _frames_kind(conn)
+            self._compact = kind == "view" or (kind is None and self.capture_format == "compact")
+            if self._compact:
+                conn.executescript(_COMPACT_TABLES_SQL + ";" + _FRAMES_VIEW_SQL)
+                conn.commit()
+                conn.close()
+                return
+            if self.capture_format == "compact":
+                logger.info(
+                    "FrameCapture: %s uses the legacy format, convert with "
+                    "`python3 -m capture.frame_capture --compact %s` while capture is stopped",
+                    self.db_path,
+                    self.db_path,
+                )
             conn.execute("""
                 CREATE TABLE IF NOT EXISTS frames (
                     id        INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -142,7 +261,8 @@ class FrameCapture:
                     direction TEXT,
                     conn_id   INTEGER,
                     peer      TEXT,
-                    length    INTEGER
+                    length    INTEGER,
+                    ts_ms     INTEGER
                 )
             """)
             # Backward compat: přidat chybějící sloupce
@@ -153,15 +273,58 @@ class FrameCapture:
                 ("conn_id", "INTEGER"),
                 ("peer", "TEXT"),
                 ("length", "INTEGER"),
+                ("ts_ms", "INTEGER"),
             ]:
                 if col_name not in existing_cols:
                     with suppress(sqlite3.Error):
                         conn.execute(f"ALTER TABLE frames ADD COLUMN {col_name} {col_type}")
             conn.commit()
+            self._plan_migration(conn)
             conn.close()
         except (sqlite3.Error, OSError) as exc:
             logger.warning("FrameCapture schema init failed: %s", exc)
 
+    def _plan_migration(self, conn: sqlite3.Connection) -> None:
+        """Prázdná DB dostane indexy hned, velká se migruje ve writer threadu."""
+        self._backfill = None
+        if ts_index_ready(conn):
+            return
+        min_id, max_id = conn.execute(
+            "SELECT (SELECT MIN(id) FROM frames), (SELECT MAX(id) FROM frames)"
+        ).fetchone()
+        if max_id is None:
+            _create_indexes(conn)
+            return
+        # Nové řádky už ts_ms mají, doplňují se jen id <= max_id.
+        self._backfill = (min_id, max_id + 1)
+        logger.info("FrameCapture: migrating %d..%d to ts_ms + indexes in background", min_id, max_id)
+
+    def _migrate_step(self, conn: sqlite3.Connection) -> None:
+        """Jeden krok online migrace: blok ts_ms, potom indexy po jednom."""
+        if self._backfill is None:
+            return
+        start_id, end_id = self._backfill
+        try:
+            if start_id < end_id:
+                chunk_end = min(start_id + BACKFILL_CHUNK_ROWS, end_id)
+                conn.execute(_BACKFILL_SQL, (start_id, chunk_end))
+                conn.commit()
+                self._backfill = (chunk_end, end_id)
+                return
+            existing = _index_names(conn)
+            missing = [(name, target) for name, target in _INDEXES if name not in existing]
+            if missing:
+                name, target = missing[0]
+                conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {target}")
+                conn.commit()
+            if len(missing) <= 1:
+                self._backfill = None
+                logger.info("FrameCapture: ts_ms migration complete")
+        except Exception as exc:  # noqa: BLE001
+            logger.debug("FrameCapture migration step failed: %s", exc)
+            with suppress(Exception):
+                conn.rollback()
+
     def _writer_loop(self) -> None:
         try:
             conn = sqlite3.connect(self.db_path)
@@ -170,6 +333,8 @@ class FrameCapture:
             logger.warning("FrameCapture writer cannot open DB: %s", exc)
             return
 
+        if self._compact:
+            self._codec = FrameCodec(load_dictionaries(conn))
         _SENTINEL = _EMPTY
         batch: list[Any] = []
         last_commit = time.monotonic()
@@ -189,12 +354,17 @@ class FrameCapture:
 
             now = time.monotonic()
             if timed_out or stop or len(batch) >= 200 or (now - last_commit) >= 0.5:
-                _commit_batch(conn, batch)
+                if self._compact:
+                    _commit_batch(conn, self._encode_batch(conn, batch), _COMPACT_INSERT_SQL)
+                else:
+                    _commit_batch(conn, batch)
                 batch.clear()
                 last_commit = now
+                if not stop:
+                    self._migrate_step(conn)
 
             if self.retention_days > 0 and (now - last_prune) >= 600:
-                _prune_db(conn, self.retention_days)
+                _prune_db(conn, self.retention_days, table="frame_blobs" if self._compact else "frames")
                 last_prune = now
 
             if stop:
@@ -203,6 +373,50 @@ class FrameCapture:
         with suppress(sqlite3.Error, OSError):
             conn.close()
 
+    def _encode_batch(self, conn: sqlite3.Connection, batch: list[tuple[Any, ...]]) -> list[tuple[Any, ...]]:
+        """Komprese ve writer threadu; prvních TRAIN_SAMPLES rámců natrénuje slovník."""
+        codec = self._codec
+        if codec is None:
+            codec = self._codec = FrameCodec()
+        rows: list[tuple[Any, ...]] = []
+        for ts_ms, device_id, table, data, with_b64, direction, conn_id, peer, length in batch:
+            dict_id, blob = codec.encode(data)
+            rows.append((ts_ms, device_id, table, direction, conn_id, peer, length, dict_id, with_b64, blob))
+            if codec.dict_id is None:
+                self._samples.append(data)
+        if codec.dict_id is None and len(self._samples) >= TRAIN_SAMPLES:
+            _store_dictionary(conn, codec, self._samples)
+            self._samples = []
+        return rows
+
+
+def _frames_kind(conn: sqlite3.Connection) -> str | None:
+    """'table' (starý formát), 'view' (kompaktní) nebo None (nová DB)."""
+    row = conn.execute("SELECT type FROM sqlite_master WHERE name = 'frames'").fetchone()
+    return row[0] if row else None
+
+
+def _store_dictionary(
+    conn: sqlite3.Connection, codec: FrameCodec, samples: list[bytes], *, commit: bool = True
+) -> None:
+    """Natrénuje a uloží slovník; s commit=False zůstává v transakci volajícího."""
+    zdict = train_dictionary(samples)
+    try:
+        cur = conn.execute(
+            "INSERT INTO capture_dicts (created_ms, samples, zdict) VALUES (?,?,?)",
+            (int(time.time() * 1000), len(samples), zdict),
+        )
+        if commit:
+            conn.commit()
+    except Exception as exc:  # noqa: BLE001
+        logger.debug("FrameCapture dictionary store failed: %s", exc)
+        if commit:
+            with suppress(Exception):
+                conn.rollback()
+        return
+    codec.use_dictionary(int(cur.lastrowid or 0), zdict)
+    logger.info("FrameCapture: trained %d B dictionary from %d frames", len(zdict), len(samples))
+
 
 def _configure_pragmas(conn: sqlite3.Connection) -> None:
     with suppress(sqlite3.Error):
@@ -212,11 +426,11 @@ def _configure_pragmas(conn: sqlite3.Connection) -> None:
         conn.execute("PRAGMA busy_timeout=2000")
 
 
-def _commit_batch(conn: sqlite3.Connection, batch: list[tuple[Any, ...]]) -> None:
+def _commit_batch(conn: sqlite3.Connection, batch: list[tuple[Any, ...]], sql: str = _INSERT_SQL) -> None:
     if not batch:
         return
     try:
-        conn.executemany(_INSERT_SQL, batch)
+        conn.executemany(sql, batch)
         conn.commit()
     except Exception as exc:  # noqa: BLE001
         logger.debug("FrameCapture batch write failed (dropping): %s", exc)
@@ -224,7 +438,7 @@ def _commit_batch(conn: sqlite3.Connection, batch: list[tuple[Any, ...]]) -> Non
             conn.rollback()
 
 
-def _prune_db(conn: sqlite3.Connection, retention_days: int) -> None:
+def _prune_db(conn: sqlite3.Connection, retention_days: int, table: str = "frames") -> None:
     if retention_days <= 0:
         return
     try:
@@ -232,8 +446,9 @@ def _prune_db(conn: sqlite3.Connection, retention_days: int) -> None:
             datetime.datetime.now(datetime.timezone.utc)
             - datetime.timedelta(days=retention_days)
         )
-        cutoff_iso = cutoff.replace(microsecond=0).isoformat()
-        cur = conn.execute("DELETE FROM frames WHERE ts < ?", (cutoff_iso,))
+        cutoff_ms = int(cutoff.timestamp() * 1000)
+        # table je vždy "frames" nebo "frame_blobs" (writer), ne vstup zvenčí.
+        cur = conn.execute(f"DELETE FROM {table} WHERE ts_ms < ?", (cutoff_ms,))  # nosec B608
         deleted = cur.rowcount or 0
         conn.commit()
         if deleted:
@@ -249,3 +464,176 @@ def _iso_now() -> str:
     # cutoff (_prune_db) so lexicographic `ts < cutoff` comparisons stay correct
     # at the retention boundary.
     return datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0).isoformat()
+
+
+def _iso_from_ms(ts_ms: int) -> str:
+    return (
+        datetime.datetime.fromtimestamp(ts_ms / 1000, datetime.timezone.utc)
+        .replace(microsecond=0)
+        .isoformat()
+    )
+
+
+def _index_names(conn: sqlite3.Connection) -> set[str]:
+    return {
+        row[0]
+        for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'frames'")
+    }
+
+
+def _create_indexes(conn: sqlite3.Connection) -> None:
+    for name, target in _INDEXES:
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {target}")
+    conn.commit()
+
+
+# ----------------------------------------------------------------------
+# Dotazy pro analytické skripty
+# ----------------------------------------------------------------------
+
+
+def ts_index_ready(conn: sqlite3.Connection) -> bool:
+    """True když má DB doplněné ts_ms a index na něm (migrace doběhla)."""
+    return _frames_kind(conn) == "view" or "idx_frames_ts_ms" in _index_names(conn)
+
+
+def select_frames(
+    conn: sqlite3.Connection,
+    start_ms: int,
+    end_ms: int,
+    *,
+    table_name: str | None = None,
+    conn_id: int | None = None,
+) -> sqlite3.Cursor:
+    """Frames s ``start_ms <= ts < end_ms`` seřazené podle času.
+
+    Na migrované DB jde o range scan indexu ``(ts_ms)`` / ``(table_name, ts_ms)``
+    / ``(conn_id)``; starší DB (snapshoty) se filtrují podle textového ``ts``.
+    Vybírá jen sloupce z ``FRAME_COLUMNS``, které v DB existují.
+    """
+    register_functions(conn)
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(frames)")}
+    columns = ", ".join(col for col in FRAME_COLUMNS if col in existing)
+    if ts_index_ready(conn):
+        clauses = ["ts_ms >= ?", "ts_ms < ?"]
+        params: list[Any] = [start_ms, end_ms]
+        order = "ts_ms, id"
+    else:
+        clauses = ["ts >= ?", "ts < ?"]
+        params = [_iso_from_ms(start_ms), _iso_from_ms(end_ms)]
+        order = "ts, id"
+    if table_name is not None:
+        clauses.append("table_name = ?")
+        params.append(table_name)
+    if conn_id is not None:
+        clauses.append("conn_id = ?")
+        params.append(conn_id)
+    # Sloupce i podmínky jsou pevné, hodnoty jdou jako bind parametry.
+    sql = f"SELECT {columns} FROM frames WHERE {' AND '.join(clauses)} ORDER BY {order}"  # nosec B608
+    return conn.execute(sql, params)
+
+
+def count_by_table(conn: sqlite3.Connection, table_names: list[str]) -> dict[str, int]:
+    """Počet frames pro každé ``table_name`` (0 pro chybějící) jedním dotazem."""
+    counts = dict.fromkeys(table_names, 0)
+    if not table_names:
+        return counts
+    register_functions(conn)
+    placeholders = ",".join("?" * len(table_names))
+    rows = conn.execute(
+        f"SELECT table_name, COUNT(*) FROM frames WHERE table_name IN ({placeholders}) GROUP BY table_name",  # nosec B608
+        list(table_names),
+    )
+    for table_name, count in rows:
+        counts[table_name] = count
+    return counts
+
+
+# ----------------------------------------------------------------------
+# Převod starého formátu
+# ----------------------------------------------------------------------
+
+
+def convert_to_compact(db_path: str, *, chunk_rows: int = BACKFILL_CHUNK_ROWS) -> int:
+    """Převede DB ve starém formátu na kompaktní (id zůstávají); vrací počet frames.
+
+    Běží offline (capture zastavená): přepíše tabulku frames a na konci
+    udělá VACUUM, aby se místo na disku skutečně uvolnilo. Celý převod je
+    jedna transakce, takže po chybě zůstane DB ve starém formátu a převod
+    jde spustit znovu.
+    """
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        if _frames_kind(conn) != "table":
+            raise ValueError(f"{db_path}: no legacy frames table")
+        existing = {row[1] for row in conn.execute("PRAGMA table_info(frames)")}
+        raw_b64 = "raw_b64" if "raw_b64" in existing else "NULL"
+        ts_ms = "ts_ms" if "ts_ms" in existing else "NULL"
+        optional = ", ".join(col if col in existing else "NULL" for col in ("direction", "conn_id", "peer", "length"))
+        conn.execute("BEGIN")
+        for statement in _COMPACT_TABLES_SQL.split(";"):
+            if statement.strip():
+                conn.execute(statement)
+        # Dokud je frames tabulka, capture do frame_blobs nezapisuje: řádky
+        # tam jsou jen pozůstatek dřívějšího nedokončeného převodu.
+        conn.execute("DELETE FROM frame_blobs")
+        conn.execute("DELETE FROM capture_dicts")
+        # Sloupce pochází z PRAGMA table_info, ne ze vstupu.
+        select = conn.cursor().execute(
+            f"SELECT id, COALESCE({ts_ms}, {_TS_MS_EXPR.format('ts')}, 0), device_id, table_name, "  # nosec B608
+            f"raw, {raw_b64}, {optional} FROM frames ORDER BY id"
+        )
+        codec = FrameCodec(load_dictionaries(conn))
+        total = 0
+        while rows := select.fetchmany(chunk_rows):
+            encoded: list[tuple[Any, ...]] = []
+            payloads = [
+                base64.b64decode(b64) if b64 else (raw or "").encode("utf-8")
+                for _id, _ts, _dev, _tbl, raw, b64, *_rest in rows
+            ]
+            if codec.dict_id is None:
+                _store_dictionary(conn, codec, payloads[:TRAIN_SAMPLES], commit=False)
+            for row, data in zip(rows, payloads):
+                frame_id, frame_ts_ms, device_id, table_name, _raw, b64, direction, conn_id, peer, length = row
+                dict_id, blob = codec.encode(data)
+                encoded.append((
+                    frame_id, frame_ts_ms, device_id, table_name, direction, conn_id, peer, length,
+                    dict_id, int(bool(b64)), blob,
+                ))
+            conn.executemany(
+                "INSERT INTO frame_blobs "
+                "(id, ts_ms, device_id, table_name, direction, conn_id, peer, length, dict_id, with_b64, data) "
+                "VALUES (?,?,?,?,?,?,?,?,?,?,?)",
+                encoded,
+            )
+            total += len(encoded)
+        conn.execute("DROP TABLE frames")
+        conn.execute(_FRAMES_VIEW_SQL)
+        conn.execute("COMMIT")
+        conn.execute("VACUUM")
+        return total
+    finally:
+        # Nedokončená transakce se při close() zahodí.
+        conn.close()
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Frame capture DB maintenance.")
+    parser.add_argument("db", nargs="?", default="/data/payloads.db", help="capture DB path")
+    parser.add_argument("--compact", action="store_true", help="convert a legacy DB to the compact format")
+    args = parser.parse_args(argv)
+    if not args.compact:
+        parser.print_help()
+        return 1
+    started = time.monotonic()
+    try:
+        total = convert_to_compact(args.db)
+    except (ValueError, sqlite3.Error, OSError) as exc:
+        print(f"error: {exc}", file=sys.stderr)
+        return 1
+    print(f"{total} frames converted in {time.monotonic() - started:.1f} s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+"""
+Kompaktní kódování zachycených frames (capture/frame_capture.py).
+
+Surové bajty rámce se ukládají jednou jako raw deflate s přednastaveným
+zlib slovníkem. Slovník se trénuje z prvních zachycených rámců: OIG rámce
+jsou opakující se XML se stejnými tagy, takže typický rámec se zkomprimuje
+na zlomek velikosti. Slovníky leží v tabulce ``capture_dicts`` a každý
+řádek odkazuje na svůj ``dict_id``.
+
+``register_functions()`` přidá spojení SQL funkce ``capture_raw``,
+``capture_b64`` a ``capture_parsed``, na kterých stojí kompatibilní view
+``frames`` (``parsed`` se odvozuje při čtení přes ``parse_xml_frame``).
+"""
+
+from __future__ import annotations
+
+import base64
+import re
+import sqlite3
+import zlib
+from collections import Counter
+from collections.abc import Iterable
+from typing import Any
+
+import json_codec
+from protocol.parser import parse_xml_frame
+
+DICT_SIZE = 32 * 1024  # zlib používá nejvýš posledních 32 KiB slovníku
+TRAIN_SAMPLES = 200
+COMPRESS_LEVEL = 9
+_WBITS = -15  # raw deflate – bez hlavičky a adler32 (6 B na rámec)
+
+# Tvar rámce = sekvence tagů bez hodnot.
+_VALUE_RE = re.compile(rb">[^<]*<")
+
+
+def train_dictionary(samples: Iterable[bytes], size: int = DICT_SIZE) -> bytes:
+    """Preset slovník z ukázkových rámců.
+
+    Rámce se seskupí podle tvaru; za každý tvar se použije poslední vzorek.
+    Nejčastější tvary jsou na konci slovníku, kde má deflate nejkratší
+    vzdálenosti, a slovník se ořízne na posledních ``size`` bajtů.
+    """
+    latest: dict[bytes, bytes] = {}
+    counts: Counter[bytes] = Counter()
+    for sample in samples:
+        shape = _VALUE_RE.sub(b"><", sample)
+        counts[shape] += 1
+        latest[shape] = sample
+    ordered = sorted(counts, key=lambda shape: counts[shape])
+    return b"".join(latest[shape] for shape in ordered)[-size:]
+
+
+class FrameCodec:
+    """Komprese s aktuálním slovníkem, dekomprese libovolným uloženým."""
+
+    def __init__(self, dictionaries: dict[int, bytes] | None = None, *, level: int = COMPRESS_LEVEL) -> None:
+        self.level = level
+        self.dictionaries: dict[int, bytes] = dict(dictionaries or {})
+        self.dict_id: int | None = None
+        self._compressor: Any = None
+        self._decompressors: dict[int | None, Any] = {}
+        if self.dictionaries:
+            latest = max(self.dictionaries)
+            self.use_dictionary(latest, self.dictionaries[latest])
+        else:
+            self._compressor = zlib.compressobj(level, zlib.DEFLATED, _WBITS)
+
+    def use_dictionary(self, dict_id: int, zdict: bytes) -> None:
+        """Nové rámce se budou komprimovat slovníkem ``dict_id``."""
+        self.dictionaries[dict_id] = zdict
+        self.dict_id = dict_id
+        # Slovník se zahashuje jednou, pro každý rámec se jen kopíruje stav.
+        self._compressor = zlib.compressobj(self.level, zlib.DEFLATED, _WBITS, zdict=zdict)
+
+    def encode(self, data: bytes) -> tuple[int | None, bytes]:
+        compressor = self._compressor.copy()
+        return self.dict_id, compressor.compress(data) + compressor.flush()
+
+    def decode(self, dict_id: int | None, blob: bytes) -> bytes:
+        template = self._decompressors.get(dict_id)
+        if template is None:
+            if dict_id is None:
+                template = zlib.decompressobj(_WBITS)
+            else:
+                template = zlib.decompressobj(_WBITS, zdict=self.dictionaries[dict_id])
+            self._decompressors[dict_id] = template
+        decompressor = template.copy()
+        return decompressor.decompress(blob) + decompressor.flush()
+
+
+def load_dictionaries(conn: sqlite3.Connection) -> dict[int, bytes]:
+    try:
+        return {row[0]: bytes(row[1]) for row in conn.execute("SELECT id, zdict FROM capture_dicts")}
+    except sqlite3.DatabaseError:
+        return {}  # DB bez kompaktního formátu (nebo nečitelná – chybu ohlásí dotaz)
+
+
+def register_functions(conn: sqlite3.Connection) -> None:
+    """Zaregistruje dekódovací funkce pro view ``frames`` na spojení.
+
+    Bez nich kompaktní DB nejde číst (``no such function``); na DB ve
+    starém formátu je volání neškodné.
+    """
+    codec = FrameCodec(load_dictionaries(conn))
+    last: list[Any] = [None, None, b""]  # dict_id, blob, raw – rámec se čte pro více sloupců
+
+    def _raw_bytes(dict_id: int | None, blob: bytes) -> bytes:
+        if last[0] == dict_id and last[1] == blob:
+            return last[2]
+        if dict_id is not None and dict_id not in codec.dictionaries:
+            codec.dictionaries.update(load_dictionaries(conn))
+        data = codec.decode(dict_id, blob)
+        last[:] = [dict_id, blob, data]
+        return data
+
+    def _raw(dict_id: int | None, blob: bytes | None) -> str | None:
+        return None if blob is None else _raw_bytes(dict_id, blob).decode("utf-8", errors="replace")
+
+    def _b64(dict_id: int | None, blob: bytes | None) -> str | None:
+        return None if blob is None else base64.b64encode(_raw_bytes(dict_id, blob)).decode("ascii")
+
+    def _parsed(dict_id: int | None, blob: bytes | None) -> str | None:
+        text = _raw(dict_id, blob)
+        return None if text is None else json_codec.dumps(parse_xml_frame(text))
+
+    conn.create_function("capture_raw", 2, _raw, deterministic=True)
+    conn.create_function("capture_b64", 2, _b64, deterministic=True)
+    conn.create_function("capture_parsed", 2, _parsed, deterministic=True)
@@ -35,6 +35,16 @@ class Config:
     mqtt_namespace: str = "oig_local"
     mqtt_qos: int = 1
     mqtt_state_retain: bool = True
+    mqtt_async_transport: bool = False
+    mqtt_outbound_queue_max: int = 1000
+    mqtt_max_inflight: int = 20
+    discovery_cache_path: str = "/data/discovery_fingerprints.json"
+    discovery_mode: str = "entity"
+    twin_queue_path: str = "/data/twin_queue.db"
+    settings_audit_db_path: str = "/data/settings_audit.db"
+    settings_audit_retention_days: int = 30
+    twin_delivery_window: int = 1
+    twin_priority_keys: str = ""
 
     # Proxy mode (online / hybrid)
     proxy_mode: str = "online"
@@ -50,15 +60,20 @@ class Config:
 
     # Sensor map
     sensor_map_path: str = "/data/sensor_map.json"
+    sensor_map_cache_path: str = "/data/sensor_map.cache"
+    map_reload_seconds: int = 60
 
     telemetry_enabled: bool = True
     telemetry_mqtt_broker: str = "telemetry.muriel-cz.cz:1883"
     telemetry_interval_s: int = 300
+    telemetry_log_level: str = "DEBUG"
+    telemetry_payload_format: str = "json"
 
     capture_payloads: bool = False
     capture_raw_bytes: bool = False
     capture_retention_days: int = 7
     capture_db_path: str = "/data/payloads.db"
+    capture_format: str = "legacy"
 
     capture_pcap: bool = False
     capture_pcap_path: str = "/data/capture.pcap"
@@ -103,6 +118,19 @@ class Config:
         self.mqtt_qos = int(os.environ.get("MQTT_QOS", "1"))
         self.mqtt_state_retain = os.environ.get(
             "MQTT_STATE_RETAIN", "true").lower() == "true"
+        self.mqtt_async_transport = os.environ.get(
+            "MQTT_ASYNC_TRANSPORT", "false").lower() == "true"
+        self.mqtt_outbound_queue_max = int(os.environ.get("MQTT_OUTBOUND_QUEUE_MAX", "1000"))
+        self.mqtt_max_inflight = int(os.environ.get("MQTT_MAX_INFLIGHT", "20"))
+        self.discovery_cache_path = os.environ.get(
+            "DISCOVERY_CACHE_PATH", "/data/discovery_fingerprints.json"
+        )
+        self.discovery_mode = os.environ.get("DISCOVERY_MODE", "entity").lower()
+        self.twin_queue_path = os.environ.get("TWIN_QUEUE_PATH", "/data/twin_queue.db")
+        self.settings_audit_db_path = os.environ.get("SETTINGS_AUDIT_DB_PATH", "/data/settings_audit.db")
+        self.settings_audit_retention_days = int(os.environ.get("SETTINGS_AUDIT_RETENTION_DAYS", "30"))
+        self.twin_delivery_window = max(1, int(os.environ.get("TWIN_DELIVERY_WINDOW", "1")))
+        self.twin_priority_keys = os.environ.get("TWIN_PRIORITY_KEYS", "")
 
         self.log_level = os.environ.get("LOG_LEVEL", "INFO").upper()
 
@@ -110,17 +138,24 @@ class Config:
             os.environ.get("PROXY_STATUS_INTERVAL", "60"))
         self.proxy_device_id = os.environ.get("PROXY_DEVICE_ID", "oig_proxy")
         self.sensor_map_path = os.environ.get("SENSOR_MAP_PATH", "/data/sensor_map.json")
+        self.sensor_map_cache_path = os.environ.get(
+            "SENSOR_MAP_CACHE_PATH", "/data/sensor_map.cache"
+        )
+        self.map_reload_seconds = int(os.environ.get("MAP_RELOAD_SECONDS", "60"))
 
         self.telemetry_enabled = os.environ.get("TELEMETRY_ENABLED", "true").lower() == "true"
         self.telemetry_mqtt_broker = os.environ.get(
             "TELEMETRY_MQTT_BROKER", "telemetry.muriel-cz.cz:1883"
         )
         self.telemetry_interval_s = int(os.environ.get("TELEMETRY_INTERVAL_S", "300"))
+        self.telemetry_log_level = os.environ.get("TELEMETRY_LOG_LEVEL", "DEBUG").upper()
+        self.telemetry_payload_format = os.environ.get("TELEMETRY_PAYLOAD_FORMAT", "json").lower()
 
         self.capture_payloads = os.environ.get("CAPTURE_PAYLOADS", "false").lower() == "true"
         self.capture_raw_bytes = os.environ.get("CAPTURE_RAW_BYTES", "false").lower() == "true"
         self.capture_retention_days = int(os.environ.get("CAPTURE_RETENTION_DAYS", "7"))
         self.capture_db_path = os.environ.get("CAPTURE_DB_PATH", "/data/payloads.db")
+        self.capture_format = os.environ.get("CAPTURE_FORMAT", "legacy").lower()
 
         self.capture_pcap = os.environ.get("CAPTURE_PCAP", "false").lower() == "true"
         self.capture_pcap_path = os.environ.get("CAPTURE_PCAP_PATH", "/data/capture.pcap")
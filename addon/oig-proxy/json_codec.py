@@ -0,0 +1,138 @@
+"""JSON serialization for OIG Proxy v2.
+
+Uses ``orjson`` when it is installed, otherwise the standard library. Both
+backends produce the same compact UTF-8 text (no spaces, non-ASCII kept,
+non-finite floats as ``null``), so payloads and discovery fingerprints do
+not depend on the backend.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+from typing import Any
+
+try:
+    import orjson as _orjson  # type: ignore[import-not-found]
+
+    ORJSON_AVAILABLE = True
+except ImportError:  # pragma: no cover - závisí na prostředí
+    _orjson = None  # type: ignore[assignment]
+    ORJSON_AVAILABLE = False
+
+BACKEND = "orjson" if ORJSON_AVAILABLE else "json"
+
+_stdlib_encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"), allow_nan=False)
+_INF = math.inf
+_SCALAR_TYPES = frozenset((str, int, float, bool, type(None)))
+_encode_string = json.encoder.encode_basestring  # type: ignore[attr-defined]
+_float_repr = float.__repr__
+_int_repr = int.__repr__
+
+
+def _finite(value: Any) -> Any:
+    if type(value) is float and (value != value or value in (_INF, -_INF)):
+        return None
+    if isinstance(value, dict):
+        return {key: _finite(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_finite(item) for item in value]
+    return value
+
+
+def _stdlib_encode(obj: Any) -> str:
+    try:
+        return _stdlib_encoder.encode(obj)
+    except ValueError:
+        # NaN/Infinity nejsou platný JSON – stejně jako orjson je zapíšeme jako null.
+        return _stdlib_encoder.encode(_finite(obj))
+
+
+def _encode_value(value: Any) -> str:
+    # Rychlé cesty pro skaláry – JSONEncoder.encode() je pro ně řádově pomalejší.
+    kind = type(value)
+    if kind is str:
+        return _encode_string(value)
+    if kind is int:
+        return _int_repr(value)
+    if kind is float:
+        return _float_repr(value) if value == value and value not in (_INF, -_INF) else "null"
+    if value is True:
+        return "true"
+    if value is False:
+        return "false"
+    if value is None:
+        return "null"
+    return _stdlib_encode(value)
+
+
+def dumps(obj: Any) -> str:
+    """Serialize ``obj`` to compact JSON text."""
+    if _orjson is not None:
+        return _orjson.dumps(obj, option=_orjson.OPT_NON_STR_KEYS).decode("utf-8")
+    return _stdlib_encode(obj)
+
+
+def loads(data: str | bytes | bytearray) -> Any:
+    """Parse JSON text or UTF-8 bytes."""
+    if _orjson is not None:
+        return _orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps_with_fragments(obj: dict[str, Any], fragments: dict[str, str]) -> str:
+    """Serialize a dict and append pre-encoded JSON values for ``fragments`` keys.
+
+    ``fragments`` maps key -> already encoded JSON (see ``dumps``); the keys
+    must not also be present in ``obj``.
+    """
+    body = dumps(obj)
+    if not fragments:
+        return body
+    tail = ",".join(f"{dumps(key)}:{value}" for key, value in fragments.items())
+    return f"{body[:-1]}{',' if len(obj) else ''}{tail}}}"
+
+
+class TableStateEncoder:
+    """Encodes table state dicts, reusing encoded ``"key":value`` segments.
+
+    Table states are republished on every frame with most values unchanged.
+    The stdlib path caches the encoded segment per (stream, key) and only
+    re-encodes values that changed. With orjson a plain ``dumps`` is faster,
+    so the cache is bypassed.
+    """
+
+    MAX_KEYS_PER_STREAM = 512
+
+    def __init__(self) -> None:
+        self._segments: dict[str, dict[str, tuple[Any, str]]] = {}
+        self.reused = 0
+        self.encoded = 0
+
+    def encode(self, stream: str, data: dict[str, Any]) -> str:
+        if _orjson is not None:
+            return dumps(data)
+        segments = self._segments.get(stream)
+        if segments is None or len(segments) > self.MAX_KEYS_PER_STREAM:
+            segments = self._segments[stream] = {}
+        parts: list[str] = []
+        append = parts.append
+        for key, value in data.items():
+            cached = segments.get(key)
+            # Typ porovnáváme kvůli 1 == 1.0 == True.
+            if cached is not None and type(cached[0]) is type(value) and cached[0] == value:
+                append(cached[1])
+                self.reused += 1
+                continue
+            if not isinstance(key, str):
+                return dumps(data)
+            segment = f"{_encode_string(key)}:{_encode_value(value)}"
+            if type(value) in _SCALAR_TYPES:
+                # Mutovatelné hodnoty (list/dict) se necachují.
+                segments[key] = (value, segment)
+            append(segment)
+            self.encoded += 1
+        return "{" + ",".join(parts) + "}"
+
+    def forget(self, stream: str) -> None:
+        self._segments.pop(stream, None)
@@ -40,13 +40,20 @@ from mqtt.status import ProxyStatusPublisher
 from proxy.server import ProxyServer
 from sensor.loader import SensorMapLoader
 from sensor.processor import FrameProcessor
+from sensor.watcher import SensorMapWatcher
+from telemetry.audit_store import AuditQueryHandler, SettingsAuditStore
 from telemetry.collector import TelemetryCollector
-from twin import TwinControlHandler, TwinQueue
+from twin import TwinControlHandler, TwinJournal, TwinQueue
 from twin.delivery import TwinDelivery
 
 logger = logging.getLogger("oig_proxy_v2")
 
 
+def _log_level_number(name: str) -> int:
+    level = logging.getLevelName(name)
+    return level if isinstance(level, int) else logging.NOTSET
+
+
 class ProxyApp:
     """Main application class integrating all OIG Proxy v2 components."""
 
@@ -61,11 +68,14 @@ class ProxyApp:
         self.sensor_loader: SensorMapLoader | None = None
         self.mqtt: MQTTClient | None = None
         self.frame_processor: FrameProcessor | None = None
+        self.sensor_map_watcher: SensorMapWatcher | None = None
         self.twin_queue: TwinQueue | None = None
         self.twin_delivery: TwinDelivery | None = None
         self.twin_handler: TwinControlHandler | None = None
         self.status_publisher: ProxyStatusPublisher | None = None
         self.telemetry_collector: TelemetryCollector | None = None
+        self.audit_store: SettingsAuditStore | None = None
+        self.audit_query_handler: AuditQueryHandler | None = None
         self.frame_capture: FrameCapture | None = None
         self.pcap_capture: PcapCapture | None = None
         self.proxy: ProxyServer | None = None
@@ -89,7 +99,10 @@ class ProxyApp:
         logger.info("Device ID loaded: %s", device_id or "not set (will learn from frames)")
 
         # 3. Load sensor_map
-        self.sensor_loader = SensorMapLoader(self.config.sensor_map_path)
+        self.sensor_loader = SensorMapLoader(
+            self.config.sensor_map_path,
+            cache_path=self.config.sensor_map_cache_path or None,
+        )
         self.sensor_loader.load()
         sensor_count = self.sensor_loader.sensor_count()
         logger.info("Sensor map loaded: %d sensors from %s", sensor_count, self.config.sensor_map_path)
@@ -103,12 +116,19 @@ class ProxyApp:
             namespace=self.config.mqtt_namespace,
             qos=self.config.mqtt_qos,
             state_retain=self.config.mqtt_state_retain,
+            async_transport=self.config.mqtt_async_transport,
+            outbound_queue_max=self.config.mqtt_outbound_queue_max,
+            max_inflight=self.config.mqtt_max_inflight,
+            discovery_cache_path=self.config.discovery_cache_path or None,
+            discovery_mode=self.config.discovery_mode,
         )
 
         mqtt_device_id = device_id or "unknown"
         mqtt_ok = False
         mqtt_client = self.mqtt
-        if mqtt_client is not None:
+        if mqtt_client is not None and self.config.mqtt_async_transport:
+            mqtt_ok = await mqtt_client.connect_async(mqtt_device_id)
+        elif mqtt_client is not None:
             mqtt_ok = await asyncio.get_event_loop().run_in_executor(
                 None, lambda: mqtt_client.connect(mqtt_device_id)
             )
@@ -123,14 +143,37 @@ class ProxyApp:
             self.sensor_loader,
             proxy_device_id=self.config.proxy_device_id,
         )
+        if mqtt_client is not None:
+            mqtt_client.add_reconnect_callback(self.frame_processor.republish_discovery)
         if mqtt_client is not None and mqtt_client.is_ready() and self.frame_processor is not None:
             logger.info("FrameProcessor ready for lazy discovery from live frames")
+            mqtt_client.start_warm_start(self.frame_processor.seed_table_values)
             if device_id:
-                self.frame_processor.publish_all_discovery(device_id)
-                logger.info("Published full discovery for known device_id=%s", device_id)
+                frame_processor = self.frame_processor
+                discovery_task = asyncio.create_task(
+                    mqtt_client.publish_discovery_paced(
+                        lambda: frame_processor.publish_all_discovery(device_id)
+                    )
+                )
+                self._tasks.add(discovery_task)
+                discovery_task.add_done_callback(self._tasks.discard)
+                logger.info("Scheduled full discovery for known device_id=%s", device_id)
 
         # Create twin components
-        self.twin_queue = TwinQueue()
+        twin_journal = TwinJournal(self.config.twin_queue_path) if self.config.twin_queue_path else None
+        self.twin_queue = TwinQueue(
+            journal=twin_journal,
+            priorities=TwinQueue.parse_priorities(self.config.twin_priority_keys),
+        )
+        if self.twin_queue.size():
+            logger.info("Twin queue restored %d pending settings", self.twin_queue.size())
+
+        if self.config.settings_audit_db_path:
+            self.audit_store = SettingsAuditStore(
+                self.config.settings_audit_db_path,
+                retention_days=self.config.settings_audit_retention_days,
+            )
+            self.audit_store.start()
 
         if self.config.telemetry_enabled:
             self.telemetry_collector = TelemetryCollector(
@@ -139,6 +182,8 @@ class ProxyApp:
                 telemetry_enabled=self.config.telemetry_enabled,
                 telemetry_mqtt_broker=self.config.telemetry_mqtt_broker,
                 telemetry_interval_s=self.config.telemetry_interval_s,
+                log_level=_log_level_number(self.config.telemetry_log_level),
+                telemetry_payload_format=self.config.telemetry_payload_format,
                 device_id=mqtt_device_id,
                 mqtt_namespace=self.config.mqtt_namespace,
                 mqtt_publisher=self.mqtt,
@@ -167,6 +212,8 @@ class ProxyApp:
             self.twin_queue,
             self.mqtt,
             telemetry_collector=self.telemetry_collector,
+            window=self.config.twin_delivery_window,
+            audit_store=self.audit_store,
         )
 
         # 5. Start TwinControlHandler (if MQTT ready)
@@ -178,12 +225,39 @@ class ProxyApp:
                 namespace=self.config.mqtt_namespace,
                 proxy_control_handler=self._handle_proxy_control,
                 telemetry_collector=self.telemetry_collector,
+                get_reported_value=self._reported_setting_value,
+                is_cloud_pending=self.twin_delivery.has_cloud_pending,
+                audit_store=self.audit_store,
             )
             await self.twin_handler.start()
             logger.info("TwinControlHandler started")
+            if self.audit_store is not None:
+                self.audit_query_handler = AuditQueryHandler(
+                    self.mqtt, self.audit_store, namespace=self.config.mqtt_namespace
+                )
+                self.audit_query_handler.start()
         else:
             logger.warning("TwinControlHandler not started (MQTT not ready)")
 
+        # Sensor map hot reload
+        if self.config.map_reload_seconds > 0:
+            frame_processor = self.frame_processor
+            self.sensor_map_watcher = SensorMapWatcher(
+                self.sensor_loader,
+                self.config.sensor_map_path,
+                interval_s=self.config.map_reload_seconds,
+                cache_path=self.config.sensor_map_cache_path or None,
+                on_reload=frame_processor.apply_sensor_map_diff if frame_processor else None,
+                telemetry_collector=self.telemetry_collector,
+            )
+            watcher_task = asyncio.create_task(
+                self.sensor_map_watcher.run(),
+                name="sensor_map_watcher",
+            )
+            self._tasks.add(watcher_task)
+            watcher_task.add_done_callback(self._tasks.discard)
+            logger.info("Sensor map hot reload enabled (interval=%ds)", self.config.map_reload_seconds)
+
         # 6. Start ProxyStatusPublisher
         if self.config.proxy_status_interval > 0:
             self.status_publisher = ProxyStatusPublisher(
@@ -200,6 +274,14 @@ class ProxyApp:
                 ),
                 get_cloud_timeouts=lambda: self.proxy.cloud_timeouts if self.proxy else 0,
                 get_cloud_errors=lambda: self.proxy.cloud_errors if self.proxy else 0,
+                get_sensor_map_stats=(
+                    self.sensor_map_watcher.stats if self.sensor_map_watcher else None
+                ),
+                get_setting_latency_stats=(
+                    self.telemetry_collector.audit_latency.status_fields
+                    if self.telemetry_collector
+                    else None
+                ),
                 initial_device_id=device_id,
             )
             status_task = asyncio.create_task(
@@ -240,6 +322,7 @@ class ProxyApp:
                 db_path=self.config.capture_db_path,
                 capture_raw_bytes=self.config.capture_raw_bytes,
                 retention_days=self.config.capture_retention_days,
+                capture_format=self.config.capture_format,
             )
             self.frame_capture.start()
             logger.info(
@@ -358,7 +441,7 @@ class ProxyApp:
             return []
         return [
             {"key": f"{s.table}:{s.key}", "value": str(s.value)}
-            for s in self.twin_queue.get_pending()
+            for s in self.twin_queue.iter_pending()
         ]
 
     def _on_hybrid_transition(self, state: str, started_at: float, reason: str | None) -> None:
@@ -424,6 +507,14 @@ class ProxyApp:
         if table == "tbl_events" and self.telemetry_collector is not None:
             self.telemetry_collector.record_tbl_event(parsed=data, device_id=frame_device_id)
 
+    def _reported_setting_value(self, table: str, key: str) -> Any | None:
+        device_id = self.device_id_manager.device_id if self.device_id_manager else None
+        if self.frame_processor is None or not device_id:
+            return None
+        # Hodnota z warm startu nemusí odpovídat BOXu (např. revert během
+        # nepotvrzeného nastavení) – no-op rozhoduje jen živá data.
+        return self.frame_processor.reported_value(device_id, table, key, live_only=True)
+
     async def _on_confirmed_setting(
         self,
         device_id: str,
@@ -477,6 +568,8 @@ class ProxyApp:
             logger.info("TelemetryCollector stopped")
 
         # 3. Stop ProxyStatusPublisher
+        if self.sensor_map_watcher:
+            self.sensor_map_watcher.stop()
         if self.status_publisher:
             self.status_publisher.stop()
             logger.info("ProxyStatusPublisher stopped")
@@ -494,11 +587,19 @@ class ProxyApp:
             await self.twin_handler.stop()
             logger.info("TwinControlHandler stopped")
 
+        if self.audit_query_handler:
+            self.audit_query_handler.stop()
+        if self.audit_store:
+            self.audit_store.stop()
+
         # 5. Stop capture
         if self.pcap_capture:
             self.pcap_capture.stop()
             logger.info("PcapCapture stopped")
 
+        if self.twin_queue is not None:
+            self.twin_queue.close()
+
         if self.frame_capture:
             self.frame_capture.stop()
             logger.info("FrameCapture stopped")
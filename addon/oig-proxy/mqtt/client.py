@@ -3,7 +3,8 @@
 MQTT Client pro OIG Proxy v2.
 
 Paho-mqtt wrapper s:
-- auto-reconnect
+- neblokující reconnect s exponenciálním backoffem a jitterem
+- offline bufferem posledních hodnot per topic
 - HA MQTT discovery
 - publish state topics
 - LWT (Last Will Testament) pro availability
@@ -11,12 +12,21 @@ Paho-mqtt wrapper s:
 
 from __future__ import annotations
 
+import asyncio
 import json
 import logging
 import re
+import secrets
 import time
-from typing import Any, Callable
-
+from collections import OrderedDict
+from typing import Any, Callable, Iterable
+
+import json_codec
+from json_codec import TableStateEncoder
+from mqtt.discovery import DiscoveryPublisher
+from mqtt.router import TopicRouter
+from mqtt.state_cache import CachedState, StateCache
+from mqtt.transport import AsyncioMqttTransport, PublishResult
 from settings_constraints import CONTROL_WRITE_WHITELIST, SETTING_CONSTRAINTS, SettingConstraint
 
 logger = logging.getLogger(__name__)
@@ -52,17 +62,33 @@ except ImportError:  # pragma: no cover
     PAHO_AVAILABLE = False
 
 
+MIGRATE_DISCOVERY_PAYLOAD = json_codec.dumps({"migrate_discovery": True})
+HA_STATUS_TOPIC = "homeassistant/status"
+
+
 class MQTTClient:
     """
     Async-friendly paho-mqtt wrapper.
 
     connect() je synchronní (blokuje max timeout sekund).
     publish_*() metody jsou neblokující (paho loop_start).
-    health_check_loop() je asyncio korutina.
+    health_check_loop() je asyncio korutina; connect() spouští ve worker threadu.
+
+    S ``async_transport=True`` běží paho socket přímo na event loopu
+    (AsyncioMqttTransport) a publish jde přes omezenou frontu; API se nemění.
     """
 
     CONNECT_TIMEOUT = 5.0
     HEALTH_CHECK_INTERVAL = 30.0
+    RECONNECT_MIN_DELAY = 1.0
+    RECONNECT_MAX_DELAY = 60.0
+    OFFLINE_BUFFER_MAX_TOPICS = 500
+    STATE_CACHE_MAX_BYTES = 1_048_576
+    DISCOVERY_WINDOW = 10
+    DISCOVERY_BURST_PAUSE = 0.02
+    WARM_START_WINDOW = 2.0
+    FLUSH_BURST_SIZE = 50
+    FLUSH_BURST_PAUSE = 0.05
 
     def __init__(
         self,
@@ -74,6 +100,11 @@ class MQTTClient:
         namespace: str = "oig_local",
         qos: int = 1,
         state_retain: bool = True,
+        async_transport: bool = False,
+        outbound_queue_max: int = 1000,
+        max_inflight: int = 20,
+        discovery_cache_path: str | None = None,
+        discovery_mode: str = "entity",
     ) -> None:
         self.host = host
         self.port = port
@@ -82,10 +113,30 @@ class MQTTClient:
         self.namespace = namespace
         self.qos = qos
         self.state_retain = state_retain
+        self.async_transport = async_transport
+        self.outbound_queue_max = outbound_queue_max
+        self.max_inflight = max_inflight
 
         self._client: Any | None = None
+        self._transport: AsyncioMqttTransport | None = None
         self.connected = False
         self._discovery_sent: set[str] = set()
+        self._discovery = DiscoveryPublisher(
+            discovery_cache_path,
+            scope=f"{host}:{port}/{namespace}",
+            window=self.DISCOVERY_WINDOW,
+            burst_pause=self.DISCOVERY_BURST_PAUSE,
+        )
+        self._discovery.load()
+        # Device-based discovery: komponenty seskupené podle HA zařízení
+        self.discovery_mode = "device" if discovery_mode == "device" else "entity"
+        self._device_components: dict[str, dict[str, dict[str, Any]]] = {}
+        self._device_removed: dict[str, dict[str, str]] = {}
+        self._device_dirty: set[str] = set()
+        self._device_flush_scheduled = False
+        self._migrated_topics: list[str] = []
+        # Per-entity configy, které broker drží jako retained (warm start).
+        self._retained_entity_topics: set[str] = set()
         self._availability_online_sent: set[str] = set()
         self._all_known_device_ids: set[str] = set()
 
@@ -96,8 +147,36 @@ class MQTTClient:
 
         # Subscriptions
         self._subscriptions: dict[str, Callable[[str, bytes], None]] = {}
+        self._router = TopicRouter()
+        # Callback -> True jen retained zprávy (warm start), False jen živé.
+        self._retain_filter: dict[Callable[[str, bytes], None], bool] = {}
         self._connect_device_id: str = "unknown"
 
+        # Offline buffer: topic -> (payload, qos, retain), jen poslední hodnota
+        self._offline_buffer: OrderedDict[str, tuple[str, int, bool]] = OrderedDict()
+        self.offline_buffered = 0
+        self.offline_dropped = 0
+        self.offline_flushed = 0
+        self.reconnect_attempts = 0
+        self._reconnect_callbacks: list[Callable[[], None]] = []
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._wake_event: asyncio.Event | None = None
+        self._jitter = secrets.SystemRandom()
+
+        # Poslední publikovaný stav per state topic (telemetrie, warm start)
+        self._state_cache = StateCache(self.STATE_CACHE_MAX_BYTES)
+        self._state_encoder = TableStateEncoder()
+        # Předkódované device/availability bloky discovery payloadů
+        self._discovery_fragments: dict[str, str] = {}
+        self.state_unchanged = 0
+
+        # HA birth zpráva – broker mohl přijít o retained discovery configy.
+        self._ha_birth_pending = False
+        on_ha_status = self._on_ha_status
+        self._subscriptions[HA_STATUS_TOPIC] = on_ha_status
+        self._router.add(HA_STATUS_TOPIC, on_ha_status)
+        self._retain_filter[on_ha_status] = False
+
     # ------------------------------------------------------------------
     # Připojení
     # ------------------------------------------------------------------
@@ -110,6 +189,9 @@ class MQTTClient:
 
         timeout = timeout or self.CONNECT_TIMEOUT
         self._connect_device_id = device_id
+        if self._client is not None:
+            # Starý klient (vč. jeho paho retry threadu) nahrazujeme novým.
+            self._cleanup()
         client = self._create_client(device_id)
         if client is None:
             return False
@@ -135,9 +217,61 @@ class MQTTClient:
         logger.info("MQTT: ✅ Připojeno k %s:%s", self.host, self.port)
         return True
 
+    async def connect_async(self, device_id: str, timeout: float | None = None) -> bool:
+        """Připojí se bez blokování event loopu.
+
+        Bez ``async_transport`` spustí connect() ve worker threadu. S ním
+        proběhne jen TCP connect ve threadu a socket dál obsluhuje event loop.
+        """
+        if not self.async_transport:
+            if timeout is None:
+                return await asyncio.to_thread(self.connect, device_id)
+            return await asyncio.to_thread(self.connect, device_id, timeout)
+        if not PAHO_AVAILABLE:
+            logger.error("paho-mqtt není nainstalováno")
+            return False
+
+        timeout = timeout or self.CONNECT_TIMEOUT
+        self._connect_device_id = device_id
+        # Fronta a nepotvrzené QoS 1 zprávy starého spojení jdou do nového.
+        pending = self._transport.take_pending() if self._transport is not None else []
+        if self._client is not None:
+            self._cleanup()
+        client = self._create_client(device_id)
+        if client is None:
+            return False
+        client.max_inflight_messages_set(self.max_inflight)
+        self._transport = AsyncioMqttTransport(
+            client,
+            asyncio.get_running_loop(),
+            max_queue=self.outbound_queue_max,
+            max_inflight=self.max_inflight,
+        )
+        self._transport.requeue(pending)
+        self._client = client
+        try:
+            await asyncio.to_thread(client.connect, self.host, self.port, 60)
+        except OSError as exc:
+            logger.error("MQTT: Připojení selhalo: %s", exc)
+            self._cleanup()
+            return False
+
+        deadline = time.monotonic() + timeout
+        while not self.connected and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+
+        if not self.connected:
+            logger.error("MQTT: Timeout připojení po %.1fs", timeout)
+            self._cleanup()
+            return False
+
+        logger.info("MQTT: ✅ Připojeno k %s:%s (asyncio transport)", self.host, self.port)
+        return True
+
     def disconnect(self) -> None:
         """Odpojí se od brokeru."""
         self._cleanup()
+        self._discovery.save()
 
     def _create_client(self, device_id: str) -> Any | None:
         if _paho_mqtt is None:
@@ -168,13 +302,23 @@ class MQTTClient:
         return client
 
     def _cleanup(self) -> None:
+        transport = self._transport
+        self._transport = None
         if self._client:
             try:
-                self._client.loop_stop()
-                self._client.disconnect()
+                if transport is not None:
+                    self._client.disconnect()
+                    if transport.attached:
+                        # Bez network threadu DISCONNECT odešleme sami.
+                        self._client.loop_write()
+                else:
+                    self._client.loop_stop()
+                    self._client.disconnect()
             except Exception as exc:  # noqa: BLE001
                 logger.debug("MQTT cleanup error: %s", exc)
             self._client = None
+        if transport is not None:
+            transport.close()
         self.connected = False
 
     # ------------------------------------------------------------------
@@ -189,18 +333,30 @@ class MQTTClient:
             connect_id = getattr(client, "_oig_device_id", self._connect_device_id)
             for device_id in ({connect_id} | self._all_known_device_ids):
                 avail_topic = f"{self.namespace}/{device_id}/availability"
-                client.publish(avail_topic, "online", retain=True, qos=1)
+                self._publish(client, avail_topic, "online", retain=True, qos=1)
                 self._availability_online_sent.add(device_id)
             self._remove_legacy_discovery(client, connect_id)
+            for topic in self._subscriptions:
+                client.subscribe(topic, qos=self.qos)
+            self._wake_health_check()
             logger.info("MQTT: Připojeno (rc=0)")
         else:
             self.connected = False
             logger.error("MQTT: Odmítnuto (rc=%s)", rc)
 
+    def _on_ha_status(self, _topic: str, payload: bytes) -> None:
+        """HA birth (``online``): republish all discovery on the event loop."""
+        if payload.strip().lower() != b"online":
+            return
+        logger.info("MQTT: Home Assistant online – discovery se publikuje znovu")
+        self._ha_birth_pending = True
+        self._wake_health_check()
+
     def _on_disconnect(self, _client: Any, _userdata: Any, rc: int) -> None:
         self.connected = False
         if rc != 0:
             logger.warning("MQTT: Neočekávané odpojení (rc=%s)", rc)
+            self._wake_health_check()
 
     # ------------------------------------------------------------------
     # Publish
@@ -208,27 +364,305 @@ class MQTTClient:
 
     def _remove_legacy_discovery(self, client: Any, device_id: str) -> None:
         """Remove retained discovery for obsolete or incorrectly typed entities."""
-        for component, table, key, suffix in LEGACY_DISCOVERY_TOMBSTONES:
+        self._publish_tombstones(client, device_id, LEGACY_DISCOVERY_TOMBSTONES)
+
+    def _publish_tombstones(
+        self,
+        client: Any,
+        device_id: str,
+        tombstones: Iterable[tuple[str, str, str, str]],
+    ) -> int:
+        removed = 0
+        for component, table, key, suffix in tombstones:
             unique_id = f"{self.namespace}_{device_id}_{table}_{key}{suffix}".lower()
             topic = f"homeassistant/{component}/{unique_id}/config"
-            client.publish(topic, "", retain=True, qos=1)
+            self._discovery_sent.discard(unique_id)
+            self._drop_device_component(component, unique_id)
+            if self._publish_discovery(client, topic, "").rc == 0:
+                removed += 1
+        self._schedule_device_flush()
+        return removed
+
+    def remove_discovery(
+        self,
+        device_id: str,
+        tombstones: Iterable[tuple[str, str, str, str]],
+    ) -> int:
+        """Tombstone retained discovery configs.
+
+        Uses the same ``(component, table, key, suffix)`` tuples as
+        LEGACY_DISCOVERY_TOMBSTONES. Returns the number of topics cleared.
+        """
+        client = self._client
+        if client is None or not self.is_ready():
+            return 0
+        try:
+            return self._publish_tombstones(client, device_id, tombstones)
+        except Exception as exc:  # noqa: BLE001
+            logger.error("MQTT: discovery tombstone exception: %s", exc)
+            return 0
+
+    def forget_discovery(self, device_id: str, table: str, sensor_key: str) -> None:
+        """Drop the sent-discovery marker so the next send_discovery() republishes."""
+        unique_id = f"{self.namespace}_{device_id}_{table}_{sensor_key.lower()}".lower()
+        self._discovery_sent.discard(unique_id)
+        self._discovery_sent.discard(f"{unique_id}_cfg")
+
+    @classmethod
+    def discovery_components(
+        cls,
+        table: str,
+        sensor_key: str,
+        *,
+        is_binary: bool = False,
+        enum_map: dict[str, str] | None = None,
+    ) -> list[tuple[str, str]]:
+        """Return ``(component, unique_id suffix)`` pairs send_discovery() publishes."""
+        is_setting = table in CONTROL_WRITE_WHITELIST and sensor_key in CONTROL_WRITE_WHITELIST[table]
+        if not is_setting:
+            return [("binary_sensor" if is_binary else "sensor", "")]
+        components: list[tuple[str, str]] = []
+        if table == "tbl_box_prms" and sensor_key == "MODE":
+            components.append(("binary_sensor" if is_binary else "sensor", ""))
+        components.append((cls._control_component(table, sensor_key, is_binary, enum_map), "_cfg"))
+        return components
+
+    @classmethod
+    def _control_component(
+        cls,
+        table: str,
+        sensor_key: str,
+        is_binary: bool,
+        enum_map: dict[str, str] | None,
+    ) -> str:
+        if cls._is_select_control(table, sensor_key, enum_map):
+            return "select"
+        constraint = SETTING_CONSTRAINTS.get((table, sensor_key))
+        if is_binary or cls._is_binary_control_constraint(constraint):
+            return "switch"
+        return "number"
 
     def is_ready(self) -> bool:
         return self._client is not None and self.connected
 
+    def _publish(
+        self,
+        client: Any,
+        topic: str,
+        payload: str | bytes,
+        *,
+        qos: int,
+        retain: bool,
+    ) -> Any:
+        """Publish přes asyncio transport (pokud běží), jinak přímo přes paho."""
+        transport = self._transport
+        if transport is not None:
+            return transport.publish(topic, payload, qos=qos, retain=retain)
+        return client.publish(topic, payload, qos=qos, retain=retain)
+
+    def _publish_discovery(self, client: Any, topic: str, payload: str) -> Any:
+        """Retained discovery publish: skip unchanged, queue during bulk runs."""
+        action = self._discovery.offer(topic, payload)
+        if action != "publish":
+            return PublishResult(0)
+        result = self._publish(client, topic, payload, retain=True, qos=1)
+        if getattr(result, "rc", 1) == 0:
+            self._discovery.track(result, topic, payload)
+            self._discovery.published += 1
+        return result
+
+    def _emit_discovery(self, client: Any, component: str, payload: dict[str, Any]) -> Any:
+        """Publish one entity config, or fold it into its device config in device mode."""
+        unique_id = payload["unique_id"]
+        topic = f"homeassistant/{component}/{unique_id}/config"
+        if self.discovery_mode != "device":
+            return self._publish_discovery(client, topic, self._encode_entity_discovery(payload))
+
+        identifier = payload["device"]["identifiers"][0]
+        self._device_components.setdefault(identifier, {})[unique_id] = {"p": component, **payload}
+        self._device_removed.get(identifier, {}).pop(unique_id, None)
+        self._device_dirty.add(identifier)
+        if self._holds_entity_config(topic):
+            self._migrate_entity_topic(client, topic)
+        self._schedule_device_flush()
+        return PublishResult(0)
+
+    def _holds_entity_config(self, topic: str) -> bool:
+        return topic in self._retained_entity_topics or self._discovery.holds_config(topic)
+
+    def _migrate_entity_topic(self, client: Any, topic: str) -> None:
+        # Stávající per-entity config převedeme (HA migrate_discovery), po
+        # odeslání device configu se topic vyčistí. Na čisté instalaci (topic
+        # není v cache ani mezi retained configy) se nic neposílá.
+        if topic in self._migrated_topics:
+            return
+        self._publish_discovery(client, topic, MIGRATE_DISCOVERY_PAYLOAD)
+        self._migrated_topics.append(topic)
+
+    def _on_retained_entity_config(self, topic: str, payload: bytes) -> None:
+        """Warm start (device mode): remember entity configs the broker holds."""
+        parts = topic.split("/")
+        if len(parts) != 4 or not payload or not parts[2].startswith(f"{self.namespace}_".lower()):
+            return
+        self._retained_entity_topics.add(topic)
+        client = self._client
+        unique_id = parts[2]
+        for identifier, components in self._device_components.items():
+            if unique_id in components and client is not None:
+                # Entita už je v device configu – převedeme ji dodatečně.
+                self._migrate_entity_topic(client, topic)
+                self._device_dirty.add(identifier)
+                self._schedule_device_flush()
+
+    def _encode_entity_discovery(self, payload: dict[str, Any]) -> str:
+        fragments: dict[str, str] = {}
+        body = dict(payload)
+        for key in ("device", "availability"):
+            value = body.pop(key, None)
+            if value is None:
+                continue
+            cache_key = f"{key}:{value['identifiers'][0] if key == 'device' else value[0]['topic']}"
+            fragment = self._discovery_fragments.get(cache_key)
+            if fragment is None:
+                fragment = self._discovery_fragments[cache_key] = json_codec.dumps(value)
+            fragments[key] = fragment
+        return json_codec.dumps_with_fragments(body, fragments)
+
+    def _drop_device_component(self, component: str, unique_id: str) -> None:
+        for identifier, components in self._device_components.items():
+            if components.pop(unique_id, None) is not None:
+                # HA odebere komponentu, když v cmps zůstane jen platforma.
+                self._device_removed.setdefault(identifier, {})[unique_id] = component
+                self._device_dirty.add(identifier)
+
+    def _schedule_device_flush(self) -> None:
+        if self.discovery_mode != "device" or self._discovery.bulk or not self._device_dirty:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._flush_device_discovery()
+            return
+        if not self._device_flush_scheduled:
+            self._device_flush_scheduled = True
+            loop.call_soon(self._flush_device_discovery)
+
+    def _device_discovery_payload(self, identifier: str) -> dict[str, Any] | None:
+        components = self._device_components.get(identifier, {})
+        removed = self._device_removed.get(identifier, {})
+        if not components and not removed:
+            return None
+        cmps: dict[str, dict[str, Any]] = {
+            unique_id: {"p": component} for unique_id, component in removed.items()
+        }
+        device: dict[str, Any] = {"identifiers": [identifier]}
+        availability: list[dict[str, Any]] = []
+        for unique_id, config in components.items():
+            cmps[unique_id] = {
+                key: value for key, value in config.items() if key not in ("device", "availability")
+            }
+            device = config["device"]
+            availability = config["availability"]
+        payload: dict[str, Any] = {
+            "dev": device,
+            "o": {"name": "OIG Proxy"},
+            "cmps": cmps,
+        }
+        if availability:
+            payload["availability"] = availability
+        return payload
+
+    def _flush_device_discovery(self) -> int:
+        """Publish device configs with pending changes, then clear migrated topics."""
+        self._device_flush_scheduled = False
+        client = self._client
+        if client is None or not self.is_ready():
+            return 0
+        published = 0
+        failed: set[str] = set()
+        for identifier in sorted(self._device_dirty):
+            payload = self._device_discovery_payload(identifier)
+            if payload is None:
+                continue
+            topic = f"homeassistant/device/{identifier}/config"
+            if self._publish_discovery(client, topic, json_codec.dumps(payload)).rc == 0:
+                # Odebrané komponenty stačí ohlásit jednou, ale až po úspěšném publish.
+                self._device_removed.pop(identifier, None)
+                published += 1
+            else:
+                failed.add(identifier)
+        self._device_dirty = failed
+        if not self._discovery.bulk:
+            self._clear_migrated_topics(client)
+        return published
+
+    def _clear_migrated_topics(self, client: Any) -> None:
+        topics, self._migrated_topics = self._migrated_topics, []
+        for topic in topics:
+            self._publish_discovery(client, topic, "")
+
+    async def _drain_discovery(self) -> dict[str, Any]:
+        return await self._discovery.drain(
+            lambda topic, payload: self._publish(self._client, topic, payload, retain=True, qos=1),
+            self.is_ready,
+        )
+
+    async def publish_discovery_paced(self, *producers: Callable[[], Any]) -> dict[str, Any]:
+        """Run discovery producers (e.g. ``publish_all_discovery``) as one paced batch.
+
+        Configs the producers emit are queued instead of published directly;
+        the queue is then drained with a bounded inflight window. Returns
+        ``{"published", "skipped", "duration_ms"}`` for this run.
+        """
+        self._discovery.begin_bulk()
+        for producer in producers:
+            try:
+                producer()
+            except Exception as exc:  # noqa: BLE001
+                logger.error("MQTT: discovery producer error: %s", exc)
+        self._flush_device_discovery()
+        stats = await self._drain_discovery()
+        if self._migrated_topics and self.is_ready():
+            # Staré per-entity topicy mažeme až po odeslání device configů.
+            self._discovery.begin_bulk()
+            client = self._client
+            if client is not None:
+                self._clear_migrated_topics(client)
+            cleanup = await self._drain_discovery()
+            stats = {key: stats[key] + cleanup[key] for key in stats}
+        logger.info(
+            "MQTT: Discovery publikováno %d, beze změny %d (%.0f ms)",
+            stats["published"],
+            stats["skipped"],
+            stats["duration_ms"],
+        )
+        return stats
+
+    def discovery_stats(self) -> dict[str, Any]:
+        """Published/skipped counters of the discovery pipeline."""
+        return self._discovery.stats()
+
+    def transport_stats(self) -> dict[str, Any]:
+        """Outbound queue metrics of the asyncio transport ({} in thread mode)."""
+        transport = self._transport
+        return transport.stats() if transport is not None else {}
+
     def publish_state(self, device_id: str, table: str, data: dict[str, Any]) -> bool:
         """
         Publikuje data jako JSON na state topic.
 
         Topic: {namespace}/{device_id}/{table}/state
         """
+        topic = f"{self.namespace}/{device_id}/{table}/state"
+        payload = self._state_encoder.encode(topic, data)
+        if not self._state_cache.put(topic, payload, data):
+            self.state_unchanged += 1
         if not self.is_ready():
             self.publish_failed += 1
+            self._buffer_offline(topic, payload, self.qos, self.state_retain)
+            self._all_known_device_ids.add(device_id)
             return False
 
-        topic = f"{self.namespace}/{device_id}/{table}/state"
-        payload = json.dumps(data)
-
         self.publish_count += 1
         try:
             client = self._client
@@ -238,27 +672,109 @@ class MQTTClient:
             if device_id not in self._availability_online_sent:
                 avail_topic = f"{self.namespace}/{device_id}/availability"
                 try:
-                    avail_result = client.publish(avail_topic, "online", retain=True, qos=1)
+                    avail_result = self._publish(client, avail_topic, "online", retain=True, qos=1)
                     if getattr(avail_result, "rc", 1) == 0:
                         self._availability_online_sent.add(device_id)
                         self._all_known_device_ids.add(device_id)
                 except Exception as exc:  # noqa: BLE001
                     logger.debug("MQTT availability publish failed for %s: %s", device_id, exc)
-            result = client.publish(
-                topic, payload, qos=self.qos, retain=self.state_retain
+            result = self._publish(
+                client, topic, payload, qos=self.qos, retain=self.state_retain
             )
             if result.rc == 0:
                 self.publish_success += 1
                 logger.debug("MQTT: → %s (%d keys)", topic, len(data))
                 return True
             self.publish_failed += 1
+            self._buffer_offline(topic, payload, self.qos, self.state_retain)
             logger.error("MQTT: publish rc=%s", result.rc)
             return False
         except Exception as exc:  # noqa: BLE001
             self.publish_failed += 1
+            self._buffer_offline(topic, payload, self.qos, self.state_retain)
             logger.error("MQTT: publish exception: %s", exc)
             return False
 
+    def publish_message(self, topic: str, payload: str, *, retain: bool = False) -> bool:
+        """Publish one non-state message (request/response topics); not buffered offline."""
+        client = self._client
+        if client is None or not self.is_ready():
+            return False
+        try:
+            return self._publish(client, topic, payload, qos=self.qos, retain=retain).rc == 0
+        except Exception as exc:  # noqa: BLE001
+            logger.debug("MQTT: publish to %s failed: %s", topic, exc)
+            return False
+
+    # ------------------------------------------------------------------
+    # State cache
+    # ------------------------------------------------------------------
+
+    def get_cached_payload(self, topic: str) -> str | None:
+        """Return the last serialized payload published on a state topic."""
+        entry = self._state_cache.get(topic)
+        return entry.payload if entry is not None else None
+
+    def get_cached_state(self, topic: str) -> CachedState | None:
+        """Return the cache entry (payload, source dict, updated/changed time)."""
+        return self._state_cache.get(topic)
+
+    def get_cached_field(self, topic: str, field_name: str) -> Any | None:
+        """O(1) field lookup in the last published state (case-insensitive fallback)."""
+        entry = self._state_cache.get(topic)
+        return entry.get(field_name) if entry is not None else None
+
+    def start_warm_start(
+        self,
+        on_state: Callable[[str, str, dict[str, Any]], None] | None = None,
+        window_s: float | None = None,
+    ) -> bool:
+        """Seed the state cache from retained state topics after a restart.
+
+        Subscribes to ``{namespace}/+/+/state`` for ``window_s`` seconds.
+        Retained payloads are cached for topics not published yet in this run
+        and passed to ``on_state(device_id, table, data)``; ``device_id`` is
+        the one from the topic. Live (non-retained) messages are ignored.
+        In device discovery mode the retained per-entity configs of this
+        namespace are collected as well, so only those get migrated.
+        Must be called from the event loop.
+        """
+        loop = asyncio.get_running_loop()
+        topic_filter = f"{self.namespace}/+/+/state"
+
+        def _adopt(topic: str, payload: bytes) -> None:
+            if topic in self._state_cache:
+                return
+            try:
+                text = payload.decode("utf-8") if isinstance(payload, bytes) else str(payload)
+                data = json_codec.loads(text)
+            except (UnicodeDecodeError, ValueError):
+                return
+            if not isinstance(data, dict):
+                return
+            self._state_cache.put(topic, text, data)
+            if on_state is not None:
+                parts = topic.split("/")
+                on_state(parts[1], parts[2], data)
+
+        def _on_retained(topic: str, payload: bytes) -> None:
+            # Paho thread – cache i processor patří event loopu.
+            loop.call_soon_threadsafe(_adopt, topic, payload)
+
+        if not self.subscribe(topic_filter, _on_retained, retained=True):
+            return False
+        loop.call_later(window_s or self.WARM_START_WINDOW, self.unsubscribe, topic_filter)
+        if self.discovery_mode == "device":
+            config_filter = "homeassistant/+/+/config"
+
+            def _on_retained_config(topic: str, payload: bytes) -> None:
+                loop.call_soon_threadsafe(self._on_retained_entity_config, topic, payload)
+
+            if self.subscribe(config_filter, _on_retained_config, retained=True):
+                loop.call_later(window_s or self.WARM_START_WINDOW, self.unsubscribe, config_filter)
+        logger.info("MQTT: Warm start z retained state topiců (%.1fs)", window_s or self.WARM_START_WINDOW)
+        return True
+
     # ------------------------------------------------------------------
     # HA Discovery
     # ------------------------------------------------------------------
@@ -359,12 +875,7 @@ class MQTTClient:
                     return True
 
                 if dual_publish_sensor and unique_id not in self._discovery_sent:
-                    sensor_result = client.publish(
-                        discovery_topic,
-                        json.dumps(payload),
-                        retain=True,
-                        qos=1,
-                    )
+                    sensor_result = self._emit_discovery(client, component, payload)
                     if sensor_result.rc == 0:
                         self._discovery_sent.add(unique_id)
                         logger.debug("MQTT: Discovery → %s", discovery_topic)
@@ -372,11 +883,7 @@ class MQTTClient:
                         return False
 
                 constraint = SETTING_CONSTRAINTS.get((table, sensor_key))
-                binary_control = is_binary or self._is_binary_control_constraint(constraint)
-                if self._is_select_control(table, sensor_key, enum_map):
-                    control_component = "select"
-                else:
-                    control_component = "switch" if binary_control else "number"
+                control_component = self._control_component(table, sensor_key, is_binary, enum_map)
                 control_object_id = self._build_object_id(device_id, table, safe_key, is_control=True)
                 control_payload: dict[str, Any] = {
                     "name": sensor_name,
@@ -423,21 +930,14 @@ class MQTTClient:
                     )
 
                 control_topic = f"homeassistant/{control_component}/{control_unique_id}/config"
-                control_result = client.publish(
-                    control_topic,
-                    json.dumps(control_payload),
-                    retain=True,
-                    qos=1,
-                )
+                control_result = self._emit_discovery(client, control_component, control_payload)
                 if control_result.rc == 0:
                     self._discovery_sent.add(control_unique_id)
                     logger.debug("MQTT: Discovery → %s", control_topic)
                     return True
                 return False
 
-            result = client.publish(
-                discovery_topic, json.dumps(payload), retain=True, qos=1
-            )
+            result = self._emit_discovery(client, component, payload)
             if result.rc == 0:
                 self._discovery_sent.add(unique_id)
                 logger.debug("MQTT: Discovery → %s", discovery_topic)
@@ -490,33 +990,139 @@ class MQTTClient:
     # Health check
     # ------------------------------------------------------------------
 
+    def add_reconnect_callback(self, callback: Callable[[], None]) -> None:
+        """Register a callback run after each reconnect once the offline buffer is flushed.
+
+        Callbacks run inside one paced discovery batch (publish_discovery_paced).
+        """
+        self._reconnect_callbacks.append(callback)
+
+    def _wake_health_check(self) -> None:
+        # Volá se z paho threadu – probudíme health_check_loop na event loopu.
+        loop = self._loop
+        event = self._wake_event
+        if loop is None or event is None or loop.is_closed():
+            return
+        try:
+            loop.call_soon_threadsafe(event.set)
+        except RuntimeError:
+            pass
+
+    def _reconnect_delay(self, failures: int) -> float:
+        """Exponential backoff with equal jitter: half fixed, half random."""
+        delay = min(self.RECONNECT_MAX_DELAY, self.RECONNECT_MIN_DELAY * (2 ** max(0, failures - 1)))
+        return delay / 2 + self._jitter.uniform(0, delay / 2)
+
+    def _buffer_offline(self, topic: str, payload: str, qos: int, retain: bool) -> None:
+        if topic in self._offline_buffer:
+            self._offline_buffer.move_to_end(topic)
+        elif len(self._offline_buffer) >= self.OFFLINE_BUFFER_MAX_TOPICS:
+            self._offline_buffer.popitem(last=False)
+            self.offline_dropped += 1
+        self._offline_buffer[topic] = (payload, qos, retain)
+        self.offline_buffered += 1
+
+    def offline_buffer_size(self) -> int:
+        return len(self._offline_buffer)
+
+    async def flush_offline_buffer(self) -> int:
+        """Publish buffered last values in paced bursts. Returns published count."""
+        published = 0
+        while self._offline_buffer and self.is_ready():
+            client = self._client
+            for _ in range(min(self.FLUSH_BURST_SIZE, len(self._offline_buffer))):
+                topic, (payload, qos, retain) = self._offline_buffer.popitem(last=False)
+                try:
+                    ok = getattr(self._publish(client, topic, payload, qos=qos, retain=retain), "rc", 1) == 0
+                except Exception as exc:  # noqa: BLE001
+                    logger.debug("MQTT: offline flush exception for %s: %s", topic, exc)
+                    ok = False
+                if not ok:
+                    # Vrátíme na začátek, zbytek počká na další pokus.
+                    self._offline_buffer[topic] = (payload, qos, retain)
+                    self._offline_buffer.move_to_end(topic, last=False)
+                    self.offline_flushed += published
+                    return published
+                published += 1
+            await asyncio.sleep(self.FLUSH_BURST_PAUSE)
+        self.offline_flushed += published
+        return published
+
+    async def _replay_after_reconnect(self) -> None:
+        if self._ha_birth_pending:
+            self._ha_birth_pending = False
+            self._discovery.reset()
+            self._discovery_sent.clear()
+        flushed = await self.flush_offline_buffer()
+        if flushed:
+            logger.info("MQTT: Offline buffer flushed (%d topics)", flushed)
+        client = self._client
+        if client is not None and self.connected:
+            for device_id in self._all_known_device_ids - self._availability_online_sent:
+                self._publish(
+                    client, f"{self.namespace}/{device_id}/availability", "online", retain=True, qos=1
+                )
+                self._availability_online_sent.add(device_id)
+        if self._reconnect_callbacks:
+            # Callbacky přehrávají discovery – jednou dávkou s pacingem.
+            await self.publish_discovery_paced(*self._reconnect_callbacks)
+
     async def health_check_loop(self, device_id: str) -> None:
-        """Asyncio korutina – periodicky reconnectuje pokud je odpojeno."""
-        import asyncio
+        """Asyncio korutina – reconnect s backoffem, po připojení flush bufferu a replay."""
+        self._loop = asyncio.get_running_loop()
+        self._wake_event = asyncio.Event()
 
         logger.info(
             "MQTT: Health check spuštěn (interval %.0fs)",
             self.HEALTH_CHECK_INTERVAL,
         )
+        failures = 0
         while True:
-            await asyncio.sleep(self.HEALTH_CHECK_INTERVAL)
-            if not self.connected:
-                logger.warning("MQTT: Reconnect...")
-                if self.connect(device_id):
-                    logger.info("MQTT: ✅ Reconnect úspěšný")
-                else:
-                    logger.warning("MQTT: ❌ Reconnect selhal")
+            delay = self._reconnect_delay(failures) if failures else self.HEALTH_CHECK_INTERVAL
+            try:
+                await asyncio.wait_for(self._wake_event.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+            woken = self._wake_event.is_set()
+            self._wake_event.clear()
+
+            if self.connected:
+                failures = 0
+                if woken:
+                    # Paho se připojil sám (interní retry) – přehrajeme stav.
+                    await self._replay_after_reconnect()
+                elif self._offline_buffer:
+                    await self.flush_offline_buffer()
+                continue
+
+            self.reconnect_attempts += 1
+            logger.warning("MQTT: Reconnect (pokus %d)...", failures + 1)
+            if await self.connect_async(device_id):
+                logger.info("MQTT: ✅ Reconnect úspěšný")
+                self._wake_event.clear()
+                failures = 0
+                await self._replay_after_reconnect()
+            else:
+                failures += 1
+                logger.warning("MQTT: ❌ Reconnect selhal")
 
     # ------------------------------------------------------------------
     # Subscribe / Unsubscribe
     # ------------------------------------------------------------------
 
-    def subscribe(self, topic: str, callback: Callable[[str, bytes], None]) -> bool:
+    def subscribe(
+        self,
+        topic: str,
+        callback: Callable[[str, bytes], None],
+        *,
+        retained: bool | None = None,
+    ) -> bool:
         """Subscribe to an MQTT topic.
 
         Args:
             topic: The topic to subscribe to
             callback: Function to call when message received (topic: str, payload: bytes)
+            retained: Deliver only retained (True) or only live (False) messages
 
         Returns:
             True if subscription was successful
@@ -526,6 +1132,9 @@ class MQTTClient:
             return False
 
         self._subscriptions[topic] = callback
+        self._router.add(topic, callback)
+        if retained is not None:
+            self._retain_filter[callback] = retained
 
         try:
             client = self._client
@@ -554,7 +1163,8 @@ class MQTTClient:
             return False
 
         if topic in self._subscriptions:
-            del self._subscriptions[topic]
+            self._retain_filter.pop(self._subscriptions.pop(topic), None)
+            self._router.remove(topic)
 
         try:
             client = self._client
@@ -573,38 +1183,16 @@ class MQTTClient:
     def _on_message(self, client: Any, _userdata: Any, msg: Any) -> None:
         """Internal callback for incoming MQTT messages.
 
-        Routes messages to registered callbacks.
+        Dispatches to every subscription whose filter matches the topic.
         """
         topic = msg.topic
         payload = msg.payload
+        retained = bool(getattr(msg, "retain", False))
 
-        # Find matching callback
-        for sub_topic, callback in self._subscriptions.items():
-            if self._topic_matches(sub_topic, topic):
-                try:
-                    callback(topic, payload)
-                except Exception as exc:  # noqa: BLE001
-                    logger.error("MQTT: Callback error for %s: %s", topic, exc)
-                return
-
-    @staticmethod
-    def _topic_matches(subscription: str, topic: str) -> bool:
-        """Check if a topic matches a subscription pattern.
-
-        Supports + and # wildcards.
-        """
-        if subscription == topic:
-            return True
-
-        sub_parts = subscription.split("/")
-        topic_parts = topic.split("/")
-
-        for i, sub_part in enumerate(sub_parts):
-            if sub_part == "#":
-                return True
-            if sub_part == "+":
+        for callback in self._router.match(topic):
+            if self._retain_filter.get(callback, retained) != retained:
                 continue
-            if i >= len(topic_parts) or sub_part != topic_parts[i]:
-                return False
-
-        return len(sub_parts) == len(topic_parts)
+            try:
+                callback(topic, payload)
+            except Exception as exc:  # noqa: BLE001
+                logger.error("MQTT: Callback error for %s: %s", topic, exc)
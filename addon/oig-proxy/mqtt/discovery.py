@@ -0,0 +1,231 @@
+"""Paced publishing of retained HA discovery configs with a fingerprint cache."""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable
+
+logger = logging.getLogger(__name__)
+
+PublishFn = Callable[[str, str], Any]
+
+
+def _ack_state(info: Any) -> bool | None:
+    """True = broker potvrdil, False = čeká, None = publish selhal."""
+    is_published = getattr(info, "is_published", None)
+    if is_published is None:
+        return True
+    try:
+        return bool(is_published())
+    except (RuntimeError, ValueError):
+        return None
+
+
+class DiscoveryPublisher:
+    """Deduplicates and paces retained discovery publishes.
+
+    A content fingerprint per discovery topic is kept on disk, so configs the
+    broker already holds are skipped across restarts and reconnects. A
+    fingerprint is recorded only once the broker acknowledged the publish
+    (``track``/``confirm``); publishes not acknowledged within
+    ``ack_timeout`` are sent again next time. While a bulk run is active
+    (``begin_bulk``), new configs are queued and ``drain`` publishes them
+    with at most ``window`` unacknowledged messages in flight. ``reset``
+    forgets everything (HA birth message – the broker may have lost its
+    retained configs).
+    """
+
+    def __init__(
+        self,
+        path: str | None = None,
+        *,
+        scope: str = "",
+        window: int = 10,
+        burst_pause: float = 0.02,
+        ack_timeout: float = 10.0,
+    ) -> None:
+        self._path = path
+        self._scope = scope
+        self.window = max(1, window)
+        self.burst_pause = burst_pause
+        self.ack_timeout = ack_timeout
+        self._fingerprints: dict[str, str] = {}
+        self._pending: OrderedDict[str, tuple[str, str]] = OrderedDict()
+        # (info, topic, fingerprint, odesláno) v pořadí odeslání
+        self._unacked: deque[tuple[Any, str, str, float]] = deque()
+        self._dirty = False
+        self._bulk = False
+
+        self.published = 0
+        self.skipped = 0
+        self.last_run: dict[str, Any] = {}
+
+    @staticmethod
+    def fingerprint(payload: str) -> str:
+        return hashlib.blake2b(payload.encode("utf-8"), digest_size=12).hexdigest()
+
+    @property
+    def bulk(self) -> bool:
+        return self._bulk
+
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def load(self) -> int:
+        """Load fingerprints from disk. A file for another broker is ignored."""
+        if not self._path:
+            return 0
+        try:
+            with open(self._path, encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return 0
+        except (OSError, ValueError) as exc:
+            logger.warning("Discovery fingerprint cache unreadable (%s), starting empty", exc)
+            return 0
+        if not isinstance(data, dict) or data.get("scope") != self._scope:
+            return 0
+        topics = data.get("topics")
+        if isinstance(topics, dict):
+            self._fingerprints = {str(k): str(v) for k, v in topics.items()}
+        return len(self._fingerprints)
+
+    def save(self) -> None:
+        self.confirm()
+        if not self._path or not self._dirty:
+            return
+        tmp_path = f"{self._path}.tmp"
+        snapshot = {"scope": self._scope, "topics": dict(self._fingerprints)}
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(snapshot, f, separators=(",", ":"))
+            os.replace(tmp_path, self._path)
+            self._dirty = False
+        except OSError as exc:
+            logger.debug("Discovery fingerprint cache write failed: %s", exc)
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+
+    # ------------------------------------------------------------------
+    # Publish path
+    # ------------------------------------------------------------------
+
+    def is_current(self, topic: str, payload: str) -> bool:
+        return self._fingerprints.get(topic) == self.fingerprint(payload)
+
+    def holds_config(self, topic: str) -> bool:
+        """True when the broker holds a non-empty config for ``topic`` (per cache)."""
+        fingerprint = self._fingerprints.get(topic)
+        return fingerprint is not None and fingerprint != _EMPTY_FINGERPRINT
+
+    def record(self, topic: str, payload: str) -> None:
+        self._fingerprints[topic] = self.fingerprint(payload)
+        self._dirty = True
+
+    def forget(self, topic: str) -> None:
+        if self._fingerprints.pop(topic, None) is not None:
+            self._dirty = True
+
+    def reset(self) -> None:
+        """Forget all fingerprints so every config is published again."""
+        self._unacked.clear()
+        if self._fingerprints:
+            self._fingerprints.clear()
+            self._dirty = True
+
+    def track(self, info: Any, topic: str, payload: str) -> None:
+        """Record ``payload`` for ``topic`` once ``info`` reports it published."""
+        self._unacked.append((info, topic, self.fingerprint(payload), time.monotonic()))
+        self.confirm()
+
+    def confirm(self) -> int:
+        """Record acknowledged publishes; returns how many still wait for an ack."""
+        now = time.monotonic()
+        while self._unacked:
+            info, topic, fingerprint, sent_at = self._unacked[0]
+            state = _ack_state(info)
+            if state is False and now - sent_at < self.ack_timeout:
+                break
+            self._unacked.popleft()
+            if state:
+                self._fingerprints[topic] = fingerprint
+                self._dirty = True
+        return len(self._unacked)
+
+    def offer(self, topic: str, payload: str) -> str:
+        """Return ``"skip"`` (unchanged), ``"queued"`` (bulk run) or ``"publish"``."""
+        if self.is_current(topic, payload):
+            self.skipped += 1
+            self._pending.pop(topic, None)
+            return "skip"
+        if self._bulk:
+            self._pending[topic] = (payload, self.fingerprint(payload))
+            return "queued"
+        return "publish"
+
+    def begin_bulk(self) -> None:
+        self._bulk = True
+        self.last_run = {"published": 0, "skipped": self.skipped, "duration_ms": 0.0}
+
+    async def drain(self, publish: PublishFn, is_ready: Callable[[], bool]) -> dict[str, Any]:
+        """Publish queued configs with a bounded inflight window, then persist.
+
+        Waits for the acknowledgements of this run (at most ``ack_timeout``)
+        so the saved fingerprints only cover configs the broker holds.
+        """
+        self._bulk = False
+        started = time.monotonic()
+        skipped_before = self.last_run.get("skipped", self.skipped)
+        published = 0
+        while self._pending:
+            if not is_ready():
+                # Po reconnectu se discovery přehraje znovu.
+                self._pending.clear()
+                break
+            if self.confirm() >= self.window:
+                await asyncio.sleep(self.burst_pause)
+                continue
+            topic, (payload, fingerprint) = self._pending.popitem(last=False)
+            info = publish(topic, payload)
+            if getattr(info, "rc", 1) != 0:
+                self._pending[topic] = (payload, fingerprint)
+                self._pending.move_to_end(topic, last=False)
+                await asyncio.sleep(self.burst_pause)
+                continue
+            self._unacked.append((info, topic, fingerprint, time.monotonic()))
+            self.published += 1
+            published += 1
+            if published % self.window == 0:
+                await asyncio.sleep(self.burst_pause)
+        while self.confirm() and is_ready():
+            await asyncio.sleep(max(self.burst_pause, 0.005))
+        await asyncio.to_thread(self.save)
+        self.last_run = {
+            "published": published,
+            "skipped": self.skipped - skipped_before,
+            "duration_ms": round((time.monotonic() - started) * 1000.0, 1),
+        }
+        return self.last_run
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "discovery_published": self.published,
+            "discovery_skipped": self.skipped,
+            "discovery_pending": len(self._pending),
+            "discovery_last_run": dict(self.last_run),
+        }
+
+
+_EMPTY_FINGERPRINT = DiscoveryPublisher.fingerprint("")  # tombstone (smazaný config)
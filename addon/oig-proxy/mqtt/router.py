@@ -0,0 +1,121 @@
+"""Topic trie for routing incoming MQTT messages to subscription handlers."""
+
+from __future__ import annotations
+
+import threading
+from typing import Callable
+
+Handler = Callable[[str, bytes], None]
+
+
+class _Node:
+    __slots__ = ("children", "handlers", "multi")
+
+    def __init__(self) -> None:
+        self.children: dict[str, _Node] = {}
+        # Handlery filtrů končících na tomto uzlu / na "#" pod tímto uzlem.
+        self.handlers: dict[str, Handler] = {}
+        self.multi: dict[str, Handler] = {}
+
+
+class TopicRouter:
+    """Subscription filters (``+`` / ``#``) compiled into a trie.
+
+    ``match()`` returns every handler whose filter matches the topic, in
+    subscription order. Results are cached per concrete topic; the cache is
+    dropped on any add/remove. ``match()`` may run on the paho network thread
+    while filters are changed from the event loop.
+    """
+
+    MATCH_CACHE_MAX = 1024
+
+    def __init__(self) -> None:
+        self._root = _Node()
+        self._order: dict[str, int] = {}
+        self._seq = 0
+        self._cache: dict[str, tuple[Handler, ...]] = {}
+        self._lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def add(self, topic_filter: str, handler: Handler) -> None:
+        """Register (or replace) the handler for a subscription filter."""
+        with self._lock:
+            node = self._root
+            parts = topic_filter.split("/")
+            for part in parts[:-1] if parts[-1] == "#" else parts:
+                node = node.children.setdefault(part, _Node())
+            if parts[-1] == "#":
+                node.multi[topic_filter] = handler
+            else:
+                node.handlers[topic_filter] = handler
+            if topic_filter not in self._order:
+                self._seq += 1
+                self._order[topic_filter] = self._seq
+            self._cache = {}
+
+    def remove(self, topic_filter: str) -> bool:
+        """Drop a subscription filter. Returns False when it was not registered."""
+        with self._lock:
+            if self._order.pop(topic_filter, None) is None:
+                return False
+            parts = topic_filter.split("/")
+            multi = parts[-1] == "#"
+            path = [self._root]
+            for part in parts[:-1] if multi else parts:
+                path.append(path[-1].children[part])
+            (path[-1].multi if multi else path[-1].handlers).pop(topic_filter, None)
+            # Prázdné větve uklidíme, ať trie neroste s dočasnými filtry.
+            keys = parts[:-1] if multi else parts
+            for depth in range(len(keys), 0, -1):
+                node = path[depth]
+                if node.children or node.handlers or node.multi:
+                    break
+                del path[depth - 1].children[keys[depth - 1]]
+            self._cache = {}
+            return True
+
+    def match(self, topic: str) -> tuple[Handler, ...]:
+        """Return handlers of all filters matching ``topic``."""
+        cache = self._cache
+        cached = cache.get(topic)
+        if cached is not None:
+            self.cache_hits += 1
+            return cached
+        self.cache_misses += 1
+        with self._lock:
+            found: dict[str, Handler] = {}
+            self._collect(self._root, topic.split("/"), 0, found, topic.startswith("$"))
+            order = self._order
+            handlers = tuple(found[name] for name in sorted(found, key=order.__getitem__))
+            cache = self._cache
+            if len(cache) >= self.MATCH_CACHE_MAX:
+                del cache[next(iter(cache))]
+            cache[topic] = handlers
+        return handlers
+
+    def _collect(
+        self,
+        node: _Node,
+        parts: list[str],
+        depth: int,
+        found: dict[str, Handler],
+        system_topic: bool,
+    ) -> None:
+        # Wildcardy na první úrovni nesmí chytat $SYS/... topicy (MQTT 4.7.2).
+        wildcard_ok = not (system_topic and depth == 0)
+        if wildcard_ok:
+            found.update(node.multi)
+        if depth == len(parts):
+            found.update(node.handlers)
+            return
+        child = node.children.get(parts[depth])
+        if child is not None:
+            self._collect(child, parts, depth + 1, found, system_topic)
+        if wildcard_ok:
+            plus = node.children.get("+")
+            if plus is not None:
+                self._collect(plus, parts, depth + 1, found, system_topic)
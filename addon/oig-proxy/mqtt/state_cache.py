@@ -0,0 +1,78 @@
+"""Last-value cache of published MQTT state topics."""
+
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any
+
+
+@dataclass
+class CachedState:
+    """Serialized payload plus the dict it was built from."""
+
+    payload: str
+    data: dict[str, Any]
+    updated_at: float
+    changed_at: float
+    _lower_keys: dict[str, str] | None = field(default=None, repr=False)
+
+    def get(self, field_name: str) -> Any | None:
+        """Field lookup, exact key first, then case-insensitive."""
+        if field_name in self.data:
+            return self.data[field_name]
+        if self._lower_keys is None:
+            self._lower_keys = {str(key).lower(): key for key in self.data}
+        key = self._lower_keys.get(field_name.lower())
+        return None if key is None else self.data[key]
+
+
+class StateCache:
+    """LRU cache of ``topic -> CachedState`` bounded by total payload size."""
+
+    def __init__(self, max_bytes: int = 1_048_576) -> None:
+        self._max_bytes = max_bytes
+        self._entries: OrderedDict[str, CachedState] = OrderedDict()
+        self._bytes = 0
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, topic: str) -> bool:
+        return topic in self._entries
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def put(self, topic: str, payload: str, data: dict[str, Any]) -> bool:
+        """Store the latest payload. Returns True when the content changed."""
+        now = time.time()
+        changed = True
+        changed_at = now
+        old = self._entries.pop(topic, None)
+        if old is not None:
+            self._bytes -= len(old.payload)
+            if old.payload == payload:
+                changed = False
+                changed_at = old.changed_at
+        self._entries[topic] = CachedState(
+            payload=payload,
+            data=dict(data),
+            updated_at=now,
+            changed_at=changed_at,
+        )
+        self._bytes += len(payload)
+        while self._bytes > self._max_bytes and len(self._entries) > 1:
+            _topic, evicted = self._entries.popitem(last=False)
+            self._bytes -= len(evicted.payload)
+            self.evicted += 1
+        return changed
+
+    def get(self, topic: str) -> CachedState | None:
+        return self._entries.get(topic)
+
+    def items(self) -> list[tuple[str, CachedState]]:
+        return list(self._entries.items())
@@ -29,6 +29,8 @@ class ProxyStatusPublisher:
         get_cloud_disconnects: Callable[[], int] | None = None,
         get_cloud_timeouts: Callable[[], int] | None = None,
         get_cloud_errors: Callable[[], int] | None = None,
+        get_sensor_map_stats: Callable[[], dict[str, Any]] | None = None,
+        get_setting_latency_stats: Callable[[], dict[str, Any]] | None = None,
         initial_device_id: str | None = None,
     ) -> None:
         self._mqtt = mqtt
@@ -40,6 +42,8 @@ class ProxyStatusPublisher:
         self._get_cloud_disconnects = get_cloud_disconnects
         self._get_cloud_timeouts = get_cloud_timeouts
         self._get_cloud_errors = get_cloud_errors
+        self._get_sensor_map_stats = get_sensor_map_stats
+        self._get_setting_latency_stats = get_setting_latency_stats
 
         self._frame_count = 0
         self._last_frame_table = ""
@@ -104,10 +108,24 @@ class ProxyStatusPublisher:
                 int(self._get_cloud_errors()) if self._get_cloud_errors else 0
             ),
             "mqtt_connected": int(self._mqtt.connected),
+            "mqtt_queue": int(self._mqtt.offline_buffer_size()),
             "frame_count": self._frame_count,
             "last_frame_table": self._last_frame_table,
             "box_device_id": self._last_frame_device_id,
         }
+        transport_stats = self._mqtt.transport_stats()
+        if transport_stats:
+            payload["mqtt_queue"] += int(transport_stats["queue_depth"])
+            payload["mqtt_publish_latency_ms"] = transport_stats["latency_p95_ms"]
+            payload["mqtt_publish_dropped"] = int(transport_stats["dropped"])
+        discovery_stats = self._mqtt.discovery_stats()
+        if discovery_stats:
+            payload["mqtt_discovery_published"] = int(discovery_stats["discovery_published"])
+            payload["mqtt_discovery_skipped"] = int(discovery_stats["discovery_skipped"])
+        if self._get_sensor_map_stats is not None:
+            payload.update(self._get_sensor_map_stats())
+        if self._get_setting_latency_stats is not None:
+            payload.update(self._get_setting_latency_stats())
         if last_data_iso:
             payload["last_data"] = last_data_iso
             payload["last_data_update"] = last_data_iso
@@ -137,9 +155,7 @@ class ProxyStatusPublisher:
                     is_binary=is_binary,
                 )
 
-            for table, key, metadata in self._sensor_loader.iter_sensors():
-                if table != "proxy_control":
-                    continue
+            for table, key, metadata in self._sensor_loader.iter_table("proxy_control"):
                 sensor_name = metadata.get("name_cs") or metadata.get("name") or key
                 unit = metadata.get("unit_of_measurement") or ""
                 device_class = metadata.get("device_class") or ""
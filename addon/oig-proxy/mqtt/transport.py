@@ -0,0 +1,252 @@
+"""Asyncio-native transport for paho-mqtt.
+
+Drives the paho socket from the event loop (``add_reader``/``add_writer`` +
+``loop_read``/``loop_write``/``loop_misc``) instead of the ``loop_start``
+network thread. Outbound publishes go through a bounded queue and a QoS
+inflight window so backpressure and drops are visible to the proxy.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+# paho MQTTErrorCode hodnoty (bez importu paho kvůli testům)
+MQTT_ERR_SUCCESS = 0
+
+
+@dataclass
+class PublishResult:
+    """Minimal stand-in for paho ``MQTTMessageInfo`` (``rc`` and ``is_published``)."""
+
+    rc: int
+    published: bool = False
+
+    def is_published(self) -> bool:
+        return self.published
+
+
+@dataclass
+class _Outbound:
+    topic: str
+    payload: str | bytes
+    qos: int
+    retain: bool
+    enqueued_at: float
+    result: PublishResult
+
+
+class AsyncioMqttTransport:
+    """Runs a paho client on an asyncio loop with a bounded outbound queue.
+
+    All paho callbacks (on_connect, on_message, ...) fire on the loop thread.
+    ``publish()`` never blocks: when the queue is full the oldest queued
+    message is dropped and counted. QoS>0 messages still waiting for their
+    PUBACK when the socket closes go back to the head of the queue;
+    ``take_pending()``/``requeue()`` carry them over to the transport of
+    the next connection.
+    """
+
+    MISC_INTERVAL = 1.0
+    LATENCY_SAMPLES = 1024
+
+    def __init__(
+        self,
+        client: Any,
+        loop: asyncio.AbstractEventLoop,
+        *,
+        max_queue: int = 1000,
+        max_inflight: int = 20,
+    ) -> None:
+        self._client = client
+        self._loop = loop
+        self._max_queue = max_queue
+        self._max_inflight = max_inflight
+        self._queue: deque[_Outbound] = deque()
+        self._inflight: dict[int, _Outbound] = {}
+        self._sock: Any | None = None
+        self._misc_handle: asyncio.TimerHandle | None = None
+        self._latencies_ms: deque[float] = deque(maxlen=self.LATENCY_SAMPLES)
+
+        self.enqueued = 0
+        self.published = 0
+        self.dropped = 0
+
+        client.on_socket_open = self._on_socket_open
+        client.on_socket_close = self._on_socket_close
+        client.on_socket_register_write = self._on_socket_register_write
+        client.on_socket_unregister_write = self._on_socket_unregister_write
+        client.on_publish = self._on_publish
+
+    # ------------------------------------------------------------------
+    # Socket lifecycle (paho callbacks, may run in a connect worker thread)
+    # ------------------------------------------------------------------
+
+    def _call_on_loop(self, func: Any, *args: Any) -> None:
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            func(*args)
+        elif not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(func, *args)
+
+    def _on_socket_open(self, _client: Any, _userdata: Any, sock: Any) -> None:
+        self._call_on_loop(self._attach, sock)
+
+    def _on_socket_close(self, _client: Any, _userdata: Any, sock: Any) -> None:
+        self._call_on_loop(self._detach, sock)
+
+    def _on_socket_register_write(self, _client: Any, _userdata: Any, sock: Any) -> None:
+        self._call_on_loop(self._add_writer, sock)
+
+    def _on_socket_unregister_write(self, _client: Any, _userdata: Any, sock: Any) -> None:
+        self._call_on_loop(self._remove_writer, sock)
+
+    def _attach(self, sock: Any) -> None:
+        self._sock = sock
+        self._loop.add_reader(sock, self._do_read)
+        self._schedule_misc()
+        self._drain()
+
+    def _detach(self, sock: Any) -> None:
+        self._loop.remove_reader(sock)
+        self._loop.remove_writer(sock)
+        if self._sock is sock:
+            self._sock = None
+            if self._misc_handle is not None:
+                self._misc_handle.cancel()
+                self._misc_handle = None
+            # Nepotvrzené zprávy už nepatří do okna tohoto spojení; QoS>0
+            # se po reconnectu pošlou znovu, QoS 0 se jen započítá.
+            unacked = list(self._inflight.values())
+            self._inflight.clear()
+            self.dropped += sum(1 for item in unacked if item.qos == 0)
+            self.requeue([item for item in unacked if item.qos > 0])
+
+    def _add_writer(self, sock: Any) -> None:
+        current = self._sock
+        if current is not None and sock is current:
+            self._loop.add_writer(current, self._do_write)
+
+    def _remove_writer(self, sock: Any) -> None:
+        self._loop.remove_writer(sock)
+
+    def _do_read(self) -> None:
+        self._client.loop_read()
+
+    def _do_write(self) -> None:
+        self._client.loop_write()
+
+    def _schedule_misc(self) -> None:
+        self._misc_handle = self._loop.call_later(self.MISC_INTERVAL, self._do_misc)
+
+    def _do_misc(self) -> None:
+        self._misc_handle = None
+        if self._sock is None:
+            return
+        self._client.loop_misc()
+        if self._sock is not None:
+            self._schedule_misc()
+
+    @property
+    def attached(self) -> bool:
+        return self._sock is not None
+
+    def close(self) -> None:
+        """Detach from the loop; queued messages are discarded and counted."""
+        self.dropped += len(self.take_pending())
+
+    def take_pending(self) -> list[_Outbound]:
+        """Detach and hand over queued (incl. unacknowledged QoS>0) messages."""
+        if self._sock is not None:
+            self._detach(self._sock)
+        pending = list(self._queue)
+        self._queue.clear()
+        return pending
+
+    def requeue(self, items: list[_Outbound]) -> None:
+        """Put messages back at the head of the queue, keeping their order."""
+        self._queue.extendleft(reversed(items))
+        while len(self._queue) > self._max_queue:
+            self._queue.popleft()
+            self.dropped += 1
+        self._drain()
+
+    # ------------------------------------------------------------------
+    # Publish path
+    # ------------------------------------------------------------------
+
+    def publish(
+        self,
+        topic: str,
+        payload: str | bytes,
+        qos: int = 0,
+        retain: bool = False,
+    ) -> PublishResult:
+        """Queue a publish. Returns rc=0 when queued (not yet delivered).
+
+        ``is_published()`` of the result turns true once paho reports the
+        message sent (PUBACK for QoS 1).
+        """
+        if len(self._queue) >= self._max_queue:
+            self._queue.popleft()
+            self.dropped += 1
+        result = PublishResult(MQTT_ERR_SUCCESS)
+        self._queue.append(_Outbound(topic, payload, qos, retain, time.monotonic(), result))
+        self.enqueued += 1
+        self._drain()
+        return result
+
+    def _drain(self) -> None:
+        while self._queue and self._sock is not None and len(self._inflight) < self._max_inflight:
+            item = self._queue.popleft()
+            info = self._client.publish(item.topic, item.payload, qos=item.qos, retain=item.retain)
+            if info.rc != MQTT_ERR_SUCCESS:
+                self._queue.appendleft(item)
+                return
+            self._inflight[info.mid] = item
+
+    def _on_publish(self, _client: Any, _userdata: Any, mid: int, *_args: Any) -> None:
+        item = self._inflight.pop(mid, None)
+        if item is None:
+            return
+        item.result.published = True
+        self._latencies_ms.append((time.monotonic() - item.enqueued_at) * 1000.0)
+        self.published += 1
+        self._drain()
+
+    # ------------------------------------------------------------------
+    # Metrics
+    # ------------------------------------------------------------------
+
+    def queue_depth(self) -> int:
+        return len(self._queue)
+
+    def inflight(self) -> int:
+        return len(self._inflight)
+
+    def latency_percentile(self, pct: float) -> float:
+        if not self._latencies_ms:
+            return 0.0
+        ordered = sorted(self._latencies_ms)
+        idx = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+        return ordered[idx]
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "queue_depth": self.queue_depth(),
+            "inflight": self.inflight(),
+            "enqueued": self.enqueued,
+            "published": self.published,
+            "dropped": self.dropped,
+            "latency_p50_ms": round(self.latency_percentile(50), 2),
+            "latency_p95_ms": round(self.latency_percentile(95), 2),
+        }
@@ -590,10 +590,14 @@ class ProxyServer:
         # ~15 s přibude jeden "stuck" cloud socket dokud systém nevyčerpá FDs).
         pipe_tasks = [
             asyncio.ensure_future(
-                self._pipe_box_to_cloud(box_reader, cloud_writer, box_writer, peer=peer, session_id=session_id)
+                self._pipe_box_to_cloud(
+                    box_reader, cloud_writer, box_writer, peer=peer, session_id=session_id, conn_id=session_conn_id
+                )
             ),
             asyncio.ensure_future(
-                self._pipe_cloud_to_box(cloud_reader, box_writer, peer=peer, session_id=session_id)
+                self._pipe_cloud_to_box(
+                    cloud_reader, box_writer, peer=peer, session_id=session_id, conn_id=session_conn_id
+                )
             ),
         ]
         try:
@@ -615,6 +619,8 @@ class ProxyServer:
             await self._stop_local_getactual_task(local_getactual_task)
             if self.twin_delivery is not None:
                 self.twin_delivery.clear_session(session_id)
+            if self.telemetry_collector is not None:
+                self.telemetry_collector.record_connection_closed(session_conn_id)
             for writer in (box_writer, cloud_writer):
                 if writer and not writer.is_closing():
                     writer.close()
@@ -645,10 +651,13 @@ class ProxyServer:
         box_writer: asyncio.StreamWriter | None = None,
         peer: tuple | None = None,
         session_id: str | None = None,
+        conn_id: int | None = None,
     ) -> None:
         """Čte data od Boxu, parsuje framy a forwarduje do cloudu."""
         peer_str = f"{peer[0]}:{peer[1]}" if peer and len(peer) >= 2 else None
-        conn_id = id(asyncio.current_task())
+        # Obě pipe sdílí conn_id session, aby se odpověď spárovala s požadavkem.
+        if conn_id is None:
+            conn_id = id(asyncio.current_task())
         buf = bytearray()
         while True:
             try:
@@ -721,11 +730,12 @@ class ProxyServer:
                     pending_settings = await self.twin_delivery.deliver_pending(
                         device_id,
                         session_id=session_id,
+                        limit=self.twin_delivery.window_for(session_id),
                     )
-                    setting = pending_settings[0] if pending_settings else None
-                    logger.debug("deliver_pending returned: %s", setting)
-                    if setting is not None:
-                        audit_session_id = session_id or ""
+                    logger.debug("deliver_pending returned: %s", pending_settings)
+                    audit_session_id = session_id or ""
+                    injected = False
+                    for setting in pending_settings:
                         next_id_set = self.twin_delivery.next_id_set()
                         next_msg_id = self.twin_delivery.next_msg_id()
                         setting_frame = build_setting_frame(
@@ -751,11 +761,16 @@ class ProxyServer:
                                 setting,
                                 device_id,
                                 session_id=audit_session_id,
+                                id_set=next_id_set,
+                                msg_id=next_msg_id,
                             )
-                            withheld_chunks = True
-                            continue
+                            injected = True
                         except (OSError, ConnectionResetError) as exc:
                             logger.error("Failed to inject Setting to BOX: %s", exc)
+                            break
+                    if injected:
+                        withheld_chunks = True
+                        continue
 
                 forward_chunks.append(frame_bytes)
 
@@ -793,12 +808,14 @@ class ProxyServer:
         box_writer: asyncio.StreamWriter,
         peer: tuple | None = None,
         session_id: str | None = None,
+        conn_id: int | None = None,
     ) -> None:
         """
         Čte data z cloudu a forwarduje do Boxu.
         """
         peer_str = f"{peer[0]}:{peer[1]}" if peer and len(peer) >= 2 else None
-        conn_id = id(asyncio.current_task())
+        if conn_id is None:
+            conn_id = id(asyncio.current_task())
         buf = bytearray()
         while True:
             try:
@@ -896,9 +913,16 @@ class ProxyServer:
         table_name = self._effective_table_name(parsed_frame, frame_text)
 
         if run_isnewset_hook and table_name == "IsNewSet" and box_writer is not None:
-            await self._deliver_pending_for_isnewset(frame_text, box_writer)
+            await self._deliver_pending_for_isnewset(frame_text, box_writer, session_id=session_id)
 
-        inflight_setting = self.twin_delivery.inflight_setting() if self.twin_delivery else None
+        parsed_ack = parse_box_ack(frame_bytes)
+        # ACK se k inflight Settingu páruje přes ID_Set (bez něj přes ID), jinak FIFO.
+        ack_id_set: int | None = None
+        ack_msg_id: int | None = None
+        if parsed_ack:
+            ack_id_set = _extract_id_set(frame_text)
+            ack_msg_id = None if ack_id_set else _extract_msg_id(frame_text)
+        inflight_setting = self.twin_delivery.inflight_setting(id_set=ack_id_set, msg_id=ack_msg_id)
         confirmed_published = False
 
         def _unpack_inflight():
@@ -910,7 +934,6 @@ class ProxyServer:
             except Exception:
                 return None
 
-        parsed_ack = parse_box_ack(frame_bytes)
         if (
             parsed_ack
             and parsed_ack.get("result") == "ACK"
@@ -918,7 +941,7 @@ class ProxyServer:
             and parsed_ack.get("todo")
         ):
             matched_inflight = False
-            pair = _unpack_inflight()
+            pair = self.twin_delivery.find_inflight(parsed_ack["table"], parsed_ack["todo"]) or _unpack_inflight()
             if pair is not None:
                 setting, inflight_device_id = pair
                 if (setting.table, setting.key) == (parsed_ack["table"], parsed_ack["todo"]):
@@ -964,7 +987,7 @@ class ProxyServer:
                 session_id=audit_session_id,
             )
             if cloud_pair is None:
-                pair = _unpack_inflight()
+                pair = self.twin_delivery.find_inflight(event_ack["table"], event_ack["key"]) or _unpack_inflight()
             else:
                 pair = None
             if pair is not None:
@@ -1067,26 +1090,35 @@ class ProxyServer:
         self,
         frame_text: str,
         box_writer: asyncio.StreamWriter,
+        session_id: str | None = None,
     ) -> None:
         if self.twin_delivery is None:
             return
         parsed_frame = parse_xml_frame(frame_text)
         device_id = str(parsed_frame.get("_device_id") or "")
-        pending = await self.twin_delivery.deliver_pending(device_id)
+        pending = await self.twin_delivery.deliver_pending(
+            device_id,
+            session_id=session_id,
+            limit=self.twin_delivery.window_for(session_id),
+        )
         for setting in pending:
             id_set = self.twin_delivery.next_id_set()
+            msg_id = self.twin_delivery.next_msg_id()
             payload = self.twin_delivery.build_setting_xml(
                 setting.table,
                 setting.key,
                 setting.value,
                 device_id=device_id,
                 id_set=id_set,
+                msg_id=msg_id,
             )
             try:
                 frame = build_frame(payload).encode("utf-8", errors="replace")
                 box_writer.write(frame)
                 await box_writer.drain()
-                self.twin_delivery.record_injected_box(setting, device_id)
+                self.twin_delivery.record_injected_box(
+                    setting, device_id, session_id=session_id or "", id_set=id_set, msg_id=msg_id
+                )
             except (OSError, ConnectionResetError):
                 break
 
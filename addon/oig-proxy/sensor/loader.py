@@ -2,46 +2,106 @@
 
 from __future__ import annotations
 
+import hashlib
 import json
 import logging
+import marshal
+import os
+from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Any
 
 logger = logging.getLogger(__name__)
 
+# Bump whenever the compiled cache layout changes.
+CACHE_FORMAT_VERSION = 1
+
+SensorEntry = tuple[str, str, dict[str, Any]]
+
+
+@dataclass
+class SensorMapDiff:
+    """Per ``table:key`` difference between two loaded sensor maps."""
+
+    added: list[SensorEntry] = field(default_factory=list)
+    changed: list[tuple[SensorEntry, SensorEntry]] = field(default_factory=list)
+    removed: list[SensorEntry] = field(default_factory=list)
+
+    @property
+    def size(self) -> int:
+        return len(self.added) + len(self.changed) + len(self.removed)
+
+    def is_empty(self) -> bool:
+        return self.size == 0
+
 
 class SensorMapLoader:
     """Loads and provides lookup for sensor_map.json."""
 
-    def __init__(self, path: str) -> None:
+    def __init__(self, path: str, cache_path: str | None = None) -> None:
         """Initialize loader with path to sensor_map.json.
 
         Args:
             path: Path to the sensor_map.json file.
+            cache_path: Optional path of the compiled sensor map cache. When
+                set, parsed data and per-table indexes are stored there keyed
+                by the source file hash and reused while the source is unchanged.
         """
         self._path = path
+        self._cache_path = cache_path
         self._data: dict[str, Any] = {"sensors": {}}
+        self._source_hash = ""
+        self._entries: list[SensorEntry] = []
+        self._by_table: dict[str, list[SensorEntry]] = {}
+
+    @property
+    def source_hash(self) -> str:
+        """SHA-256 of the currently loaded sensor map file ("" if none)."""
+        return self._source_hash
 
     def load(self) -> None:
         """Load sensor map from JSON file.
 
         If file doesn't exist, logs a warning and uses empty sensor map.
+        If a compiled cache matching the file hash exists, JSON parsing is skipped.
         """
         file_path = Path(self._path)
         if not file_path.exists():
             logger.warning("Sensor map file not found: %s", self._path)
-            self._data = {"sensors": {}}
+            self._set_data({"sensors": {}}, "")
             return
 
         try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                self._data = json.load(f)
-        except json.JSONDecodeError as e:
-            logger.error("Failed to parse sensor map JSON: %s", e)
-            self._data = {"sensors": {}}
+            raw = file_path.read_bytes()
         except OSError as e:
             logger.error("Failed to read sensor map file: %s", e)
-            self._data = {"sensors": {}}
+            self._set_data({"sensors": {}}, "")
+            return
+
+        source_hash = hashlib.sha256(raw).hexdigest()
+        cached = self._read_cache(source_hash)
+        if cached is not None:
+            data, index = cached
+            try:
+                self._set_data(data, source_hash, index)
+                logger.debug("Sensor map served from cache %s", self._cache_path)
+                return
+            except (KeyError, TypeError, ValueError) as e:
+                logger.debug("Sensor map cache inconsistent (%s), rebuilding", e)
+
+        try:
+            data = json.loads(raw.decode("utf-8"))
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            logger.error("Failed to parse sensor map JSON: %s", e)
+            self._set_data({"sensors": {}}, "")
+            return
+        if not isinstance(data, dict):
+            logger.error("Failed to parse sensor map JSON: top-level object expected")
+            self._set_data({"sensors": {}}, "")
+            return
+
+        self._set_data(data, source_hash)
+        self._write_cache()
 
     def lookup(self, table: str, key: str) -> dict | None:
         """Look up sensor config by table:key.
@@ -66,11 +126,74 @@ class SensorMapLoader:
         return len(self._data.get("sensors", {}))
 
     def iter_sensors(self) -> list[tuple[str, str, dict[str, Any]]]:
-        sensors = self._data.get("sensors", {})
-        if not isinstance(sensors, dict):
-            return []
+        """Return all valid ``(table, key, metadata)`` entries.
+
+        The list is built once per load; callers must not mutate it.
+        """
+        return self._entries
+
+    def iter_table(self, table: str) -> list[tuple[str, str, dict[str, Any]]]:
+        """Return ``(table, key, metadata)`` entries of a single table."""
+        return self._by_table.get(table, [])
+
+    def diff(self, other: SensorMapLoader) -> SensorMapDiff:
+        """Compare this map with ``other`` (the newer one) per ``table:key``.
 
-        out: list[tuple[str, str, dict[str, Any]]] = []
+        ``changed`` holds ``(old_entry, new_entry)`` pairs.
+        """
+        result = SensorMapDiff()
+        old_by_key = {(table, key): (table, key, meta) for table, key, meta in self._entries}
+        for entry in other.iter_sensors():
+            old = old_by_key.pop((entry[0], entry[1]), None)
+            if old is None:
+                result.added.append(entry)
+            elif old[2] != entry[2]:
+                result.changed.append((old, entry))
+        result.removed.extend(old_by_key.values())
+        return result
+
+    def adopt(self, other: SensorMapLoader) -> None:
+        """Swap in data loaded by ``other`` in one step.
+
+        Holders of this loader see either the old or the new map, never a mix.
+        """
+        self._data, self._source_hash, self._entries, self._by_table = (
+            other._data,
+            other._source_hash,
+            other._entries,
+            other._by_table,
+        )
+
+    # ------------------------------------------------------------------
+    # Index / cache internals
+    # ------------------------------------------------------------------
+
+    def _set_data(
+        self,
+        data: dict[str, Any],
+        source_hash: str,
+        index: list[tuple[str, str]] | None = None,
+    ) -> None:
+        self._data = data
+        self._source_hash = source_hash
+        sensors = data.get("sensors", {})
+        if index is None:
+            index = self._build_index(sensors)
+
+        entries: list[SensorEntry] = []
+        by_table: dict[str, list[SensorEntry]] = {}
+        for table, key in index:
+            entry = (table, key, sensors[f"{table}:{key}"])
+            entries.append(entry)
+            by_table.setdefault(table, []).append(entry)
+        self._entries = entries
+        self._by_table = by_table
+
+    @staticmethod
+    def _build_index(sensors: Any) -> list[tuple[str, str]]:
+        index: list[tuple[str, str]] = []
+        if not isinstance(sensors, dict):
+            return index
         for lookup_key, metadata in sensors.items():
             if not isinstance(lookup_key, str) or not isinstance(metadata, dict):
                 continue
@@ -79,5 +202,48 @@ class SensorMapLoader:
             table, key = lookup_key.split(":", 1)
             if not table or not key:
                 continue
-            out.append((table, key, metadata))
-        return out
+            index.append((table, key))
+        return index
+
+    def _read_cache(self, source_hash: str) -> tuple[dict[str, Any], list[tuple[str, str]]] | None:
+        if not self._cache_path:
+            return None
+        try:
+            with open(self._cache_path, "rb") as f:
+                # Local cache written by _write_cache() only; contains plain data types.
+                payload = marshal.load(f)  # nosec B302
+        except FileNotFoundError:
+            return None
+        except (OSError, EOFError, ValueError, TypeError) as e:
+            logger.debug("Sensor map cache unreadable (%s), rebuilding", e)
+            return None
+        if not isinstance(payload, dict):
+            return None
+        if payload.get("version") != CACHE_FORMAT_VERSION or payload.get("source_hash") != source_hash:
+            return None
+        data = payload.get("data")
+        index = payload.get("index")
+        if not isinstance(data, dict) or not isinstance(index, tuple):
+            return None
+        return data, list(index)
+
+    def _write_cache(self) -> None:
+        if not self._cache_path:
+            return
+        payload = {
+            "version": CACHE_FORMAT_VERSION,
+            "source_hash": self._source_hash,
+            "data": self._data,
+            "index": tuple((entry[0], entry[1]) for entry in self._entries),
+        }
+        tmp_path = f"{self._cache_path}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                marshal.dump(payload, f)
+            os.replace(tmp_path, self._cache_path)
+        except (OSError, ValueError) as e:
+            logger.debug("Sensor map cache write failed: %s", e)
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
@@ -4,15 +4,18 @@ from __future__ import annotations
 
 import logging
 from datetime import datetime, timezone
+from collections.abc import Iterable
 from typing import Any
 
-from sensor.loader import SensorMapLoader
+from sensor.loader import SensorEntry, SensorMapDiff, SensorMapLoader
 from sensor.warnings import decode_warning_details, decode_warnings
 from mqtt.client import MQTTClient
 
 logger = logging.getLogger(__name__)
 
 ISNEW_TABLES = {"IsNewFW", "IsNewSet", "IsNewWeather"}
+# Tabulky publikované pod proxy device_id (zdrojem je ale BOX).
+PROXY_DEVICE_TABLES = frozenset({"tbl_events", "proxy_status", "twin_state"})
 # NOTE: kept in sync with proxy/server.py:TRANSPORT_METADATA_KEYS. Not extracted to
 # a shared module: the HAOS git-addon rebuild runs `git clean`, which deletes any
 # new untracked file before the image is built.
@@ -55,6 +58,11 @@ class FrameProcessor:
         self._actual_mirror_targets = self._build_actual_mirror_targets()
         self._battery_bank_count_by_device: dict[str, int] = {}
         self._last_table_values: dict[tuple[str, str], dict[str, Any]] = {}
+        # Warm start tabulek publikovaných pod proxy device_id: čeká na zdrojový BOX.
+        self._proxy_table_seeds: dict[str, dict[str, Any]] = {}
+        # Klíče, jejichž hodnota zatím pochází jen z warm startu (ne z BOXu).
+        self._seeded_keys: dict[tuple[str, str], set[str]] = {}
+        self._known_device_ids: set[str] = set()
 
     def _build_actual_mirror_targets(self) -> dict[str, str]:
         priority = [
@@ -106,40 +114,140 @@ class FrameProcessor:
         return True
 
     def _target_device_id(self, source_device_id: str, table: str) -> str:
-        if table in ("tbl_events", "proxy_status", "twin_state"):
+        if table in PROXY_DEVICE_TABLES:
             return self._proxy_device_id
         return source_device_id
 
+    def _discovery_enabled(self, device_id: str, table: str) -> bool:
+        if table in ISNEW_TABLES or table == "proxy_control":
+            return False
+        return self._table_enabled_for_device(device_id, table)
+
+    def _send_entry_discovery(self, device_id: str, entry: SensorEntry) -> None:
+        table, key, metadata = entry
+        sensor_name = metadata.get("name_cs") or metadata.get("name") or key
+        unit = metadata.get("unit_of_measurement") or ""
+        device_class = metadata.get("device_class") or ""
+        state_class = metadata.get("state_class") or ""
+        is_binary = bool(metadata.get("is_binary", False))
+        entity_category = metadata.get("entity_category") or ""
+        device_mapping = metadata.get("device_mapping") or ""
+        enum_map = metadata.get("enum_map") or None
+        self._mqtt.send_discovery(
+            device_id=self._target_device_id(device_id, table),
+            table=table,
+            sensor_key=key,
+            sensor_name=sensor_name,
+            unit=unit,
+            device_class=device_class,
+            state_class=state_class,
+            device_mapping=device_mapping,
+            entity_category=entity_category,
+            is_binary=is_binary,
+            enum_map=enum_map,
+        )
+
     def publish_all_discovery(self, device_id: str) -> None:
-        for table, key, metadata in self._sensor_loader.iter_sensors():
-            if table in ISNEW_TABLES:
-                continue
-            if table == "proxy_control":
+        self._known_device_ids.add(device_id)
+        for entry in self._sensor_loader.iter_sensors():
+            if not self._discovery_enabled(device_id, entry[0]):
                 continue
-            if not self._table_enabled_for_device(device_id, table):
-                continue
-            target_device_id = self._target_device_id(device_id, table)
-            sensor_name = metadata.get("name_cs") or metadata.get("name") or key
-            unit = metadata.get("unit_of_measurement") or ""
-            device_class = metadata.get("device_class") or ""
-            state_class = metadata.get("state_class") or ""
-            is_binary = bool(metadata.get("is_binary", False))
-            entity_category = metadata.get("entity_category") or ""
-            device_mapping = metadata.get("device_mapping") or ""
-            enum_map = metadata.get("enum_map") or None
-            self._mqtt.send_discovery(
-                device_id=target_device_id,
-                table=table,
-                sensor_key=key,
-                sensor_name=sensor_name,
-                unit=unit,
-                device_class=device_class,
-                state_class=state_class,
-                device_mapping=device_mapping,
-                entity_category=entity_category,
-                is_binary=is_binary,
-                enum_map=enum_map,
-            )
+            self._send_entry_discovery(device_id, entry)
+
+    def seed_table_values(self, device_id: str, table: str, data: dict[str, Any]) -> None:
+        """Warm start: adopt a retained state unless live data already arrived.
+
+        ``device_id`` comes from the state topic. Tables published under the
+        proxy device id are keyed by the source BOX like in ``process()``, so
+        they are adopted once the first frame names that BOX.
+        """
+        if device_id == self._proxy_device_id and table in PROXY_DEVICE_TABLES:
+            self._proxy_table_seeds.setdefault(table, dict(data))
+            return
+        self._seed((device_id, table), data)
+
+    def _seed(self, table_key: tuple[str, str], data: dict[str, Any]) -> None:
+        if table_key not in self._last_table_values:
+            self._last_table_values[table_key] = dict(data)
+            self._seeded_keys[table_key] = set(data)
+
+    def _adopt_proxy_table_seeds(self, source_device_id: str) -> None:
+        for table, data in self._proxy_table_seeds.items():
+            self._seed((source_device_id, table), data)
+        self._proxy_table_seeds.clear()
+
+    def _mark_live(self, table_key: tuple[str, str], keys: Iterable[str]) -> None:
+        seeded = self._seeded_keys.get(table_key)
+        if seeded is None:
+            return
+        seeded.difference_update(keys)
+        if not seeded:
+            del self._seeded_keys[table_key]
+
+    def reported_value(self, device_id: str, table: str, key: str, *, live_only: bool = False) -> Any | None:
+        """Last value of ``table:key`` published for the device (None if unknown).
+
+        With ``live_only`` a value known only from the warm start (retained
+        state of the previous run) counts as unknown.
+        """
+        if live_only and key in self._seeded_keys.get((device_id, table), ()):
+            return None
+        return self._last_table_values.get((device_id, table), {}).get(key)
+
+    def republish_discovery(self) -> None:
+        """Replay discovery for every device seen so far (after MQTT reconnect)."""
+        for device_id in sorted(self._known_device_ids):
+            self.publish_all_discovery(device_id)
+
+    @staticmethod
+    def _entry_components(entry: SensorEntry) -> list[tuple[str, str]]:
+        table, key, metadata = entry
+        return MQTTClient.discovery_components(
+            table,
+            key,
+            is_binary=bool(metadata.get("is_binary", False)),
+            enum_map=metadata.get("enum_map") or None,
+        )
+
+    def apply_sensor_map_diff(self, diff: SensorMapDiff) -> dict[str, int]:
+        """Apply a hot-reloaded sensor map to derived state and HA discovery.
+
+        The loader must already hold the new map. Only added and changed
+        entities are rediscovered; removed ones (and components an entity no
+        longer uses) get empty retained configs. Last published table values
+        are kept so the next state publish stays complete.
+        """
+        self._actual_mirror_targets = self._build_actual_mirror_targets()
+        for table, key, _metadata in diff.added:
+            self._missing_map_logged.discard(f"{table}:{key}")
+
+        stale: list[tuple[SensorEntry, list[tuple[str, str]]]] = [
+            (entry, self._entry_components(entry)) for entry in diff.removed
+        ]
+        for old, new in diff.changed:
+            new_components = set(self._entry_components(new))
+            dropped = [c for c in self._entry_components(old) if c not in new_components]
+            if dropped:
+                stale.append((old, dropped))
+
+        republished = 0
+        removed = 0
+        for device_id in sorted(self._known_device_ids):
+            for (table, key, _metadata), components in stale:
+                if not self._discovery_enabled(device_id, table):
+                    continue
+                removed += self._mqtt.remove_discovery(
+                    self._target_device_id(device_id, table),
+                    [(component, table, key, suffix) for component, suffix in components],
+                )
+            for entry in [*diff.added, *(new for _old, new in diff.changed)]:
+                table, key, _metadata = entry
+                if not self._discovery_enabled(device_id, table):
+                    continue
+                self._mqtt.forget_discovery(self._target_device_id(device_id, table), table, key)
+                self._send_entry_discovery(device_id, entry)
+                republished += 1
+        return {"republished": republished, "removed": removed}
 
     async def process(self, device_id: str, table: str, data: dict[str, Any]) -> None:
         """Process frame data and publish to MQTT.
@@ -175,6 +283,9 @@ class FrameProcessor:
             )
             return
 
+        if self._proxy_table_seeds:
+            self._adopt_proxy_table_seeds(device_id)
+        self._known_device_ids.add(device_id)
         target_device_id = self._target_device_id(device_id, table)
         pub_data: dict[str, Any] = {}
 
@@ -283,6 +394,7 @@ class FrameProcessor:
             self._last_table_values[(device_id, table)] = {
                 k: v for k, v in merged.items() if not k.startswith("_")
             }
+            self._mark_live((device_id, table), pub_data)
             logger.debug("Published %d keys for %s:%s", len(merged), target_device_id, table)
 
             if table == "tbl_actual":
@@ -304,6 +416,7 @@ class FrameProcessor:
                     self._last_table_values[(device_id, mirror_table)] = {
                         k: v for k, v in merged_mirror.items() if not k.startswith("_")
                     }
+                    self._mark_live((device_id, mirror_table), mirror_data)
                     logger.debug(
                         "Mirrored %d keys from tbl_actual to %s for %s",
                         len(merged_mirror),
@@ -0,0 +1,122 @@
+"""Hot reload of sensor_map.json for OIG Proxy v2."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Callable
+
+from sensor.loader import SensorMapDiff, SensorMapLoader
+
+logger = logging.getLogger(__name__)
+
+FileSignature = tuple[int, int]
+
+
+class SensorMapWatcher:
+    """Polls sensor_map.json and swaps changed maps into a live loader.
+
+    Stat and parse run in worker threads; the swap and the ``on_reload``
+    callback run on the event loop, so readers never see a half-built map.
+    """
+
+    def __init__(
+        self,
+        loader: SensorMapLoader,
+        path: str,
+        *,
+        interval_s: float,
+        cache_path: str | None = None,
+        on_reload: Callable[[SensorMapDiff], Any] | None = None,
+        telemetry_collector: Any | None = None,
+    ) -> None:
+        self._loader = loader
+        self._path = path
+        self._interval_s = interval_s
+        self._cache_path = cache_path
+        self._on_reload = on_reload
+        self._telemetry_collector = telemetry_collector
+        self._signature: FileSignature | None = None
+        self._running = False
+
+        self.reloads = 0
+        self.reload_errors = 0
+        self.last_reload_ms = 0.0
+        self.last_diff_size = 0
+
+    def _stat(self) -> FileSignature | None:
+        try:
+            st = os.stat(self._path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def stats(self) -> dict[str, Any]:
+        """Return reload counters for status/telemetry payloads."""
+        return {
+            "sensor_map_reloads": self.reloads,
+            "sensor_map_reload_ms": round(self.last_reload_ms, 1),
+            "sensor_map_diff_size": self.last_diff_size,
+        }
+
+    async def check(self) -> SensorMapDiff | None:
+        """Reload the map if the file changed. Returns the applied diff."""
+        signature = await asyncio.to_thread(self._stat)
+        if signature is None or signature == self._signature:
+            return None
+        self._signature = signature
+
+        started = time.monotonic()
+        fresh = SensorMapLoader(self._path, cache_path=self._cache_path)
+        await asyncio.to_thread(fresh.load)
+        if not fresh.source_hash:
+            # Soubor chybí nebo je nevalidní – ponecháme běžící mapu.
+            self.reload_errors += 1
+            logger.warning("Sensor map reload skipped: %s could not be loaded", self._path)
+            return None
+        if fresh.source_hash == self._loader.source_hash:
+            return None
+
+        diff = self._loader.diff(fresh)
+        self._loader.adopt(fresh)
+        if self._on_reload is not None:
+            try:
+                self._on_reload(diff)
+            except Exception as exc:  # noqa: BLE001
+                logger.error("Sensor map reload callback failed: %s", exc)
+
+        self.reloads += 1
+        self.last_reload_ms = (time.monotonic() - started) * 1000.0
+        self.last_diff_size = diff.size
+        if self._telemetry_collector is not None:
+            self._telemetry_collector.record_sensor_map_reload(
+                added=len(diff.added),
+                changed=len(diff.changed),
+                removed=len(diff.removed),
+                duration_ms=self.last_reload_ms,
+            )
+        logger.info(
+            "Sensor map reloaded: +%d ~%d -%d entries in %.1f ms",
+            len(diff.added),
+            len(diff.changed),
+            len(diff.removed),
+            self.last_reload_ms,
+        )
+        return diff
+
+    async def run(self) -> None:
+        """Poll until stop() is called."""
+        self._running = True
+        self._signature = await asyncio.to_thread(self._stat)
+        while self._running:
+            await asyncio.sleep(self._interval_s)
+            try:
+                await self.check()
+            except Exception as exc:  # noqa: BLE001
+                self.reload_errors += 1
+                logger.error("Sensor map watcher error: %s", exc)
+
+    def stop(self) -> None:
+        self._running = False
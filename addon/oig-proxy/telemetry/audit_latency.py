@@ -0,0 +1,280 @@
+"""Setting latency aggregation over settings-audit steps.
+
+Audit records of one setting share an ``audit_id``. The aggregator
+remembers when each step was first seen and records the time between
+selected steps (transitions) into streaming log-bucket histograms, both
+globally and per ``(table, key)``. Tracking state is evicted after a TTL
+or when too many settings are open, so memory stays bounded.
+"""
+
+from __future__ import annotations
+
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, TypeVar
+
+from .settings_audit import SettingStep
+
+# (name, start step, end steps) – první výskyt end kroku uzavírá přechod.
+TRANSITIONS: tuple[tuple[str, SettingStep, tuple[SettingStep, ...]], ...] = (
+    ("queue_wait", SettingStep.ENQUEUED, (SettingStep.DELIVER_SELECTED,)),
+    ("injection_wait", SettingStep.DELIVER_SELECTED, (SettingStep.INJECTED_BOX,)),
+    ("box_ack", SettingStep.INJECTED_BOX, (SettingStep.ACK_BOX_OBSERVED, SettingStep.ACK_REASON_SETTING)),
+    ("tbl_events_confirm", SettingStep.INJECTED_BOX, (SettingStep.ACK_TBL_EVENTS,)),
+    ("end_to_end", SettingStep.INCOMING, (SettingStep.ACK_TBL_EVENTS, SettingStep.ACK_REASON_SETTING)),
+)
+TRANSITION_NAMES = tuple(name for name, _start, _ends in TRANSITIONS)
+BATCH_COMPLETE = "batch_complete"
+
+
+def _step_transitions() -> dict[str, list[tuple[str, str]]]:
+    """end step -> [(transition, start step)] pro rychlé vyhledání v observe()."""
+    mapping: dict[str, list[tuple[str, str]]] = {}
+    for name, start, ends in TRANSITIONS:
+        for end in ends:
+            mapping.setdefault(end.value, []).append((name, start.value))
+    return mapping
+
+
+_STEP_TRANSITIONS = _step_transitions()
+
+# Po těchto krocích už žádný další přechod nepřijde.
+_FINAL_STEPS: frozenset[str] = frozenset(
+    step.value
+    for step in (
+        SettingStep.ACK_TBL_EVENTS,
+        SettingStep.NACK,
+        SettingStep.TIMEOUT,
+        SettingStep.SUPERSEDED,
+        SettingStep.REJECTED_NOT_ALLOWED,
+        SettingStep.REJECTED_VALIDATION,
+        SettingStep.NOOP_ALREADY_APPLIED,
+        SettingStep.APPLIED_LOCALLY,
+    )
+)
+# Setting dávky je vyřízený potvrzením nebo selháním.
+_BATCH_DONE_STEPS = _FINAL_STEPS | {SettingStep.ACK_REASON_SETTING.value}
+
+
+class LogHistogram:
+    """Streaming histogram with logarithmic buckets.
+
+    Each power of two is split into ``SUB_BUCKETS`` buckets, so a reported
+    percentile is within ~4.5 % of the true value while memory grows only
+    with the logarithm of the value range.
+    """
+
+    SUB_BUCKETS = 8
+
+    def __init__(self) -> None:
+        self._buckets: dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def record(self, value: float) -> None:
+        value = max(0.0, float(value))
+        index = math.floor(math.log2(value) * self.SUB_BUCKETS) if value > 0 else -(1 << 30)
+        self._buckets[index] = self._buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, pct: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(self.count * pct / 100.0))
+        seen = 0
+        for index in sorted(self._buckets):
+            seen += self._buckets[index]
+            if seen >= rank:
+                if index < -(1 << 29):
+                    return 0.0
+                midpoint = 2.0 ** ((index + 0.5) / self.SUB_BUCKETS)
+                return min(self.max, max(self.min, midpoint))
+        return self.max
+
+    def summary(self) -> dict[str, Any]:
+        return {
+            "count": self.count,
+            "p50_ms": round(self.percentile(50), 1),
+            "p95_ms": round(self.percentile(95), 1),
+            "p99_ms": round(self.percentile(99), 1),
+            "max_ms": round(self.max, 1),
+            "mean_ms": round(self.total / self.count, 1) if self.count else 0.0,
+        }
+
+
+@dataclass
+class _Track:
+    table: str
+    key: str
+    last_seen: float
+    seen: dict[str, float] = field(default_factory=dict)
+    done: set[str] = field(default_factory=set)
+
+
+@dataclass
+class _BatchTrack:
+    started: float
+    last_seen: float
+    open: set[str] = field(default_factory=set)
+    enqueued: bool = False
+
+
+_TrackT = TypeVar("_TrackT", _Track, _BatchTrack)
+
+
+class AuditLatencyAggregator:
+    """Correlates audit steps by ``audit_id`` into latency histograms.
+
+    Global histograms are cumulative (MQTT status); the per-window ones,
+    including the per-``(table, key)`` series, are reset by
+    ``snapshot_window`` (telemetry). Records carrying a ``batch_id`` also
+    feed ``batch_complete``: time from the batch's first incoming step
+    until the last accepted setting of the batch is confirmed or failed.
+    """
+
+    def __init__(self, *, ttl_s: float = 900.0, max_tracked: int = 2000, max_series: int = 128) -> None:
+        self.ttl_s = ttl_s
+        self.max_tracked = max_tracked
+        self.max_series = max_series
+        self._tracks: OrderedDict[str, _Track] = OrderedDict()
+        self._batches: OrderedDict[str, _BatchTrack] = OrderedDict()
+        self._total: dict[str, LogHistogram] = {
+            name: LogHistogram() for name in (*TRANSITION_NAMES, BATCH_COMPLETE)
+        }
+        self._window: dict[str, LogHistogram] = {}
+        self._per_key: OrderedDict[tuple[str, str], dict[str, LogHistogram]] = OrderedDict()
+        self.evicted = 0
+
+    def observe(self, record: dict[str, Any], now: float | None = None) -> None:
+        """Feed one audit record (``record_to_dict`` form)."""
+        audit_id = record.get("audit_id")
+        step = record.get("step")
+        if not audit_id or not step:
+            return
+        if now is None:
+            now = time.monotonic()
+
+        track = self._tracks.get(audit_id)
+        if track is None:
+            track = self._tracks[audit_id] = _Track(
+                table=str(record.get("table") or ""),
+                key=str(record.get("key") or ""),
+                last_seen=now,
+            )
+        else:
+            self._tracks.move_to_end(audit_id)
+            track.last_seen = now
+        track.seen.setdefault(step, now)
+
+        for name, start in _STEP_TRANSITIONS.get(step, ()):
+            started = track.seen.get(start)
+            if started is None or name in track.done:
+                continue
+            track.done.add(name)
+            self._record(track, name, (now - started) * 1000.0)
+
+        if step in _FINAL_STEPS:
+            del self._tracks[audit_id]
+        batch_id = record.get("batch_id")
+        if batch_id:
+            self._observe_batch(batch_id, audit_id, step, now)
+        self._evict(now)
+
+    def _observe_batch(self, batch_id: str, audit_id: str, step: str, now: float) -> None:
+        batch = self._batches.get(batch_id)
+        if batch is None:
+            if step != SettingStep.INCOMING.value:
+                return
+            batch = self._batches[batch_id] = _BatchTrack(started=now, last_seen=now)
+        else:
+            self._batches.move_to_end(batch_id)
+            batch.last_seen = now
+        if step == SettingStep.INCOMING.value:
+            batch.open.add(audit_id)
+        elif step == SettingStep.ENQUEUED.value:
+            batch.enqueued = True
+        elif step in _BATCH_DONE_STEPS:
+            batch.open.discard(audit_id)
+            if not batch.open:
+                del self._batches[batch_id]
+                if batch.enqueued:
+                    latency_ms = (now - batch.started) * 1000.0
+                    self._total[BATCH_COMPLETE].record(latency_ms)
+                    self._window_histogram(BATCH_COMPLETE).record(latency_ms)
+
+    def _window_histogram(self, name: str) -> LogHistogram:
+        histogram = self._window.get(name)
+        if histogram is None:
+            histogram = self._window[name] = LogHistogram()
+        return histogram
+
+    def _record(self, track: _Track, name: str, latency_ms: float) -> None:
+        self._total[name].record(latency_ms)
+        self._window_histogram(name).record(latency_ms)
+
+        series_key = (track.table, track.key)
+        series = self._per_key.get(series_key)
+        if series is None:
+            if len(self._per_key) >= self.max_series:
+                self._per_key.popitem(last=False)
+            series = self._per_key[series_key] = {}
+        else:
+            self._per_key.move_to_end(series_key)
+        histogram = series.get(name)
+        if histogram is None:
+            histogram = series[name] = LogHistogram()
+        histogram.record(latency_ms)
+
+    def _evict(self, now: float) -> None:
+        self.evicted += self._evict_stale(self._tracks, now)
+        self.evicted += self._evict_stale(self._batches, now)
+
+    def _evict_stale(self, tracks: OrderedDict[str, _TrackT], now: float) -> int:
+        # Pořadí = poslední výskyt, nejstarší položka je vždy první.
+        evicted = 0
+        while tracks:
+            head = next(iter(tracks.values()))
+            if len(tracks) <= self.max_tracked and now - head.last_seen < self.ttl_s:
+                break
+            tracks.popitem(last=False)
+            evicted += 1
+        return evicted
+
+    def tracked(self) -> int:
+        return len(self._tracks)
+
+    def status_fields(self) -> dict[str, Any]:
+        """Flat cumulative percentiles for the proxy status payload."""
+        fields: dict[str, Any] = {}
+        for name, histogram in self._total.items():
+            if histogram.count:
+                fields[f"setting_{name}_p50_ms"] = round(histogram.percentile(50), 1)
+                fields[f"setting_{name}_p95_ms"] = round(histogram.percentile(95), 1)
+        return fields
+
+    def snapshot_window(self) -> dict[str, Any]:
+        """Return and reset per-window histograms (telemetry payload)."""
+        self._evict(time.monotonic())
+        snapshot = {
+            "transitions": {name: histogram.summary() for name, histogram in self._window.items()},
+            "per_key": {
+                f"{table}:{key}": {name: histogram.summary() for name, histogram in series.items()}
+                for (table, key), series in self._per_key.items()
+            },
+            "tracked": len(self._tracks),
+            "open_batches": len(self._batches),
+            "evicted": self.evicted,
+        }
+        self._window.clear()
+        self._per_key.clear()
+        self.evicted = 0
+        return snapshot
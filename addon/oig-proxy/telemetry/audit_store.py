@@ -0,0 +1,399 @@
+"""Local SQLite store of settings-audit records.
+
+``TwinControlHandler`` and ``TwinDelivery`` queue every audit step here,
+independently of telemetry. A daemon thread writes the records in batches
+(same pattern as ``TwinJournal`` and ``FrameCapture``), so the event loop
+never waits for the SD card. Records
+are indexed by ``audit_id`` (full lifecycle of one setting),
+``(device_id, table_name, key, ts_ms)`` (history of one setting key) and
+``(step, ts_ms)``; rows older than the retention are pruned from the head.
+
+Queries are served by ``lifecycle``/``query``, by the
+``<namespace>/<device_id>/audit/query`` MQTT topic (``AuditQueryHandler``,
+answered on ``<namespace>/<device_id>/audit/response``) and by the CLI::
+
+    python3 -m telemetry.audit_store /data/settings_audit.db --audit-id aud_...
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import queue
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import suppress
+from typing import Any
+
+import json_codec
+
+logger = logging.getLogger(__name__)
+
+QUERY_LIMIT_DEFAULT = 100
+QUERY_LIMIT_MAX = 500
+PRUNE_INTERVAL_S = 600.0
+
+_INSERT_SQL = (
+    "INSERT INTO settings_audit "
+    "(ts_ms, audit_id, batch_id, device_id, table_name, key, step, result, record) "
+    "VALUES (?,?,?,?,?,?,?,?,?)"
+)
+# Řádky jsou v pořadí id = pořadí zápisu, expirované leží na začátku.
+_PRUNE_SQL = (
+    "DELETE FROM settings_audit WHERE id < COALESCE("
+    "(SELECT id FROM settings_audit WHERE ts_ms >= ? ORDER BY id LIMIT 1), "
+    "(SELECT IFNULL(MAX(id), 0) + 1 FROM settings_audit))"
+)
+_LIFECYCLE_SQL = "SELECT ts_ms, record FROM settings_audit WHERE audit_id = ? ORDER BY id"
+# Filtry dotazu: parametr -> podmínka (hodnoty vždy jako bind parametry).
+_QUERY_FILTERS: tuple[tuple[str, str], ...] = (
+    ("device_id", "device_id = ?"),
+    ("table", "table_name = ?"),
+    ("key", "key = ?"),
+    ("step", "step = ?"),
+    ("since_ms", "ts_ms >= ?"),
+    ("until_ms", "ts_ms < ?"),
+)
+
+
+class _Flush:
+    def __init__(self) -> None:
+        self.done = threading.Event()
+
+
+class SettingsAuditStore:
+    """Background batched writer + indexed queries for audit records."""
+
+    BATCH_MAX = 200
+    BATCH_WINDOW_S = 0.5
+    QUEUE_MAX = 5000
+
+    def __init__(self, db_path: str, retention_days: int = 30) -> None:
+        self.db_path = db_path
+        self.retention_days = retention_days
+        self._queue: queue.Queue[tuple[int, dict[str, Any]] | _Flush | None] = queue.Queue(maxsize=self.QUEUE_MAX)
+        self._thread: threading.Thread | None = None
+        self._reader: sqlite3.Connection | None = None
+        self._reader_lock = threading.Lock()
+        self.records_written = 0
+        self.dropped = 0
+        self.write_errors = 0
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        if not self._ensure_schema():
+            return
+        self._thread = threading.Thread(target=self._writer_loop, daemon=True, name="audit-store")
+        self._thread.start()
+        logger.info("SettingsAuditStore started: db=%s retention=%dd", self.db_path, self.retention_days)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        if self._thread is not None:
+            with suppress(queue.Full):
+                self._queue.put(None, timeout=2.0)
+            self._thread.join(timeout=timeout)
+            self._thread = None
+        with self._reader_lock:
+            if self._reader is not None:
+                with suppress(sqlite3.Error):
+                    self._reader.close()
+                self._reader = None
+
+    def put(self, record: dict[str, Any]) -> None:
+        """Queue one ``record_to_dict`` record; never blocks."""
+        if self._thread is None:
+            return
+        try:
+            self._queue.put_nowait((int(time.time() * 1000), record))
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Block until everything queued so far is committed."""
+        if self._thread is None:
+            return False
+        marker = _Flush()
+        self._queue.put(marker, timeout=timeout)
+        return marker.done.wait(timeout)
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def lifecycle(self, audit_id: str) -> list[dict[str, Any]]:
+        """All steps of one setting, in the order they were recorded."""
+        return self._select(_LIFECYCLE_SQL, (audit_id,))
+
+    def query(self, *, limit: int = QUERY_LIMIT_DEFAULT, **filters: Any) -> list[dict[str, Any]]:
+        """Newest records matching ``device_id``/``table``/``key``/``step``/``since_ms``/``until_ms``."""
+        unknown = set(filters) - {name for name, _clause in _QUERY_FILTERS}
+        if unknown:
+            raise ValueError(f"unknown audit query filter: {', '.join(sorted(unknown))}")
+        clauses: list[str] = []
+        params: list[Any] = []
+        for name, clause in _QUERY_FILTERS:
+            value = filters.get(name)
+            if value is not None and value != "":
+                clauses.append(clause)
+                params.append(value)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        params.append(max(1, min(int(limit), QUERY_LIMIT_MAX)))
+        # Podmínky pochází jen z _QUERY_FILTERS, hodnoty jsou bind parametry.
+        sql = f"SELECT ts_ms, record FROM settings_audit{where} ORDER BY ts_ms DESC, id DESC LIMIT ?"  # nosec B608
+        return self._select(sql, tuple(params))
+
+    def _select(self, sql: str, params: tuple[Any, ...]) -> list[dict[str, Any]]:
+        with self._reader_lock:
+            if self._reader is None:
+                self._reader = sqlite3.connect(self.db_path, check_same_thread=False)
+                self._reader.execute("PRAGMA busy_timeout=2000")
+            rows = self._reader.execute(sql, params).fetchall()
+        records: list[dict[str, Any]] = []
+        for ts_ms, raw in rows:
+            record = json_codec.loads(raw)
+            record["ts_ms"] = ts_ms
+            records.append(record)
+        return records
+
+    # ------------------------------------------------------------------
+    # Writer thread
+    # ------------------------------------------------------------------
+
+    def _ensure_schema(self) -> bool:
+        try:
+            conn = sqlite3.connect(self.db_path)
+            _configure_pragmas(conn)
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS settings_audit (
+                    id         INTEGER PRIMARY KEY,
+                    ts_ms      INTEGER NOT NULL,
+                    audit_id   TEXT NOT NULL,
+                    batch_id   TEXT,
+                    device_id  TEXT,
+                    table_name TEXT,
+                    key        TEXT,
+                    step       TEXT,
+                    result     TEXT,
+                    record     TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_settings_audit_audit_id ON settings_audit(audit_id);
+                CREATE INDEX IF NOT EXISTS idx_settings_audit_setting
+                    ON settings_audit(device_id, table_name, key, ts_ms);
+                CREATE INDEX IF NOT EXISTS idx_settings_audit_step ON settings_audit(step, ts_ms);
+            """)
+            conn.commit()
+            conn.close()
+            return True
+        except (sqlite3.Error, OSError) as exc:
+            logger.warning("SettingsAuditStore: cannot open %s: %s", self.db_path, exc)
+            return False
+
+    def _writer_loop(self) -> None:
+        try:
+            conn = sqlite3.connect(self.db_path)
+            _configure_pragmas(conn)
+        except (sqlite3.Error, OSError) as exc:
+            logger.warning("SettingsAuditStore writer cannot open DB: %s", exc)
+            return
+
+        last_prune = 0.0
+        while True:
+            item = self._queue.get()
+            batch: list[tuple[Any, ...]] = []
+            markers: list[_Flush] = []
+            stop = False
+            deadline = time.monotonic() + self.BATCH_WINDOW_S
+            while True:
+                if item is None:
+                    stop = True
+                elif isinstance(item, _Flush):
+                    markers.append(item)
+                else:
+                    batch.append(_row(*item))
+                if stop or markers or len(batch) >= self.BATCH_MAX:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+            self._commit(conn, batch)
+            now = time.monotonic()
+            if self.retention_days > 0 and now - last_prune >= PRUNE_INTERVAL_S:
+                self._prune(conn)
+                last_prune = now
+            for marker in markers:
+                marker.done.set()
+            if stop:
+                break
+
+        with suppress(sqlite3.Error, OSError):
+            conn.close()
+
+    def _commit(self, conn: sqlite3.Connection, batch: list[tuple[Any, ...]]) -> None:
+        if not batch:
+            return
+        try:
+            conn.executemany(_INSERT_SQL, batch)
+            conn.commit()
+            self.records_written += len(batch)
+        except Exception as exc:  # noqa: BLE001
+            self.write_errors += 1
+            logger.warning("SettingsAuditStore batch write failed: %s", exc)
+            with suppress(Exception):
+                conn.rollback()
+
+    def _prune(self, conn: sqlite3.Connection) -> None:
+        cutoff_ms = int((time.time() - self.retention_days * 86400) * 1000)
+        try:
+            deleted = conn.execute(_PRUNE_SQL, (cutoff_ms,)).rowcount or 0
+            conn.commit()
+            if deleted:
+                logger.debug("SettingsAuditStore pruned %d records", deleted)
+        except Exception as exc:  # noqa: BLE001
+            logger.debug("SettingsAuditStore prune failed: %s", exc)
+
+
+class AuditQueryHandler:
+    """Answers audit queries on ``<namespace>/<device_id>/audit/query``.
+
+    Request: JSON with ``audit_id`` (lifecycle) or query filters
+    (``table``, ``key``, ``step``, ``since_ms``, ``until_ms``, ``limit``;
+    ``device_id`` defaults to the topic's device). An optional
+    ``request_id`` is echoed in the response on
+    ``<namespace>/<device_id>/audit/response``.
+    """
+
+    def __init__(self, mqtt: Any, store: SettingsAuditStore, namespace: str = "oig_local") -> None:
+        self._mqtt = mqtt
+        self._store = store
+        self._namespace = namespace
+        self._topic = f"{namespace}/+/audit/query"
+        self._subscribed = False
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._tasks: set[asyncio.Task[None]] = set()
+
+    def start(self) -> None:
+        with suppress(RuntimeError):
+            self._loop = asyncio.get_running_loop()
+        if self._mqtt.is_ready() and self._mqtt.subscribe(self._topic, self._on_message):
+            self._subscribed = True
+
+    def stop(self) -> None:
+        if self._subscribed and self._mqtt.is_ready():
+            self._mqtt.unsubscribe(self._topic)
+        self._subscribed = False
+        for task in list(self._tasks):
+            task.cancel()
+        self._loop = None
+
+    def _on_message(self, topic: str, payload: bytes) -> None:
+        device_id = topic.split("/")[-3]
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            self._reply(device_id, self._lookup(device_id, payload))
+            return
+        # Callback běží na event loopu (asyncio transport) nebo v paho vlákně;
+        # SQLite dotaz nesmí blokovat proxy provoz, odpověď se publikuje z loopu.
+        loop.call_soon_threadsafe(self._schedule, device_id, payload)
+
+    def _schedule(self, device_id: str, payload: bytes) -> None:
+        task = asyncio.create_task(self._answer(device_id, payload))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _answer(self, device_id: str, payload: bytes) -> None:
+        response = await asyncio.to_thread(self._lookup, device_id, payload)
+        self._reply(device_id, response)
+
+    def _lookup(self, device_id: str, payload: bytes) -> dict[str, Any]:
+        started = time.monotonic()
+        response: dict[str, Any] = {}
+        try:
+            request = json_codec.loads(payload)
+            if not isinstance(request, dict):
+                raise ValueError("expected JSON object")
+            response["request_id"] = request.pop("request_id", None)
+            audit_id = request.pop("audit_id", None)
+            if audit_id:
+                records = self._store.lifecycle(str(audit_id))
+            else:
+                request.setdefault("device_id", device_id)
+                records = self._store.query(**request)
+            response["count"] = len(records)
+            response["records"] = records
+        except (TypeError, ValueError, sqlite3.Error) as exc:
+            response["error"] = str(exc)
+        response["elapsed_ms"] = round((time.monotonic() - started) * 1000.0, 2)
+        return response
+
+    def _reply(self, device_id: str, response: dict[str, Any]) -> None:
+        self._mqtt.publish_message(f"{self._namespace}/{device_id}/audit/response", json_codec.dumps(response))
+
+def _row(ts_ms: int, record: dict[str, Any]) -> tuple[Any, ...]:
+    return (
+        ts_ms,
+        record.get("audit_id") or "",
+        record.get("batch_id") or "",
+        record.get("device_id"),
+        record.get("table"),
+        record.get("key"),
+        record.get("step"),
+        record.get("result"),
+        json_codec.dumps(record),
+    )
+
+
+def _configure_pragmas(conn: sqlite3.Connection) -> None:
+    with suppress(sqlite3.Error):
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=2000")
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Query the local settings-audit store.")
+    parser.add_argument("db", nargs="?", default="/data/settings_audit.db", help="audit DB path")
+    parser.add_argument("--audit-id", help="print the full lifecycle of one setting")
+    for name in ("device-id", "table", "key", "step"):
+        parser.add_argument(f"--{name}")
+    parser.add_argument("--since-ms", type=int)
+    parser.add_argument("--until-ms", type=int)
+    parser.add_argument("--limit", type=int, default=QUERY_LIMIT_DEFAULT)
+    args = parser.parse_args(argv)
+
+    store = SettingsAuditStore(args.db)
+    started = time.monotonic()
+    try:
+        if args.audit_id:
+            records = store.lifecycle(args.audit_id)
+        else:
+            records = store.query(
+                device_id=args.device_id,
+                table=args.table,
+                key=args.key,
+                step=args.step,
+                since_ms=args.since_ms,
+                until_ms=args.until_ms,
+                limit=args.limit,
+            )
+    except sqlite3.Error as exc:
+        print(f"error: {exc}", file=sys.stderr)
+        return 1
+    finally:
+        store.stop()
+    for record in records:
+        print(json_codec.dumps(record))
+    print(f"{len(records)} records in {(time.monotonic() - started) * 1000:.1f} ms", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
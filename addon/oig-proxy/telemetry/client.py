@@ -7,10 +7,15 @@ import logging
 import os
 import sqlite3
 import time
+import zlib
 from importlib import import_module
 from pathlib import Path
 from typing import Any
 
+import json_codec
+
+from .envelope import TelemetryEnvelope
+
 logger = logging.getLogger("oig.telemetry")
 
 try:
@@ -23,6 +28,9 @@ BUFFER_MAX_MESSAGES = 1000
 BUFFER_MAX_AGE_HOURS = 168
 SQL_SELECT_COUNT = "SELECT COUNT(*) FROM messages"
 BUFFER_DB_PATH = Path("/data/telemetry_buffer.db")
+BUFFER_COMPRESS_LEVEL = 6
+ENVELOPE_TOPIC_SUFFIX = "/envelope"
+PUBLISH_ACK_TIMEOUT_S = 10.0
 
 
 def _get_instance_hash() -> str:
@@ -42,15 +50,37 @@ def _init_sqlite_db(db_path: str, schema_sql: str, indexes_sql: str = "") -> sql
     return conn
 
 
+def _encode_payload(payload: dict[str, Any]) -> bytes:
+    return zlib.compress(json_codec.dumps(payload).encode("utf-8"), BUFFER_COMPRESS_LEVEL)
+
+
+def _decode_payload(raw: bytes | str) -> Any:
+    # Řádky ze starších verzí obsahují nekomprimovaný JSON text.
+    if isinstance(raw, bytes):
+        raw = zlib.decompress(raw).decode("utf-8")
+    return json.loads(raw)
+
+
 class TelemetryBuffer:
+    """Offline buffer for telemetry messages (SQLite, WAL).
+
+    Rows are kept in ``id`` order as a ring of at most ``BUFFER_MAX_MESSAGES``:
+    a store into a full buffer drops the oldest ids in the same transaction.
+    The row count is maintained in memory, payloads are zlib-compressed JSON
+    and messages sent during a flush are deleted in one transaction.
+    """
+
     def __init__(self, db_path: Path | None = None):
         self._db_path = db_path if db_path is not None else BUFFER_DB_PATH
         self._conn: sqlite3.Connection | None = None
+        self._count = 0
         self._init_db()
 
     def _init_db(self) -> None:
         try:
             schema_sql = """
+                PRAGMA journal_mode=WAL;
+                PRAGMA synchronous=NORMAL;
                 CREATE TABLE IF NOT EXISTS messages (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     topic TEXT NOT NULL,
@@ -65,27 +95,30 @@ class TelemetryBuffer:
             self._conn = _init_sqlite_db(str(self._db_path), schema_sql, indexes_sql)
             self._conn.commit()
             self._cleanup()
-            count = self._conn.execute(SQL_SELECT_COUNT).fetchone()[0]
-            if count > 0:
-                logger.debug("Telemetry buffer pending messages: %d", count)
+            if self._count > 0:
+                logger.debug("Telemetry buffer pending messages: %d", self._count)
         except Exception as exc:
             logger.warning("Failed to initialize telemetry buffer: %s", exc)
             self._conn = None
 
+    def _evict_oldest(self, conn: sqlite3.Connection, excess: int) -> None:
+        """Drop the ``excess`` oldest rows as one id range (no commit)."""
+        row = conn.execute(
+            "SELECT id FROM messages ORDER BY id LIMIT 1 OFFSET ?",
+            (excess - 1,),
+        ).fetchone()
+        if row is not None:
+            self._count -= conn.execute("DELETE FROM messages WHERE id <= ?", (row[0],)).rowcount
+
     def _cleanup(self) -> None:
         if not self._conn:
             return
         try:
             cutoff = time.time() - (BUFFER_MAX_AGE_HOURS * 3600)
             self._conn.execute("DELETE FROM messages WHERE timestamp < ?", (cutoff,))
-            self._conn.execute(
-                """
-                DELETE FROM messages WHERE id NOT IN (
-                    SELECT id FROM messages ORDER BY timestamp DESC LIMIT ?
-                )
-                """,
-                (BUFFER_MAX_MESSAGES,),
-            )
+            self._count = self._conn.execute(SQL_SELECT_COUNT).fetchone()[0]
+            if self._count > BUFFER_MAX_MESSAGES:
+                self._evict_oldest(self._conn, self._count - BUFFER_MAX_MESSAGES)
             self._conn.commit()
         except Exception:
             return
@@ -94,59 +127,72 @@ class TelemetryBuffer:
         if not self._conn:
             return False
         try:
-            payload_json = json.dumps(payload, ensure_ascii=False)
-            self._conn.execute(
-                "INSERT INTO messages (topic, payload, timestamp) VALUES (?, ?, ?)",
-                (topic, payload_json, time.time()),
-            )
-            self._conn.commit()
-            count = self._conn.execute(SQL_SELECT_COUNT).fetchone()[0]
-            if count > BUFFER_MAX_MESSAGES:
-                self._cleanup()
+            with self._conn:
+                self._conn.execute(
+                    "INSERT INTO messages (topic, payload, timestamp) VALUES (?, ?, ?)",
+                    (topic, _encode_payload(payload), time.time()),
+                )
+                self._count += 1
+                if self._count > BUFFER_MAX_MESSAGES:
+                    self._evict_oldest(self._conn, self._count - BUFFER_MAX_MESSAGES)
             return True
         except Exception:
+            self._resync_count()
             return False
 
     def get_pending(self, limit: int = 50) -> list[tuple[int, str, dict[str, Any]]]:
         if not self._conn:
             return []
         try:
-            cursor = self._conn.execute(
-                "SELECT id, topic, payload FROM messages ORDER BY timestamp ASC LIMIT ?",
+            rows = self._conn.execute(
+                "SELECT id, topic, payload FROM messages ORDER BY id ASC LIMIT ?",
                 (limit,),
-            )
+            ).fetchall()
             results: list[tuple[int, str, dict[str, Any]]] = []
-            deleted = False
-            for row in cursor:
+            broken: list[int] = []
+            for row in rows:
                 try:
-                    payload = json.loads(row[2])
-                    if isinstance(payload, dict):
-                        results.append((row[0], row[1], payload))
-                except json.JSONDecodeError:
-                    self._conn.execute("DELETE FROM messages WHERE id = ?", (row[0],))
-                    deleted = True
-            if deleted:
-                self._conn.commit()
+                    payload = _decode_payload(row[2])
+                except (zlib.error, UnicodeDecodeError, json.JSONDecodeError):
+                    broken.append(row[0])
+                    continue
+                if isinstance(payload, dict):
+                    results.append((row[0], row[1], payload))
+            if broken:
+                self.remove_many(broken)
             return results
         except Exception:
             return []
 
+    def remove_many(self, message_ids: list[int]) -> None:
+        """Delete several messages in a single transaction."""
+        if not self._conn or not message_ids:
+            return
+        try:
+            with self._conn:
+                cursor = self._conn.executemany(
+                    "DELETE FROM messages WHERE id = ?",
+                    [(message_id,) for message_id in message_ids],
+                )
+                self._count -= cursor.rowcount
+        except Exception:
+            self._resync_count()
+
     def remove(self, message_id: int) -> None:
+        self.remove_many([message_id])
+
+    def _resync_count(self) -> None:
         if not self._conn:
             return
         try:
-            self._conn.execute("DELETE FROM messages WHERE id = ?", (message_id,))
-            self._conn.commit()
+            self._count = self._conn.execute(SQL_SELECT_COUNT).fetchone()[0]
         except Exception:
             return
 
     def count(self) -> int:
         if not self._conn:
             return 0
-        try:
-            return self._conn.execute(SQL_SELECT_COUNT).fetchone()[0]
-        except Exception:
-            return 0
+        return self._count
 
     def close(self) -> None:
         if not self._conn:
@@ -168,6 +214,7 @@ class TelemetryClient:
         telemetry_mqtt_broker: str = "telemetry.muriel-cz.cz:1883",
         telemetry_interval_s: int = 300,
         db_path: Path | None = None,
+        payload_format: str = "json",
     ):
         self._device_id = device_id
         self.version = version
@@ -182,6 +229,7 @@ class TelemetryClient:
         self._mqtt_host, self._mqtt_port = self._parse_mqtt_url(telemetry_mqtt_broker)
         self._last_connect_attempt = 0.0
         self._connect_backoff_s = 5.0
+        self._envelope = TelemetryEnvelope() if payload_format == "envelope" else None
 
     @property
     def device_id(self) -> str:
@@ -292,30 +340,72 @@ class TelemetryClient:
         try:
             if not self._client:
                 return False
-            message = json.dumps(payload, ensure_ascii=False)
+            message = json_codec.dumps(payload)
             result = self._client.publish(topic, message, qos=1)
             return result.rc == 0
         except Exception:
             return False
 
+    def _publish_messages(self, topic: str, messages: list[bytes]) -> bool:
+        """Publish all messages and wait until the broker acknowledged each of them.
+
+        ``rc == 0`` only means paho queued the message locally.
+        """
+        infos = []
+        for message in messages:
+            if not self._client:
+                return False
+            info = self._client.publish(topic, message, qos=1)
+            if info.rc != 0:
+                return False
+            infos.append(info)
+        deadline = time.monotonic() + PUBLISH_ACK_TIMEOUT_S
+        for info in infos:
+            try:
+                info.wait_for_publish(max(0.0, deadline - time.monotonic()))
+                if not info.is_published():
+                    return False
+            except (RuntimeError, ValueError):
+                return False
+        return True
+
+    def _publish_envelope_sync(self, topic: str, payload: dict[str, Any]) -> bool:
+        if not self._envelope or not self._ensure_connected():
+            return False
+        window = None
+        try:
+            window = self._envelope.encode(payload)
+            published = self._publish_messages(topic, window.messages)
+        except Exception:
+            published = False
+        if window is None or not published:
+            self._envelope.reject()
+            return False
+        self._envelope.acknowledge(window, payload)
+        return True
+
     def _flush_buffer_sync(self) -> int:
         if not self._buffer or not self._ensure_connected():
             return 0
-        sent = 0
+        sent: list[int] = []
         for msg_id, topic, payload in self._buffer.get_pending(limit=50):
             try:
                 if not self._client:
                     break
-                message = json.dumps(payload, ensure_ascii=False)
-                result = self._client.publish(topic, message, qos=1)
-                if result.rc == 0:
-                    self._buffer.remove(msg_id)
-                    sent += 1
+                if self._envelope and topic.endswith(ENVELOPE_TOPIC_SUFFIX):
+                    # Starší okno nesmí posunout bázi delta – posílá se celé.
+                    ok = self._publish_messages(topic, self._envelope.encode(payload, delta=False).messages)
+                else:
+                    message = json_codec.dumps(payload)
+                    ok = self._client.publish(topic, message, qos=1).rc == 0
+                if ok:
+                    sent.append(msg_id)
                 else:
                     break
             except Exception:
                 break
-        return sent
+        self._buffer.remove_many(sent)
+        return len(sent)
 
     async def send_telemetry(self, metrics: dict[str, Any]) -> bool:
         if not self._enabled:
@@ -331,9 +421,14 @@ class TelemetryClient:
             **metrics,
         }
         topic = f"oig/telemetry/{self.device_id}"
+        publish = self._publish_sync
+        if self._envelope:
+            topic += ENVELOPE_TOPIC_SUFFIX
+            payload["payload_size"] = self._envelope.size_summary()
+            publish = self._publish_envelope_sync
         loop = asyncio.get_event_loop()
         async with self._lock:
-            success = await loop.run_in_executor(None, self._publish_sync, topic, payload)
+            success = await loop.run_in_executor(None, publish, topic, payload)
             if success:
                 now = time.time()
                 if self._buffer and now - self._last_buffer_flush > 60.0:
@@ -3,7 +3,6 @@ from __future__ import annotations
 import asyncio
 import json
 import logging
-import threading
 import time
 from collections import Counter, defaultdict, deque
 from datetime import datetime, timezone
@@ -11,7 +10,9 @@ from collections.abc import Callable
 from pathlib import Path
 from typing import Any
 
+from .audit_latency import AuditLatencyAggregator, LogHistogram
 from .client import TelemetryClient
+from .log_ring import LogRing, format_log_ts
 from .settings_audit import SettingStep, SettingsAuditRecord, record_to_dict
 
 logger = logging.getLogger(__name__)
@@ -21,6 +22,12 @@ ISNEW_STATE_TOPIC_ALIASES = {
     "isnewset": "IsNewSet",
     "isnewweather": "IsNewWeather",
 }
+# Error contexts kept per telemetry window (older ones are dropped).
+ERROR_CONTEXT_MAX = 500
+REQ_PENDING_MAX = 1000
+# Požadavky bez odpovědi starší než TTL patří k mrtvému spojení.
+REQ_PENDING_TTL_S = 600.0
+CLOUD_RTT_MAX_SERIES = 128
 
 
 class TelemetryCollector:
@@ -50,6 +57,8 @@ class TelemetryCollector:
         consume_set_commands: Callable[[], Any] | None = None,
         get_background_tasks: Callable[[], Any] | None = None,
         db_path: Path | None = None,
+        log_level: int = logging.NOTSET,
+        telemetry_payload_format: str = "json",
     ) -> None:
         self.client: TelemetryClient | None = None
         self.task: asyncio.Task[Any] | None = None
@@ -75,6 +84,7 @@ class TelemetryCollector:
         self._telemetry_enabled = telemetry_enabled
         self._telemetry_mqtt_broker = telemetry_mqtt_broker
         self._telemetry_interval_s = telemetry_interval_s
+        self._telemetry_payload_format = telemetry_payload_format
         self._db_path = db_path
 
         self.box_sessions: deque[dict[str, Any]] = deque()
@@ -82,14 +92,14 @@ class TelemetryCollector:
         self.hybrid_sessions: deque[dict[str, Any]] = deque()
         self.offline_events: deque[dict[str, Any]] = deque()
         self.tbl_events: deque[dict[str, Any]] = deque()
-        self.error_context: deque[dict[str, Any]] = deque()
+        self.error_context: deque[dict[str, Any]] = deque(maxlen=ERROR_CONTEXT_MAX)
         self.settings_audit: deque[dict[str, Any]] = deque()
+        self.sensor_map_reloads: deque[dict[str, Any]] = deque()
+        self.audit_latency = AuditLatencyAggregator()
 
-        self.logs: deque[dict[str, Any]] = deque()
-        self._dropped_log_epochs: deque[float] = deque()
-        self._logs_lock = threading.Lock()
+        self._log_ring = LogRing(5000, level=log_level)
+        self._log_dropped_reported = 0
         self.log_window_s = 300
-        self.log_max = 5000
         self.log_error = False
 
         self.warning_burst_windows_remaining = 0
@@ -102,7 +112,8 @@ class TelemetryCollector:
         self.cloud_failed_in_window = False
         self.cloud_eof_short_in_window = False
 
-        self.req_pending: dict[int, deque[str]] = defaultdict(deque)
+        self.req_pending: dict[int, deque[tuple[str, float]]] = defaultdict(deque)
+        self.cloud_rtt: dict[tuple[str, str], LogHistogram] = {}
         self.stats: dict[tuple[str, str, str], Counter[str]] = {}
 
         self.nack_reasons: Counter[str] = Counter()
@@ -129,7 +140,7 @@ class TelemetryCollector:
 
     @staticmethod
     def _utc_log_ts(ts: float) -> str:
-        return datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+        return format_log_ts(ts)
 
     @staticmethod
     def _parse_frame_dt(value: Any) -> str | None:
@@ -149,15 +160,13 @@ class TelemetryCollector:
             dt = dt.replace(tzinfo=timezone.utc)
         return dt.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
 
-    def _prune_log_buffer(self) -> None:
-        cutoff = time.time() - float(self.log_window_s)
-        while self.logs and self.logs[0]["_epoch"] < cutoff:
-            self.logs.popleft()
-        while self._dropped_log_epochs and self._dropped_log_epochs[0] < cutoff:
-            self._dropped_log_epochs.popleft()
-        while len(self.logs) > self.log_max:
-            dropped_entry = self.logs.popleft()
-            self._dropped_log_epochs.append(float(dropped_entry["_epoch"]))
+    @property
+    def log_max(self) -> int:
+        return self._log_ring.capacity
+
+    @log_max.setter
+    def log_max(self, value: int) -> None:
+        self._log_ring.resize(value)
 
     @property
     def debug_windows_remaining(self) -> int:
@@ -178,11 +187,9 @@ class TelemetryCollector:
         }
 
     def _snapshot_log_buffer(self) -> tuple[list[dict[str, Any]], int]:
-        with self._logs_lock:
-            self._prune_log_buffer()
-            logs = [{k: v for k, v in item.items() if k != "_epoch"} for item in self.logs]
-            dropped_count = len(self._dropped_log_epochs)
-        return logs, dropped_count
+        """Format the logs of the rolling window; second item = newly dropped count."""
+        logs = self._log_ring.snapshot(time.time() - float(self.log_window_s))
+        return logs, self._log_ring.dropped - self._log_dropped_reported
 
     def _advance_log_window_state(self) -> None:
         if self.warning_burst_windows_remaining > 0:
@@ -198,38 +205,48 @@ class TelemetryCollector:
         if record.levelno >= logging.WARNING:
             self.warning_burst_windows_remaining += 2
         try:
-            entry = {
-                "_epoch": record.created,
-                "timestamp": self._utc_log_ts(record.created),
-                "level": record.levelname,
-                "message": record.getMessage(),
-                "source": record.name,
-            }
-            with self._logs_lock:
-                self.logs.append(entry)
-                self._prune_log_buffer()
+            self._log_ring.append(record, float(self.log_window_s))
         except Exception:  # NOSONAR
             self.log_error = True
 
-    def _snapshot_logs(self) -> list[dict[str, Any]]:
-        logs, _ = self._snapshot_log_buffer()
-        return logs
-
-    def _flush_log_buffer(self) -> list[dict[str, Any]]:
-        with self._logs_lock:
-            self._prune_log_buffer()
-            logs = [{k: v for k, v in item.items() if k != "_epoch"} for item in self.logs]
-            self.logs.clear()
-        return logs
-
     def record_request(self, table_name: str | None, conn_id: int) -> None:
         if not table_name:
             return
         queue = self.req_pending[conn_id]
-        queue.append(table_name)
-        if len(queue) > 1000:
+        queue.append((table_name, time.monotonic()))
+        if len(queue) > REQ_PENDING_MAX:
             queue.popleft()
 
+    def record_connection_closed(self, conn_id: int) -> None:
+        """Forget requests of a closed connection (their responses never come)."""
+        self.req_pending.pop(conn_id, None)
+
+    def _prune_req_pending(self, now: float) -> None:
+        stale = [
+            conn_id
+            for conn_id, queue in self.req_pending.items()
+            if not queue or now - queue[-1][1] > REQ_PENDING_TTL_S
+        ]
+        for conn_id in stale:
+            del self.req_pending[conn_id]
+
+    def _record_cloud_rtt(self, table_name: str, mode: str, rtt_ms: float) -> None:
+        key = (table_name, mode)
+        histogram = self.cloud_rtt.get(key)
+        if histogram is None:
+            if len(self.cloud_rtt) >= CLOUD_RTT_MAX_SERIES:
+                return
+            histogram = self.cloud_rtt[key] = LogHistogram()
+        histogram.record(rtt_ms)
+
+    def _flush_cloud_rtt(self) -> list[dict[str, Any]]:
+        items = [
+            {"timestamp": self._utc_iso(), "table": table, "mode": mode, **histogram.summary()}
+            for (table, mode), histogram in self.cloud_rtt.items()
+        ]
+        self.cloud_rtt.clear()
+        return items
+
     @staticmethod
     def _response_kind(response_text: str) -> str:
         if "<Result>Weather</Result>" in response_text:
@@ -291,13 +308,17 @@ class TelemetryCollector:
 
     def record_response(self, response_text: str, *, source: str, conn_id: int) -> None:
         queue = self.req_pending.get(conn_id)
+        sent_at: float | None = None
         if queue:
-            table_name = queue.popleft()
+            table_name, sent_at = queue.popleft()
         else:
             table_name = "unmatched"
         if queue is not None and not queue:
             self.req_pending.pop(conn_id, None)
-        key = (table_name, source, self._safe_mode_value())
+        mode = self._safe_mode_value()
+        if source == "cloud" and sent_at is not None:
+            self._record_cloud_rtt(table_name, mode, (time.monotonic() - sent_at) * 1000.0)
+        key = (table_name, source, mode)
         stats_counter = self.stats.setdefault(
             key,
             Counter(
@@ -349,15 +370,37 @@ class TelemetryCollector:
             details_json = json.dumps(details, ensure_ascii=False)
         except Exception:
             details_json = json.dumps({"detail": str(details)}, ensure_ascii=False)
+        # Jen rozsah seq v log ringu; logy se formátují jednou za okno.
+        ring = self._log_ring
         self.error_context.append(
             {
                 "timestamp": self._utc_iso(),
                 "event_type": event_type,
                 "details": details_json,
-                "logs": json.dumps(self._snapshot_logs(), ensure_ascii=False),
+                "log_seq_start": ring.seq_since(time.time() - float(self.log_window_s)),
+                "log_seq_end": ring.head,
             }
         )
 
+    def _collect_error_context_logs(self) -> list[dict[str, Any]]:
+        """Logs referenced by the window's error contexts, each record once.
+
+        The ring keeps only the newest ``log_max`` records; a
+        context whose records were overwritten before the window was sent
+        gets their count in ``log_lost``.
+        """
+        logs: list[dict[str, Any]] = []
+        covered = 0
+        tail = self._log_ring.tail
+        for context in self.error_context:
+            context["log_lost"] = max(0, min(context["log_seq_end"], tail) - context["log_seq_start"])
+            start = max(context["log_seq_start"], covered)
+            end = context["log_seq_end"]
+            if start < end:
+                logs.extend(self._log_ring.snapshot(0.0, start, end, include_seq=True))
+                covered = end
+        return logs
+
     def record_tbl_event(self, *, parsed: dict[str, Any], device_id: str | None) -> None:
         event_time = self._parse_frame_dt(parsed.get("_dt")) or self._utc_iso()
         self.tbl_events.append(
@@ -374,12 +417,25 @@ class TelemetryCollector:
     def record_setting_audit_step(self, record: SettingsAuditRecord | dict[str, Any]) -> None:
         record_dict = record_to_dict(record) if isinstance(record, SettingsAuditRecord) else dict(record)
         self.settings_audit.append(record_dict)
+        self.audit_latency.observe(record_dict)
         step = record_dict.get("step", "")
         if step == SettingStep.INCOMING.value:
             self.setting_burst_current_active = True
             self.setting_burst_next_windows_remaining = 1
             self.force_logs_this_window = True
 
+    def record_sensor_map_reload(self, *, added: int, changed: int, removed: int, duration_ms: float) -> None:
+        self.sensor_map_reloads.append(
+            {
+                "timestamp": self._utc_iso(),
+                "added": added,
+                "changed": changed,
+                "removed": removed,
+                "diff_size": added + changed + removed,
+                "duration_ms": round(duration_ms, 1),
+            }
+        )
+
     def record_box_session_end(self, *, connected_since_epoch: float | None, reason: str, peer: str | None) -> None:
         if connected_since_epoch is None:
             return
@@ -454,6 +510,7 @@ class TelemetryCollector:
                 telemetry_mqtt_broker=self._telemetry_mqtt_broker,
                 telemetry_interval_s=self._telemetry_interval_s,
                 db_path=self._db_path,
+                payload_format=self._telemetry_payload_format,
             )
         except Exception:
             self.client = None
@@ -514,6 +571,7 @@ class TelemetryCollector:
             logs, dropped_count = self._snapshot_log_buffer()
             if dropped_count > 0:
                 logs.append(self._build_log_overflow_marker(dropped_count))
+                self._log_dropped_reported += dropped_count
         if burst_active:
             self._advance_log_window_state()
         return logs
@@ -536,6 +594,7 @@ class TelemetryCollector:
         return list(self.hybrid_sessions)
 
     def _collect_and_clear_window_metrics(self, logs: list[dict[str, Any]]) -> dict[str, Any]:
+        error_context_logs = self._collect_error_context_logs()  # doplní log_lost do kontextů
         window_metrics = {
             "box_sessions": list(self.box_sessions),
             "cloud_sessions": list(self.cloud_sessions),
@@ -543,9 +602,13 @@ class TelemetryCollector:
             "offline_events": list(self.offline_events),
             "tbl_events": list(self.tbl_events),
             "error_context": list(self.error_context),
+            "error_context_logs": error_context_logs,
             "stats": self._flush_stats(),
+            "cloud_rtt": self._flush_cloud_rtt(),
             "logs": logs,
             "settings_audit": list(self.settings_audit),
+            "sensor_map_reloads": list(self.sensor_map_reloads),
+            "setting_latency": self.audit_latency.snapshot_window(),
         }
         self.box_sessions.clear()
         self.cloud_sessions.clear()
@@ -554,6 +617,8 @@ class TelemetryCollector:
         self.tbl_events.clear()
         self.error_context.clear()
         self.settings_audit.clear()
+        self.sensor_map_reloads.clear()
+        self._prune_req_pending(time.monotonic())
         return window_metrics
 
     def _cached_state_value(self, device_id: str, table_name: str, field_name: str) -> Any | None:
@@ -564,6 +629,14 @@ class TelemetryCollector:
         alias = ISNEW_STATE_TOPIC_ALIASES.get(table_name)
         if alias:
             table_candidates.append(alias)
+        field_getter = getattr(mqtt_pub, "get_cached_field", None)
+        if field_getter is not None:
+            # Rychlá cesta: MQTTClient drží rozparsovaný dict, bez json.loads.
+            for candidate in table_candidates:
+                value = field_getter(f"{self._mqtt_namespace}/{device_id}/{candidate}/state", field_name)
+                if value is not None:
+                    return value
+            return None
         payload = None
         for candidate in table_candidates:
             topic = f"{self._mqtt_namespace}/{device_id}/{candidate}/state"
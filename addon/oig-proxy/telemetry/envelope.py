@@ -0,0 +1,202 @@
+"""Compact envelope format for telemetry windows.
+
+A telemetry window is published as one or more binary MQTT messages:
+``ENVELOPE_MAGIC`` followed by zlib-compressed JSON. Cumulative counters
+are sent as differences against the last window acknowledged by the
+broker; every ``keyframe_interval``-th window (and any window after a
+counter went backwards, e.g. proxy restart, or after a window the broker
+did not confirm) carries absolute values.
+Lists longer than ``chunk_items`` are split into follow-up messages so a
+single message stays small on metered uplinks.
+
+``EnvelopeDecoder`` is the reference decoder (tests, receiving side).
+"""
+
+from __future__ import annotations
+
+import copy
+import zlib
+from typing import Any, NamedTuple
+
+import json_codec
+
+from .audit_latency import LogHistogram
+
+ENVELOPE_MAGIC = b"OIGT1"
+ENVELOPE_VERSION = 1
+CHUNK_ITEMS = 200
+KEYFRAME_INTERVAL = 12
+COMPRESS_LEVEL = 6
+
+# Monotónní čítače od startu proxy – posílají se jako rozdíl.
+CUMULATIVE_COUNTERS: tuple[str, ...] = (
+    "uptime_s",
+    "frames_received",
+    "frames_forwarded",
+    "cloud_connects",
+    "cloud_disconnects",
+    "cloud_timeouts",
+    "cloud_errors",
+)
+# Seznamy, které se dělí do navazujících zpráv.
+_CHUNKED_PARENTS: tuple[tuple[str, ...], ...] = ((), ("window_metrics",))
+
+
+def _pack(envelope: dict[str, Any], level: int) -> bytes:
+    return ENVELOPE_MAGIC + zlib.compress(json_codec.dumps(envelope).encode("utf-8"), level)
+
+
+def unpack(message: bytes) -> dict[str, Any]:
+    """Decode one envelope message; raises ``ValueError`` on foreign data."""
+    if not message.startswith(ENVELOPE_MAGIC):
+        raise ValueError("not a telemetry envelope")
+    try:
+        return json_codec.loads(zlib.decompress(message[len(ENVELOPE_MAGIC):]))
+    except zlib.error as exc:
+        raise ValueError(f"corrupt telemetry envelope: {exc}") from exc
+
+
+def _size_summary(histogram: LogHistogram) -> dict[str, Any]:
+    return {
+        "count": histogram.count,
+        "p50": round(histogram.percentile(50)),
+        "p95": round(histogram.percentile(95)),
+        "max": round(histogram.max),
+    }
+
+
+class EncodedWindow(NamedTuple):
+    seq: int
+    messages: list[bytes]
+    keyframe: bool
+
+
+class TelemetryEnvelope:
+    """Encoder with delta state against the last acknowledged window."""
+
+    def __init__(
+        self,
+        *,
+        chunk_items: int = CHUNK_ITEMS,
+        keyframe_interval: int = KEYFRAME_INTERVAL,
+        level: int = COMPRESS_LEVEL,
+    ) -> None:
+        self.chunk_items = max(1, int(chunk_items))
+        self.keyframe_interval = max(1, int(keyframe_interval))
+        self.level = level
+        self._seq = 0
+        self._base_seq: int | None = None
+        self._base: dict[str, int] = {}
+        self._since_keyframe = 0
+        self._keyframe_due = False
+        self.raw_sizes = LogHistogram()
+        self.encoded_sizes = LogHistogram()
+
+    def _delta_counters(self, payload: dict[str, Any]) -> list[str]:
+        """Counters to send as differences; empty list means a keyframe."""
+        if self._base_seq is None or self._keyframe_due or self._since_keyframe + 1 >= self.keyframe_interval:
+            return []
+        names = [name for name in CUMULATIVE_COUNTERS if type(payload.get(name)) is int]
+        if any(payload[name] < self._base.get(name, 0) for name in names):
+            return []
+        return names
+
+    def encode(self, payload: dict[str, Any], *, delta: bool = True) -> EncodedWindow:
+        """Encode one window into messages; ``payload`` is not modified."""
+        self._seq += 1
+        seq = self._seq
+        body = dict(payload)
+        envelope: dict[str, Any] = {"v": ENVELOPE_VERSION, "seq": seq}
+        names = self._delta_counters(payload) if delta else []
+        if names:
+            envelope["base_seq"] = self._base_seq
+            envelope["delta"] = names
+            for name in names:
+                body[name] = payload[name] - self._base.get(name, 0)
+
+        chunks: list[dict[str, Any]] = []
+        for parent in _CHUNKED_PARENTS:
+            container = body
+            if parent:
+                nested = body.get(parent[0])
+                if not isinstance(nested, dict):
+                    continue
+                container = body[parent[0]] = dict(nested)
+            for key, value in list(container.items()):
+                if not isinstance(value, list) or len(value) <= self.chunk_items:
+                    continue
+                container[key] = value[: self.chunk_items]
+                for offset in range(self.chunk_items, len(value), self.chunk_items):
+                    chunks.append({"path": [*parent, key], "items": value[offset : offset + self.chunk_items]})
+
+        envelope["chunks"] = 1 + len(chunks)
+        envelope["body"] = body
+        messages = [_pack({**envelope, "chunk": 0}, self.level)]
+        for index, chunk in enumerate(chunks, start=1):
+            messages.append(
+                _pack({"v": ENVELOPE_VERSION, "seq": seq, "chunk": index, "chunks": 1 + len(chunks), **chunk}, self.level)
+            )
+
+        self.raw_sizes.record(len(json_codec.dumps(payload).encode("utf-8")))
+        self.encoded_sizes.record(sum(len(message) for message in messages))
+        return EncodedWindow(seq, messages, "base_seq" not in envelope)
+
+    def acknowledge(self, window: EncodedWindow, payload: dict[str, Any]) -> None:
+        """Make a fully published window the base for following deltas."""
+        self._base_seq = window.seq
+        self._base = {name: int(payload.get(name) or 0) for name in CUMULATIVE_COUNTERS}
+        self._since_keyframe = 0 if window.keyframe else self._since_keyframe + 1
+        if window.keyframe:
+            self._keyframe_due = False
+
+    def reject(self) -> None:
+        """A window was not confirmed by the broker: keep the base, send a keyframe next."""
+        self._keyframe_due = True
+
+    def size_summary(self) -> dict[str, Any]:
+        """Distribution of window sizes in bytes (raw JSON vs. published)."""
+        raw_total = self.raw_sizes.total
+        return {
+            "raw_bytes": _size_summary(self.raw_sizes),
+            "encoded_bytes": _size_summary(self.encoded_sizes),
+            "ratio": round(self.encoded_sizes.total / raw_total, 3) if raw_total else None,
+        }
+
+
+class EnvelopeDecoder:
+    """Reassemble chunks and resolve deltas back to the original payload."""
+
+    def __init__(self) -> None:
+        self._pending: dict[int, tuple[dict[str, Any], dict[int, dict[str, Any]]]] = {}
+        self._counters: dict[int, dict[str, int]] = {}
+
+    def feed(self, message: bytes) -> dict[str, Any] | None:
+        """Return the full payload once all chunks of a window arrived."""
+        envelope = unpack(message)
+        seq = envelope["seq"]
+        head, parts = self._pending.setdefault(seq, ({}, {}))
+        if envelope["chunk"] == 0:
+            head.update(envelope)
+        else:
+            parts[envelope["chunk"]] = envelope
+        if not head or len(parts) + 1 < head["chunks"]:
+            return None
+        del self._pending[seq]
+
+        body = copy.deepcopy(head["body"])
+        for index in sorted(parts):
+            *parent, key = parts[index]["path"]
+            container = body
+            for name in parent:
+                container = container[name]
+            container[key].extend(parts[index]["items"])
+        if "base_seq" in head:
+            base = self._counters.get(head["base_seq"])
+            if base is None:
+                raise ValueError(f"missing base window {head['base_seq']}")
+            for name in head["delta"]:
+                body[name] += base.get(name, 0)
+        self._counters[seq] = {name: body[name] for name in CUMULATIVE_COUNTERS if name in body}
+        while len(self._counters) > 64:
+            del self._counters[next(iter(self._counters))]
+        return body
@@ -0,0 +1,148 @@
+"""Fixed-capacity ring of log records for telemetry.
+
+``append`` is called from the logging handler on every record, so it only
+stores a reference in a preallocated slot: no formatting, no timestamp
+strings and no lock. Sequence numbers come from ``itertools.count`` (atomic
+under the GIL), so concurrent writers never share a slot index; a snapshot
+skips slots that were overwritten while it was reading. Messages are
+formatted only when a snapshot is taken.
+"""
+
+from __future__ import annotations
+
+import itertools
+import logging
+from datetime import datetime, timezone
+from typing import Any, NamedTuple
+
+
+class _Entry(NamedTuple):
+    seq: int
+    record: logging.LogRecord
+
+
+class _FormattedRecord:
+    """Detached copy of a record with ``exc_info`` (no traceback frames kept alive)."""
+
+    __slots__ = ("created", "levelno", "levelname", "name", "message")
+
+    def __init__(self, record: logging.LogRecord) -> None:
+        self.created = record.created
+        self.levelno = record.levelno
+        self.levelname = record.levelname
+        self.name = record.name
+        self.message = _message(record)
+
+    def getMessage(self) -> str:  # noqa: N802  # pylint: disable=invalid-name
+        return self.message
+
+
+def _message(record: Any) -> str:
+    try:
+        return record.getMessage()
+    except Exception:  # noqa: BLE001  # NOSONAR
+        return str(record.msg)
+
+
+def format_log_ts(ts: float) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
+class LogRing:
+    """Newest ``capacity`` log records at or above ``level``."""
+
+    def __init__(self, capacity: int, level: int = logging.NOTSET) -> None:
+        self.level = level
+        self._capacity = max(1, int(capacity))
+        self._slots: list[_Entry | None] = [None] * self._capacity
+        self._seq = itertools.count()
+        self._head = 0
+        # Záznamy přepsané dřív, než stihly vypršet z časového okna.
+        self.dropped = 0
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    @property
+    def head(self) -> int:
+        """Sequence number the next appended record will get."""
+        return self._head
+
+    @property
+    def tail(self) -> int:
+        """Oldest sequence number still held (older ones were overwritten)."""
+        return max(self._head - self._capacity, 0)
+
+    def append(self, record: logging.LogRecord, window_s: float) -> None:
+        if record.levelno < self.level:
+            return
+        if record.exc_info:
+            record = _FormattedRecord(record)  # type: ignore[assignment]
+        seq = next(self._seq)
+        index = seq % self._capacity
+        old = self._slots[index]
+        if old is not None and old.record.created >= record.created - window_s:
+            self.dropped += 1
+        self._slots[index] = _Entry(seq, record)
+        if seq >= self._head:
+            self._head = seq + 1
+
+    def resize(self, capacity: int) -> None:
+        """Change capacity, keeping the newest records."""
+        entries = self._entries(0)
+        self._capacity = max(1, int(capacity))
+        self._slots = [None] * self._capacity
+        for entry in entries[-self._capacity:]:
+            self._slots[entry.seq % self._capacity] = entry
+        self.dropped += max(0, len(entries) - self._capacity)
+
+    def _entries(self, start_seq: int, end_seq: int | None = None) -> list[_Entry]:
+        head = self._head if end_seq is None else min(end_seq, self._head)
+        entries: list[_Entry] = []
+        for seq in range(max(start_seq, self._head - self._capacity, 0), head):
+            entry = self._slots[seq % self._capacity]
+            if entry is not None and entry.seq == seq:
+                entries.append(entry)
+        return entries
+
+    def seq_since(self, cutoff: float) -> int:
+        """First retained sequence number created at or after ``cutoff``.
+
+        Binary search over the retained range (records arrive in time
+        order); returns ``head`` when no record is that recent.
+        """
+        low = max(self._head - self._capacity, 0)
+        high = self._head
+        while low < high:
+            mid = (low + high) // 2
+            entry = self._slots[mid % self._capacity]
+            if entry is not None and entry.seq == mid and entry.record.created >= cutoff:
+                high = mid
+            else:
+                low = mid + 1
+        return low
+
+    def snapshot(
+        self,
+        cutoff: float,
+        start_seq: int = 0,
+        end_seq: int | None = None,
+        *,
+        include_seq: bool = False,
+    ) -> list[dict[str, Any]]:
+        """Format records created at or after ``cutoff`` (oldest first)."""
+        items: list[dict[str, Any]] = []
+        for entry in self._entries(start_seq, end_seq):
+            if entry.record.created < cutoff:
+                continue
+            item: dict[str, Any] = {
+                "timestamp": format_log_ts(entry.record.created),
+                "level": entry.record.levelname,
+                "message": _message(entry.record),
+                "source": entry.record.name,
+            }
+            if include_seq:
+                item["seq"] = entry.seq
+            items.append(item)
+        return items
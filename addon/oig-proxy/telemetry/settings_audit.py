@@ -6,7 +6,7 @@ ProxyServer) must use the helpers defined here.
 
 Schema Design:
 - Tags (low-cardinality, for grouping): device_id, table, step, result
-- Fields (high-cardinality, for analysis): audit_id, key, session_id, msg_id,
+- Fields (high-cardinality, for analysis): audit_id, batch_id, key, session_id, msg_id,
   id_set, raw_text, value_text, confirmed_value_text, value_kind,
   confirmed_value_kind, value_num_float, confirmed_value_num_float,
   raw_text_truncated, raw_text_bytes_original, audit_payload_capped
@@ -22,6 +22,7 @@ from __future__ import annotations
 import re
 import secrets
 import time
+from collections import OrderedDict
 from dataclasses import dataclass, field
 from enum import Enum
 from typing import Any
@@ -35,7 +36,7 @@ class SettingStep(str, Enum):
     """Lifecycle steps for a settings audit record.
 
     Terminal steps: superseded, ack_tbl_events, ack_reason_setting, nack,
-    timeout, session_cleared
+    timeout, session_cleared, noop_already_applied, applied_locally
     Non-terminal steps: incoming, rejected_not_allowed, rejected_validation,
     enqueued, deliver_selected, injected_box, ack_box_observed
     """
@@ -53,6 +54,8 @@ class SettingStep(str, Enum):
     NACK = "nack"  # BOX or cloud rejected
     TIMEOUT = "timeout"  # No response within timeout window
     SESSION_CLEARED = "session_cleared"  # Session ended without ACK
+    NOOP_ALREADY_APPLIED = "noop_already_applied"  # BOX already reports the requested value
+    APPLIED_LOCALLY = "applied_locally"  # proxy_control handled by the proxy, never sent to BOX
 
 
 class SettingResult(str, Enum):
@@ -79,6 +82,8 @@ TERMINAL_STEPS = frozenset({
     SettingStep.NACK,
     SettingStep.TIMEOUT,
     SettingStep.SESSION_CLEARED,
+    SettingStep.NOOP_ALREADY_APPLIED,
+    SettingStep.APPLIED_LOCALLY,
 })
 
 ACK_TERMINAL_PRECEDENCE = {
@@ -102,7 +107,8 @@ _MAX_TOTAL_RAW_BYTES = 64 * 1024  # 64 KiB per audit_id total
 _AUDIT_TRACKING_TTL_SECONDS = 300
 
 _audit_raw_bytes: dict[str, int] = {}
-_audit_last_seen: dict[str, float] = {}
+# TTL index: audit_id -> last seen, ordered by last touch (oldest first).
+_audit_last_seen: OrderedDict[str, float] = OrderedDict()
 
 
 def _is_sensitive_key(key: str) -> bool:
@@ -129,6 +135,18 @@ class TruncationInfo:
     was_truncated: bool = False
 
 
+def _utf8_prefix_length(encoded: bytes, byte_limit: int) -> int:
+    """Largest prefix length <= byte_limit that does not split a UTF-8 character."""
+    if byte_limit <= 0:
+        return 0
+    if len(encoded) <= byte_limit:
+        return len(encoded)
+    cut = byte_limit
+    while cut > 0 and (encoded[cut] & 0xC0) == 0x80:
+        cut -= 1
+    return cut
+
+
 def truncate_raw_text(text: str) -> tuple[str, TruncationInfo]:
     """Truncate raw text to MAX_RAW_TEXT_BYTES (16 KiB).
 
@@ -138,31 +156,19 @@ def truncate_raw_text(text: str) -> tuple[str, TruncationInfo]:
     info = TruncationInfo(original_bytes=len(encoded))
     if len(encoded) <= _MAX_RAW_TEXT_BYTES:
         return text, info
-    truncated_bytes = encoded[:_MAX_RAW_TEXT_BYTES]
-    truncated_text = truncated_bytes.decode("utf-8", errors="replace")
     info.was_truncated = True
-    return truncated_text, info
-
-
-def _truncate_utf8_text(text: str, byte_limit: int) -> str:
-    """Truncate text to a byte limit while preserving UTF-8 validity."""
-    if byte_limit <= 0:
-        return ""
-    truncated_bytes = text.encode("utf-8", errors="replace")[:byte_limit]
-    return truncated_bytes.decode("utf-8", errors="replace")
+    return encoded[: _utf8_prefix_length(encoded, _MAX_RAW_TEXT_BYTES)].decode("utf-8"), info
 
 
 def _cleanup_audit_tracking(now: float | None = None) -> None:
-    """Expire stale aggregate raw-text tracking entries."""
+    """Expire stale aggregate raw-text tracking entries from the TTL index head."""
     if now is None:
         now = time.time()
-    expired_audit_ids = [
-        audit_id
-        for audit_id, last_seen in _audit_last_seen.items()
-        if now - last_seen > _AUDIT_TRACKING_TTL_SECONDS
-    ]
-    for audit_id in expired_audit_ids:
-        _audit_last_seen.pop(audit_id, None)
+    while _audit_last_seen:
+        audit_id, last_seen = next(iter(_audit_last_seen.items()))
+        if now - last_seen <= _AUDIT_TRACKING_TTL_SECONDS:
+            break
+        _audit_last_seen.popitem(last=False)
         _audit_raw_bytes.pop(audit_id, None)
 
 
@@ -172,6 +178,7 @@ def _touch_audit_tracking(audit_id: str, now: float | None = None) -> None:
         now = time.time()
     if audit_id in _audit_raw_bytes:
         _audit_last_seen[audit_id] = now
+        _audit_last_seen.move_to_end(audit_id)
 
 
 def _apply_raw_text_limits(audit_id: str, raw_text: str) -> tuple[str, TruncationInfo, bool]:
@@ -179,19 +186,23 @@ def _apply_raw_text_limits(audit_id: str, raw_text: str) -> tuple[str, Truncatio
     now = time.time()
     _cleanup_audit_tracking(now)
 
-    truncated, info = truncate_raw_text(raw_text)
-    stored_bytes = len(truncated.encode("utf-8", errors="replace"))
+    encoded = raw_text.encode("utf-8", errors="replace")
+    info = TruncationInfo(original_bytes=len(encoded))
     used_bytes = _audit_raw_bytes.get(audit_id, 0)
     remaining_bytes = max(0, _MAX_TOTAL_RAW_BYTES - used_bytes)
-    audit_payload_capped = stored_bytes > remaining_bytes
+    field_bytes = _utf8_prefix_length(encoded, _MAX_RAW_TEXT_BYTES)
+    audit_payload_capped = field_bytes > remaining_bytes
 
-    if audit_payload_capped:
-        truncated = _truncate_utf8_text(truncated, remaining_bytes)
-        stored_bytes = len(truncated.encode("utf-8", errors="replace"))
+    stored_bytes = _utf8_prefix_length(encoded, min(field_bytes, remaining_bytes))
+    if stored_bytes < len(encoded):
         info.was_truncated = True
+        truncated = encoded[:stored_bytes].decode("utf-8")
+    else:
+        truncated = raw_text
 
     _audit_raw_bytes[audit_id] = used_bytes + stored_bytes
     _audit_last_seen[audit_id] = now
+    _audit_last_seen.move_to_end(audit_id)
 
     return truncated, info, audit_payload_capped
 
@@ -220,6 +231,7 @@ class SettingsAuditRecord:
     result: SettingResult
 
     # --- Correlation ---
+    batch_id: str = ""  # shared by all settings of one batch command
     session_id: str = ""
     msg_id: int = 0
     id_set: int = 0
@@ -296,6 +308,7 @@ def make_incoming_record(
     session_id: str = "",
     msg_id: int = 0,
     id_set: int = 0,
+    batch_id: str = "",
 ) -> SettingsAuditRecord:
     """Create an 'incoming' audit record for a newly received setting command."""
     audit_id = _generate_audit_id()
@@ -320,6 +333,7 @@ def make_incoming_record(
         key=key,
         step=SettingStep.INCOMING,
         result=SettingResult.PENDING,
+        batch_id=batch_id,
         session_id=session_id,
         msg_id=msg_id,
         id_set=id_set,
@@ -385,6 +399,7 @@ def make_step_record(
         key=parent_record.key,
         step=step,
         result=result,
+        batch_id=parent_record.batch_id,
         session_id=session_id if session_id is not None else parent_record.session_id,
         msg_id=msg_id if msg_id is not None else parent_record.msg_id,
         id_set=id_set if id_set is not None else parent_record.id_set,
@@ -425,6 +440,8 @@ def _terminal_result_for_step(step: SettingStep) -> SettingResult:
         SettingStep.NACK: SettingResult.FAILED,
         SettingStep.TIMEOUT: SettingResult.FAILED,
         SettingStep.SESSION_CLEARED: SettingResult.INCOMPLETE,
+        SettingStep.NOOP_ALREADY_APPLIED: SettingResult.CONFIRMED,
+        SettingStep.APPLIED_LOCALLY: SettingResult.CONFIRMED,
     }
     return mapping.get(step, SettingResult.FAILED)
 
@@ -434,6 +451,11 @@ def _generate_audit_id() -> str:
     return f"aud_{int(time.time() * 1000):014d}_{secrets.randbelow(1_000_000):06d}"
 
 
+def new_batch_id() -> str:
+    """Generate a batch ID shared by the records of one batch command."""
+    return f"bat_{int(time.time() * 1000):014d}_{secrets.randbelow(1_000_000):06d}"
+
+
 def is_stronger_ack(this_step: SettingStep, other_step: SettingStep) -> bool:
     """Return True if this_step represents a stronger ACK than other_step.
 
@@ -453,6 +475,7 @@ def record_to_dict(record: SettingsAuditRecord) -> dict[str, Any]:
         "step": record.step.value if isinstance(record.step, Enum) else record.step,
         "result": record.result.value if isinstance(record.result, Enum) else record.result,
         "audit_id": record.audit_id,
+        "batch_id": record.batch_id,
         "key": record.key,
         "session_id": record.session_id,
         "msg_id": record.msg_id,
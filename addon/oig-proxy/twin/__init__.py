@@ -1,9 +1,11 @@
 """Twin module for OIG Proxy v2.
 
-Provides in-memory state management for device twin settings.
+Provides state management for device twin settings, optionally persisted
+to a SQLite journal.
 """
 
 from .handler import TwinControlHandler
+from .journal import TwinJournal
 from .state import TwinQueue, TwinSetting
 
-__all__ = ["TwinControlHandler", "TwinQueue", "TwinSetting"]
+__all__ = ["TwinControlHandler", "TwinJournal", "TwinQueue", "TwinSetting"]
@@ -1,7 +1,9 @@
 from __future__ import annotations
 
-from collections import defaultdict, deque
+from collections import OrderedDict, defaultdict, deque
 from dataclasses import dataclass
+import heapq
+import itertools
 import logging
 import secrets
 import time
@@ -13,14 +15,17 @@ from telemetry.settings_audit import (
     TERMINAL_STEPS,
     SettingResult,
     SettingStep,
+    SettingsAuditRecord,
     _normalize_value_for_text,
     is_stronger_ack,
     make_incoming_record,
     make_step_record,
+    record_to_dict,
 )
 
 if TYPE_CHECKING:
     from ..mqtt.client import MQTTClient
+    from telemetry.audit_store import SettingsAuditStore
     from telemetry.collector import TelemetryCollector
     from .state import TwinQueue, TwinSetting
 
@@ -33,40 +38,73 @@ class _CloudPendingSetting:
     setting: TwinSetting
     device_id: str
     tracked_at: float
+    seq: int = 0
     reason_setting_seen: bool = False
     reason_setting_at: float | None = None
 
 
+@dataclass
+class _LocalInflight:
+    table: str
+    key: str
+    device_id: str
+    session_id: str | None
+    since: float
+    id_set: int = 0
+    msg_id: int = 0
+    nacked: bool = False
+
+
+@dataclass
+class _SessionWindow:
+    size: int
+    clean_acks: int = 0
+
+
 class TwinDelivery:
     """Manages delivery of pending settings to BOX via proxy.
-    
-    Session-level tracking ensures only one setting is in-flight per TCP session.
+
+    Each box session may have up to ``window`` local settings in flight and
+    a poll hands out as many as fit; box ACKs are correlated to them by
+    ``ID_Set``/msg ID, falling back to delivery order. A NACK shrinks the
+    window of that session to 1 until the box has acknowledged ``window``
+    settings in a row again. Settings of a closed session keep counting
+    against every session's window until acknowledged or timed out.
     Cloud-initiated settings take priority over local queue.
     """
-    
+
     def __init__(
         self,
         twin_queue: TwinQueue,
         mqtt: MQTTClient,
         inflight_timeout_s: float = 60.0,
         telemetry_collector: TelemetryCollector | None = None,
+        window: int = 1,
+        audit_store: SettingsAuditStore | None = None,
     ) -> None:
         self._twin_queue = twin_queue
         self._mqtt = mqtt
         self._inflight_timeout_s = inflight_timeout_s
         self._telemetry_collector = telemetry_collector
+        self._audit_store = audit_store
 
         # Cloud-initiated setting tracking
         self._cloud_pending: dict[tuple[str, str, str], deque[_CloudPendingSetting]] = defaultdict(deque)
         self._cloud_legacy_inflight: bool = False
+        # Indexy nad _cloud_pending: seq -> entry v pořadí tracked_at (globálně
+        # i per device) a halda (deadline, seq); neplatné položky haldy se
+        # přeskakují líně při popu.
+        self._cloud_order: dict[int, _CloudPendingSetting] = {}
+        self._cloud_by_device: dict[str, dict[int, _CloudPendingSetting]] = {}
+        self._cloud_expiry: list[tuple[float, int]] = []
+        self._cloud_seq = itertools.count(1)
+
+        # Local inflight settings in delivery order: (table, key) -> entry
+        self._inflight: OrderedDict[tuple[str, str], _LocalInflight] = OrderedDict()
+        self._max_window = max(1, window)
+        self._windows: dict[str | None, _SessionWindow] = {}
+        self.nack_fallbacks = 0
 
-        # Session-level inflight tracking: session_id -> (table, key, since)
-        self._session_inflight: dict[str, tuple[str, str, float]] = {}
-
-        # Global inflight for backward compatibility
-        self._inflight_key: tuple[str, str] | None = None
-        self._inflight_device_id: str | None = None
-        self._inflight_since: float | None = None
         self._last_seen_id_set: int | None = None
         self._last_msg_id: int | None = None
 
@@ -109,6 +147,7 @@ class TwinDelivery:
             id_set=setting.id_set,
         )
         record.audit_id = setting.audit_id
+        record.batch_id = setting.batch_id
         return record
 
     def _record_audit_step(
@@ -122,7 +161,7 @@ class TwinDelivery:
         raw_text: str | None = None,
         session_id: str = "",
     ) -> None:
-        if self._telemetry_collector is None or not setting.audit_id:
+        if (self._telemetry_collector is None and self._audit_store is None) or not setting.audit_id:
             return
         is_terminal = step in TERMINAL_STEPS and result != SettingResult.PENDING
         if is_terminal:
@@ -139,19 +178,43 @@ class TwinDelivery:
             raw_text=raw_text,
             session_id=session_id,
         )
-        self._telemetry_collector.record_setting_audit_step(record)
+        self._record_audit(record)
+
+    def _record_audit(self, record: SettingsAuditRecord) -> None:
+        if self._telemetry_collector is not None:
+            self._telemetry_collector.record_setting_audit_step(record)
+        if self._audit_store is not None:
+            self._audit_store.put(record_to_dict(record))
 
     @staticmethod
     def _cloud_pending_key(device_id: str, table: str, key: str) -> tuple[str, str, str]:
         return device_id, table, key
 
-    def _iter_cloud_pending(self) -> list[_CloudPendingSetting]:
-        entries: list[_CloudPendingSetting] = []
-        for queue in self._cloud_pending.values():
-            entries.extend(queue)
-        return entries
+    def _track_cloud_pending(self, pending: _CloudPendingSetting) -> None:
+        pending.seq = next(self._cloud_seq)
+        queue_key = self._cloud_pending_key(
+            pending.device_id,
+            pending.setting.table,
+            pending.setting.key,
+        )
+        self._cloud_pending[queue_key].append(pending)
+        self._cloud_order[pending.seq] = pending
+        self._cloud_by_device.setdefault(pending.device_id, {})[pending.seq] = pending
+        heapq.heappush(self._cloud_expiry, (self._cloud_deadline(pending), pending.seq))
+
+    def _cloud_deadline(self, pending: _CloudPendingSetting) -> float:
+        if pending.reason_setting_seen and pending.reason_setting_at is not None:
+            return pending.reason_setting_at + self._inflight_timeout_s
+        return pending.tracked_at + self._inflight_timeout_s
 
     def _remove_cloud_pending(self, pending: _CloudPendingSetting) -> None:
+        if self._cloud_order.pop(pending.seq, None) is None:
+            return
+        device_index = self._cloud_by_device.get(pending.device_id)
+        if device_index is not None:
+            device_index.pop(pending.seq, None)
+            if not device_index:
+                del self._cloud_by_device[pending.device_id]
         queue_key = self._cloud_pending_key(
             pending.device_id,
             pending.setting.table,
@@ -168,216 +231,228 @@ class TwinDelivery:
             self._cloud_pending.pop(queue_key, None)
 
     def _oldest_cloud_pending(self, device_id: str | None = None) -> _CloudPendingSetting | None:
-        candidates = [
-            pending
-            for pending in self._iter_cloud_pending()
-            if device_id is None or pending.device_id == device_id
-        ]
-        if not candidates:
+        index = self._cloud_order if device_id is None else self._cloud_by_device.get(device_id)
+        if not index:
             return None
-        return min(candidates, key=lambda pending: pending.tracked_at)
+        return next(iter(index.values()))
 
     def _expire_cloud_pending(self, now: float | None = None) -> None:
+        expiry = self._cloud_expiry
+        if not expiry:
+            return
         if now is None:
             now = time.monotonic()
-        for pending in list(self._iter_cloud_pending()):
-            if pending.reason_setting_seen and pending.reason_setting_at is not None:
-                if now - pending.reason_setting_at >= self._inflight_timeout_s:
-                    self.record_ack_reason_setting(
-                        pending.setting,
-                        pending.device_id,
-                        session_id="",
-                        terminal=True,
-                    )
-                    self._remove_cloud_pending(pending)
-            elif now - pending.tracked_at >= self._inflight_timeout_s:
+        while expiry and expiry[0][0] <= now:
+            deadline, seq = heapq.heappop(expiry)
+            pending = self._cloud_order.get(seq)
+            if pending is None or deadline < self._cloud_deadline(pending):
+                continue  # už vyřízeno, nebo deadline posunul Reason=Setting ACK
+            if pending.reason_setting_seen:
+                self.record_ack_reason_setting(
+                    pending.setting,
+                    pending.device_id,
+                    session_id="",
+                    terminal=True,
+                )
+            else:
                 self._record_audit_step(
                     pending.setting,
                     pending.device_id,
                     SettingStep.TIMEOUT,
                 )
-                self._remove_cloud_pending(pending)
+            self._remove_cloud_pending(pending)
+
+    @property
+    def window(self) -> int:
+        """Current delivery window of settings delivered without a session."""
+        return self.window_for(None)
+
+    def window_for(self, session_id: str | None) -> int:
+        """Current delivery window of a session (drops to 1 after a NACK)."""
+        window = self._windows.get(session_id)
+        return self._max_window if window is None else window.size
+
+    def _session_window(self, session_id: str | None) -> _SessionWindow:
+        window = self._windows.get(session_id)
+        if window is None:
+            window = self._windows[session_id] = _SessionWindow(self._max_window)
+        return window
+
+    def _inflight_count(self, session_id: str | None) -> int:
+        return sum(1 for entry in self._inflight.values() if entry.session_id in (session_id, None))
+
+    def _expire_local_inflight(self, session_id: str | None) -> None:
+        now = time.monotonic()
+        for inflight_key, entry in list(self._inflight.items()):
+            elapsed = now - entry.since
+            if elapsed < self._inflight_timeout_s:
+                continue
+            logger.warning(
+                "TwinDelivery: inflight timeout for %s:%s after %.1fs, dropping",
+                entry.table,
+                entry.key,
+                elapsed,
+            )
+            setting = self._twin_queue.get(entry.table, entry.key)
+            if setting is not None:
+                self._record_audit_step(
+                    setting,
+                    entry.device_id,
+                    SettingStep.TIMEOUT,
+                    session_id=session_id or entry.session_id or "",
+                )
+            self._twin_queue.acknowledge(entry.table, entry.key)
+            del self._inflight[inflight_key]
 
     async def deliver_pending(
-        self, 
+        self,
         device_id: str,
         session_id: str | None = None,
+        limit: int = 1,
     ) -> list[TwinSetting]:
         """Deliver pending settings for device.
-        
+
         Args:
             device_id: Device ID
             session_id: Unique session identifier for tracking (defaults to conn_id)
-            
+            limit: Max settings to hand out in this call (a poll passes
+                ``window_for(session_id)``)
+
         Returns:
-            List of settings to deliver (max 1 per session)
+            List of settings to deliver, bounded by the free window of the session
         """
-        # Check global inflight timeout
-        if self._inflight_key is not None and self._inflight_since is not None:
-            elapsed = time.monotonic() - self._inflight_since
-            if elapsed >= self._inflight_timeout_s:
-                logger.warning(
-                    "TwinDelivery: inflight timeout for %s:%s after %.1fs, dropping",
-                    self._inflight_key[0],
-                    self._inflight_key[1],
-                    elapsed,
-                )
-                setting = self._twin_queue.get(self._inflight_key[0], self._inflight_key[1])
-                if setting is not None and self._inflight_device_id is not None:
-                    self._record_audit_step(
-                        setting,
-                        self._inflight_device_id,
-                        SettingStep.TIMEOUT,
-                        session_id=session_id or "",
-                    )
-                self._twin_queue.acknowledge(self._inflight_key[0], self._inflight_key[1])
-                self._clear_global_inflight()
-
-        # Session-level check
-        if session_id is not None:
-            session_inflight = self._session_inflight.get(session_id)
-            if session_inflight is not None:
-                table, key, since = session_inflight
-                elapsed = time.monotonic() - since
-                if elapsed >= self._inflight_timeout_s:
-                    logger.warning(
-                        "TwinDelivery: session %s inflight timeout for %s:%s after %.1fs",
-                        session_id,
-                        table,
-                        key,
-                        elapsed,
-                    )
-                    setting = self._twin_queue.get(table, key)
-                    if setting is not None and self._inflight_device_id is not None:
-                        self._record_audit_step(
-                            setting,
-                            self._inflight_device_id,
-                            SettingStep.TIMEOUT,
-                            session_id=session_id,
-                        )
-                    del self._session_inflight[session_id]
-                else:
-                    logger.debug(
-                        "TwinDelivery: session %s has inflight %s:%s, skipping",
-                        session_id,
-                        table,
-                        key,
-                    )
-                    return []
+        self._expire_local_inflight(session_id)
 
-        # Global inflight check (backward compatibility)
-        if self._inflight_key is not None:
+        window = self._session_window(session_id)
+        inflight = self._inflight_count(session_id)
+        free = min(limit, window.size - inflight)
+        if free <= 0:
             logger.debug(
-                "TwinDelivery: global inflight %s:%s, skipping",
-                self._inflight_key[0],
-                self._inflight_key[1],
+                "TwinDelivery: window full (%d/%d inflight, session=%s), skipping",
+                inflight,
+                window.size,
+                session_id or "global",
             )
             return []
 
-        # Get pending settings
-        pending = self._twin_queue.get_pending()
-        if not pending:
-            return []
-
-        # Take first setting
-        setting = pending[0]
-
-        # Mark as inflight (both session and global)
+        selected: list[TwinSetting] = []
         now = time.monotonic()
-        self._inflight_key = (setting.table, setting.key)
-        self._inflight_device_id = device_id
-        self._inflight_since = now
-
-        if session_id is not None:
-            self._session_inflight[session_id] = (setting.table, setting.key, now)
-
-        self._record_audit_step(
-            setting,
-            device_id,
-            SettingStep.DELIVER_SELECTED,
-            session_id=session_id or "",
-        )
-
-        logger.info(
-            "TwinDelivery: delivering %s:%s=%s (device=%s, session=%s)",
-            setting.table,
-            setting.key,
-            setting.value,
-            device_id,
-            session_id or "global",
-        )
-
-        return [setting]
+        for setting in self._twin_queue.iter_pending():
+            inflight_key = (setting.table, setting.key)
+            if inflight_key in self._inflight:
+                continue
+            self._inflight[inflight_key] = _LocalInflight(
+                table=setting.table,
+                key=setting.key,
+                device_id=device_id,
+                session_id=session_id,
+                since=now,
+            )
+            self._record_audit_step(
+                setting,
+                device_id,
+                SettingStep.DELIVER_SELECTED,
+                session_id=session_id or "",
+            )
+            logger.info(
+                "TwinDelivery: delivering %s:%s=%s (device=%s, session=%s, inflight=%d/%d)",
+                setting.table,
+                setting.key,
+                setting.value,
+                device_id,
+                session_id or "global",
+                inflight + len(selected) + 1,
+                window.size,
+            )
+            selected.append(setting)
+            if len(selected) >= free:
+                break
+        return selected
 
     def acknowledge(self, table: str, key: str, session_id: str | None = None) -> bool:
         """Acknowledge setting delivery.
-        
+
         Args:
             table: Table name
             key: Setting key
-            session_id: Session ID (optional)
-            
+            session_id: Session ID (optional, kept for logging)
+
         Returns:
             True if setting was inflight and acknowledged
         """
-        # Check session-level inflight
-        if session_id is not None:
-            session_inflight = self._session_inflight.get(session_id)
-            if session_inflight is not None:
-                s_table, s_key, _ = session_inflight
-                if (s_table, s_key) == (table, key):
-                    del self._session_inflight[session_id]
-                    logger.info(
-                        "TwinDelivery: session %s acknowledged %s:%s",
-                        session_id,
-                        table,
-                        key,
-                    )
-        
-        # Check global inflight
-        if self._inflight_key == (table, key):
-            self._clear_global_inflight()
+        entry = self._inflight.pop((table, key), None)
+        if entry is not None:
+            self._note_box_result(entry)
             removed = self._twin_queue.acknowledge(table, key)
             if removed:
-                logger.info("TwinDelivery: acknowledged %s:%s", table, key)
+                logger.info(
+                    "TwinDelivery: acknowledged %s:%s (session=%s)",
+                    table,
+                    key,
+                    session_id or entry.session_id or "global",
+                )
             return True
-        
+
         # Try queue acknowledge anyway
         removed = self._twin_queue.acknowledge(table, key)
         if removed:
             return True
 
-        for pending in list(self._iter_cloud_pending()):
+        for pending in self._cloud_order.values():
             if (pending.setting.table, pending.setting.key) == (table, key):
                 self._remove_cloud_pending(pending)
                 return True
 
         return False
 
-    def _clear_global_inflight(self) -> None:
-        self._inflight_key = None
-        self._inflight_device_id = None
-        self._inflight_since = None
+    def _note_box_result(self, entry: _LocalInflight) -> None:
+        window = self._windows.get(entry.session_id)
+        if entry.nacked or window is None or window.size >= self._max_window:
+            return
+        window.clean_acks += 1
+        if window.clean_acks >= self._max_window:
+            window.size = self._max_window
+            window.clean_acks = 0
+            logger.info(
+                "TwinDelivery: delivery window restored to %d (session=%s)",
+                window.size,
+                entry.session_id or "global",
+            )
 
     def clear_session(self, session_id: str) -> None:
-        if session_id in self._session_inflight:
-            table, key, _ = self._session_inflight[session_id]
-            setting = self._twin_queue.get(table, key)
-            if setting is not None and self._inflight_device_id is not None:
+        """Detach inflight settings from a closed session.
+
+        They keep occupying the window of every session until acknowledged
+        (tbl_events may still arrive on the next connection) or until they
+        time out.
+        """
+        self._windows.pop(session_id, None)
+        for entry in self._inflight.values():
+            if entry.session_id != session_id:
+                continue
+            setting = self._twin_queue.get(entry.table, entry.key)
+            if setting is not None:
                 self._record_audit_step(
                     setting,
-                    self._inflight_device_id,
+                    entry.device_id,
                     SettingStep.SESSION_CLEARED,
                     session_id=session_id,
                 )
-            del self._session_inflight[session_id]
+            entry.session_id = None
 
     def record_injected_box(
         self,
         setting: TwinSetting,
         device_id: str,
         session_id: str = "",
+        *,
+        id_set: int = 0,
+        msg_id: int = 0,
     ) -> None:
+        entry = self._inflight.get((setting.table, setting.key))
+        if entry is not None:
+            entry.id_set = id_set
+            entry.msg_id = msg_id
         self._record_audit_step(
             setting,
             device_id,
@@ -435,6 +510,21 @@ class TwinDelivery:
         device_id: str,
         session_id: str = "",
     ) -> None:
+        entry = self._inflight.get((setting.table, setting.key))
+        if entry is not None:
+            entry.nacked = True
+            window = self._windows.get(entry.session_id)
+            if window is not None:
+                window.clean_acks = 0
+                if window.size > 1:
+                    window.size = 1
+                    self.nack_fallbacks += 1
+                    logger.warning(
+                        "TwinDelivery: BOX NACK for %s:%s, delivery window reduced to 1 (session=%s)",
+                        setting.table,
+                        setting.key,
+                        entry.session_id or "global",
+                    )
         self._record_audit_step(
             setting,
             device_id,
@@ -443,17 +533,18 @@ class TwinDelivery:
         )
 
     def shutdown(self) -> None:
-        if self._inflight_key is not None and self._inflight_device_id is not None:
-            setting = self._twin_queue.get(self._inflight_key[0], self._inflight_key[1])
+        for entry in self._inflight.values():
+            setting = self._twin_queue.get(entry.table, entry.key)
             if setting is not None:
                 self._record_audit_step(
                     setting,
-                    self._inflight_device_id,
+                    entry.device_id,
                     SettingStep.SESSION_CLEARED,
                 )
-            self._clear_global_inflight()
+        self._inflight.clear()
+        self._windows.clear()
 
-        for pending in list(self._iter_cloud_pending()):
+        for pending in list(self._cloud_order.values()):
             self._record_audit_step(
                 pending.setting,
                 pending.device_id,
@@ -461,34 +552,72 @@ class TwinDelivery:
             )
             self._remove_cloud_pending(pending)
 
+    def _match_local_inflight(self, id_set: int | None, msg_id: int | None) -> _LocalInflight | None:
+        if not self._inflight:
+            return None
+        if id_set:
+            for entry in self._inflight.values():
+                if entry.id_set == id_set:
+                    return entry
+        elif msg_id:
+            for entry in self._inflight.values():
+                if entry.msg_id == msg_id:
+                    return entry
+        # BOX zpracovává Settingy v pořadí doručení.
+        return next(iter(self._inflight.values()))
+
     def inflight(self) -> tuple[str, str] | None:
         """Get current global inflight setting."""
         self._expire_cloud_pending()
         pending = self._oldest_cloud_pending()
         if pending is not None:
             return pending.setting.table, pending.setting.key
-        return self._inflight_key
+        if not self._inflight:
+            return None
+        return next(iter(self._inflight))
+
+    def inflight_setting(
+        self,
+        *,
+        id_set: int | None = None,
+        msg_id: int | None = None,
+    ) -> tuple[TwinSetting, str] | None:
+        """Return current inflight setting together with target device_id.
 
-    def inflight_setting(self) -> tuple[TwinSetting, str] | None:
-        """Return current inflight setting together with target device_id."""
+        ``id_set``/``msg_id`` taken from a box ACK select the matching local
+        setting; without a match the oldest one is returned.
+        """
         self._expire_cloud_pending()
         pending = self._oldest_cloud_pending()
         if pending is not None:
             return pending.setting, pending.device_id
-        if self._inflight_key is None or self._inflight_device_id is None:
+        entry = self._match_local_inflight(id_set, msg_id)
+        if entry is None:
+            return None
+        setting = self._twin_queue.get(entry.table, entry.key)
+        if setting is None:
             return None
-        setting = self._twin_queue.get(self._inflight_key[0], self._inflight_key[1])
+        return setting, entry.device_id
+
+    def find_inflight(self, table: str, key: str) -> tuple[TwinSetting, str] | None:
+        """Return the local inflight setting for ``table``/``key``, if any."""
+        entry = self._inflight.get((table, key))
+        if entry is None:
+            return None
+        setting = self._twin_queue.get(table, key)
         if setting is None:
             return None
-        return setting, self._inflight_device_id
+        return setting, entry.device_id
 
-    def has_pending_or_inflight(self, session_id: str | None = None) -> bool:
-        """Check if there are pending or inflight settings."""
+    def has_pending_or_inflight(self, session_id: str | None = None) -> bool:  # pylint: disable=unused-argument
+        """Check if there are pending or inflight settings (any session counts)."""
         self._expire_cloud_pending()
-        if session_id is not None:
-            if session_id in self._session_inflight:
-                return True
-        return self._cloud_legacy_inflight or bool(self._iter_cloud_pending()) or self._inflight_key is not None or self._twin_queue.size() > 0
+        return (
+            self._cloud_legacy_inflight
+            or bool(self._cloud_order)
+            or bool(self._inflight)
+            or self._twin_queue.size() > 0
+        )
 
     def begin_cloud_setting(
         self,
@@ -516,8 +645,7 @@ class TwinDelivery:
             msg_id=msg_id,
             id_set=id_set,
         )
-        if self._telemetry_collector is not None:
-            self._telemetry_collector.record_setting_audit_step(incoming_record)
+        self._record_audit(incoming_record)
 
         setting = TwinSetting(
             table=table,
@@ -530,8 +658,7 @@ class TwinDelivery:
             id_set=id_set,
             confirm=confirm,
         )
-        queue_key = self._cloud_pending_key(device_id, table, key)
-        self._cloud_pending[queue_key].append(
+        self._track_cloud_pending(
             _CloudPendingSetting(
                 setting=setting,
                 device_id=device_id,
@@ -558,6 +685,7 @@ class TwinDelivery:
             )
             pending.reason_setting_seen = True
             pending.reason_setting_at = time.monotonic()
+            heapq.heappush(self._cloud_expiry, (self._cloud_deadline(pending), pending.seq))
         return pending.setting, pending.device_id
 
     def match_cloud_tbl_events(
@@ -606,7 +734,12 @@ class TwinDelivery:
     def is_cloud_inflight(self) -> bool:
         """Check if cloud-initiated setting is in-flight."""
         self._expire_cloud_pending()
-        return self._cloud_legacy_inflight or bool(self._iter_cloud_pending())
+        return self._cloud_legacy_inflight or bool(self._cloud_order)
+
+    def has_cloud_pending(self, table: str, key: str) -> bool:
+        """True while a cloud-originated ``table:key`` setting awaits confirmation."""
+        self._expire_cloud_pending()
+        return any(entry[1:] == (table, key) for entry in self._cloud_pending)
 
     def has_pending(self) -> bool:
         """Check if there are pending local settings."""
@@ -9,16 +9,19 @@ import json
 import logging
 from typing import TYPE_CHECKING, Any, Callable
 
-from settings_constraints import is_setting_allowed, validate_setting_value
+from settings_constraints import is_setting_allowed, parse_numeric, validate_setting_value
 from telemetry.settings_audit import (
     SettingResult,
     SettingStep,
     SettingsAuditRecord,
     make_incoming_record,
     make_step_record,
+    new_batch_id,
+    record_to_dict,
 )
 
 if TYPE_CHECKING:
+    from telemetry.audit_store import SettingsAuditStore
     from telemetry.collector import TelemetryCollector
 
     from .state import TwinQueue
@@ -33,6 +36,9 @@ class TwinControlHandler:
     Subscribes to `oig/{device_id}/control/set` and enqueues
     settings for later delivery to the device.
 
+    A JSON array of settings on `oig/{device_id}/control/set_batch` is
+    validated as a whole and enqueued under one batch ID.
+
     Example:
         >>> handler = TwinControlHandler(mqtt_client, twin_queue, "device_123")
         >>> await handler.start()
@@ -40,6 +46,8 @@ class TwinControlHandler:
         >>> await handler.stop()
     """
 
+    BATCH_MAX_SETTINGS = 64
+
     def __init__(
         self,
         mqtt: Any,
@@ -48,6 +56,9 @@ class TwinControlHandler:
         namespace: str = "oig_local",
         proxy_control_handler: Callable[[str, str, Any], bool] | None = None,
         telemetry_collector: TelemetryCollector | None = None,
+        get_reported_value: Callable[[str, str], Any] | None = None,
+        is_cloud_pending: Callable[[str, str], bool] | None = None,
+        audit_store: SettingsAuditStore | None = None,
     ) -> None:
         """Initialize the control handler.
 
@@ -55,21 +66,33 @@ class TwinControlHandler:
             mqtt: The MQTT client instance
             twin_queue: The twin queue for storing pending settings
             device_id: The device ID for topic subscription
+            get_reported_value: Returns the BOX's last reported value for
+                ``(table, key)``; settings equal to it are not enqueued
+                unless forced.
+            is_cloud_pending: True while a cloud setting of ``(table, key)``
+                is in flight; the reported value is then not trusted.
+            audit_store: Local settings-audit store; written even when
+                telemetry is disabled.
         """
         self._mqtt = mqtt
         self._twin_queue = twin_queue
         self._device_id = device_id
         self._namespace = namespace
         self._topic: str = "oig/+/control/set"
+        self._topic_batch: str = "oig/+/control/set_batch"
         self._topic_compat: str = f"{self._namespace}/+/set/#"
         self._subscribed = False
         self._proxy_control_handler = proxy_control_handler
         self._telemetry_collector = telemetry_collector
+        self._get_reported_value = get_reported_value
+        self._is_cloud_pending = is_cloud_pending
+        self._audit_store = audit_store
 
     def _record_setting_audit(self, record: SettingsAuditRecord) -> None:
-        if self._telemetry_collector is None:
-            return
-        self._telemetry_collector.record_setting_audit_step(record)
+        if self._telemetry_collector is not None:
+            self._telemetry_collector.record_setting_audit_step(record)
+        if self._audit_store is not None:
+            self._audit_store.put(record_to_dict(record))
 
     def _make_pending_setting_record(self, setting: TwinSetting) -> SettingsAuditRecord:
         record = make_incoming_record(
@@ -82,8 +105,187 @@ class TwinControlHandler:
             id_set=setting.id_set,
         )
         record.audit_id = setting.audit_id
+        record.batch_id = setting.batch_id
         return record
 
+    def _already_applied(self, table: str, key: str, value: Any) -> bool:
+        """True if the BOX already reports ``value`` and nothing else is queued or in flight."""
+        if self._get_reported_value is None or self._twin_queue.get(table, key) is not None:
+            return False
+        if self._is_cloud_pending is not None and self._is_cloud_pending(table, key):
+            return False
+        reported = parse_numeric(self._get_reported_value(table, key))
+        return reported is not None and reported == float(value)
+
+    def _skip_if_applied(self, incoming_record: SettingsAuditRecord, normalized: Any, force: bool) -> bool:
+        table = incoming_record.table
+        key = incoming_record.key
+        if force or not self._already_applied(table, key, normalized):
+            return False
+        self._record_setting_audit(make_step_record(incoming_record, SettingStep.NOOP_ALREADY_APPLIED))
+        logger.info("Twin setting skipped: %s:%s=%s already reported by BOX", table, key, normalized)
+        return True
+
+    def _apply_proxy_control(self, incoming_record: SettingsAuditRecord, normalized: Any) -> bool:
+        table = incoming_record.table
+        key = incoming_record.key
+        if table != "proxy_control" or self._proxy_control_handler is None:
+            return False
+        if not self._proxy_control_handler(table, key, normalized):
+            return False
+        self._record_setting_audit(make_step_record(incoming_record, SettingStep.APPLIED_LOCALLY))
+        logger.info("Proxy control applied: %s:%s=%s", table, key, normalized)
+        return True
+
+    def _supersede_pending(self, table: str, key: str) -> None:
+        pending_setting = self._twin_queue.get(table, key)
+        if pending_setting is not None and pending_setting.audit_id:
+            self._record_setting_audit(
+                make_step_record(
+                    self._make_pending_setting_record(pending_setting),
+                    SettingStep.SUPERSEDED,
+                    SettingResult.SUPERSEDED,
+                )
+            )
+
+    def _record_enqueued(self, incoming_record: SettingsAuditRecord, setting: TwinSetting | None) -> None:
+        self._record_setting_audit(
+            make_step_record(
+                incoming_record,
+                SettingStep.ENQUEUED,
+                msg_id=setting.msg_id if setting is not None else None,
+                id_set=setting.id_set if setting is not None else None,
+            )
+        )
+
+    def _enqueue_setting(self, incoming_record: SettingsAuditRecord, normalized: Any, *, force: bool = False) -> None:
+        """Enqueue a validated setting, or short-circuit a no-op one."""
+        table = incoming_record.table
+        key = incoming_record.key
+        if self._skip_if_applied(incoming_record, normalized, force):
+            return
+        self._supersede_pending(table, key)
+        self._twin_queue.enqueue(
+            table,
+            key,
+            normalized,
+            audit_id=incoming_record.audit_id,
+            raw_text=incoming_record.raw_text,
+        )
+        self._record_enqueued(incoming_record, self._twin_queue.get(table, key))
+        logger.info("Twin setting enqueued: %s:%s=%s", table, key, normalized)
+
+    def _validate_batch_item(
+        self, record: SettingsAuditRecord, value: Any
+    ) -> tuple[Any, SettingStep | None, str]:
+        if not is_setting_allowed(record.table, record.key):
+            return None, SettingStep.REJECTED_NOT_ALLOWED, "not allowed"
+        ok, normalized, reason = validate_setting_value(record.table, record.key, value)
+        if not ok:
+            return None, SettingStep.REJECTED_VALIDATION, reason
+        return normalized, None, ""
+
+    def _on_batch_message(self, topic: str, raw_payload: str) -> None:
+        """Validate a JSON array of settings and enqueue all of them or none.
+
+        Settings share a ``batch_id``; a repeated ``(table, key)`` keeps its
+        last value. Delivery order is planned by table (tables in order of
+        first appearance) so settings of one table go out together.
+        """
+        items = json.loads(raw_payload)
+        if not isinstance(items, list) or not items:
+            logger.warning("TwinControlHandler: Invalid batch on %s: expected non-empty JSON array", topic)
+            return
+        if len(items) > self.BATCH_MAX_SETTINGS:
+            logger.warning(
+                "TwinControlHandler: Batch on %s rejected: %d settings (max %d)",
+                topic,
+                len(items),
+                self.BATCH_MAX_SETTINGS,
+            )
+            return
+        for item in items:
+            if (
+                not isinstance(item, dict)
+                or not isinstance(item.get("table"), str)
+                or not isinstance(item.get("key"), str)
+                or item.get("value") is None
+            ):
+                logger.warning("TwinControlHandler: Invalid batch on %s: missing table/key/value", topic)
+                return
+
+        batch_id = new_batch_id()
+        entries: list[tuple[SettingsAuditRecord, dict[str, Any]]] = []
+        for item in items:
+            record = make_incoming_record(
+                device_id=self._device_id,
+                table=item["table"],
+                key=item["key"],
+                raw_text=json.dumps(item, separators=(",", ":")),
+                value=item["value"],
+                batch_id=batch_id,
+            )
+            self._record_setting_audit(record)
+            entries.append((record, item))
+
+        validated: list[tuple[SettingsAuditRecord, Any, SettingStep | None, str]] = [
+            (record, *self._validate_batch_item(record, item["value"])) for record, item in entries
+        ]
+        errors = [(record, reason) for record, _normalized, step, reason in validated if step is not None]
+        if errors:
+            for record, _normalized, step, _reason in validated:
+                self._record_setting_audit(
+                    make_step_record(record, step or SettingStep.REJECTED_VALIDATION, SettingResult.REJECTED)
+                )
+            logger.warning(
+                "Twin batch %s rejected: %s",
+                batch_id,
+                ", ".join(f"{record.table}:{record.key} ({reason})" for record, reason in errors),
+            )
+            return
+
+        # Plán: poslední hodnota klíče vyhrává, klíče jedné tabulky jdou za sebou.
+        planned: dict[tuple[str, str], tuple[SettingsAuditRecord, Any, bool]] = {}
+        for (record, normalized, _step, _reason), (_record, item) in zip(validated, entries):
+            previous = planned.pop((record.table, record.key), None)
+            if previous is not None:
+                self._record_setting_audit(make_step_record(previous[0], SettingStep.SUPERSEDED))
+            planned[(record.table, record.key)] = (record, normalized, item.get("force") is True)
+        table_rank: dict[str, int] = {}
+        for record, _item in entries:
+            table_rank.setdefault(record.table, len(table_rank))
+        ordered = sorted(planned.values(), key=lambda entry: table_rank[entry[0].table])
+
+        to_enqueue: list[tuple[SettingsAuditRecord, Any]] = []
+        for record, normalized, force in ordered:
+            if self._apply_proxy_control(record, normalized):
+                continue
+            if self._skip_if_applied(record, normalized, force):
+                continue
+            self._supersede_pending(record.table, record.key)
+            to_enqueue.append((record, normalized))
+
+        settings = self._twin_queue.enqueue_many(
+            {
+                "table": record.table,
+                "key": record.key,
+                "value": normalized,
+                "audit_id": record.audit_id,
+                "raw_text": record.raw_text,
+                "batch_id": batch_id,
+            }
+            for record, normalized in to_enqueue
+        )
+        for (record, _normalized), setting in zip(to_enqueue, settings):
+            self._record_enqueued(record, setting)
+        logger.info(
+            "Twin batch %s enqueued: %d settings in %d tables (%d skipped)",
+            batch_id,
+            len(settings),
+            len(table_rank),
+            len(items) - len(settings),
+        )
+
     async def start(self) -> None:
         """Start the handler by subscribing to the control topic.
 
@@ -97,11 +299,13 @@ class TwinControlHandler:
         # Subscribe to control topic
         self._mqtt.subscribe(self._topic, self._on_message)
         self._mqtt.subscribe(self._topic_compat, self._on_message)
+        self._mqtt.subscribe(self._topic_batch, self._on_message)
         self._subscribed = True
         logger.info(
-            "TwinControlHandler: Subscribed to %s and %s",
+            "TwinControlHandler: Subscribed to %s, %s and %s",
             self._topic,
             self._topic_compat,
+            self._topic_batch,
         )
 
     async def stop(self) -> None:
@@ -109,11 +313,13 @@ class TwinControlHandler:
         if self._subscribed and self._mqtt.is_ready():
             self._mqtt.unsubscribe(self._topic)
             self._mqtt.unsubscribe(self._topic_compat)
+            self._mqtt.unsubscribe(self._topic_batch)
             self._subscribed = False
             logger.info(
-                "TwinControlHandler: Unsubscribed from %s and %s",
+                "TwinControlHandler: Unsubscribed from %s, %s and %s",
                 self._topic,
                 self._topic_compat,
+                self._topic_batch,
             )
 
     def _on_message(self, topic: str, payload: bytes) -> None:
@@ -129,6 +335,10 @@ class TwinControlHandler:
             raw_payload = payload.decode("utf-8", errors="replace")
             logger.info("📥 Twin MQTT message: topic=%s payload=%s", topic, raw_payload)
 
+            if topic.endswith("/control/set_batch"):
+                self._on_batch_message(topic, raw_payload)
+                return
+
             if topic.startswith(f"{self._namespace}/") and "/set/" in topic:
                 path = topic.split("/")
                 if len(path) >= 5:
@@ -172,37 +382,10 @@ class TwinControlHandler:
                             reason,
                         )
                         return
-                    if table == "proxy_control" and self._proxy_control_handler is not None:
-                        handled = self._proxy_control_handler(table, key, normalized)
-                        if handled:
-                            logger.info("Proxy control applied: %s:%s=%s", table, key, normalized)
-                            return
-                    pending_setting = self._twin_queue.get(table, key)
-                    if pending_setting is not None and pending_setting.audit_id:
-                        self._record_setting_audit(
-                            make_step_record(
-                                self._make_pending_setting_record(pending_setting),
-                                SettingStep.SUPERSEDED,
-                                SettingResult.SUPERSEDED,
-                            )
-                        )
-                    self._twin_queue.enqueue(
-                        table,
-                        key,
-                        normalized,
-                        audit_id=incoming_record.audit_id,
-                        raw_text=incoming_record.raw_text,
-                    )
-                    enqueued_setting = self._twin_queue.get(table, key)
-                    self._record_setting_audit(
-                        make_step_record(
-                            incoming_record,
-                            SettingStep.ENQUEUED,
-                            msg_id=enqueued_setting.msg_id if enqueued_setting is not None else None,
-                            id_set=enqueued_setting.id_set if enqueued_setting is not None else None,
-                        )
-                    )
-                    logger.info("Twin setting enqueued: %s:%s=%s", table, key, normalized)
+                    if self._apply_proxy_control(incoming_record, normalized):
+                        return
+                    force = len(path) >= 6 and path[5] == "force"
+                    self._enqueue_setting(incoming_record, normalized, force=force)
                     return
 
             # Parse JSON payload
@@ -268,39 +451,11 @@ class TwinControlHandler:
                 )
                 return
 
-            if table == "proxy_control" and self._proxy_control_handler is not None:
-                handled = self._proxy_control_handler(table, key, normalized)
-                if handled:
-                    logger.info("Proxy control applied: %s:%s=%s", table, key, normalized)
-                    return
+            if self._apply_proxy_control(incoming_record, normalized):
+                return
 
             # Enqueue the setting
-            pending_setting = self._twin_queue.get(table, key)
-            if pending_setting is not None and pending_setting.audit_id:
-                self._record_setting_audit(
-                    make_step_record(
-                        self._make_pending_setting_record(pending_setting),
-                        SettingStep.SUPERSEDED,
-                        SettingResult.SUPERSEDED,
-                    )
-                )
-            self._twin_queue.enqueue(
-                table,
-                key,
-                normalized,
-                audit_id=incoming_record.audit_id,
-                raw_text=incoming_record.raw_text,
-            )
-            enqueued_setting = self._twin_queue.get(table, key)
-            self._record_setting_audit(
-                make_step_record(
-                    incoming_record,
-                    SettingStep.ENQUEUED,
-                    msg_id=enqueued_setting.msg_id if enqueued_setting is not None else None,
-                    id_set=enqueued_setting.id_set if enqueued_setting is not None else None,
-                )
-            )
-            logger.info("Twin setting enqueued: %s:%s=%s", table, key, normalized)
+            self._enqueue_setting(incoming_record, normalized, force=data.get("force") is True)
 
         except json.JSONDecodeError as exc:
             logger.warning(
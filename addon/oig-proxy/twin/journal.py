@@ -0,0 +1,246 @@
+"""Crash-safe persistence for TwinQueue.
+
+SQLite in WAL mode, one row per pending ``(table, key)``. Operations are
+handed to a daemon writer thread and committed in batches (same pattern as
+FrameCapture); consecutive operations on one key inside a batch collapse to
+the last one. Recovery reads only the live rows in write order (``rowid``:
+an upsert replaces the row, like TwinQueue moves a re-enqueued key to the
+end). A failed commit is retried together with the following operations;
+until it succeeds the journal reports ``degraded``.
+"""
+
+from __future__ import annotations
+
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import suppress
+from dataclasses import asdict
+from typing import Any
+
+import json_codec
+
+from .state import TwinSetting
+
+logger = logging.getLogger(__name__)
+
+# REPLACE = DELETE + INSERT, takže řádek dostane nový (nejvyšší) rowid.
+_UPSERT_SQL = "INSERT OR REPLACE INTO twin_queue (table_name, key, enqueued_at, setting) VALUES (?,?,?,?)"
+_DELETE_SQL = "DELETE FROM twin_queue WHERE table_name=? AND key=?"
+_CLEAR_SQL = "DELETE FROM twin_queue"
+_SELECT_SQL = "SELECT setting FROM twin_queue ORDER BY rowid"
+
+_CLEAR = ("__clear__", "")
+_RETRY = object()  # žádná nová operace – jen zopakovat neúspěšný commit
+
+# Operace: (table, key) -> TwinSetting (upsert) | None (delete)
+_Op = tuple[tuple[str, str], TwinSetting | None]
+
+
+class _Flush:
+    def __init__(self) -> None:
+        self.done = threading.Event()
+
+
+class TwinJournal:
+    """Background batched writer + startup loader for twin settings."""
+
+    BATCH_MAX = 200
+    BATCH_WINDOW_S = 0.05
+    RETRY_DELAY_S = 1.0
+
+    def __init__(self, db_path: str) -> None:
+        self.db_path = db_path
+        self._queue: queue.Queue[_Op | list[_Op] | _Flush | None] = queue.Queue()
+        self._thread: threading.Thread | None = None
+        self.batches = 0
+        self.ops_written = 0
+        self.write_errors = 0
+        self.degraded = False  # neuložené operace čekají na opakovaný commit
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    def load(self) -> list[TwinSetting]:
+        """Create the schema and return persisted settings (oldest first)."""
+        started = time.monotonic()
+        settings: list[TwinSetting] = []
+        try:
+            conn = sqlite3.connect(self.db_path)
+            _configure_pragmas(conn)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS twin_queue (
+                    table_name  TEXT NOT NULL,
+                    key         TEXT NOT NULL,
+                    enqueued_at REAL NOT NULL,
+                    setting     TEXT NOT NULL,
+                    PRIMARY KEY (table_name, key)
+                )
+            """)
+            conn.commit()
+            for (raw,) in conn.execute(_SELECT_SQL):
+                setting = _decode(raw)
+                if setting is not None:
+                    settings.append(setting)
+            conn.close()
+        except (sqlite3.Error, OSError) as exc:
+            logger.warning("TwinJournal: cannot load %s: %s", self.db_path, exc)
+            return []
+        logger.info(
+            "TwinJournal: recovered %d pending settings in %.1f ms",
+            len(settings),
+            (time.monotonic() - started) * 1000.0,
+        )
+        return settings
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._writer_loop, daemon=True, name="twin-journal")
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout=timeout)
+        self._thread = None
+
+    # ------------------------------------------------------------------
+    # Operations (called from the event loop, never block)
+    # ------------------------------------------------------------------
+
+    def put(self, setting: TwinSetting) -> None:
+        self._queue.put(((setting.table, setting.key), setting))
+
+    def put_many(self, settings: list[TwinSetting]) -> None:
+        """Queue upserts that must land in the same commit."""
+        self._queue.put([((setting.table, setting.key), setting) for setting in settings])
+
+    def delete(self, table: str, key: str) -> None:
+        self._queue.put(((table, key), None))
+
+    def clear(self) -> None:
+        self._queue.put((_CLEAR, None))
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Block until everything queued so far is committed."""
+        if self._thread is None:
+            return False
+        marker = _Flush()
+        self._queue.put(marker)
+        return marker.done.wait(timeout)
+
+    # ------------------------------------------------------------------
+    # Writer thread
+    # ------------------------------------------------------------------
+
+    def _writer_loop(self) -> None:
+        try:
+            conn = sqlite3.connect(self.db_path)
+            _configure_pragmas(conn)
+        except (sqlite3.Error, OSError) as exc:
+            logger.warning("TwinJournal writer cannot open DB: %s", exc)
+            return
+
+        # Po neúspěšném commitu zůstávají operace i flush markery v pending.
+        pending: dict[tuple[str, str], TwinSetting | None] = {}
+        markers: list[_Flush] = []
+        while True:
+            item: Any
+            try:
+                item = self._queue.get(timeout=self.RETRY_DELAY_S if self.degraded else None)
+            except queue.Empty:
+                item = _RETRY
+            stop = False
+            deadline = time.monotonic() + self.BATCH_WINDOW_S
+            count = 0
+            while True:
+                if item is None:
+                    stop = True
+                elif isinstance(item, _Flush):
+                    markers.append(item)
+                elif item is not _RETRY:
+                    # Skupina z put_many() se vždy vejde do jednoho commitu.
+                    for op_key, setting in item if isinstance(item, list) else (item,):
+                        if op_key == _CLEAR:
+                            pending = {_CLEAR: None}
+                        else:
+                            pending.pop(op_key, None)  # poslední operace na klíči vyhrává
+                            pending[op_key] = setting
+                        count += 1
+                if stop or markers or item is _RETRY or count >= self.BATCH_MAX:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+            if self._commit(conn, pending):
+                pending = {}
+                for marker in markers:
+                    marker.done.set()
+                markers = []
+            if stop:
+                if pending:
+                    logger.error("TwinJournal: %d operations not persisted on shutdown", len(pending))
+                break
+
+        with suppress(sqlite3.Error, OSError):
+            conn.close()
+
+    def _commit(self, conn: sqlite3.Connection, pending: dict[tuple[str, str], TwinSetting | None]) -> bool:
+        if not pending:
+            return True
+        try:
+            upserts = []
+            deletes = []
+            for op_key, setting in pending.items():
+                if op_key == _CLEAR:
+                    conn.execute(_CLEAR_SQL)
+                elif setting is None:
+                    deletes.append(op_key)
+                else:
+                    upserts.append((setting.table, setting.key, setting.enqueued_at, _encode(setting)))
+            if deletes:
+                conn.executemany(_DELETE_SQL, deletes)
+            if upserts:
+                conn.executemany(_UPSERT_SQL, upserts)
+            conn.commit()
+            self.batches += 1
+            self.ops_written += len(pending)
+        except Exception as exc:  # noqa: BLE001
+            self.write_errors += 1
+            if not self.degraded:
+                logger.error("TwinJournal batch write failed, retrying every %.0fs: %s", self.RETRY_DELAY_S, exc)
+            self.degraded = True
+            with suppress(Exception):
+                conn.rollback()
+            return False
+        if self.degraded:
+            logger.info("TwinJournal: write recovered, pending operations persisted")
+            self.degraded = False
+        return True
+
+
+def _configure_pragmas(conn: sqlite3.Connection) -> None:
+    with suppress(sqlite3.Error):
+        conn.execute("PRAGMA journal_mode=WAL")
+        # FULL: commit přežije i výpadek napájení, zápisů je málo.
+        conn.execute("PRAGMA synchronous=FULL")
+        conn.execute("PRAGMA busy_timeout=2000")
+
+
+def _encode(setting: TwinSetting) -> str:
+    return json_codec.dumps(asdict(setting))
+
+
+def _decode(raw: str) -> TwinSetting | None:
+    try:
+        data: dict[str, Any] = json_codec.loads(raw)
+        return TwinSetting(**data)
+    except (TypeError, ValueError) as exc:
+        logger.warning("TwinJournal: skipping unreadable entry: %s", exc)
+        return None
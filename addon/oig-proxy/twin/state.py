@@ -1,9 +1,14 @@
 from __future__ import annotations
 
+import bisect
 import secrets
 import time
+from collections import OrderedDict
 from dataclasses import dataclass
-from typing import Any
+from typing import TYPE_CHECKING, Any, Iterable, Iterator, Mapping
+
+if TYPE_CHECKING:
+    from .journal import TwinJournal
 
 
 @dataclass
@@ -17,12 +22,64 @@ class TwinSetting:
     msg_id: int = 0
     id_set: int = 0
     confirm: str = "New"
+    batch_id: str = ""
+
+
+DEFAULT_PRIORITY = 1_000
 
 
 class TwinQueue:
-    def __init__(self) -> None:
-        self._queue: dict[tuple[str, str], TwinSetting] = {}
+    """Pending settings, one per ``(table, key)``, in delivery order.
+
+    Each priority class is an insertion-ordered dict; re-enqueuing a key
+    supersedes the old value and moves it to the tail of its class. Classes
+    are served in ascending order. ``priorities`` maps a setting key (or
+    ``"table:key"``) to its class; unlisted keys share ``DEFAULT_PRIORITY``.
+    """
+
+    def __init__(
+        self,
+        journal: TwinJournal | None = None,
+        priorities: Mapping[str, int] | None = None,
+    ) -> None:
+        self._priorities = dict(priorities or {})
+        self._classes: dict[int, OrderedDict[tuple[str, str], TwinSetting]] = {}
+        self._class_order: list[int] = []
+        self._index: dict[tuple[str, str], int] = {}
         self._next_id_set = int(time.time())
+        self._journal = journal
+        if journal is not None:
+            for setting in journal.load():
+                self._insert(setting)
+                self._next_id_set = max(self._next_id_set, setting.id_set + 1)
+            journal.start()
+
+    @staticmethod
+    def parse_priorities(spec: str) -> dict[str, int]:
+        """``"RQRESET,MODE"`` -> ``{"RQRESET": 0, "MODE": 1}`` (earlier = sooner)."""
+        names = [name.strip() for name in spec.split(",")]
+        return {name: rank for rank, name in enumerate(n for n in names if n)}
+
+    def _priority_of(self, table: str, key: str) -> int:
+        if not self._priorities:
+            return DEFAULT_PRIORITY
+        priority = self._priorities.get(f"{table}:{key}")
+        if priority is None:
+            priority = self._priorities.get(key, DEFAULT_PRIORITY)
+        return priority
+
+    def _insert(self, setting: TwinSetting) -> None:
+        key_tuple = (setting.table, setting.key)
+        old_priority = self._index.get(key_tuple)
+        if old_priority is not None:
+            del self._classes[old_priority][key_tuple]
+        priority = self._priority_of(setting.table, setting.key)
+        bucket = self._classes.get(priority)
+        if bucket is None:
+            bucket = self._classes[priority] = OrderedDict()
+            bisect.insort(self._class_order, priority)
+        bucket[key_tuple] = setting
+        self._index[key_tuple] = priority
 
     def _generate_msg_id(self) -> int:
         return secrets.randbelow(1_000_000) + 14_000_000
@@ -38,7 +95,7 @@ class TwinQueue:
         now_epoch = int(time.time() * 1000)
         return f"aud_{now_epoch:014d}_{secrets.randbelow(1_000_000):06d}"
 
-    def enqueue(
+    def _new_setting(
         self,
         table: str,
         key: str,
@@ -46,37 +103,95 @@ class TwinQueue:
         confirm: str = "New",
         audit_id: str = "",
         raw_text: str = "",
-    ) -> None:
-        if not audit_id:
-            audit_id = self._generate_audit_id()
-        setting = TwinSetting(
+        batch_id: str = "",
+    ) -> TwinSetting:
+        return TwinSetting(
             table=table,
             key=key,
             value=value,
             enqueued_at=time.time(),
             raw_text=raw_text,
-            audit_id=audit_id,
+            audit_id=audit_id or self._generate_audit_id(),
             msg_id=self._generate_msg_id(),
             id_set=self._generate_id_set(),
             confirm=confirm,
+            batch_id=batch_id,
         )
-        self._queue[(table, key)] = setting
+
+    def enqueue(
+        self,
+        table: str,
+        key: str,
+        value: Any,
+        confirm: str = "New",
+        audit_id: str = "",
+        raw_text: str = "",
+    ) -> None:
+        setting = self._new_setting(table, key, value, confirm, audit_id, raw_text)
+        self._insert(setting)
+        if self._journal is not None:
+            self._journal.put(setting)
+
+    def enqueue_many(self, items: Iterable[Mapping[str, Any]]) -> list[TwinSetting]:
+        """Enqueue several settings at once, in the given order.
+
+        Each item holds ``enqueue()`` keyword arguments. With a journal the
+        whole group is committed in a single transaction.
+        """
+        settings = [self._new_setting(**item) for item in items]
+        for setting in settings:
+            self._insert(setting)
+        if self._journal is not None and settings:
+            self._journal.put_many(settings)
+        return settings
+
+    def iter_pending(self) -> Iterator[TwinSetting]:
+        """Iterate pending settings in delivery order without copying.
+
+        The queue must not be modified while the iterator is in use.
+        """
+        for priority in self._class_order:
+            yield from self._classes[priority].values()
 
     def get_pending(self) -> list[TwinSetting]:
-        return sorted(self._queue.values(), key=lambda s: s.enqueued_at)
+        return list(self.iter_pending())
+
+    def peek(self) -> TwinSetting | None:
+        """Return the next setting to deliver (O(1) per priority class)."""
+        for priority in self._class_order:
+            bucket = self._classes[priority]
+            if bucket:
+                return next(iter(bucket.values()))
+        return None
 
     def acknowledge(self, table: str, key: str) -> bool:
         key_tuple = (table, key)
-        if key_tuple in self._queue:
-            del self._queue[key_tuple]
-            return True
-        return False
+        priority = self._index.pop(key_tuple, None)
+        if priority is None:
+            return False
+        del self._classes[priority][key_tuple]
+        if self._journal is not None:
+            self._journal.delete(table, key)
+        return True
 
     def size(self) -> int:
-        return len(self._queue)
+        return len(self._index)
 
     def clear(self) -> None:
-        self._queue.clear()
+        self._classes.clear()
+        self._class_order.clear()
+        self._index.clear()
+        if self._journal is not None:
+            self._journal.clear()
+
+    def close(self) -> None:
+        """Flush and stop the journal writer (no-op without a journal)."""
+        if self._journal is not None:
+            self._journal.stop()
 
     def get(self, table: str, key: str) -> TwinSetting | None:
-        return self._queue.get((table, key))
+        key_tuple = (table, key)
+        priority = self._index.get(key_tuple)
+        if priority is None:
+            return None
+        return self._classes[priority][key_tuple]
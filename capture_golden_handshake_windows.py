@@ -35,8 +35,11 @@ def _find_mode_sequences(ssh_host: str, start_date: str) -> List[Dict[str, Any]]
     """
     # Find Setting frames (Reason=Setting) for today
     py = (
-        "import sqlite3, json;"
+        "import sqlite3, json, sys;"
+        "sys.path.insert(0, '/app');"
+        "from capture.frame_codec import register_functions;"
         "c=sqlite3.connect('/data/payloads.db');"
+        "register_functions(c);"
         "cur=c.cursor();"
         
         # Find Setting frames with their conn_id and timestamp
@@ -118,8 +121,11 @@ def _find_mode_sequences(ssh_host: str, start_date: str) -> List[Dict[str, Any]]
 def _fetch_full_sequence_frames(ssh_host: str, conn_id: int, setting_id: int, ack_id: int, end_id: int) -> List[Dict[str, Any]]:
     """Fetch all frames in a sequence for context."""
     py = (
-        "import sqlite3, json;"
+        "import sqlite3, json, sys;"
+        "sys.path.insert(0, '/app');"
+        "from capture.frame_codec import register_functions;"
         "c=sqlite3.connect('/data/payloads.db');"
+        "register_functions(c);"
         "cur=c.cursor();"
         
         # Get frames around the sequence for context
@@ -30,6 +30,7 @@ DEPLOY_FILES=(
     device_id.py
     settings_constraints.py
     logging_config.py
+    json_codec.py
     main.py
     run
     sensor_map.json
@@ -40,6 +41,10 @@ DEPLOY_FILES=(
     mqtt/__init__.py
     mqtt/client.py
     mqtt/status.py
+    mqtt/transport.py
+    mqtt/state_cache.py
+    mqtt/router.py
+    mqtt/discovery.py
     proxy/__init__.py
     proxy/server.py
     proxy/mode.py
@@ -54,8 +59,10 @@ DEPLOY_FILES=(
     sensor/loader.py
     sensor/warnings.py
     sensor/processor.py
+    sensor/watcher.py
     twin/__init__.py
     twin/state.py
+    twin/journal.py
     twin/handler.py
     twin/delivery.py
     twin/ack_parser.py
@@ -63,8 +70,13 @@ DEPLOY_FILES=(
     telemetry/collector.py
     telemetry/client.py
     telemetry/settings_audit.py
+    telemetry/audit_latency.py
+    telemetry/log_ring.py
+    telemetry/envelope.py
+    telemetry/audit_store.py
     capture/__init__.py
     capture/frame_capture.py
+    capture/frame_codec.py
     capture/pcap_capture.py
 )
 
@@ -4,15 +4,22 @@ Day-slice frame extractor for OIG protocol analysis.
 
 Extracts frame snapshots for a specific date from the payload capture DB.
 Supports date-range filtering and conn_id grouping metadata.
+Uses the capture indexes (ts_ms, table_name) via capture.frame_capture
+query helpers; DB snapshots without them fall back to the text ts column.
 """
 
 import argparse
 import json
+import os
 import sqlite3
 import sys
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
 
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "addon", "oig-proxy"))
+
+from capture.frame_capture import select_frames  # noqa: E402  # pylint: disable=wrong-import-position
+
 
 def parse_date(date_str: str) -> datetime:
     """
@@ -39,6 +46,7 @@ def parse_date(date_str: str) -> datetime:
 def extract_day_slice(
     db_path: str,
     date: datetime,
+    table_name: str | None = None,
 ) -> dict:
     """
     Extract frames for a specific day from the SQLite DB.
@@ -46,52 +54,39 @@ def extract_day_slice(
     Args:
         db_path: Path to the SQLite database
         date: datetime object representing the target date (at 00:00:00 UTC)
+        table_name: Optional table_name filter (e.g. tbl_actual)
 
     Returns:
         Dictionary with metadata and frames array
     """
+    end_date = date + timedelta(days=1)
     start_ts = date.isoformat()
-    end_ts = (date + timedelta(days=1)).isoformat()
+    end_ts = end_date.isoformat()
 
     conn = sqlite3.connect(db_path)
     conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-
-    query = """
-        SELECT
-            id,
-            ts,
-            device_id,
-            table_name,
-            raw,
-            raw_b64,
-            parsed,
-            direction,
-            conn_id,
-            peer,
-            length
-        FROM frames
-        WHERE ts >= ? AND ts < ?
-        ORDER BY ts ASC
-    """
-
-    cursor.execute(query, (start_ts, end_ts))
-    rows = cursor.fetchall()
+    rows = select_frames(
+        conn,
+        int(date.timestamp() * 1000),
+        int(end_date.timestamp() * 1000),
+        table_name=table_name,
+    ).fetchall()
 
     frames = []
     for row in rows:
+        values = dict(row)
         frame = {
-            "id": row["id"],
-            "ts": row["ts"],
-            "device_id": row["device_id"],
-            "table_name": row["table_name"],
-            "raw": row["raw"],
-            "raw_b64": row["raw_b64"],
-            "parsed": json.loads(row["parsed"]) if row["parsed"] else None,
-            "direction": row["direction"],
-            "conn_id": row["conn_id"],
-            "peer": row["peer"],
-            "length": row["length"],
+            "id": values["id"],
+            "ts": values["ts"],
+            "device_id": values.get("device_id"),
+            "table_name": values.get("table_name"),
+            "raw": values.get("raw"),
+            "raw_b64": values.get("raw_b64"),
+            "parsed": json.loads(values["parsed"]) if values.get("parsed") else None,
+            "direction": values.get("direction"),
+            "conn_id": values.get("conn_id"),
+            "peer": values.get("peer"),
+            "length": values.get("length"),
         }
         frames.append(frame)
 
@@ -102,6 +97,7 @@ def extract_day_slice(
     payload = {
         "source_db": str(db_path),
         "date": date.strftime("%Y-%m-%d"),
+        "table_name": table_name,
         "start_ts": start_ts,
         "end_ts": end_ts,
         "frame_count": len(frames),
@@ -128,6 +124,11 @@ def main() -> int:
         required=True,
         help="Date in YYYY-MM-DD format to extract",
     )
+    parser.add_argument(
+        "--table",
+        default=None,
+        help="Only extract frames with this table_name (uses the table_name index)",
+    )
     parser.add_argument(
         "--out",
         default=".sisyphus/evidence/task-7-day-slice.json",
@@ -147,7 +148,7 @@ def main() -> int:
         return 1
 
     try:
-        payload = extract_day_slice(str(db_path), target_date)
+        payload = extract_day_slice(str(db_path), target_date, table_name=args.table)
     except sqlite3.Error as exc:
         print(f"Error: Database query failed: {exc}", file=sys.stderr)
         return 1
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Benchmark: lokální settings-audit úložiště (telemetry/audit_store.py).
+
+Naplní dočasnou DB N záznamy (5 kroků na audit_id, několik zařízení a
+klíčů) přes dávkový zapisovač a měří dotazy: celý lifecycle jednoho
+audit_id, historii jednoho klíče a filtr podle kroku.
+
+Použití:
+    python testing/bench_audit_store.py [--records 100000] [--queries 200]
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "addon", "oig-proxy"))
+
+from telemetry.audit_store import SettingsAuditStore  # noqa: E402  # pylint: disable=wrong-import-position
+
+_STEPS = ("incoming", "enqueued", "deliver_selected", "injected_box", "ack_box_observed")
+_KEYS = ("MODE", "T_Room", "T_Boiler", "BAT_MIN", "P_MAX", "SOC_MAX", "HDO", "PRIO")
+
+
+def _records(count: int) -> list[dict]:
+    records = []
+    for idx in range(count):
+        audit_idx, step_idx = divmod(idx, len(_STEPS))
+        records.append({
+            "audit_id": f"aud_{audit_idx:08d}",
+            "batch_id": "",
+            "device_id": f"DEV{audit_idx % 4}",
+            "table": "tbl_box_prms",
+            "key": _KEYS[audit_idx % len(_KEYS)],
+            "step": _STEPS[step_idx],
+            "result": "confirmed" if step_idx == len(_STEPS) - 1 else "pending",
+            "value_text": str(audit_idx % 100),
+            "raw_text": f"Set tbl_box_prms {_KEYS[audit_idx % len(_KEYS)]}={audit_idx % 100}",
+        })
+    return records
+
+
+def _timed(queries: int, func) -> float:
+    started = time.perf_counter()
+    for _ in range(queries):
+        func()
+    return (time.perf_counter() - started) / queries * 1000.0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", maxsplit=1)[0])
+    parser.add_argument("--records", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SettingsAuditStore(os.path.join(tmp, "audit.db"))
+        store.start()
+        records = _records(args.records)
+        started = time.perf_counter()
+        for offset in range(0, len(records), store.QUEUE_MAX // 2):
+            for record in records[offset : offset + store.QUEUE_MAX // 2]:
+                store.put(record)
+            store.flush(timeout=60.0)
+        write_s = time.perf_counter() - started
+        print(f"zápis {store.records_written} záznamů: {write_s:.2f} s ({store.dropped} zahozeno)")
+
+        audits = args.records // len(_STEPS)
+        rng = random.Random(1)
+        results = {
+            "lifecycle(audit_id)": _timed(args.queries, lambda: store.lifecycle(f"aud_{rng.randrange(audits):08d}")),
+            "query(device, table, key)": _timed(
+                args.queries,
+                lambda: store.query(device_id="DEV1", table="tbl_box_prms", key=rng.choice(_KEYS), limit=50),
+            ),
+            "query(step)": _timed(args.queries, lambda: store.query(step="ack_box_observed", limit=50)),
+        }
+        for name, ms in results.items():
+            print(f"{name:28s} {ms:8.3f} ms/dotaz")
+        store.stop()
+
+
+if __name__ == "__main__":
+    main()
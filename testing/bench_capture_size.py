@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Benchmark: velikost capture DB za den – starý formát vs. kompaktní.
+
+Den provozu se poskládá ze zaznamenaných rámců BOXu
+(test_data/test_data/box_frames_5min.json, 5 minut reálného provozu) a
+odpovědí cloudu (replay_session_latest.json): 5minutový záznam se přehraje
+288× a v každém průchodu se změní DT, ID_Set, CRC a číselné hodnoty, aby
+se rámce neopakovaly doslova. Rámce jdou přes FrameCapture.capture() stejně
+jako z proxy/server.py (parsed = parse_xml_frame(raw)).
+
+Použití:
+    python testing/bench_capture_size.py [--days 1] [--seed 1]
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime
+import json
+import logging
+import os
+import queue
+import random
+import re
+import sqlite3
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(__file__)
+sys.path.insert(0, os.path.join(ROOT, "..", "addon", "oig-proxy"))
+
+from capture import frame_capture  # noqa: E402  # pylint: disable=wrong-import-position
+from protocol.parser import parse_xml_frame  # noqa: E402  # pylint: disable=wrong-import-position
+
+# pylint: disable=protected-access
+
+_CYCLE_S = 300
+_NUMBER_RE = re.compile(r"<(?!ID_Device|TblName|Reason|Result|ver)(\w+)>(-?\d+(?:\.\d+)?)</\1>")
+
+
+def _recorded() -> tuple[list[str], list[str]]:
+    with open(os.path.join(ROOT, "test_data", "test_data", "box_frames_5min.json"), encoding="utf-8") as handle:
+        box = [item["frame"] for item in json.load(handle)]
+    with open(os.path.join(ROOT, "replay_session_latest.json"), encoding="utf-8") as handle:
+        cloud = [item["raw"] for item in json.load(handle)["frames"] if item["direction"] == "cloud_to_proxy"]
+    return box, cloud
+
+
+def _perturb(frame: str, rng: random.Random, when: datetime.datetime, cycle: int) -> str:
+    def _jitter(match: re.Match[str]) -> str:
+        tag, value = match.group(1), match.group(2)
+        if tag in ("ID_Set", "CRC", "DT"):
+            return match.group(0)
+        if "." in value:
+            decimals = len(value.split(".")[1])
+            return f"<{tag}>{float(value) * rng.uniform(0.9, 1.1):.{decimals}f}</{tag}>"
+        number = int(value)
+        return f"<{tag}>{number + rng.randint(-max(1, abs(number) // 10), max(1, abs(number) // 10))}</{tag}>"
+
+    frame = _NUMBER_RE.sub(_jitter, frame)
+    frame = re.sub(r"<DT>[^<]*</DT>", f"<DT>{when:%Y-%m-%d %H:%M:%S}</DT>", frame)
+    frame = re.sub(r"<ID_Set>(\d+)</ID_Set>", lambda m: f"<ID_Set>{int(m.group(1)) + cycle * _CYCLE_S}</ID_Set>", frame)
+    return re.sub(r"<CRC>\d+</CRC>", f"<CRC>{rng.randint(0, 65535)}</CRC>", frame)
+
+
+def _day_of_traffic(days: int, seed: int) -> list[tuple[str, str, str | None]]:
+    box, cloud = _recorded()
+    rng = random.Random(seed)
+    start = datetime.datetime(2026, 1, 1, tzinfo=datetime.timezone.utc)
+    frames: list[tuple[str, str, str | None]] = []
+    for cycle in range(days * 86_400 // _CYCLE_S):
+        for index, frame in enumerate(box):
+            when = start + datetime.timedelta(seconds=cycle * _CYCLE_S + index * _CYCLE_S / len(box))
+            raw = _perturb(frame, rng, when, cycle)
+            frames.append((raw, "box_to_proxy", parse_xml_frame(raw).get("_table")))
+            reply = cloud[index % len(cloud)]
+            frames.append((reply, "cloud_to_proxy", parse_xml_frame(reply).get("_table")))
+    return frames
+
+
+def _db_bytes(path: str) -> int:
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    page_size, pages, free = (conn.execute(f"PRAGMA {name}").fetchone()[0] for name in ("page_size", "page_count", "freelist_count"))
+    conn.close()
+    return page_size * (pages - free)
+
+
+def _capture(path: str, frames: list[tuple[str, str, str | None]], *, capture_format: str, raw_bytes: bool) -> tuple[int, float]:
+    capture = frame_capture.FrameCapture(
+        db_path=path, capture_raw_bytes=raw_bytes, retention_days=0, capture_format=capture_format
+    )
+    capture._queue = queue.Queue()  # bez limitu – měří se velikost, ne zahazování
+    capture.start()
+    prepared = [(raw, raw.encode("utf-8"), parse_xml_frame(raw), direction, table) for raw, direction, table in frames]
+    started = time.perf_counter()
+    for index, (raw, data, parsed, direction, table) in enumerate(prepared):
+        capture.capture("2206237016", table, raw, data, parsed, direction, index // 40, "10.0.0.5:5710", len(data))
+    enqueue_s = time.perf_counter() - started
+    capture.stop()
+    return _db_bytes(path), enqueue_s
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", maxsplit=1)[0])
+    parser.add_argument("--days", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    frames = _day_of_traffic(args.days, args.seed)
+    raw_total = sum(len(raw.encode("utf-8")) for raw, _direction, _table in frames)
+    print(f"{len(frames)} frames za {args.days} den/dní, surová data {raw_total / args.days / 1e6:.2f} MB/den")
+    with tempfile.TemporaryDirectory() as tmp:
+        variants = (
+            ("legacy (raw + parsed)", "legacy", False),
+            ("legacy + CAPTURE_RAW_BYTES", "legacy", True),
+            ("compact", "compact", False),
+            ("compact + CAPTURE_RAW_BYTES", "compact", True),
+        )
+        for name, capture_format, raw_bytes in variants:
+            path = os.path.join(tmp, f"{capture_format}_{int(raw_bytes)}.db")
+            size, enqueue_s = _capture(path, frames, capture_format=capture_format, raw_bytes=raw_bytes)
+            per_frame_us = enqueue_s / len(frames) * 1e6
+            print(f"{name:30s} {size / args.days / 1e6:7.2f} MB/den  capture() {per_frame_us:5.1f} µs/frame")
+
+
+if __name__ == "__main__":
+    main()
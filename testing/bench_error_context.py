@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Benchmark: error context v TelemetryCollector při bouři chyb.
+
+Porovnává původní chování (každá chyba serializuje celý log buffer do JSON)
+s rozsahy seq v LogRingu, kde se logy formátují jednou za telemetrické
+okno a sdílí se mezi chybami. Simuluje plný log buffer a N chyb za okno
+(typicky opakované selhání připojení ke cloudu) a měří čas zápisu chyb,
+čas sestavení okna, alokovanou paměť a velikost výsledného JSON.
+
+Použití:
+    python testing/bench_error_context.py [--errors 100] [--logs 5000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+import tracemalloc
+from typing import Any
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "addon", "oig-proxy"))
+
+from telemetry import collector as telemetry_collector  # noqa: E402  # pylint: disable=wrong-import-position
+
+
+def _fill(collector: Any, logs: int) -> None:
+    now = time.time()
+    for i in range(logs):
+        record = logging.LogRecord(
+            "proxy.server", logging.INFO, __file__, 1, "Frame %s #%d forwarded to cloud", ("tbl_actual", i), None
+        )
+        record.created = now - 200 + i * 200 / logs
+        collector.record_log_entry(record)
+
+
+def _legacy_record(collector: Any, details: dict[str, Any]) -> None:
+    """Původní record_error_context: celý buffer do JSON u každé chyby."""
+    collector.error_context.append(
+        {
+            "timestamp": collector._utc_iso(),  # pylint: disable=protected-access
+            "event_type": "error_cloud_connect_refused",
+            "details": json.dumps(details, ensure_ascii=False),
+            "logs": json.dumps(collector._snapshot_log_buffer()[0], ensure_ascii=False),  # pylint: disable=protected-access
+            "log_seq_start": 0,
+            "log_seq_end": 0,
+        }
+    )
+
+
+def _run(name: str, record: Any, logs: int, errors: int) -> None:
+    collector = telemetry_collector.TelemetryCollector(interval_s=300, telemetry_enabled=False)
+    collector.log_max = logs
+    _fill(collector, logs)
+    details = {"cloud_host": "oigservis.cz", "cloud_port": 5710, "error": "Connection refused"}
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    for _ in range(errors):
+        record(collector, details)
+    record_ms = (time.perf_counter() - started) * 1000
+    held_kib = tracemalloc.get_traced_memory()[0] / 1024
+
+    started = time.perf_counter()
+    window = collector._collect_and_clear_window_metrics(logs=[])  # pylint: disable=protected-access
+    payload = json.dumps(window, ensure_ascii=False)
+    window_ms = (time.perf_counter() - started) * 1000
+    peak_kib = tracemalloc.get_traced_memory()[1] / 1024
+    tracemalloc.stop()
+
+    print(f"{name}:")
+    print(f"  zápis {errors} chyb         {record_ms:9.1f} ms  ({record_ms / errors * 1000:.0f} µs/chyba)")
+    print(f"  sestavení okna + JSON   {window_ms:9.1f} ms")
+    print(f"  paměť chyb v okně       {held_kib:9.0f} KiB  (peak {peak_kib:.0f} KiB)")
+    print(f"  velikost JSON okna      {len(payload) / 1024:9.0f} KiB")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--errors", type=int, default=100, help="počet chyb za okno")
+    parser.add_argument("--logs", type=int, default=5000, help="počet logů v bufferu")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    _run("původní (JSON logů na chybu)", _legacy_record, args.logs, args.errors)
+    _run(
+        "LogRing (rozsahy seq)",
+        lambda collector, details: collector.record_error_context(
+            event_type="error_cloud_connect_refused", details=details
+        ),
+        args.logs, args.errors,
+    )
+
+
+if __name__ == "__main__":
+    main()
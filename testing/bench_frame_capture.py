@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Benchmark: dotazy nad capture DB (capture/frame_capture.py).
+
+Vytvoří capture DB ve starém schématu (bez ts_ms a bez indexů) s N frames
+rozložených do D dní, změří výřez jednoho dne, počty podle table_name a
+prune, pak DB zmigruje stejnými kroky jako writer thread a měření zopakuje.
+
+Použití:
+    python testing/bench_frame_capture.py [--frames 500000] [--days 7]
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "addon", "oig-proxy"))
+
+from capture import frame_capture  # noqa: E402  # pylint: disable=wrong-import-position
+
+# pylint: disable=protected-access
+
+_TABLES = ("tbl_actual", "tbl_dc_in", "tbl_ac_out", "tbl_batt", "IsNewSet", "IsNewWeather", "IsNewFW", "END", "ACK")
+_DAY_MS = 86_400_000
+_START_MS = 1_767_225_600_000  # 2026-01-01T00:00:00Z
+
+
+def _legacy_db(path: str, frames: int, days: int) -> None:
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        CREATE TABLE frames (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, ts TEXT, device_id TEXT, table_name TEXT,
+            raw TEXT, raw_b64 TEXT, parsed TEXT, direction TEXT, conn_id INTEGER, peer TEXT, length INTEGER
+        )
+    """)
+    step_ms = days * _DAY_MS // frames
+    conn.executemany(
+        "INSERT INTO frames (ts, device_id, table_name, raw, parsed, direction, conn_id, length) "
+        "VALUES (?,?,?,?,?,?,?,?)",
+        (
+            (
+                frame_capture._iso_from_ms(_START_MS + idx * step_ms),
+                "2206237016",
+                _TABLES[idx % len(_TABLES)],
+                f"<Frame><TblName>{_TABLES[idx % len(_TABLES)]}</TblName><ID>{idx}</ID></Frame>",
+                '{"ID":%d}' % idx,
+                "box_to_proxy",
+                idx // 40,
+                120,
+            )
+            for idx in range(frames)
+        ),
+    )
+    conn.commit()
+    conn.close()
+
+
+def _measure(conn: sqlite3.Connection, days: int) -> dict[str, float]:
+    day_start = _START_MS + (days // 2) * _DAY_MS
+    results: dict[str, float] = {}
+
+    started = time.perf_counter()
+    frame_capture.select_frames(conn, day_start, day_start + _DAY_MS).fetchall()
+    results["výřez dne"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    frame_capture.select_frames(conn, day_start, day_start + _DAY_MS, table_name="END").fetchall()
+    results["výřez dne, table_name"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    conn.execute("SELECT * FROM frames WHERE conn_id = ?", (1234,)).fetchall()
+    results["conn_id"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    frame_capture.count_by_table(conn, ["IsNewSet", "IsNewWeather", "IsNewFW", "END", "ACK"])
+    results["počty podle table_name"] = time.perf_counter() - started
+    return results
+
+
+def _prune(conn: sqlite3.Connection, sql: str, cutoff: object) -> float:
+    started = time.perf_counter()
+    conn.execute("SAVEPOINT bench")
+    conn.execute(sql, (cutoff,))
+    conn.execute("ROLLBACK TO bench")
+    conn.execute("RELEASE bench")
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", maxsplit=1)[0])
+    parser.add_argument("--frames", type=int, default=500_000)
+    parser.add_argument("--days", type=int, default=7)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "payloads.db")
+        _legacy_db(path, args.frames, args.days)
+        cutoff_ms = _START_MS + _DAY_MS // 4  # prune čtvrt dne
+        conn = sqlite3.connect(path)
+        before = _measure(conn, args.days)
+        before["prune"] = _prune(conn, "DELETE FROM frames WHERE ts < ?", frame_capture._iso_from_ms(cutoff_ms))
+        conn.close()
+
+        capture = frame_capture.FrameCapture(db_path=path)
+        started = time.perf_counter()
+        capture._ensure_schema()
+        schema_s = time.perf_counter() - started
+        conn = sqlite3.connect(path)
+        steps = 0
+        longest = 0.0
+        started = time.perf_counter()
+        while capture._backfill is not None:
+            step_started = time.perf_counter()
+            capture._migrate_step(conn)
+            longest = max(longest, time.perf_counter() - step_started)
+            steps += 1
+        migrate_s = time.perf_counter() - started
+        after = _measure(conn, args.days)
+        after["prune"] = _prune(conn, "DELETE FROM frames WHERE ts_ms < ?", cutoff_ms)
+        conn.close()
+
+    print(f"{args.frames} frames / {args.days} dní")
+    print(f"start (_ensure_schema): {schema_s * 1000:.1f} ms")
+    print(f"migrace: {steps} kroků, {migrate_s:.2f} s celkem, nejdelší krok {longest * 1000:.1f} ms")
+    print(f"{'':24s} {'před':>10s} {'po':>10s}")
+    for name, value in before.items():
+        print(f"{name:24s} {value * 1000:8.1f}ms {after[name] * 1000:8.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
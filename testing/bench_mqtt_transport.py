@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Benchmark: MQTT publish throughput – paho loop_start vs. asyncio transport.
+
+Spouští minimální MQTT 3.1.1 broker (stand-in, vlastní thread + event loop),
+připojí MQTTClient v obou režimech a měří, za jak dlouho broker přijme
+všech N state publishů.
+
+Použití:
+    python testing/bench_mqtt_transport.py --messages 20000 --qos 1
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "addon", "oig-proxy"))
+
+from mqtt.client import MQTTClient  # noqa: E402  # pylint: disable=wrong-import-position
+
+
+class BrokerStandIn:
+    """Minimal MQTT broker: CONNACK, PUBACK/PUBREC/PUBCOMP, SUBACK, PINGRESP."""
+
+    def __init__(self) -> None:
+        self.received = 0
+        self.port = 0
+        self._loop = asyncio.new_event_loop()
+        self._server: asyncio.base_events.Server | None = None
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+        self._ready.wait(5)
+
+    def stop(self) -> None:
+        asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result(5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(5)
+
+    async def _shutdown(self) -> None:
+        if self._server is not None:
+            self._server.close()
+        current = asyncio.current_task()
+        tasks = [task for task in asyncio.all_tasks() if task is not current]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _run(self) -> None:
+        asyncio.set_event_loop(self._loop)
+        self._server = self._loop.run_until_complete(
+            asyncio.start_server(self._handle, "127.0.0.1", 0)
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._ready.set()
+        self._loop.run_forever()
+
+    @staticmethod
+    async def _read_packet(reader: asyncio.StreamReader) -> tuple[int, bytes]:
+        header = (await reader.readexactly(1))[0]
+        multiplier, length = 1, 0
+        while True:
+            byte = (await reader.readexactly(1))[0]
+            length += (byte & 0x7F) * multiplier
+            if not byte & 0x80:
+                break
+            multiplier *= 128
+        body = await reader.readexactly(length) if length else b""
+        return header, body
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                header, body = await self._read_packet(reader)
+                ptype = header & 0xF0
+                if ptype == 0x10:  # CONNECT
+                    writer.write(b"\x20\x02\x00\x00")
+                elif ptype == 0x30:  # PUBLISH
+                    self.received += 1
+                    qos = (header >> 1) & 0x03
+                    if qos:
+                        topic_len = int.from_bytes(body[:2], "big")
+                        packet_id = body[2 + topic_len:4 + topic_len]
+                        writer.write((b"\x40\x02" if qos == 1 else b"\x50\x02") + packet_id)
+                elif ptype == 0x60:  # PUBREL
+                    writer.write(b"\x70\x02" + body[:2])
+                elif ptype == 0x80:  # SUBSCRIBE
+                    writer.write(b"\x90\x03" + body[:2] + b"\x01")
+                elif ptype == 0xC0:  # PINGREQ
+                    writer.write(b"\xd0\x00")
+                elif ptype == 0xE0:  # DISCONNECT
+                    break
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+async def _run_mode(broker: BrokerStandIn, *, async_transport: bool, messages: int, qos: int) -> dict:
+    client = MQTTClient(
+        host="127.0.0.1",
+        port=broker.port,
+        namespace="bench",
+        qos=qos,
+        async_transport=async_transport,
+        outbound_queue_max=messages,
+    )
+    if not await client.connect_async("BENCH"):
+        raise RuntimeError("connect failed")
+    await asyncio.sleep(0.2)
+    baseline = broker.received
+
+    payload = {"P": 1234, "U": 230.1, "I": 5.2}
+    started = time.perf_counter()
+    for i in range(messages):
+        payload["P"] = i
+        client.publish_state("BENCH", f"tbl_{i % 32}", payload)
+        if i % 500 == 0:
+            await asyncio.sleep(0)  # ať běží loop (transport / broker ACK)
+    enqueue_s = time.perf_counter() - started
+    deadline = time.monotonic() + 60
+    while broker.received - baseline < messages and time.monotonic() < deadline:
+        await asyncio.sleep(0.005)
+    total_s = time.perf_counter() - started
+    stats = client.transport_stats()
+    client.disconnect()
+    return {
+        "mode": "asyncio" if async_transport else "loop_start",
+        "received": broker.received - baseline,
+        "enqueue_ms": enqueue_s * 1000,
+        "total_ms": total_s * 1000,
+        "msgs_per_s": messages / total_s if total_s else 0.0,
+        "stats": stats,
+    }
+
+
+async def _main(args: argparse.Namespace) -> None:
+    broker = BrokerStandIn()
+    broker.start()
+    try:
+        for async_transport in (False, True):
+            result = await _run_mode(broker, async_transport=async_transport, messages=args.messages, qos=args.qos)
+            print(
+                f"{result['mode']:>10}: {result['received']}/{args.messages} msgs, "
+                f"enqueue {result['enqueue_ms']:.1f} ms, total {result['total_ms']:.1f} ms, "
+                f"{result['msgs_per_s']:.0f} msg/s"
+            )
+            if result["stats"]:
+                print(f"{'':>12}transport: {result['stats']}")
+    finally:
+        broker.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--qos", type=int, default=1, choices=(0, 1, 2))
+    asyncio.run(_main(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Benchmark: podíl JSON serializace na CPU per frame (publish_state, capture).
+
+Měří MQTTClient.publish_state() proti no-op paho klientovi a
+FrameCapture.capture() bez writer threadu. Pro každou cestu vypíše čas na
+frame, čas samotné serializace a její podíl. Serializace se porovnává pro
+stdlib json.dumps, json_codec.dumps (orjson, pokud je nainstalován) a
+inkrementální TableStateEncoder.
+
+Použití:
+    python testing/bench_serialization.py --frames 20000 --keys 40 [--stdlib]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import queue
+import sys
+import time
+from typing import Any, Callable
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "addon", "oig-proxy"))
+
+import json_codec  # noqa: E402  # pylint: disable=wrong-import-position
+from capture.frame_capture import FrameCapture  # noqa: E402  # pylint: disable=wrong-import-position
+from json_codec import TableStateEncoder  # noqa: E402  # pylint: disable=wrong-import-position
+from mqtt.client import MQTTClient  # noqa: E402  # pylint: disable=wrong-import-position
+
+
+class _Published:
+    rc = 0
+    mid = 1
+
+
+class _NullPaho:
+    """Paho stand-in: publish() nic neodesílá."""
+
+    def publish(self, *_args: Any, **_kwargs: Any) -> _Published:
+        return _Published()
+
+
+def _frames(count: int, keys: int) -> list[dict[str, Any]]:
+    base: dict[str, Any] = {}
+    for i in range(keys):
+        if i % 4 == 0:
+            base[f"KEY_{i}"] = i * 10
+        elif i % 4 == 1:
+            base[f"KEY_{i}"] = round(i * 1.37, 2)
+        elif i % 4 == 2:
+            base[f"KEY_{i}"] = f"Režim {i}"
+        else:
+            base[f"KEY_{i}"] = bool(i % 2)
+    frames = []
+    for n in range(count):
+        frame = dict(base)
+        # typický tbl_actual: mění se jen výkony / proudy
+        for i in range(0, min(keys, 6)):
+            frame[f"KEY_{i}"] = n + i if i % 4 == 0 else round((n + i) * 0.1, 1)
+        frames.append(frame)
+    return frames
+
+
+def _time_it(func: Callable[[dict[str, Any]], Any], frames: list[dict[str, Any]]) -> float:
+    started = time.perf_counter()
+    for frame in frames:
+        func(frame)
+    return (time.perf_counter() - started) / len(frames) * 1e6
+
+
+def _report(label: str, total_us: float, serialize_us: float) -> None:
+    share = serialize_us / total_us * 100 if total_us else 0.0
+    print(f"  {label:<34} {total_us:8.2f} µs/frame, serializace {serialize_us:6.2f} µs ({share:4.1f} %)")
+
+
+def bench_publish_state(frames: list[dict[str, Any]]) -> None:
+    client = MQTTClient(host="127.0.0.1", port=1883, namespace="bench")
+    client._client = _NullPaho()  # pylint: disable=protected-access
+    client.connected = True
+    client._availability_online_sent.add("BENCH")  # pylint: disable=protected-access
+
+    total = _time_it(lambda frame: client.publish_state("BENCH", "tbl_actual", frame), frames)
+    encoder = TableStateEncoder()
+    incremental = _time_it(lambda frame: encoder.encode("bench/BENCH/tbl_actual/state", frame), frames)
+    stdlib = _time_it(json.dumps, frames)
+    codec = _time_it(json_codec.dumps, frames)
+
+    print(f"publish_state (backend={json_codec.BACKEND})")
+    _report("aktuální (TableStateEncoder)", total, incremental)
+    _report("odhad se stdlib json.dumps", total - incremental + stdlib, stdlib)
+    print(f"  json_codec.dumps: {codec:.2f} µs/frame")
+
+
+def bench_capture(frames: list[dict[str, Any]]) -> None:
+    capture = FrameCapture(db_path=":memory:")
+    capture._queue = queue.Queue()  # pylint: disable=protected-access  # bez limitu, writer neběží
+    raw = "<Frame>" + "x" * 600 + "</Frame>"
+
+    total = _time_it(
+        lambda frame: capture.capture("BENCH", "tbl_actual", raw, None, frame, "box_to_proxy", 1, "peer", len(raw)),
+        frames,
+    )
+    stdlib = _time_it(lambda frame: json.dumps(frame, ensure_ascii=False), frames)
+    codec = _time_it(json_codec.dumps, frames)
+
+    print(f"capture (backend={json_codec.BACKEND})")
+    _report("aktuální (json_codec.dumps)", total, codec)
+    _report("odhad se stdlib json.dumps", total - codec + stdlib, stdlib)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=20000)
+    parser.add_argument("--keys", type=int, default=40)
+    parser.add_argument("--stdlib", action="store_true", help="vynutit stdlib backend i s nainstalovaným orjson")
+    args = parser.parse_args()
+    if args.stdlib:
+        json_codec._orjson = None  # pylint: disable=protected-access
+        json_codec.BACKEND = "json"
+
+    frames = _frames(args.frames, args.keys)
+    bench_publish_state(frames)
+    bench_capture(frames)
+
+
+if __name__ == "__main__":
+    main()
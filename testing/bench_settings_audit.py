@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Benchmark: sledování raw_text limitů v telemetry/settings_audit.py.
+
+Porovnává původní úklid (průchod celým slovníkem _audit_last_seen při
+každém záznamu + opakované kódování textu do UTF-8) s TTL indexem
+(OrderedDict, expirace z hlavy) a jedním kódováním na záznam. Simuluje
+hromadné nastavování: N aktivních audit_id, každé s několika kroky.
+
+Použití:
+    python testing/bench_settings_audit.py [--populations 100,1000,10000] [--steps 5]
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "addon", "oig-proxy"))
+
+from telemetry import settings_audit  # noqa: E402  # pylint: disable=wrong-import-position
+
+# pylint: disable=protected-access
+
+_legacy_raw_bytes: dict[str, int] = {}
+_legacy_last_seen: dict[str, float] = {}
+
+
+def _legacy_apply(audit_id: str, raw_text: str) -> str:
+    """Původní _apply_raw_text_limits (úklid O(n), 2–3 kódování)."""
+    now = time.time()
+    expired = [
+        key for key, last_seen in _legacy_last_seen.items()
+        if now - last_seen > settings_audit._AUDIT_TRACKING_TTL_SECONDS
+    ]
+    for key in expired:
+        _legacy_last_seen.pop(key, None)
+        _legacy_raw_bytes.pop(key, None)
+    encoded = raw_text.encode("utf-8", errors="replace")
+    truncated = raw_text
+    if len(encoded) > settings_audit._MAX_RAW_TEXT_BYTES:
+        truncated = encoded[: settings_audit._MAX_RAW_TEXT_BYTES].decode("utf-8", errors="replace")
+    stored = len(truncated.encode("utf-8", errors="replace"))
+    used = _legacy_raw_bytes.get(audit_id, 0)
+    remaining = max(0, settings_audit._MAX_TOTAL_RAW_BYTES - used)
+    if stored > remaining:
+        truncated = truncated.encode("utf-8", errors="replace")[:remaining].decode("utf-8", errors="replace")
+        stored = len(truncated.encode("utf-8", errors="replace"))
+    _legacy_raw_bytes[audit_id] = used + stored
+    _legacy_last_seen[audit_id] = now
+    return truncated
+
+
+def _run(apply, population: int, steps: int, raw_text: str) -> float:
+    ids = [f"aud_{i:06d}" for i in range(population)]
+    for audit_id in ids:
+        apply(audit_id, raw_text)
+    started = time.perf_counter()
+    for _ in range(steps):
+        for audit_id in ids:
+            apply(audit_id, raw_text)
+    return (time.perf_counter() - started) / (population * steps) * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--populations", default="100,1000,10000", help="počty sledovaných audit_id")
+    parser.add_argument("--steps", type=int, default=5, help="kroků na audit_id")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+    raw_text = "<Frame><TblName>tbl_box_prms</TblName><NewValue>1</NewValue></Frame>" * 4
+
+    print(f"{'audit_id':>9}  {'původní':>12}  {'TTL index':>12}")
+    for population in (int(value) for value in args.populations.split(",")):
+        _legacy_raw_bytes.clear()
+        _legacy_last_seen.clear()
+        settings_audit._audit_raw_bytes.clear()
+        settings_audit._audit_last_seen.clear()
+        legacy = _run(_legacy_apply, population, args.steps, raw_text)
+        current = _run(settings_audit._apply_raw_text_limits, population, args.steps, raw_text)
+        print(f"{population:>9}  {legacy:9.2f} µs  {current:9.2f} µs")
+
+
+if __name__ == "__main__":
+    main()
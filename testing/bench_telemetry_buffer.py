@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Benchmark: TelemetryBuffer (telemetry/client.py) s plným bufferem.
+
+Porovnává aktuální buffer (WAL, počet v paměti, ring eviction podle id,
+dávkové mazání, zlib payloady) s původní implementací (commit po každém
+insertu + SELECT COUNT(*), úklid přes NOT IN, commit po každém remove).
+Měří:
+  - store do prázdného bufferu (naplnění na BUFFER_MAX_MESSAGES),
+  - store do plného bufferu (každý zápis vyvolá eviction),
+  - flush celého bufferu po 50 zprávách (get_pending + remove),
+  - úklid při startu s plným bufferem.
+
+Na SD kartě rozhoduje počet commitů (fsync). Pro měření přímo na kartě
+použijte --dir na připojené kartě; --fsync-ms připočte modelovou cenu
+fsync ke každému commitu v režimu rollback journal (synchronous=FULL).
+Ve WAL se synchronous=NORMAL commit nesynchronizuje.
+
+Použití:
+    python testing/bench_telemetry_buffer.py [--messages 1000] [--dir /mnt/sd] [--fsync-ms 5]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "addon", "oig-proxy"))
+
+import json_codec  # noqa: E402  # pylint: disable=wrong-import-position
+from telemetry import client as telemetry_client  # noqa: E402  # pylint: disable=wrong-import-position
+
+
+def _payload(i: int) -> dict[str, Any]:
+    """Typická telemetrie: metriky + okno s logy a audit záznamy."""
+    return {
+        "device_id": "2206237016",
+        "timestamp": f"2026-01-01T00:{i % 60:02d}:00Z",
+        "uptime_s": i * 300,
+        "frames_received": 1000 + i,
+        "window_metrics": {
+            "logs": [
+                {"level": "INFO", "logger": "proxy.server", "message": f"Frame tbl_actual #{i}-{j} forwarded"}
+                for j in range(30)
+            ],
+            "settings_audit": [],
+            "stats": [{"table": "tbl_actual", "count": 60, "bytes": 41_000}],
+        },
+    }
+
+
+class _LegacyBuffer:
+    """Původní TelemetryBuffer (před WAL/ring/batch úpravou)."""
+
+    def __init__(self, db_path: Path, max_messages: int) -> None:
+        self._max = max_messages
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                topic TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                timestamp REAL NOT NULL,
+                retries INTEGER DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS idx_timestamp ON messages(timestamp);
+        """)
+        self._conn.commit()
+        self._cleanup()
+
+    def _cleanup(self) -> None:
+        cutoff = time.time() - 168 * 3600
+        self._conn.execute("DELETE FROM messages WHERE timestamp < ?", (cutoff,))
+        self._conn.execute(
+            "DELETE FROM messages WHERE id NOT IN (SELECT id FROM messages ORDER BY timestamp DESC LIMIT ?)",
+            (self._max,),
+        )
+        self._conn.commit()
+
+    def store(self, topic: str, payload: dict[str, Any]) -> bool:
+        self._conn.execute(
+            "INSERT INTO messages (topic, payload, timestamp) VALUES (?, ?, ?)",
+            (topic, json_codec.dumps(payload), time.time()),
+        )
+        self._conn.commit()
+        if self._conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0] > self._max:
+            self._cleanup()
+        return True
+
+    def get_pending(self, limit: int = 50) -> list[tuple[int, str, dict[str, Any]]]:
+        rows = self._conn.execute(
+            "SELECT id, topic, payload FROM messages ORDER BY timestamp ASC LIMIT ?", (limit,)
+        ).fetchall()
+        return [(row[0], row[1], json.loads(row[2])) for row in rows]
+
+    def remove(self, message_id: int) -> None:
+        self._conn.execute("DELETE FROM messages WHERE id = ?", (message_id,))
+        self._conn.commit()
+
+    def remove_many(self, message_ids: list[int]) -> None:
+        for message_id in message_ids:
+            self.remove(message_id)
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+def _commits(buffer: Any) -> list[str]:
+    statements: list[str] = []
+    buffer._conn.set_trace_callback(statements.append)  # pylint: disable=protected-access
+    return statements
+
+
+def _measure(label: str, buffer: Any, func: Any, ops: int, fsync_ms: float, wal: bool) -> None:
+    statements = _commits(buffer)
+    started = time.perf_counter()
+    func()
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    commits = sum(1 for stmt in statements if stmt.startswith("COMMIT"))
+    modeled = elapsed_ms + (0.0 if wal else commits * fsync_ms)
+    print(
+        f"  {label:<26} {elapsed_ms / ops * 1000:9.1f} µs/zpráva  {commits:5d} commitů"
+        + (f"  ~{modeled:8.0f} ms s fsync" if fsync_ms else "")
+    )
+
+
+def _flush_all(buffer: Any) -> None:
+    while True:
+        pending = buffer.get_pending(limit=50)
+        if not pending:
+            return
+        buffer.remove_many([message_id for message_id, _, _ in pending])
+
+
+def _run(name: str, factory: Any, db_path: Path, messages: int, fsync_ms: float, wal: bool) -> None:
+    print(f"{name}:")
+    buffer = factory(db_path)
+    _measure(
+        "store (plnění)", buffer,
+        lambda: [buffer.store("oig/telemetry/dev", _payload(i)) for i in range(messages)],
+        messages, fsync_ms, wal,
+    )
+    overflow = max(1, messages // 5)
+    _measure(
+        "store (plný, eviction)", buffer,
+        lambda: [buffer.store("oig/telemetry/dev", _payload(i)) for i in range(overflow)],
+        overflow, fsync_ms, wal,
+    )
+    buffer.close()
+    print(f"  {'velikost DB':<26} {os.path.getsize(db_path) / 1024:9.0f} KiB")
+
+    started = time.perf_counter()
+    buffer = factory(db_path)
+    print(f"  {'start + úklid':<26} {(time.perf_counter() - started) * 1000:9.1f} ms")
+    _measure("flush (50/dávka)", buffer, lambda: _flush_all(buffer), messages, fsync_ms, wal)
+    buffer.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=telemetry_client.BUFFER_MAX_MESSAGES)
+    parser.add_argument("--dir", default="", help="adresář pro DB (default: dočasný)")
+    parser.add_argument("--fsync-ms", type=float, default=0.0, help="modelová cena fsync na commit (SD karta)")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+    telemetry_client.BUFFER_MAX_MESSAGES = args.messages
+
+    with tempfile.TemporaryDirectory(dir=args.dir or None) as tmp:
+        _run(
+            "původní", lambda path: _LegacyBuffer(path, args.messages),
+            Path(tmp) / "legacy.db", args.messages, args.fsync_ms, wal=False,
+        )
+        _run(
+            "TelemetryBuffer", lambda path: telemetry_client.TelemetryBuffer(db_path=path),
+            Path(tmp) / "buffer.db", args.messages, args.fsync_ms, wal=True,
+        )
+
+
+if __name__ == "__main__":
+    main()
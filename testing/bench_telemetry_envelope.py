@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Benchmark: velikost telemetrických oken – JSON vs. envelope (telemetry/envelope.py).
+
+Generuje den telemetrických oken (po 300 s) s proměnlivým počtem logů,
+statistik a session záznamů (většina oken klidných, občas burst logů)
+a porovnává velikost publikovaných zpráv: čistý JSON vs. zlib envelope
+s delta čítači a chunkováním. Vypisuje rozložení velikostí (p50/p95/max),
+počet zpráv a objem za den.
+
+Použití:
+    python testing/bench_telemetry_envelope.py [--windows 288] [--burst-every 12]
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import random
+import sys
+from typing import Any
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "addon", "oig-proxy"))
+
+import json_codec  # noqa: E402  # pylint: disable=wrong-import-position
+from telemetry.audit_latency import LogHistogram  # noqa: E402  # pylint: disable=wrong-import-position
+from telemetry.envelope import TelemetryEnvelope  # noqa: E402  # pylint: disable=wrong-import-position
+
+TABLES = ("tbl_actual", "tbl_dc_in", "tbl_ac_in", "tbl_ac_out", "tbl_batt", "tbl_boiler", "tbl_box", "tbl_events")
+
+
+def _window(i: int, burst: bool, rng: random.Random) -> dict[str, Any]:
+    logs = [
+        {
+            "timestamp": f"2026-01-01 {i * 5 // 60:02d}:{i * 5 % 60:02d}:{j % 60:02d}",
+            "level": "INFO" if j % 7 else "WARNING",
+            "message": f"Frame {TABLES[j % len(TABLES)]} forwarded to cloud (conn {1000 + i}, {rng.randint(300, 900)} B)",
+            "source": "proxy.server",
+        }
+        for j in range(rng.randint(400, 900) if burst else 0)
+    ]
+    return {
+        "device_id": "2206237016",
+        "instance_hash": "3f9c2d",
+        "version": "2.0.0",
+        "timestamp": f"2026-01-01T{i * 5 // 60:02d}:{i * 5 % 60:02d}:00Z",
+        "interval_s": 300,
+        "uptime_s": i * 300,
+        "mode": "online",
+        "configured_mode": "online",
+        "box_connected": True,
+        "box_peer": "192.168.1.50:41234",
+        "frames_received": i * 312,
+        "frames_forwarded": i * 310,
+        "cloud_connects": i * 10,
+        "cloud_disconnects": i * 10,
+        "cloud_timeouts": i // 40,
+        "cloud_errors": i // 60,
+        "cloud_online": True,
+        "mqtt_ok": True,
+        "set_commands": [],
+        "window_metrics": {
+            "logs": logs,
+            "stats": [
+                {"table": table, "mode": "online", "response": "ack", "count": rng.randint(20, 40)}
+                for table in TABLES
+            ],
+            "box_sessions": [],
+            "cloud_sessions": [
+                {"start": "2026-01-01T00:00:00Z", "duration_s": rng.randint(20, 40), "reason": "eof"}
+                for _ in range(10)
+            ],
+            "error_context": [],
+            "settings_audit": [],
+        },
+        "nack_reasons": {},
+        "frame_directions": {"box_to_proxy": 312, "cloud_to_proxy": 310, "proxy_to_box": 312},
+        "signal_distribution": {"END": 20, "ACK": 290},
+    }
+
+
+def _line(name: str, histogram: LogHistogram, messages: int) -> None:
+    print(
+        f"  {name:<10} p50 {histogram.percentile(50) / 1024:7.1f} KiB  p95 {histogram.percentile(95) / 1024:7.1f} KiB"
+        f"  max {histogram.max / 1024:7.1f} KiB  zpráv {messages:5d}  den {histogram.total / 1024 / 1024:6.2f} MiB"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--windows", type=int, default=288, help="počet oken (288 = den po 300 s)")
+    parser.add_argument("--burst-every", type=int, default=12, help="každé N-té okno obsahuje logy")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    rng = random.Random(42)
+    encoder = TelemetryEnvelope()
+    plain = LogHistogram()
+    envelope = LogHistogram()
+    envelope_messages = 0
+    for i in range(1, args.windows + 1):
+        payload = _window(i, i % args.burst_every == 0, rng)
+        plain.record(len(json_codec.dumps(payload).encode("utf-8")))
+        window = encoder.encode(payload)
+        encoder.acknowledge(window, payload)
+        envelope.record(sum(len(message) for message in window.messages))
+        envelope_messages += len(window.messages)
+
+    print(f"{args.windows} oken:")
+    _line("JSON", plain, args.windows)
+    _line("envelope", envelope, envelope_messages)
+    print(f"  poměr      {envelope.total / plain.total:.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Benchmark: TwinDelivery s mnoha souběžně sledovanými cloud Settingy.
+
+Pro N sledovaných cloud Settingů měří cenu per-frame dotazů
+(is_cloud_inflight, inflight_setting, has_pending_or_inflight) a
+hromadnou expiraci. Pro srovnání vypíše i cenu původního
+průchodu (zploštění všech deque + min() přes tracked_at).
+
+Použití:
+    python testing/bench_twin_cloud_pending.py --sizes 100,1000,5000 --calls 100000 [--devices 4]
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import sys
+import time
+from typing import Any, Callable
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "addon", "oig-proxy"))
+
+from twin.delivery import TwinDelivery  # noqa: E402  # pylint: disable=wrong-import-position
+from twin.state import TwinQueue  # noqa: E402  # pylint: disable=wrong-import-position
+
+
+def _per_call_us(func: Callable[[], Any], calls: int) -> float:
+    started = time.perf_counter()
+    for _ in range(calls):
+        func()
+    return (time.perf_counter() - started) / calls * 1e6
+
+
+def _legacy_scan(delivery: TwinDelivery) -> Any:
+    entries = []
+    for queue in delivery._cloud_pending.values():  # pylint: disable=protected-access
+        entries.extend(queue)
+    return min(entries, key=lambda pending: pending.tracked_at) if entries else None
+
+
+def _populate(delivery: TwinDelivery, size: int, devices: int) -> None:
+    for i in range(size):
+        delivery.begin_cloud_setting(
+            device_id=f"dev_{i % devices}",
+            table="tbl_box_prms",
+            key=f"KEY_{i}",
+            value=i,
+            raw_text="",
+        )
+
+
+def _bench(size: int, calls: int, devices: int) -> None:
+    delivery = TwinDelivery(TwinQueue(), None, inflight_timeout_s=3600.0)  # type: ignore[arg-type]
+    _populate(delivery, size, devices)
+
+    print(f"N={size}:")
+    for label, func in (
+        ("is_cloud_inflight", delivery.is_cloud_inflight),
+        ("inflight_setting", delivery.inflight_setting),
+        ("has_pending_or_inflight", delivery.has_pending_or_inflight),
+        ("původní zploštění + min()", lambda: _legacy_scan(delivery)),
+    ):
+        scaled = calls if "původní" not in label else max(1, calls * 100 // max(size, 100))
+        print(f"  {label:<28} {_per_call_us(func, scaled):9.3f} µs/volání")
+
+    later = time.monotonic() + 7200.0
+    with mock.patch("twin.delivery.time.monotonic", return_value=later):
+        started = time.perf_counter()
+        delivery.is_cloud_inflight()
+        expire_ms = (time.perf_counter() - started) * 1000
+    print(f"  {'expirace všech':<28} {expire_ms:9.1f} ms ({expire_ms * 1000 / size:.2f} µs/položka)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="100,1000,5000", help="čárkou oddělené počty sledovaných Settingů")
+    parser.add_argument("--calls", type=int, default=100000)
+    parser.add_argument("--devices", type=int, default=4)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    for size in (int(s) for s in args.sizes.split(",") if s.strip()):
+        _bench(size, args.calls, args.devices)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Benchmark: time-to-confirm lokálních Settingů pro různá delivery okna.
+
+Simulovaný BOX (jako mock_box_client.py, ale rozumí Setting framům) posílá
+cyklicky IsNewSet/IsNewWeather/IsNewFW polly přímo do
+ProxyServer._pipe_box_to_cloud() a na každý injektovaný Setting odpoví po
+``--ack-ms`` ACKem ``Reason=Setting`` s ``ID_Set`` (volitelně NACKem).
+Měří se čas od startu do potvrzení každého Settingu – výchozí sada jsou
+hranice zón bojleru ZONE1_S…ZONE4_E.
+
+Použití:
+    python testing/bench_twin_delivery.py --windows 1,2,4,8 --poll-ms 100 --ack-ms 250 [--nack-rate 0.1]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import os
+import secrets
+import statistics
+import sys
+import time
+from typing import Any
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "addon", "oig-proxy"))
+
+from config import Config  # noqa: E402  # pylint: disable=wrong-import-position
+from protocol.frame import build_frame, extract_frame_from_buffer  # noqa: E402  # pylint: disable=wrong-import-position
+from proxy.server import ProxyServer, _extract_id_set  # noqa: E402  # pylint: disable=wrong-import-position
+from twin.delivery import TwinDelivery  # noqa: E402  # pylint: disable=wrong-import-position
+from twin.state import TwinQueue  # noqa: E402  # pylint: disable=wrong-import-position
+
+DEVICE_ID = "2206237016"
+ZONE_KEYS = [f"ZONE{zone}_{edge}" for zone in range(1, 5) for edge in ("S", "E")]
+POLL_TABLES = ("IsNewSet", "IsNewWeather", "IsNewFW")
+
+
+class _NullWriter:
+    def write(self, _data: bytes) -> None:
+        return None
+
+    async def drain(self) -> None:
+        return None
+
+    def can_write_eof(self) -> bool:
+        return False
+
+
+class _BoxWriter:
+    """Proxy -> BOX směr: předává framy simulovanému BOXu."""
+
+    def __init__(self, box: "_SettingBox") -> None:
+        self._box = box
+        self._buf = bytearray()
+
+    def write(self, data: bytes) -> None:
+        self._buf.extend(data)
+        while (frame := extract_frame_from_buffer(self._buf)) is not None:
+            self._box.on_frame(frame.decode("utf-8", errors="replace"))
+
+    async def drain(self) -> None:
+        return None
+
+
+class _SettingBox:
+    def __init__(self, reader: asyncio.StreamReader, ack_s: float, nack_rate: float) -> None:
+        self._reader = reader
+        self._ack_s = ack_s
+        self._nack_rate = nack_rate
+        self._rng = secrets.SystemRandom()
+        self.settings_received = 0
+        self.nacks = 0
+
+    def _feed(self, inner: str) -> None:
+        self._reader.feed_data(build_frame(f"<ID_Device>{DEVICE_ID}</ID_Device>{inner}").encode("utf-8"))
+
+    def poll(self, index: int) -> None:
+        self._feed(f"<TblName>{POLL_TABLES[index % len(POLL_TABLES)]}</TblName>")
+
+    def on_frame(self, frame_text: str) -> None:
+        if "<Reason>Setting</Reason>" not in frame_text:
+            return
+        self.settings_received += 1
+        id_set = _extract_id_set(frame_text)
+        result = "ACK"
+        if self._rng.random() < self._nack_rate:
+            result = "NACK"
+            self.nacks += 1
+        asyncio.get_running_loop().call_later(
+            self._ack_s,
+            self._feed,
+            f"<Result>{result}</Result><ID_Set>{id_set}</ID_Set><Reason>Setting</Reason>",
+        )
+
+
+async def _run(window: int, poll_s: float, ack_s: float, nack_rate: float, timeout_s: float) -> dict[str, Any]:
+    queue = TwinQueue()
+    for i, key in enumerate(ZONE_KEYS):
+        queue.enqueue("tbl_boiler_prms", key, 300 + i * 15)
+    delivery = TwinDelivery(queue, None, inflight_timeout_s=timeout_s, window=window)  # type: ignore[arg-type]
+
+    started = time.perf_counter()
+    confirmed: dict[str, float] = {}
+
+    async def on_confirmed(_device_id: str, _table: str, key: str, _value: Any) -> None:
+        confirmed.setdefault(key, time.perf_counter() - started)
+
+    server = ProxyServer(Config(), on_confirmed_setting=on_confirmed, twin_delivery=delivery)
+    reader = asyncio.StreamReader()
+    box = _SettingBox(reader, ack_s, nack_rate)
+    pipe = asyncio.create_task(server._pipe_box_to_cloud(  # pylint: disable=protected-access
+        reader, _NullWriter(), _BoxWriter(box), session_id="bench",  # type: ignore[arg-type]
+    ))
+
+    polls = 0
+    deadline = started + timeout_s
+    while queue.size() > 0 and time.perf_counter() < deadline:
+        box.poll(polls)
+        polls += 1
+        await asyncio.sleep(poll_s)
+    reader.feed_eof()
+    await pipe
+
+    latencies = sorted(confirmed.values())
+    return {
+        "window": window,
+        "polls": polls,
+        "confirmed": len(latencies),
+        "nacks": box.nacks,
+        "fallbacks": delivery.nack_fallbacks,
+        "p50_s": statistics.median(latencies) if latencies else 0.0,
+        "all_s": latencies[-1] if latencies else 0.0,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--windows", default="1,2,4,8", help="čárkou oddělená delivery okna")
+    parser.add_argument("--poll-ms", type=float, default=100.0, help="interval mezi polly BOXu")
+    parser.add_argument("--ack-ms", type=float, default=250.0, help="zpoždění ACK od BOXu")
+    parser.add_argument("--nack-rate", type=float, default=0.0, help="podíl Settingů, na které BOX odpoví NACK")
+    parser.add_argument("--timeout", type=float, default=30.0, help="limit běhu jednoho okna (s)")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    print(f"{len(ZONE_KEYS)} Settingů, poll {args.poll_ms:.0f} ms, ACK {args.ack_ms:.0f} ms, NACK {args.nack_rate:.0%}")
+    for window in (int(w) for w in args.windows.split(",") if w.strip()):
+        result = asyncio.run(
+            _run(window, args.poll_ms / 1000.0, args.ack_ms / 1000.0, args.nack_rate, args.timeout)
+        )
+        print(
+            f"  window={result['window']}: {result['confirmed']}/{len(ZONE_KEYS)} potvrzeno, "
+            f"p50 {result['p50_s'] * 1000:7.0f} ms, vše {result['all_s'] * 1000:7.0f} ms, "
+            f"{result['polls']} pollů, NACK {result['nacks']} (fallback {result['fallbacks']}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
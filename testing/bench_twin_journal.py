@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Benchmark: perzistentní TwinQueue (twin/journal.py).
+
+Měří propustnost enqueue (čas volání na event loopu i čas do commitu na
+disk), mix supersede/acknowledge a dobu recovery po restartu s N záznamy.
+
+Použití:
+    python testing/bench_twin_journal.py --entries 10000 [--db /tmp/twin_bench.db]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "addon", "oig-proxy"))
+
+from twin.journal import TwinJournal  # noqa: E402  # pylint: disable=wrong-import-position
+from twin.state import TwinQueue  # noqa: E402  # pylint: disable=wrong-import-position
+
+
+def _bench(db_path: str, entries: int) -> None:
+    journal = TwinJournal(db_path)
+    queue = TwinQueue(journal=journal)
+
+    started = time.perf_counter()
+    for i in range(entries):
+        queue.enqueue("tbl_boiler_prms", f"KEY_{i}", i)
+    call_s = time.perf_counter() - started
+    journal.flush(timeout=60)
+    durable_s = time.perf_counter() - started
+    print(
+        f"enqueue {entries}: {call_s * 1e6 / entries:.2f} µs/op na loopu, "
+        f"{entries / durable_s:,.0f} ops/s do commitu ({journal.batches} batchů)"
+    )
+
+    started = time.perf_counter()
+    for i in range(entries):
+        queue.enqueue("tbl_boiler_prms", f"KEY_{i % 100}", -i)  # supersede
+        if i % 3 == 0:
+            queue.acknowledge("tbl_boiler_prms", f"KEY_{i}")
+    journal.flush(timeout=60)
+    mixed_s = time.perf_counter() - started
+    print(f"supersede/ack mix {entries}: {entries / mixed_s:,.0f} ops/s do commitu")
+
+    for i in range(entries):
+        queue.enqueue("tbl_boiler_prms", f"KEY_{i}", i)
+    queue.close()
+
+    started = time.perf_counter()
+    restored = TwinQueue(journal=TwinJournal(db_path))
+    recovery_ms = (time.perf_counter() - started) * 1000
+    print(f"recovery: {restored.size()} položek za {recovery_ms:.1f} ms")
+    restored.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=10000)
+    parser.add_argument("--db", default="", help="cesta k DB (default: dočasný soubor)")
+    args = parser.parse_args()
+
+    if args.db:
+        _bench(args.db, args.entries)
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        _bench(os.path.join(tmp, "twin_queue.db"), args.entries)
+
+
+if __name__ == "__main__":
+    main()
@@ -31,8 +31,11 @@ def _fetch_conn_ids(ssh_host: str, min_frames: int, limit: int) -> list[tuple[in
         f"LIMIT {int(limit)}"
     )
     py = (
-        "import sqlite3, json;"
+        "import sqlite3, json, sys;"
+        "sys.path.insert(0, '/app');"
+        "from capture.frame_codec import register_functions;"
         "c=sqlite3.connect('/data/payloads.db');"
+        "register_functions(c);"
         "cur=c.cursor();"
         f"rows=cur.execute({query!r}).fetchall();"
         "print(json.dumps(rows));"
@@ -54,8 +57,11 @@ def _fetch_session_rows(ssh_host: str, conn_id: int) -> list[dict]:
         "ORDER BY id"
     )
     py = (
-        "import sqlite3, json;"
+        "import sqlite3, json, sys;"
+        "sys.path.insert(0, '/app');"
+        "from capture.frame_codec import register_functions;"
         "c=sqlite3.connect('/data/payloads.db');"
+        "register_functions(c);"
         "cur=c.cursor();"
         f"rows=cur.execute({query!r}).fetchall();"
         "out=[];"
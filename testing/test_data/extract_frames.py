@@ -2,13 +2,19 @@
 """
 Extrahuje reálné frames z payloads.db pro testování.
 
-Vytvoří JSON soubory s frames které můžeme přehrát v testech.
+Vytvoří JSON soubory s frames které můžeme přehrát v testech. Funguje
+s oběma formáty capture DB (CAPTURE_FORMAT=legacy i compact).
 """
 
 import json
 import sqlite3
+import sys
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "addon" / "oig-proxy"))
+
+from capture.frame_codec import register_functions  # noqa: E402  # pylint: disable=wrong-import-position
+
 DB_PATH = Path(__file__).parent.parent.parent / "analysis" / "payloads.db"
 
 
@@ -20,6 +26,7 @@ def extract_frames(db_path: str, limit: int = 100, direction: str = "box_to_prox
         return []
 
     conn = sqlite3.connect(db_path)
+    register_functions(conn)  # kompaktní DB: view frames dekóduje raw/parsed
     cursor = conn.cursor()
 
     # Get frames
@@ -56,6 +63,7 @@ def extract_by_table(db_path: str, table_name: str, limit: int = 50):
     """Extrahuje frames pro konkrétní tabulku."""
 
     conn = sqlite3.connect(db_path)
+    register_functions(conn)  # kompaktní DB: view frames dekóduje raw/parsed
     cursor = conn.cursor()
 
     query = """
@@ -16,12 +16,18 @@ Exit codes:
 
 import argparse
 import json
+import os
 import sqlite3
 import sys
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any
 
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "addon", "oig-proxy"))
+
+from capture.frame_capture import count_by_table  # noqa: E402  # pylint: disable=wrong-import-position
+from capture.frame_codec import register_functions  # noqa: E402  # pylint: disable=wrong-import-position
+
 REQUIRED_COLUMNS: list[str] = ["id", "ts", "device_id", "table_name", "direction"]
 
 DEFAULT_MIN_FRAME_COUNT: int = 1000
@@ -43,17 +49,19 @@ def open_db(db_path: str) -> sqlite3.Connection | None:
     """Open SQLite; tries URI read-only first, falls back to normal open."""
     try:
         conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
-        return conn
     except (sqlite3.OperationalError, sqlite3.DatabaseError):
         try:
-            return sqlite3.connect(db_path)
+            conn = sqlite3.connect(db_path)
         except (sqlite3.Error, OSError):
             return None
+    # Compact capture DBs expose frames as a view over decoding functions.
+    register_functions(conn)
+    return conn
 
 
 def _table_exists(conn: sqlite3.Connection) -> bool:
     cur = conn.execute(
-        "SELECT name FROM sqlite_master WHERE type='table' AND name='frames'"
+        "SELECT name FROM sqlite_master WHERE type IN ('table', 'view') AND name='frames'"
     )
     return cur.fetchone() is not None
 
@@ -110,23 +118,11 @@ def check_frame_count(conn: sqlite3.Connection, min_count: int) -> dict[str, Any
 def check_required_signals(
     conn: sqlite3.Connection, required_signals: list[str]
 ) -> dict[str, Any]:
-    placeholders = ",".join("?" * len(required_signals))
-    found = {
-        row[0]
-        for row in conn.execute(
-            f"SELECT DISTINCT table_name FROM frames WHERE table_name IN ({placeholders})",
-            required_signals,
-        )
-    }
+    # One grouped query; on capture DBs it is served by idx_frames_table_ts.
+    signal_counts = count_by_table(conn, required_signals)
+    found = {sig for sig, count in signal_counts.items() if count}
     missing = [s for s in required_signals if s not in found]
 
-    signal_counts = {
-        sig: conn.execute(
-            "SELECT COUNT(*) FROM frames WHERE table_name = ?", (sig,)
-        ).fetchone()[0] or 0
-        for sig in required_signals
-    }
-
     passed = len(missing) == 0
     return {
         "check": "required_signal_classes",
@@ -45,14 +45,26 @@ def make_config():
         cfg.mqtt_namespace = "oig_local"
         cfg.mqtt_qos = 1
         cfg.mqtt_state_retain = True
+        cfg.mqtt_async_transport = False
+        cfg.discovery_cache_path = ""
+        cfg.discovery_mode = "entity"
+        cfg.twin_queue_path = ""
+        cfg.settings_audit_db_path = ""
+        cfg.settings_audit_retention_days = 30
+        cfg.twin_delivery_window = 1
+        cfg.twin_priority_keys = ""
 
         cfg.log_level = "DEBUG"
         cfg.telemetry_enabled = False
         cfg.telemetry_mqtt_broker = "telemetry.muriel-cz.cz:1883"
         cfg.telemetry_interval_s = 300
+        cfg.telemetry_log_level = "DEBUG"
+        cfg.telemetry_payload_format = "json"
         cfg.proxy_status_interval = 60
         cfg.proxy_device_id = "oig_proxy"
         cfg.sensor_map_path = "/data/sensor_map.json"
+        cfg.sensor_map_cache_path = ""
+        cfg.map_reload_seconds = 0
         cfg.max_concurrent_connections = 100
         cfg.dns_upstream = "8.8.8.8"
 
@@ -0,0 +1,144 @@
+"""
+Testy pro telemetry/audit_latency.py — korelace audit kroků a histogramy latence.
+"""
+# pylint: disable=protected-access
+from __future__ import annotations
+
+# pyright: reportMissingImports=false
+
+from telemetry.audit_latency import AuditLatencyAggregator, LogHistogram
+from telemetry.collector import TelemetryCollector
+from telemetry.settings_audit import SettingStep
+
+
+def _rec(audit_id: str, step: SettingStep, key: str = "MODE") -> dict:
+    return {"audit_id": audit_id, "step": step.value, "table": "tbl_box_prms", "key": key}
+
+
+def _full_cycle(agg: AuditLatencyAggregator, audit_id: str, start: float, key: str = "MODE") -> None:
+    for offset, step in (
+        (0.0, SettingStep.INCOMING),
+        (0.0, SettingStep.ENQUEUED),
+        (0.5, SettingStep.DELIVER_SELECTED),
+        (0.6, SettingStep.INJECTED_BOX),
+        (0.9, SettingStep.ACK_BOX_OBSERVED),
+        (2.6, SettingStep.ACK_TBL_EVENTS),
+    ):
+        agg.observe(_rec(audit_id, step, key), now=start + offset)
+
+
+def test_log_histogram_percentiles_within_bucket_error():
+    hist = LogHistogram()
+    for value in range(1, 1001):
+        hist.record(float(value))
+
+    assert hist.count == 1000
+    assert abs(hist.percentile(50) - 500) / 500 < 0.05
+    assert abs(hist.percentile(99) - 990) / 990 < 0.05
+    assert hist.percentile(100) <= 1000
+    summary = hist.summary()
+    assert summary["max_ms"] == 1000.0
+    assert summary["mean_ms"] == 500.5
+
+
+def test_log_histogram_empty_and_zero():
+    hist = LogHistogram()
+    assert hist.percentile(95) == 0.0
+    hist.record(0.0)
+    assert hist.percentile(50) == 0.0
+
+
+def test_aggregator_records_transitions_and_drops_track_on_final_step():
+    agg = AuditLatencyAggregator()
+    _full_cycle(agg, "aud_1", start=100.0)
+
+    assert agg.tracked() == 0
+    fields = agg.status_fields()
+    assert abs(fields["setting_queue_wait_p50_ms"] - 500) / 500 < 0.05
+    assert abs(fields["setting_injection_wait_p50_ms"] - 100) / 100 < 0.05
+    assert abs(fields["setting_box_ack_p50_ms"] - 300) / 300 < 0.05
+    assert abs(fields["setting_tbl_events_confirm_p50_ms"] - 2000) / 2000 < 0.05
+    assert abs(fields["setting_end_to_end_p95_ms"] - 2600) / 2600 < 0.05
+
+
+def test_aggregator_window_snapshot_resets_but_totals_remain():
+    agg = AuditLatencyAggregator()
+    _full_cycle(agg, "aud_1", start=0.0, key="MODE")
+    _full_cycle(agg, "aud_2", start=10.0, key="BAT_MIN")
+
+    snap = agg.snapshot_window()
+    assert snap["transitions"]["queue_wait"]["count"] == 2
+    assert set(snap["per_key"]) == {"tbl_box_prms:MODE", "tbl_box_prms:BAT_MIN"}
+    assert snap["per_key"]["tbl_box_prms:MODE"]["end_to_end"]["count"] == 1
+
+    empty = agg.snapshot_window()
+    assert empty["transitions"] == {}
+    assert empty["per_key"] == {}
+    assert agg._total["queue_wait"].count == 2
+
+
+def test_aggregator_evicts_by_ttl_and_capacity():
+    agg = AuditLatencyAggregator(ttl_s=60.0, max_tracked=3)
+    for i in range(5):
+        agg.observe(_rec(f"aud_{i}", SettingStep.INCOMING), now=float(i))
+    assert agg.tracked() == 3
+    assert agg.evicted == 2
+
+    agg.observe(_rec("aud_late", SettingStep.INCOMING), now=1000.0)
+    assert agg.tracked() == 1
+    assert agg.evicted == 5
+
+    # Po evikci chybí začátek přechodu -> nic se nezaznamená.
+    agg.observe(_rec("aud_4", SettingStep.ACK_TBL_EVENTS), now=1001.0)
+    assert agg.status_fields() == {}
+
+
+def test_aggregator_evicts_stale_batches():
+    agg = AuditLatencyAggregator(ttl_s=60.0)
+    agg.observe({**_rec("aud_1", SettingStep.INCOMING), "batch_id": "bat_old"}, now=0.0)
+    agg.observe({**_rec("aud_2", SettingStep.INCOMING), "batch_id": "bat_new"}, now=30.0)
+
+    agg.observe(_rec("aud_3", SettingStep.INCOMING), now=70.0)
+
+    assert list(agg._batches) == ["bat_new"]
+
+
+def test_aggregator_caps_per_key_series():
+    agg = AuditLatencyAggregator(max_series=2)
+    for i in range(4):
+        _full_cycle(agg, f"aud_{i}", start=float(i * 10), key=f"KEY_{i}")
+    assert list(agg.snapshot_window()["per_key"]) == ["tbl_box_prms:KEY_2", "tbl_box_prms:KEY_3"]
+
+
+def test_aggregator_reports_batch_completion_after_last_setting():
+    agg = AuditLatencyAggregator()
+    for audit_id in ("aud_1", "aud_2"):
+        agg.observe({**_rec(audit_id, SettingStep.INCOMING), "batch_id": "bat_1"}, now=0.0)
+        agg.observe({**_rec(audit_id, SettingStep.ENQUEUED), "batch_id": "bat_1"}, now=0.0)
+
+    agg.observe({**_rec("aud_1", SettingStep.ACK_TBL_EVENTS), "batch_id": "bat_1"}, now=1.0)
+    assert "setting_batch_complete_p50_ms" not in agg.status_fields()
+
+    agg.observe({**_rec("aud_2", SettingStep.NACK), "batch_id": "bat_1"}, now=4.0)
+    fields = agg.status_fields()
+    assert abs(fields["setting_batch_complete_p50_ms"] - 4000) / 4000 < 0.05
+    assert agg.snapshot_window()["open_batches"] == 0
+
+
+def test_aggregator_ignores_rejected_batch():
+    agg = AuditLatencyAggregator()
+    agg.observe({**_rec("aud_1", SettingStep.INCOMING), "batch_id": "bat_1"}, now=0.0)
+    agg.observe({**_rec("aud_1", SettingStep.REJECTED_VALIDATION), "batch_id": "bat_1"}, now=0.0)
+
+    assert agg.status_fields() == {}
+    assert agg.snapshot_window()["open_batches"] == 0
+
+
+def test_collector_feeds_latency_into_window_metrics():
+    collector = TelemetryCollector(interval_s=300, telemetry_enabled=False)
+    for step in (SettingStep.INCOMING, SettingStep.ENQUEUED, SettingStep.DELIVER_SELECTED):
+        collector.record_setting_audit_step(_rec("aud_1", step))
+
+    metrics = collector._collect_and_clear_window_metrics([])
+    assert metrics["setting_latency"]["transitions"]["queue_wait"]["count"] == 1
+    assert metrics["setting_latency"]["tracked"] == 1
@@ -0,0 +1,239 @@
+"""
+Testy pro telemetry/audit_store.py — lokální SQLite úložiště settings auditu.
+"""
+# pylint: disable=protected-access
+from __future__ import annotations
+
+# pyright: reportMissingImports=false
+
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+from telemetry import audit_store as audit_store_mod
+from telemetry.audit_store import AuditQueryHandler, SettingsAuditStore
+
+
+def _record(audit_id: str, step: str, *, key: str = "T_Room", device_id: str = "DEV1", result: str = "pending") -> dict:
+    return {
+        "audit_id": audit_id,
+        "batch_id": "",
+        "device_id": device_id,
+        "table": "tbl_set",
+        "key": key,
+        "step": step,
+        "result": result,
+        "value_text": "22",
+    }
+
+
+@pytest.fixture
+def store(tmp_path):
+    instance = SettingsAuditStore(str(tmp_path / "audit.db"))
+    instance.start()
+    yield instance
+    instance.stop()
+
+
+def test_lifecycle_returns_steps_in_order(store):
+    store.put(_record("aud_1", "incoming"))
+    store.put(_record("aud_2", "incoming", key="T_Boiler"))
+    store.put(_record("aud_1", "enqueued"))
+    store.put(_record("aud_1", "ack_box_observed", result="confirmed"))
+    assert store.flush()
+
+    steps = [r["step"] for r in store.lifecycle("aud_1")]
+    assert steps == ["incoming", "enqueued", "ack_box_observed"]
+    assert store.lifecycle("aud_missing") == []
+    assert store.records_written == 4
+    assert all("ts_ms" in r for r in store.lifecycle("aud_2"))
+
+
+def test_query_filters_and_limit(store):
+    for idx in range(5):
+        store.put(_record(f"aud_{idx}", "incoming", key="T_Room" if idx % 2 else "T_Boiler"))
+    store.put(_record("aud_x", "incoming", device_id="DEV2"))
+    assert store.flush()
+
+    room = store.query(device_id="DEV1", table="tbl_set", key="T_Room")
+    assert [r["audit_id"] for r in room] == ["aud_3", "aud_1"]
+    assert len(store.query(limit=2)) == 2
+    assert len(store.query(device_id="DEV1", step="incoming")) == 5
+    assert store.query(since_ms=int(time.time() * 1000) + 60_000) == []
+    assert store.query(device_id="DEV1", key=None, step="")  # prázdné filtry se ignorují
+
+
+def test_query_rejects_unknown_filter(store):
+    with pytest.raises(ValueError, match="unknown audit query filter"):
+        store.query(value_text="22")
+
+
+def test_schema_has_lookup_indexes(store):
+    conn = sqlite3.connect(store.db_path)
+    names = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    plan = conn.execute(
+        "EXPLAIN QUERY PLAN SELECT record FROM settings_audit WHERE audit_id = ? ORDER BY id", ("aud_1",)
+    ).fetchall()
+    conn.close()
+    assert {"idx_settings_audit_audit_id", "idx_settings_audit_setting", "idx_settings_audit_step"} <= names
+    assert "idx_settings_audit_audit_id" in " ".join(str(row[-1]) for row in plan)
+
+
+def test_prune_deletes_expired_head(tmp_path):
+    store = SettingsAuditStore(str(tmp_path / "audit.db"), retention_days=1)
+    assert store._ensure_schema()
+    now_ms = int(time.time() * 1000)
+    conn = sqlite3.connect(store.db_path)
+    conn.executemany(
+        audit_store_mod._INSERT_SQL,
+        [
+            audit_store_mod._row(now_ms - 3 * 86_400_000, _record("aud_old", "incoming")),
+            audit_store_mod._row(now_ms - 2 * 86_400_000, _record("aud_old", "timeout", result="failed")),
+            audit_store_mod._row(now_ms, _record("aud_new", "incoming")),
+        ],
+    )
+    conn.commit()
+
+    store._prune(conn)
+    remaining = [row[0] for row in conn.execute("SELECT audit_id FROM settings_audit")]
+    conn.close()
+    store.stop()
+    assert remaining == ["aud_new"]
+
+
+def test_put_without_start_is_noop(tmp_path):
+    store = SettingsAuditStore(str(tmp_path / "audit.db"))
+    store.put(_record("aud_1", "incoming"))
+    assert store._queue.qsize() == 0
+    assert store.flush() is False
+
+
+def test_put_counts_drops_when_queue_full(tmp_path, monkeypatch):
+    monkeypatch.setattr(SettingsAuditStore, "QUEUE_MAX", 1)
+    store = SettingsAuditStore(str(tmp_path / "audit.db"))
+    store._thread = MagicMock()  # writer neběží, fronta se neplní
+    store.put(_record("aud_1", "incoming"))
+    store.put(_record("aud_2", "incoming"))
+    assert store.dropped == 1
+
+
+def _handler(store):
+    mqtt = MagicMock()
+    mqtt.is_ready.return_value = True
+    mqtt.subscribe.return_value = True
+    handler = AuditQueryHandler(mqtt, store)
+    handler.start()
+    return handler, mqtt
+
+
+def _response(mqtt):
+    topic, payload = mqtt.publish_message.call_args.args
+    return topic, json.loads(payload)
+
+
+def test_handler_subscribes_and_unsubscribes(store):
+    handler, mqtt = _handler(store)
+    mqtt.subscribe.assert_called_once_with("oig_local/+/audit/query", handler._on_message)
+    handler.stop()
+    mqtt.unsubscribe.assert_called_once_with("oig_local/+/audit/query")
+
+
+def test_handler_uses_configured_namespace(store):
+    store.put(_record("aud_1", "incoming"))
+    assert store.flush()
+    mqtt = MagicMock()
+    mqtt.is_ready.return_value = True
+    mqtt.subscribe.return_value = True
+    handler = AuditQueryHandler(mqtt, store, namespace="oig_home")
+    handler.start()
+    mqtt.subscribe.assert_called_once_with("oig_home/+/audit/query", handler._on_message)
+
+    handler._on_message("oig_home/DEV1/audit/query", b'{"audit_id": "aud_1"}')
+
+    topic, response = _response(mqtt)
+    assert topic == "oig_home/DEV1/audit/response"
+    assert response["count"] == 1
+
+
+def test_handler_answers_lifecycle_request(store):
+    store.put(_record("aud_1", "incoming"))
+    store.put(_record("aud_1", "enqueued"))
+    assert store.flush()
+    handler, mqtt = _handler(store)
+
+    handler._on_message("oig_local/DEV1/audit/query", b'{"audit_id": "aud_1", "request_id": "r1"}')
+
+    topic, response = _response(mqtt)
+    assert topic == "oig_local/DEV1/audit/response"
+    assert response["request_id"] == "r1"
+    assert response["count"] == 2
+    assert [r["step"] for r in response["records"]] == ["incoming", "enqueued"]
+    assert "elapsed_ms" in response
+
+
+def test_handler_defaults_device_from_topic(store):
+    store.put(_record("aud_1", "incoming"))
+    store.put(_record("aud_2", "incoming", device_id="DEV2"))
+    assert store.flush()
+    handler, mqtt = _handler(store)
+
+    handler._on_message("oig_local/DEV2/audit/query", b'{"key": "T_Room"}')
+
+    _topic, response = _response(mqtt)
+    assert [r["audit_id"] for r in response["records"]] == ["aud_2"]
+
+
+@pytest.mark.parametrize("payload", [b"not json", b"[1, 2]", b'{"bogus": 1}'])
+def test_handler_reports_errors(store, payload):
+    handler, mqtt = _handler(store)
+    handler._on_message("oig_local/DEV1/audit/query", payload)
+    _topic, response = _response(mqtt)
+    assert "error" in response
+    assert "records" not in response
+
+
+@pytest.mark.asyncio
+async def test_handler_runs_lookup_off_event_loop(store):
+    store.put(_record("aud_1", "incoming"))
+    assert store.flush()
+    handler, mqtt = _handler(store)
+    loop_thread = threading.current_thread()
+    lookup_threads = []
+    original = store.lifecycle
+
+    def lifecycle(audit_id):
+        lookup_threads.append(threading.current_thread())
+        return original(audit_id)
+
+    store.lifecycle = lifecycle
+
+    handler._on_message("oig_local/DEV1/audit/query", b'{"audit_id": "aud_1"}')
+    mqtt.publish_message.assert_not_called()
+    for _ in range(100):
+        if mqtt.publish_message.called:
+            break
+        await asyncio.sleep(0.01)
+
+    assert lookup_threads and lookup_threads[0] is not loop_thread
+    topic, response = _response(mqtt)
+    assert topic == "oig_local/DEV1/audit/response"
+    assert response["count"] == 1
+    handler.stop()
+
+
+def test_cli_prints_lifecycle(store, capsys):
+    store.put(_record("aud_1", "incoming"))
+    store.put(_record("aud_1", "enqueued"))
+    assert store.flush()
+
+    assert audit_store_mod.main([store.db_path, "--audit-id", "aud_1"]) == 0
+
+    captured = capsys.readouterr()
+    lines = captured.out.strip().splitlines()
+    assert [json.loads(line)["step"] for line in lines] == ["incoming", "enqueued"]
+    assert "2 records" in captured.err
@@ -8,6 +8,7 @@ from __future__ import annotations
 import asyncio
 import base64
 import io
+import json
 import queue
 import sqlite3
 from pathlib import Path
@@ -17,7 +18,9 @@ from unittest.mock import AsyncMock
 import pytest
 
 from capture import frame_capture
+from capture import frame_codec
 from capture import pcap_capture
+from protocol.parser import parse_xml_frame
 
 
 def _create_frames_table(conn: sqlite3.Connection) -> None:
@@ -34,7 +37,8 @@ def _create_frames_table(conn: sqlite3.Connection) -> None:
             direction TEXT,
             conn_id INTEGER,
             peer TEXT,
-            length INTEGER
+            length INTEGER,
+            ts_ms INTEGER
         )
         """
     )
@@ -47,6 +51,7 @@ def test_frame_capture_start_capture_stop_and_schema_upgrade(tmp_path: Path) ->
         db_path=str(db_path),
         capture_raw_bytes=True,
         retention_days=0,
+        capture_format="legacy",
     )
     capture.start()
     capture.capture(
@@ -73,7 +78,7 @@ def test_frame_capture_start_capture_stop_and_schema_upgrade(tmp_path: Path) ->
     assert row[1] == "tbl_set"
     assert row[2] == "<Frame>payload</Frame>"
     assert row[3] == base64.b64encode(b"\x01\x02").decode("ascii")
-    assert row[4] == '{"value": 1}'
+    assert json.loads(row[4]) == {"value": 1}
     assert row[5:] == ("box_to_proxy", 7, "1.2.3.4:5710", 2)
 
     legacy_db = tmp_path / "legacy.db"
@@ -202,6 +207,320 @@ def test_frame_capture_stop_queue_full_and_prune_failure(tmp_path: Path) -> None
     frame_capture._prune_db(BadConn(), retention_days=1)
 
 
+def _legacy_frames_db(db_path: Path, count: int) -> None:
+    conn = sqlite3.connect(db_path)
+    conn.execute(
+        """
+        CREATE TABLE frames (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ts TEXT,
+            device_id TEXT,
+            table_name TEXT,
+            raw TEXT,
+            parsed TEXT
+        )
+        """
+    )
+    conn.executemany(
+        "INSERT INTO frames (ts, device_id, table_name, raw, parsed) VALUES (?,?,?,?,?)",
+        [(f"2026-01-01T00:00:{idx:02d}+00:00", "dev", "tbl_actual", "raw", "{}") for idx in range(count)],
+    )
+    conn.commit()
+    conn.close()
+
+
+def test_frame_capture_new_legacy_db_gets_indexes_and_ts_ms(tmp_path: Path) -> None:
+    db_path = tmp_path / "new.db"
+    capture = frame_capture.FrameCapture(db_path=str(db_path), retention_days=0, capture_format="legacy")
+    capture.start()
+    capture.capture("dev", "tbl_actual", "raw", None, {}, conn_id=3)
+    capture.stop()
+
+    conn = sqlite3.connect(db_path)
+    ts, ts_ms = conn.execute("SELECT ts, ts_ms FROM frames").fetchone()
+    assert frame_capture.ts_index_ready(conn) is True
+    assert frame_capture._index_names(conn) >= {"idx_frames_conn_id", "idx_frames_table_ts", "idx_frames_ts_ms"}
+    conn.close()
+    assert capture._backfill is None
+    assert frame_capture._iso_from_ms(ts_ms) == ts
+
+
+def test_frame_capture_migrates_legacy_db_in_chunks(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    db_path = tmp_path / "legacy.db"
+    _legacy_frames_db(db_path, 25)
+    monkeypatch.setattr(frame_capture, "BACKFILL_CHUNK_ROWS", 10)
+    capture = frame_capture.FrameCapture(db_path=str(db_path))
+    capture._ensure_schema()
+    assert capture._backfill == (1, 26)
+
+    conn = sqlite3.connect(db_path)
+    capture._migrate_step(conn)
+    assert conn.execute("SELECT COUNT(*) FROM frames WHERE ts_ms IS NULL").fetchone()[0] == 15
+    assert frame_capture.ts_index_ready(conn) is False
+    for _ in range(10):
+        capture._migrate_step(conn)
+
+    assert capture._backfill is None
+    assert frame_capture.ts_index_ready(conn) is True
+    assert conn.execute("SELECT COUNT(*) FROM frames WHERE ts_ms IS NULL").fetchone()[0] == 0
+    assert conn.execute("SELECT ts_ms FROM frames WHERE id = 6").fetchone()[0] == 1_767_225_605_000
+    conn.close()
+
+
+def test_prune_db_uses_ts_ms_index(tmp_path: Path) -> None:
+    conn = sqlite3.connect(tmp_path / "prune.db")
+    _create_frames_table(conn)
+    frame_capture._create_indexes(conn)
+    plan = " ".join(
+        str(row[-1]) for row in conn.execute("EXPLAIN QUERY PLAN DELETE FROM frames WHERE ts_ms < ?", (0,))
+    )
+    conn.close()
+    assert "idx_frames_ts_ms" in plan
+
+
+def test_select_frames_and_count_by_table(tmp_path: Path) -> None:
+    db_path = tmp_path / "legacy.db"
+    _legacy_frames_db(db_path, 20)
+    start_ms = 1_767_225_600_000  # 2026-01-01T00:00:00Z
+
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    legacy_rows = frame_capture.select_frames(conn, start_ms + 5_000, start_ms + 10_000).fetchall()
+    assert [row["id"] for row in legacy_rows] == [6, 7, 8, 9, 10]
+    assert "ts_ms" not in legacy_rows[0].keys()
+    conn.close()
+
+    capture = frame_capture.FrameCapture(db_path=str(db_path))
+    capture._ensure_schema()
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    while capture._backfill is not None:
+        capture._migrate_step(conn)
+    conn.execute(
+        "INSERT INTO frames (ts, table_name, conn_id, ts_ms) VALUES (?, 'END', 9, ?)",
+        ("2026-01-01T00:00:07+00:00", start_ms + 7_000),
+    )
+
+    rows = frame_capture.select_frames(conn, start_ms + 5_000, start_ms + 10_000).fetchall()
+    assert [row["id"] for row in rows] == [6, 7, 8, 21, 9, 10]
+    assert [row["id"] for row in frame_capture.select_frames(conn, start_ms, start_ms + 60_000, table_name="END")] == [21]
+    assert [row["id"] for row in frame_capture.select_frames(conn, start_ms, start_ms + 60_000, conn_id=9)] == [21]
+    plan = " ".join(
+        str(row[-1])
+        for row in conn.execute(
+            "EXPLAIN QUERY PLAN SELECT id FROM frames WHERE ts_ms >= ? AND ts_ms < ? AND table_name = ? ORDER BY ts_ms, id",
+            (0, 1, "END"),
+        )
+    )
+    assert "idx_frames_table_ts" in plan
+    assert frame_capture.count_by_table(conn, ["tbl_actual", "END", "ACK"]) == {"tbl_actual": 20, "END": 1, "ACK": 0}
+    assert frame_capture.count_by_table(conn, []) == {}
+    conn.close()
+
+
+_FRAME = (
+    "<Frame><TblName>tbl_actual</TblName><ID_Set>836339341</ID_Set><DT>2025-12-07 20:29:01</DT>"
+    "<Reason>Table</Reason><ID_Device>2206237016</ID_Device><Temp>26.50</Temp><CRC>16833</CRC></Frame>\r\n"
+)
+
+
+def _compact_conn(db_path: Path) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path)
+    frame_codec.register_functions(conn)
+    return conn
+
+
+def test_frame_capture_compact_view_exposes_legacy_columns(tmp_path: Path) -> None:
+    db_path = tmp_path / "compact.db"
+    capture = frame_capture.FrameCapture(db_path=str(db_path), capture_raw_bytes=True, retention_days=0, capture_format="compact")
+    capture.start()
+    capture.capture("dev", "tbl_actual", _FRAME, _FRAME.encode(), {"ignored": 1}, "box_to_proxy", 7, "1.2.3.4:5710", 10)
+    capture.capture("dev", "END", "<Frame><Result>END</Result></Frame>", None, {}, "cloud_to_proxy", 7)
+    capture.stop()
+
+    conn = _compact_conn(db_path)
+    rows = conn.execute(
+        "SELECT ts, ts_ms, device_id, table_name, raw, raw_b64, parsed, direction, conn_id, peer, length "
+        "FROM frames ORDER BY id"
+    ).fetchall()
+    blob_sizes = [row[0] for row in conn.execute("SELECT length(data) FROM frame_blobs ORDER BY id")]
+    conn.close()
+
+    assert capture._compact is True
+    first, second = rows
+    assert first[0] == frame_capture._iso_from_ms(first[1])
+    assert first[2:5] == ("dev", "tbl_actual", _FRAME)
+    assert base64.b64decode(first[5]) == _FRAME.encode()
+    assert json.loads(first[6]) == parse_xml_frame(_FRAME)
+    assert first[7:] == ("box_to_proxy", 7, "1.2.3.4:5710", 10)
+    assert second[4] == "<Frame><Result>END</Result></Frame>"
+    assert second[5] is None  # bez raw_bytes se raw_b64 neukládá
+    assert blob_sizes[0] < len(_FRAME)
+
+
+def test_frame_capture_compact_trains_dictionary(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    monkeypatch.setattr(frame_capture, "TRAIN_SAMPLES", 3)
+    db_path = tmp_path / "compact.db"
+    capture = frame_capture.FrameCapture(db_path=str(db_path), retention_days=0, capture_format="compact")
+    capture._ensure_schema()
+    conn = sqlite3.connect(db_path)
+    capture._codec = None
+    frames = [_FRAME.replace("26.50", f"2{idx}.00") for idx in range(5)]
+    items = [(1_000 + idx, "dev", "tbl_actual", frame.encode(), 0, "box_to_proxy", 1, None, None) for idx, frame in enumerate(frames)]
+
+    frame_capture._commit_batch(conn, capture._encode_batch(conn, items[:3]), frame_capture._COMPACT_INSERT_SQL)
+    frame_capture._commit_batch(conn, capture._encode_batch(conn, items[3:]), frame_capture._COMPACT_INSERT_SQL)
+    conn.close()
+
+    conn = _compact_conn(db_path)
+    dict_ids = [row[0] for row in conn.execute("SELECT dict_id FROM frame_blobs ORDER BY id")]
+    assert conn.execute("SELECT id, samples FROM capture_dicts").fetchall() == [(1, 3)]
+    assert [row[0] for row in conn.execute("SELECT raw FROM frames ORDER BY id")] == frames
+    conn.close()
+    assert dict_ids == [None, None, None, 1, 1]
+
+
+def test_frame_capture_defaults_to_legacy_format(tmp_path: Path) -> None:
+    db_path = tmp_path / "default.db"
+    capture = frame_capture.FrameCapture(db_path=str(db_path))
+    capture._ensure_schema()
+    assert capture._compact is False
+    # Bez registrace funkcí čitelné obyčejným sqlite3.
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("SELECT COUNT(*) FROM frames").fetchone() == (0,)
+    conn.close()
+
+
+def test_frame_capture_compact_keeps_legacy_db_and_prunes_blobs(tmp_path: Path) -> None:
+    legacy_db = tmp_path / "legacy.db"
+    _legacy_frames_db(legacy_db, 1)
+    legacy = frame_capture.FrameCapture(db_path=str(legacy_db), capture_format="compact")
+    legacy._ensure_schema()
+    assert legacy._compact is False
+
+    db_path = tmp_path / "compact.db"
+    capture = frame_capture.FrameCapture(db_path=str(db_path), capture_format="compact")
+    capture._ensure_schema()
+    conn = sqlite3.connect(db_path)
+    now_ms = int(frame_capture.time.time() * 1000)
+    rows = capture._encode_batch(conn, [
+        (now_ms - 3 * 86_400_000, "old", "tbl", b"<Frame/>", 0, None, None, None, None),
+        (now_ms, "new", "tbl", b"<Frame/>", 0, None, None, None, None),
+    ])
+    frame_capture._commit_batch(conn, rows, frame_capture._COMPACT_INSERT_SQL)
+    frame_capture._prune_db(conn, retention_days=1, table="frame_blobs")
+    assert conn.execute("SELECT device_id FROM frame_blobs").fetchall() == [("new",)]
+    conn.close()
+
+    # Už kompaktní DB zůstane kompaktní i s capture_format="legacy".
+    again = frame_capture.FrameCapture(db_path=str(db_path), capture_format="legacy")
+    again._ensure_schema()
+    assert again._compact is True
+
+
+def test_select_frames_on_compact_db(tmp_path: Path) -> None:
+    db_path = tmp_path / "compact.db"
+    capture = frame_capture.FrameCapture(db_path=str(db_path), capture_format="compact")
+    capture._ensure_schema()
+    conn = sqlite3.connect(db_path)
+    rows = capture._encode_batch(conn, [
+        (1_000, "dev", "tbl_actual", _FRAME.encode(), 0, None, 1, None, None),
+        (2_000, "dev", "END", b"<Frame><Result>END</Result></Frame>", 0, None, 2, None, None),
+        (9_000, "dev", "END", b"<Frame><Result>END</Result></Frame>", 0, None, 2, None, None),
+    ])
+    frame_capture._commit_batch(conn, rows, frame_capture._COMPACT_INSERT_SQL)
+    conn.close()
+
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    assert frame_capture.ts_index_ready(conn) is True
+    selected = frame_capture.select_frames(conn, 0, 5_000).fetchall()
+    assert [row["table_name"] for row in selected] == ["tbl_actual", "END"]
+    assert selected[0]["raw"] == _FRAME
+    assert [row["id"] for row in frame_capture.select_frames(conn, 0, 10_000, table_name="END")] == [2, 3]
+    assert frame_capture.count_by_table(conn, ["END", "ACK"]) == {"END": 2, "ACK": 0}
+    plan = " ".join(
+        str(row[-1])
+        for row in conn.execute("EXPLAIN QUERY PLAN SELECT raw FROM frames WHERE ts_ms >= ? AND ts_ms < ?", (0, 1))
+    )
+    assert "idx_frame_blobs_ts_ms" in plan
+    conn.close()
+
+
+def test_convert_to_compact_preserves_frames(tmp_path: Path) -> None:
+    db_path = tmp_path / "legacy.db"
+    legacy = frame_capture.FrameCapture(db_path=str(db_path), capture_raw_bytes=True, capture_format="legacy")
+    legacy._ensure_schema()
+    conn = sqlite3.connect(db_path)
+    frame_capture._commit_batch(
+        conn,
+        [
+            ("2026-01-01T00:00:05+00:00", "dev", "tbl_actual", _FRAME, base64.b64encode(_FRAME.encode()).decode(),
+             "{}", "box_to_proxy", 3, "peer", len(_FRAME)),
+            ("2026-01-01T00:00:06+00:00", "dev", "END", "<Frame/>", None, "{}", "cloud_to_proxy", 3, None, 8),
+        ],
+    )
+    before = conn.execute("SELECT id, ts, ts_ms, raw, raw_b64, direction, conn_id, peer, length FROM frames").fetchall()
+    conn.close()
+
+    assert frame_capture.main([str(db_path), "--compact"]) == 0
+    assert frame_capture.main([str(db_path), "--compact"]) == 1  # už není starý formát
+
+    conn = _compact_conn(db_path)
+    after = conn.execute("SELECT id, ts, ts_ms, raw, raw_b64, direction, conn_id, peer, length FROM frames").fetchall()
+    kind = frame_capture._frames_kind(conn)
+    conn.close()
+    assert after == before
+    assert kind == "view"
+
+
+def test_convert_to_compact_failure_keeps_legacy_db_and_rerun_succeeds(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    db_path = tmp_path / "legacy.db"
+    legacy = frame_capture.FrameCapture(db_path=str(db_path), capture_format="legacy")
+    legacy._ensure_schema()
+    conn = sqlite3.connect(db_path)
+    frame_capture._commit_batch(
+        conn,
+        [
+            (f"2026-01-01T00:00:0{i}+00:00", "dev", "tbl_actual", _FRAME, None, "{}", "box_to_proxy", 3, None, 1)
+            for i in range(3)
+        ],
+    )
+    # Pozůstatek převodu z dřívější verze, která commitovala průběžně.
+    conn.executescript(frame_capture._COMPACT_TABLES_SQL)
+    conn.execute("INSERT INTO frame_blobs (id, ts_ms, data) VALUES (1, 0, x'00')")
+    conn.commit()
+    conn.close()
+
+    original_encode = frame_capture.FrameCodec.encode
+    calls = {"n": 0}
+
+    def failing_encode(self, data):
+        calls["n"] += 1
+        if calls["n"] == 2:
+            raise RuntimeError("disk full")
+        return original_encode(self, data)
+
+    monkeypatch.setattr(frame_capture.FrameCodec, "encode", failing_encode)
+    with pytest.raises(RuntimeError):
+        frame_capture.convert_to_compact(str(db_path), chunk_rows=1)
+    monkeypatch.setattr(frame_capture.FrameCodec, "encode", original_encode)
+
+    conn = sqlite3.connect(db_path)
+    assert frame_capture._frames_kind(conn) == "table"
+    assert conn.execute("SELECT COUNT(*) FROM capture_dicts").fetchone()[0] == 0
+    assert conn.execute("SELECT id FROM frame_blobs").fetchall() == [(1,)]
+    conn.close()
+
+    assert frame_capture.convert_to_compact(str(db_path), chunk_rows=1) == 3
+    conn = _compact_conn(db_path)
+    assert frame_capture._frames_kind(conn) == "view"
+    assert [row[0] for row in conn.execute("SELECT id FROM frames ORDER BY id")] == [1, 2, 3]
+    conn.close()
+
+
 def test_find_tcpdump_build_cmd_start_and_stop_paths(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
     monkeypatch.setattr(pcap_capture.os.path, "isfile", lambda path: path == "/usr/bin/tcpdump")
     monkeypatch.setattr(pcap_capture.os, "access", lambda path, mode: path == "/usr/bin/tcpdump")
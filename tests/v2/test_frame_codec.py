@@ -0,0 +1,81 @@
+"""
+Testy pro capture/frame_codec.py — kompaktní kódování zachycených frames.
+"""
+# pylint: disable=protected-access
+from __future__ import annotations
+
+# pyright: reportMissingImports=false
+
+import base64
+import json
+import sqlite3
+
+from capture.frame_codec import DICT_SIZE, FrameCodec, register_functions, train_dictionary
+from protocol.parser import parse_xml_frame
+
+_ACTUAL = (
+    b"<Frame><TblName>tbl_actual</TblName><ID_Set>836339341</ID_Set><DT>2025-12-07 20:29:01</DT>"
+    b"<Reason>Table</Reason><ID_Device>2206237016</ID_Device><Temp>26.50</Temp><BAT_P>-2319</BAT_P>"
+    b"<BAT_C>49</BAT_C><ver>32673</ver><CRC>16833</CRC></Frame>\r\n"
+)
+_DC_IN = (
+    b"<Frame><TblName>tbl_dc_in</TblName><ID_Set>836339400</ID_Set><DT>2025-12-07 20:30:00</DT>"
+    b"<Reason>Table</Reason><ID_Device>2206237016</ID_Device><FV_P1>0</FV_P1><FV_P2>0</FV_P2>"
+    b"<ver>26213</ver><CRC>24984</CRC></Frame>\r\n"
+)
+
+
+def test_train_dictionary_puts_most_common_shape_last():
+    newer_actual = _ACTUAL.replace(b"26.50", b"27.00")
+    zdict = train_dictionary([_ACTUAL, _DC_IN, newer_actual])
+    assert zdict == _DC_IN + newer_actual
+
+
+def test_train_dictionary_is_capped():
+    samples = [_ACTUAL.replace(b"Temp>", f"Temp{idx}>".encode()) for idx in range(200)]
+    zdict = train_dictionary(samples)
+    assert len(zdict) == DICT_SIZE
+    assert zdict.endswith(samples[-1])
+
+
+def test_codec_roundtrip_with_and_without_dictionary():
+    plain = FrameCodec()
+    plain_id, plain_blob = plain.encode(_ACTUAL)
+    assert plain_id is None
+    assert plain.decode(None, plain_blob) == _ACTUAL
+
+    trained = FrameCodec()
+    trained.use_dictionary(1, train_dictionary([_ACTUAL, _DC_IN]))
+    frame = _ACTUAL.replace(b"26.50", b"25.10").replace(b"16833", b"40001")
+    dict_id, blob = trained.encode(frame)
+    assert dict_id == 1
+    assert len(blob) < len(plain_blob) / 3
+    assert trained.decode(1, blob) == frame
+    assert trained.decode(None, plain_blob) == _ACTUAL
+
+
+def test_codec_starts_with_latest_stored_dictionary():
+    codec = FrameCodec({1: b"<Frame>", 2: train_dictionary([_ACTUAL])})
+    assert codec.dict_id == 2
+
+
+def test_register_functions_decodes_columns():
+    codec = FrameCodec()
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE capture_dicts (id INTEGER PRIMARY KEY, created_ms INTEGER, samples INTEGER, zdict BLOB)")
+    conn.execute("INSERT INTO capture_dicts VALUES (5, 0, 1, ?)", (train_dictionary([_ACTUAL]),))
+    register_functions(conn)
+
+    # Slovník přidaný po registraci se načte při prvním použití.
+    conn.execute("INSERT INTO capture_dicts VALUES (6, 0, 1, ?)", (train_dictionary([_DC_IN]),))
+    codec.use_dictionary(6, train_dictionary([_DC_IN]))
+    _dict_id, blob = codec.encode(_DC_IN)
+
+    raw, raw_b64, parsed = conn.execute(
+        "SELECT capture_raw(6, ?), capture_b64(6, ?), capture_parsed(6, ?)", (blob, blob, blob)
+    ).fetchone()
+    assert raw == _DC_IN.decode()
+    assert base64.b64decode(raw_b64) == _DC_IN
+    assert json.loads(parsed) == parse_xml_frame(raw)
+    assert conn.execute("SELECT capture_raw(NULL, NULL)").fetchone() == (None,)
+    conn.close()
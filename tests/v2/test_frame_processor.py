@@ -11,7 +11,7 @@ from unittest.mock import MagicMock, patch
 import pytest
 
 from sensor.processor import FrameProcessor
-from sensor.loader import SensorMapLoader
+from sensor.loader import SensorMapDiff, SensorMapLoader
 from mqtt.client import MQTTClient
 
 
@@ -834,3 +834,107 @@ async def test_process_mirror_merge_with_previous_mirror_state(
         "AC_OUT_V": 230,
         "LOAD_P": 700,
     }
+
+
+# -----------------------------------------------------------------------------
+# Sensor map hot reload
+# -----------------------------------------------------------------------------
+
+@pytest.mark.asyncio
+async def test_apply_sensor_map_diff_rediscovers_only_changed_entities(
+    processor: FrameProcessor, mock_mqtt: MagicMock, mock_loader: MagicMock
+) -> None:
+    mock_loader.lookup.return_value = {"name_cs": "Teplota"}
+    await processor.process("DEV01", "tbl_actual", {"Temp": 21})
+    mock_mqtt.send_discovery.reset_mock()
+    mock_mqtt.remove_discovery.return_value = 1
+
+    diff = SensorMapDiff(
+        added=[("tbl_batt", "BAT_C", {"name_cs": "SoC"})],
+        changed=[(("tbl_actual", "Temp", {"name_cs": "T"}), ("tbl_actual", "Temp", {"name_cs": "Teplota"}))],
+        removed=[("tbl_actual", "Old", {"name_cs": "Old"})],
+    )
+    stats = processor.apply_sensor_map_diff(diff)
+
+    assert stats == {"republished": 2, "removed": 1}
+    assert {c.kwargs["sensor_key"] for c in mock_mqtt.send_discovery.call_args_list} == {"BAT_C", "Temp"}
+    mock_mqtt.forget_discovery.assert_any_call("DEV01", "tbl_actual", "Temp")
+    mock_mqtt.remove_discovery.assert_called_once_with("DEV01", [("sensor", "tbl_actual", "Old", "")])
+    assert processor._last_table_values[("DEV01", "tbl_actual")] == {"Temp": 21}
+
+
+def test_apply_sensor_map_diff_tombstones_dropped_component(
+    processor: FrameProcessor, mock_mqtt: MagicMock
+) -> None:
+    processor.publish_all_discovery("DEV01")
+    diff = SensorMapDiff(
+        changed=[(("tbl_actual", "Flag", {}), ("tbl_actual", "Flag", {"is_binary": True}))],
+    )
+
+    processor.apply_sensor_map_diff(diff)
+
+    mock_mqtt.remove_discovery.assert_called_once_with("DEV01", [("sensor", "tbl_actual", "Flag", "")])
+
+
+def test_apply_sensor_map_diff_refreshes_missing_map_log_and_mirrors(
+    processor: FrameProcessor, mock_loader: MagicMock
+) -> None:
+    processor._missing_map_logged.add("tbl_batt:BAT_C")
+    mock_loader.iter_sensors.return_value = [("tbl_batt", "BAT_C", {})]
+
+    processor.apply_sensor_map_diff(SensorMapDiff(added=[("tbl_batt", "BAT_C", {})]))
+
+    assert "tbl_batt:BAT_C" not in processor._missing_map_logged
+    assert processor._actual_mirror_targets == {"BAT_C": "tbl_batt"}
+
+
+def test_republish_discovery_replays_known_devices(
+    processor: FrameProcessor, mock_mqtt: MagicMock, mock_loader: MagicMock
+) -> None:
+    mock_loader.iter_sensors.return_value = [("tbl_actual", "Temp", {"name_cs": "Teplota"})]
+    processor.publish_all_discovery("DEV01")
+    mock_mqtt.send_discovery.reset_mock()
+
+    processor.republish_discovery()
+
+    assert mock_mqtt.send_discovery.call_count == 1
+    assert mock_mqtt.send_discovery.call_args.kwargs["device_id"] == "DEV01"
+
+
+def test_seed_table_values_does_not_override_live_values(processor: FrameProcessor) -> None:
+    processor._last_table_values[("DEV01", "tbl_actual")] = {"P": 1}
+
+    processor.seed_table_values("DEV01", "tbl_actual", {"P": 900})
+    processor.seed_table_values("DEV01", "tbl_batt", {"V": 52})
+
+    assert processor._last_table_values[("DEV01", "tbl_actual")] == {"P": 1}
+    assert processor._last_table_values[("DEV01", "tbl_batt")] == {"V": 52}
+
+
+@pytest.mark.asyncio
+async def test_reported_value_live_only_ignores_warm_start_values(processor: FrameProcessor) -> None:
+    processor.seed_table_values("DEV01", "tbl_box_prms", {"MODE": 3, "SA": 1})
+
+    assert processor.reported_value("DEV01", "tbl_box_prms", "MODE") == 3
+    assert processor.reported_value("DEV01", "tbl_box_prms", "MODE", live_only=True) is None
+
+    await processor.process("DEV01", "tbl_box_prms", {"MODE": 0})
+    assert processor.reported_value("DEV01", "tbl_box_prms", "MODE", live_only=True) == 0
+    assert processor.reported_value("DEV01", "tbl_box_prms", "SA", live_only=True) is None
+
+
+@pytest.mark.asyncio
+async def test_seed_proxy_tables_are_keyed_by_source_device(processor: FrameProcessor) -> None:
+    processor.seed_table_values(processor._proxy_device_id, "twin_state", {"MODE": 3})
+
+    assert processor.reported_value(processor._proxy_device_id, "twin_state", "MODE") is None
+    await processor.process("DEV01", "tbl_actual", {"P": 1})
+    assert processor.reported_value("DEV01", "twin_state", "MODE") == 3
+
+
+def test_reported_value_returns_last_published_value(processor: FrameProcessor) -> None:
+    processor._last_table_values[("DEV01", "tbl_box_prms")] = {"MODE": 3}
+
+    assert processor.reported_value("DEV01", "tbl_box_prms", "MODE") == 3
+    assert processor.reported_value("DEV01", "tbl_box_prms", "SA") is None
+    assert processor.reported_value("DEV02", "tbl_box_prms", "MODE") is None
@@ -386,3 +386,37 @@ async def test_telemetry_collection() -> None:
     assert sent_payloads, "expected telemetry payload publish"
     assert all("timestamp" in p for p in sent_payloads)
     assert all("window_metrics" in p for p in sent_payloads)
+
+
+@pytest.mark.asyncio
+async def test_pipelined_window_correlates_reason_setting_ack_by_id_set(
+    make_config,
+    stream_reader_from_chunks,
+    dummy_writer_factory,
+) -> None:
+    ProxyServer = importlib.import_module("proxy.server").ProxyServer
+    TwinDelivery = importlib.import_module("twin.delivery").TwinDelivery
+    TwinQueue = importlib.import_module("twin.state").TwinQueue
+    server_module = importlib.import_module("proxy.server")
+    cfg = make_config()
+    queue = TwinQueue()
+    queue.enqueue("tbl_boiler_prms", "ZONE1_S", 5)
+    queue.enqueue("tbl_boiler_prms", "ZONE2_S", 9)
+    twin_delivery = TwinDelivery(queue, MagicMock(), window=2)
+    server = ProxyServer(cfg, twin_delivery=twin_delivery)
+
+    box_writer = dummy_writer_factory()
+    box_reader = stream_reader_from_chunks(_frame("IsNewSet", "12345"), _frame("IsNewWeather", "12345"))
+    await server._pipe_box_to_cloud(box_reader, dummy_writer_factory(), box_writer)
+
+    sent = [chunk.decode("utf-8", errors="replace") for chunk in box_writer.written]
+    assert len(sent) == 2
+    assert "<TblItem>ZONE1_S</TblItem>" in sent[0]
+    assert "<TblItem>ZONE2_S</TblItem>" in sent[1]
+    second_id_set = server_module._extract_id_set(sent[1])
+
+    reason_ack = f"<Frame><Result>ACK</Result><ID_Set>{second_id_set}</ID_Set><Reason>Setting</Reason></Frame>"
+    await server._handle_twin_frames(reason_ack.encode("utf-8"), box_writer)
+
+    assert queue.get("tbl_boiler_prms", "ZONE2_S") is None
+    assert twin_delivery.inflight() == ("tbl_boiler_prms", "ZONE1_S")
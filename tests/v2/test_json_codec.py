@@ -0,0 +1,76 @@
+"""Tests for json_codec — pluggable JSON serialization."""
+# pylint: disable=missing-function-docstring,protected-access
+
+# pyright: reportMissingImports=false
+
+import json
+
+import pytest
+
+import json_codec
+from json_codec import TableStateEncoder
+
+
+@pytest.fixture(params=["default", "stdlib"], autouse=True)
+def backend(request, monkeypatch):
+    if request.param == "stdlib":
+        monkeypatch.setattr(json_codec, "_orjson", None)
+        monkeypatch.setattr(json_codec, "BACKEND", "json")
+    return json_codec.BACKEND
+
+
+def test_dumps_is_compact_and_keeps_non_ascii():
+    assert json_codec.dumps({"a": 1, "b": "Teplota °C"}) == '{"a":1,"b":"Teplota °C"}'
+    assert json_codec.loads(b'{"a": [1, 2]}') == {"a": [1, 2]}
+
+
+def test_non_finite_floats_are_encoded_as_null():
+    data = {"a": float("nan"), "b": [float("inf"), -float("inf"), 1.5], "c": {"d": float("nan")}}
+
+    text = json_codec.dumps(data)
+
+    assert text == '{"a":null,"b":[null,null,1.5],"c":{"d":null}}'
+    assert TableStateEncoder().encode("s", data) == text
+
+
+def test_dumps_with_fragments_appends_pre_encoded_values():
+    device = json_codec.dumps({"identifiers": ["x"], "name": "Střídač"})
+
+    text = json_codec.dumps_with_fragments({"name": "P"}, {"device": device})
+
+    assert json.loads(text) == {"name": "P", "device": {"identifiers": ["x"], "name": "Střídač"}}
+    assert json.loads(json_codec.dumps_with_fragments({}, {"device": device}))["device"]["identifiers"] == ["x"]
+    assert json_codec.dumps_with_fragments({"a": 1}, {}) == '{"a":1}'
+
+
+def test_table_state_encoder_matches_dumps_and_reuses_segments():
+    encoder = TableStateEncoder()
+    state = {"P": 1200, "U": 230.5, "MODE": "Home 1", "ON": True, "X": None}
+
+    first = encoder.encode("dev/tbl_actual", state)
+    state["P"] = 1300
+    second = encoder.encode("dev/tbl_actual", state)
+
+    assert first == json_codec.dumps({**state, "P": 1200})
+    assert second == json_codec.dumps(state)
+    if json_codec.BACKEND == "json":
+        assert encoder.reused == 4
+        assert encoder.encoded == 6
+
+
+def test_table_state_encoder_distinguishes_equal_values_of_other_type():
+    encoder = TableStateEncoder()
+
+    encoder.encode("s", {"v": 1})
+    assert json.loads(encoder.encode("s", {"v": True})) == {"v": True}
+    assert json.loads(encoder.encode("s", {"v": 1.0})) == {"v": 1.0}
+
+
+def test_table_state_encoder_does_not_cache_mutable_values():
+    encoder = TableStateEncoder()
+    codes = [1]
+
+    encoder.encode("s", {"codes": codes})
+    codes.append(2)
+
+    assert json.loads(encoder.encode("s", {"codes": codes})) == {"codes": [1, 2]}
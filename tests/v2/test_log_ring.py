@@ -0,0 +1,112 @@
+"""
+Testy pro telemetry/log_ring.py — ring buffer log záznamů pro telemetrii.
+"""
+# pylint: disable=protected-access
+from __future__ import annotations
+
+# pyright: reportMissingImports=false
+
+import logging
+import sys
+import threading
+
+from telemetry.log_ring import LogRing
+
+
+def _record(message: str, *args, created: float = 1_000.0, level: int = logging.INFO) -> logging.LogRecord:
+    record = logging.LogRecord("test.ring", level, __file__, 1, message, args, None)
+    record.created = created
+    return record
+
+
+def test_formats_lazily_at_snapshot():
+    ring = LogRing(10)
+    state = {"frames": 1}
+    ring.append(_record("frames=%s", state), window_s=300)
+    state["frames"] = 2  # formátuje se až při snapshotu
+
+    assert ring.snapshot(cutoff=0.0) == [
+        {"timestamp": "1970-01-01 00:16:40", "level": "INFO", "message": "frames={'frames': 2}", "source": "test.ring"}
+    ]
+
+
+def test_level_filter_and_cutoff():
+    ring = LogRing(10, level=logging.INFO)
+    ring.append(_record("debug", level=logging.DEBUG), window_s=300)
+    ring.append(_record("old", created=500.0), window_s=300)
+    ring.append(_record("new", created=900.0), window_s=300)
+
+    assert [entry["message"] for entry in ring.snapshot(cutoff=700.0)] == ["new"]
+    assert ring.head == 2
+
+
+def test_wraparound_counts_only_entries_still_in_window():
+    ring = LogRing(3)
+    for i in range(3):
+        ring.append(_record(f"stale {i}", created=100.0 + i), window_s=60)
+    for i in range(4):
+        ring.append(_record(f"fresh {i}", created=1_000.0 + i), window_s=60)
+
+    # Tři staré záznamy vypadly z okna přirozeně, čtvrtý fresh přepsal fresh 0.
+    assert ring.dropped == 1
+    assert [entry["message"] for entry in ring.snapshot(cutoff=0.0)] == ["fresh 1", "fresh 2", "fresh 3"]
+    assert [entry["message"] for entry in ring.snapshot(cutoff=0.0, start_seq=5)] == ["fresh 2", "fresh 3"]
+
+
+def test_exc_info_records_are_detached():
+    ring = LogRing(2)
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        record = logging.LogRecord("test.ring", logging.ERROR, __file__, 1, "failed %s", ("x",), sys.exc_info())
+    ring.append(record, window_s=300)
+
+    stored = ring._slots[0].record
+    assert stored is not record
+    assert not hasattr(stored, "exc_info")
+    assert ring.snapshot(cutoff=0.0)[0]["message"] == "failed x"
+
+
+def test_resize_keeps_newest():
+    ring = LogRing(5)
+    for i in range(5):
+        ring.append(_record(f"m{i}"), window_s=300)
+    ring.resize(2)
+
+    assert ring.capacity == 2
+    assert [entry["message"] for entry in ring.snapshot(cutoff=0.0)] == ["m3", "m4"]
+    assert ring.dropped == 3
+    ring.append(_record("m5"), window_s=300)
+    assert [entry["message"] for entry in ring.snapshot(cutoff=0.0)] == ["m4", "m5"]
+
+
+def test_concurrent_appends_get_distinct_slots():
+    ring = LogRing(4000)
+
+    def writer(name: str) -> None:
+        for i in range(1000):
+            ring.append(_record(f"{name}-{i}"), window_s=300)
+
+    threads = [threading.Thread(target=writer, args=(f"t{n}",)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    messages = [entry["message"] for entry in ring.snapshot(cutoff=0.0)]
+    assert ring.head == 4000
+    assert len(set(messages)) == 4000
+
+
+def test_seq_since_and_bounded_snapshot():
+    ring = LogRing(4)
+    for i in range(6):
+        ring.append(_record(f"m{i}", created=100.0 + i), window_s=1_000)
+
+    assert ring.seq_since(0.0) == 2  # nejstarší zachovaný
+    assert ring.seq_since(104.0) == 4
+    assert ring.seq_since(200.0) == ring.head == 6
+    assert ring.snapshot(0.0, 3, 5, include_seq=True) == [
+        {"timestamp": "1970-01-01 00:01:43", "level": "INFO", "message": "m3", "source": "test.ring", "seq": 3},
+        {"timestamp": "1970-01-01 00:01:44", "level": "INFO", "message": "m4", "source": "test.ring", "seq": 4},
+    ]
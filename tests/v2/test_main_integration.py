@@ -58,17 +58,30 @@ def mock_config(temp_dir):
     config.mqtt_namespace = "oig_local"
     config.mqtt_qos = 1
     config.mqtt_state_retain = True
+    config.mqtt_async_transport = False
+    config.discovery_cache_path = ""
+    config.discovery_mode = "entity"
+    config.twin_queue_path = ""
+    config.settings_audit_db_path = ""
+    config.settings_audit_retention_days = 30
+    config.twin_delivery_window = 1
+    config.twin_priority_keys = ""
     config.log_level = "INFO"
     config.proxy_status_interval = 0  # Disable for tests
     config.proxy_device_id = "oig_proxy"
     config.sensor_map_path = str(temp_dir / "sensor_map.json")
+    config.sensor_map_cache_path = str(temp_dir / "sensor_map.cache")
+    config.map_reload_seconds = 0
     config.telemetry_enabled = False  # Disable for tests
     config.telemetry_mqtt_broker = "127.0.0.1:1883"
     config.telemetry_interval_s = 300
+    config.telemetry_log_level = "DEBUG"
+    config.telemetry_payload_format = "json"
     config.capture_payloads = False
     config.capture_raw_bytes = False
     config.capture_retention_days = 7
     config.capture_db_path = str(temp_dir / "payloads.db")
+    config.capture_format = "compact"
     config.capture_pcap = False
     config.capture_pcap_path = str(temp_dir / "capture.pcap")
     config.capture_pcap_interface = "any"
@@ -287,6 +300,11 @@ class TestStartupSequence:
             namespace=mock_config.mqtt_namespace,
             qos=mock_config.mqtt_qos,
             state_retain=mock_config.mqtt_state_retain,
+            async_transport=False,
+            outbound_queue_max=mock_config.mqtt_outbound_queue_max,
+            max_inflight=mock_config.mqtt_max_inflight,
+            discovery_cache_path=None,
+            discovery_mode="entity",
         )
 
     @pytest.mark.asyncio
@@ -380,8 +398,44 @@ class TestStartupSequence:
             app.twin_queue,
             mock_mqtt,
             telemetry_collector=collector,
+            window=1,
+            audit_store=None,
         )
 
+    @pytest.mark.asyncio
+    async def test_startup_creates_audit_store_without_telemetry(self, mock_config):
+        """Test that the settings-audit store runs with telemetry disabled."""
+        mock_config.telemetry_enabled = False
+        mock_config.settings_audit_db_path = "/tmp/settings_audit.db"
+        app = ProxyApp(mock_config)
+
+        with patch("main.DeviceIdManager") as mock_device_manager:
+            mock_instance = Mock()
+            mock_instance.load.return_value = None
+            mock_instance.device_id = None
+            mock_device_manager.return_value = mock_instance
+
+            with patch("main.MQTTClient") as mock_mqtt_class:
+                mock_mqtt = Mock()
+                mock_mqtt.is_ready.return_value = False
+                mock_mqtt.health_check_loop = AsyncMock()
+                mock_mqtt_class.return_value = mock_mqtt
+
+                with patch("main.SettingsAuditStore") as mock_store_class:
+                    with patch("main.TwinDelivery") as mock_twin_delivery_class:
+                        mock_twin_delivery_class.return_value = Mock()
+
+                        with patch("main.ProxyServer") as mock_proxy_class:
+                            mock_proxy = AsyncMock()
+                            mock_proxy.mode_manager = Mock()
+                            mock_proxy_class.return_value = mock_proxy
+                            await app.startup()
+
+        assert app.telemetry_collector is None
+        assert app.audit_store is mock_store_class.return_value
+        app.audit_store.start.assert_called_once()
+        assert mock_twin_delivery_class.call_args.kwargs["audit_store"] is app.audit_store
+
     @pytest.mark.asyncio
     async def test_startup_starts_twin_handler_when_mqtt_ready(self, mock_config):
         """Test that TwinControlHandler starts when MQTT is ready."""
@@ -397,6 +451,7 @@ class TestStartupSequence:
                 mock_mqtt = Mock()
                 mock_mqtt.is_ready.return_value = True
                 mock_mqtt.health_check_loop = AsyncMock()
+                mock_mqtt.publish_discovery_paced = AsyncMock()
                 mock_mqtt_class.return_value = mock_mqtt
 
                 with patch("main.TwinControlHandler") as mock_handler_class:
@@ -691,6 +746,7 @@ class TestIntegrationFlow:
                 mock_mqtt = Mock()
                 mock_mqtt.is_ready.return_value = True
                 mock_mqtt.health_check_loop = AsyncMock()
+                mock_mqtt.publish_discovery_paced = AsyncMock()
                 mock_mqtt_class.return_value = mock_mqtt
 
                 with patch("main.ProxyServer") as mock_proxy_class:
@@ -125,7 +125,7 @@ def test_publish_state_increments_failed_counter_on_rc_error():
 
 
 def test_publish_state_handles_exception():
-    """Pokud paho.publish vyhodí výjimku, publish_failed se zvýší."""
+    """Pokud paho.publish vyhodí výjimku, publish_failed se zvýší a payload jde do offline bufferu."""
     c = make_client()
     mock_paho = inject_mock_paho(c)
     mock_paho.publish.side_effect = RuntimeError("broker down")
@@ -133,6 +133,7 @@ def test_publish_state_handles_exception():
     result = c.publish_state("DEV01", "tbl_x", {"k": "v"})
     assert result is False
     assert c.publish_failed == 1
+    assert json.loads(c._offline_buffer["oig_local/DEV01/tbl_x/state"][0]) == {"k": "v"}
 
 
 def test_publish_state_uses_qos_and_retain():
@@ -147,6 +148,20 @@ def test_publish_state_uses_qos_and_retain():
     assert kwargs["retain"] is False
 
 
+def test_publish_message_sends_raw_payload():
+    """publish_message posílá payload beze změny na zadaný topic."""
+    c = make_client()
+    mock_paho = inject_mock_paho(c)
+
+    assert c.publish_message("oig/DEV01/audit/response", '{"count": 0}') is True
+    assert mock_paho.publish.call_args[0][:2] == ("oig/DEV01/audit/response", '{"count": 0}')
+
+
+def test_publish_message_returns_false_when_not_ready():
+    c = make_client()
+    assert c.publish_message("oig/DEV01/audit/response", "{}") is False
+
+
 # ---------------------------------------------------------------------------
 # send_discovery()
 # ---------------------------------------------------------------------------
@@ -431,8 +446,8 @@ def test_send_discovery_returns_false_when_not_ready():
     assert result is False
 
 
-def test_send_discovery_clears_dedup_on_reconnect():
-    """Po on_connect() je _discovery_sent vymazán (simulace reconnectu)."""
+def test_send_discovery_skips_unchanged_config_after_reconnect():
+    """Po on_connect() se neměnný config znovu neposílá (fingerprint), změněný ano."""
     c = make_client()
     mock_paho = inject_mock_paho(c)
 
@@ -449,7 +464,12 @@ def test_send_discovery_clears_dedup_on_reconnect():
     inject_mock_paho(c)
 
     c.send_discovery(device_id="DEV01", table="t", sensor_key="k", sensor_name="K")
-    assert c._client.publish.call_count == 1  # Opět posláno
+    assert c._client.publish.call_count == 0
+    assert c.discovery_stats()["discovery_skipped"] == 1
+
+    c._discovery_sent.clear()
+    c.send_discovery(device_id="DEV01", table="t", sensor_key="k", sensor_name="K2")
+    assert c._client.publish.call_count == 1
 
 
 def test_build_object_id_normalizes_non_alnum():
@@ -515,6 +535,44 @@ def test_on_connect_removes_legacy_unvalidated_number_discovery():
             assert publish_call.kwargs == {"retain": True, "qos": 1}
 
 
+def test_remove_discovery_publishes_empty_retained_configs():
+    c = make_client(namespace="oig_local")
+    mock_paho = inject_mock_paho(c)
+    c._discovery_sent.add("oig_local_dev1_tbl_actual_temp")
+
+    removed = c.remove_discovery("DEV1", [("sensor", "tbl_actual", "Temp", "")])
+
+    assert removed == 1
+    mock_paho.publish.assert_called_once_with(
+        "homeassistant/sensor/oig_local_dev1_tbl_actual_temp/config", "", retain=True, qos=1
+    )
+    assert "oig_local_dev1_tbl_actual_temp" not in c._discovery_sent
+
+
+def test_remove_discovery_noop_when_not_ready():
+    c = make_client()
+    assert c.remove_discovery("DEV1", [("sensor", "tbl_actual", "Temp", "")]) == 0
+
+
+def test_forget_discovery_allows_republish():
+    c = make_client(namespace="oig_local")
+    mock_paho = inject_mock_paho(c)
+    c.send_discovery(device_id="DEV1", table="tbl_actual", sensor_key="Temp", sensor_name="T")
+    mock_paho.publish.reset_mock()
+
+    c.forget_discovery("DEV1", "tbl_actual", "Temp")
+    c.send_discovery(device_id="DEV1", table="tbl_actual", sensor_key="Temp", sensor_name="T2")
+
+    assert mock_paho.publish.call_count == 1
+
+
+def test_discovery_components_match_send_discovery():
+    assert MQTTClient.discovery_components("tbl_actual", "Temp") == [("sensor", "")]
+    assert MQTTClient.discovery_components("tbl_actual", "Flag", is_binary=True) == [("binary_sensor", "")]
+    mode = MQTTClient.discovery_components("tbl_box_prms", "MODE", enum_map={"0": "Home 1"})
+    assert mode == [("sensor", ""), ("select", "_cfg")]
+
+
 def test_boiler_hdo_energy_number_range_accepts_live_value():
     """WD discovery range includes the 500 kWh value reported by the box."""
     c = make_client(namespace="oig_local")
@@ -614,6 +672,399 @@ async def test_health_check_loop_does_not_reconnect_when_connected():
     assert reconnect_calls == []
 
 
+@pytest.mark.asyncio
+async def test_health_check_loop_backs_off_after_failed_reconnect():
+    """Po neúspěchu se další pokus plánuje podle backoffu, ne podle intervalu."""
+    c = make_client()
+    attempts = []
+
+    def fake_connect(device_id: str) -> bool:
+        attempts.append(device_id)
+        return False
+
+    c.connect = fake_connect
+    c.HEALTH_CHECK_INTERVAL = 0.01
+    c.RECONNECT_MIN_DELAY = 10.0
+
+    task = asyncio.create_task(c.health_check_loop("DEV01"))
+    await asyncio.sleep(0.1)
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+
+    assert attempts == ["DEV01"]
+    assert c.reconnect_attempts == 1
+
+
+def test_reconnect_delay_is_exponential_with_jitter_and_capped():
+    c = make_client()
+    c.RECONNECT_MIN_DELAY = 1.0
+    c.RECONNECT_MAX_DELAY = 8.0
+
+    for failures, ceiling in ((1, 1.0), (2, 2.0), (3, 4.0), (4, 8.0), (10, 8.0)):
+        delay = c._reconnect_delay(failures)
+        assert ceiling / 2 <= delay <= ceiling
+
+
+def test_publish_state_buffers_last_value_per_topic_when_offline():
+    c = make_client()
+
+    c.publish_state("DEV01", "tbl_actual", {"P": 1})
+    c.publish_state("DEV01", "tbl_actual", {"P": 2})
+    c.publish_state("DEV01", "tbl_batt", {"V": 50})
+
+    assert c.offline_buffer_size() == 2
+    assert json.loads(c._offline_buffer["oig_local/DEV01/tbl_actual/state"][0]) == {"P": 2}
+
+
+def test_offline_buffer_evicts_oldest_topic_when_full():
+    c = make_client()
+    c.OFFLINE_BUFFER_MAX_TOPICS = 2
+
+    for table in ("t1", "t2", "t3"):
+        c.publish_state("DEV01", table, {"x": 1})
+
+    assert list(c._offline_buffer) == ["oig_local/DEV01/t2/state", "oig_local/DEV01/t3/state"]
+    assert c.offline_dropped == 1
+
+
+@pytest.mark.asyncio
+async def test_flush_offline_buffer_publishes_in_bursts():
+    c = make_client()
+    c.FLUSH_BURST_SIZE = 2
+    c.FLUSH_BURST_PAUSE = 0
+    for table in ("t1", "t2", "t3"):
+        c.publish_state("DEV01", table, {"x": 1})
+    mock_paho = inject_mock_paho(c)
+
+    flushed = await c.flush_offline_buffer()
+
+    assert flushed == 3
+    assert c.offline_buffer_size() == 0
+    topics = [publish_call.args[0] for publish_call in mock_paho.publish.call_args_list]
+    assert topics == ["oig_local/DEV01/t1/state", "oig_local/DEV01/t2/state", "oig_local/DEV01/t3/state"]
+
+
+@pytest.mark.asyncio
+async def test_flush_offline_buffer_keeps_remaining_on_publish_error():
+    c = make_client()
+    c.FLUSH_BURST_PAUSE = 0
+    for table in ("t1", "t2"):
+        c.publish_state("DEV01", table, {"x": 1})
+    mock_paho = inject_mock_paho(c)
+    mock_paho.publish.return_value = MagicMock(rc=4)
+
+    assert await c.flush_offline_buffer() == 0
+    assert list(c._offline_buffer) == ["oig_local/DEV01/t1/state", "oig_local/DEV01/t2/state"]
+
+
+@pytest.mark.asyncio
+async def test_replay_after_reconnect_flushes_then_runs_callbacks():
+    c = make_client()
+    c.FLUSH_BURST_PAUSE = 0
+    c.publish_state("DEV02", "tbl_actual", {"x": 1})
+    mock_paho = inject_mock_paho(c)
+    order = []
+    mock_paho.publish.side_effect = lambda topic, *_a, **_k: order.append(topic) or MagicMock(rc=0)
+    c.add_reconnect_callback(lambda: order.append("discovery"))
+
+    await c._replay_after_reconnect()
+
+    assert order == [
+        "oig_local/DEV02/tbl_actual/state",
+        "oig_local/DEV02/availability",
+        "discovery",
+    ]
+
+
+def test_get_cached_payload_and_field_after_publish_state():
+    c = make_client()
+    inject_mock_paho(c)
+
+    c.publish_state("DEV01", "tbl_box", {"STRNGHT": 77, "tmlastcall": 5})
+
+    topic = "oig_local/DEV01/tbl_box/state"
+    assert json.loads(c.get_cached_payload(topic)) == {"STRNGHT": 77, "tmlastcall": 5}
+    assert c.get_cached_field(topic, "STRNGHT") == 77
+    assert c.get_cached_field(topic, "strnght") == 77
+    assert c.get_cached_field(topic, "missing") is None
+    assert c.get_cached_payload("oig_local/DEV01/tbl_other/state") is None
+
+
+def test_publish_state_caches_offline_and_counts_unchanged():
+    c = make_client()
+
+    c.publish_state("DEV01", "tbl_actual", {"P": 1})
+    first = c.get_cached_state("oig_local/DEV01/tbl_actual/state")
+    c.publish_state("DEV01", "tbl_actual", {"P": 1})
+
+    assert c.get_cached_field("oig_local/DEV01/tbl_actual/state", "P") == 1
+    assert c.state_unchanged == 1
+    assert c.get_cached_state("oig_local/DEV01/tbl_actual/state").changed_at == first.changed_at
+
+
+@pytest.mark.asyncio
+async def test_warm_start_seeds_cache_from_retained_states():
+    c = make_client()
+    mock_paho = inject_mock_paho(c)
+    mock_paho.subscribe.return_value = (0, 1)
+    mock_paho.unsubscribe.return_value = (0, 2)
+    c.publish_state("DEV01", "tbl_batt", {"V": 52})
+    seeded = []
+
+    assert c.start_warm_start(lambda *args: seeded.append(args), window_s=0.01) is True
+    for topic, payload, retain in (
+        ("oig_local/DEV01/tbl_actual/state", b'{"P": 900}', True),
+        ("oig_local/DEV01/tbl_batt/state", b'{"V": 10}', True),
+        ("oig_local/DEV01/tbl_box/state", b"{broken", True),
+        ("oig_local/DEV01/tbl_dc_in/state", b'{"FV_P1": 5}', False),
+    ):
+        await asyncio.to_thread(c._on_message, mock_paho, None, MagicMock(topic=topic, payload=payload, retain=retain))
+    await asyncio.sleep(0.05)
+
+    assert seeded == [("DEV01", "tbl_actual", {"P": 900})]
+    assert c.get_cached_state("oig_local/DEV01/tbl_dc_in/state") is None
+    assert c.get_cached_field("oig_local/DEV01/tbl_actual/state", "P") == 900
+    assert c.get_cached_field("oig_local/DEV01/tbl_batt/state", "V") == 52
+    assert "oig_local/+/+/state" not in c._subscriptions
+
+
+def test_on_message_dispatches_to_all_matching_subscriptions():
+    c = make_client()
+    mock_paho = inject_mock_paho(c)
+    mock_paho.subscribe.return_value = (0, 1)
+    wildcard = MagicMock(side_effect=RuntimeError("boom"))
+    exact = MagicMock()
+    other = MagicMock()
+    c.subscribe("oig_local/+/set/#", wildcard)
+    c.subscribe("oig_local/DEV01/set/tbl_box_prms/MODE", exact)
+    c.subscribe("oig/+/control/set", other)
+
+    c._on_message(mock_paho, None, MagicMock(topic="oig_local/DEV01/set/tbl_box_prms/MODE", payload=b"1"))
+
+    wildcard.assert_called_once_with("oig_local/DEV01/set/tbl_box_prms/MODE", b"1")
+    exact.assert_called_once_with("oig_local/DEV01/set/tbl_box_prms/MODE", b"1")
+    other.assert_not_called()
+
+
+def test_unsubscribe_removes_route():
+    c = make_client()
+    mock_paho = inject_mock_paho(c)
+    mock_paho.subscribe.return_value = (0, 1)
+    mock_paho.unsubscribe.return_value = (0, 2)
+    callback = MagicMock()
+    c.subscribe("oig_local/+/set/#", callback)
+
+    c.unsubscribe("oig_local/+/set/#")
+    c._on_message(mock_paho, None, MagicMock(topic="oig_local/DEV01/set/x", payload=b"1"))
+
+    callback.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_publish_discovery_paced_batches_producers_and_persists(tmp_path):
+    path = str(tmp_path / "discovery.json")
+    c = make_client(discovery_cache_path=path)
+    c.DISCOVERY_BURST_PAUSE = 0
+    mock_paho = inject_mock_paho(c)
+    published_during_producer = []
+
+    def producer(client=c):
+        client.send_discovery(device_id="DEV01", table="tbl_actual", sensor_key="P", sensor_name="P")
+        client.send_discovery(device_id="DEV01", table="tbl_actual", sensor_key="U", sensor_name="U")
+        published_during_producer.append(mock_paho.publish.call_count)
+
+    stats = await c.publish_discovery_paced(producer)
+
+    assert published_during_producer == [0]
+    assert stats["published"] == 2
+    assert mock_paho.publish.call_count == 2
+
+    restarted = make_client(discovery_cache_path=path)
+    restarted_paho = inject_mock_paho(restarted)
+    stats = await restarted.publish_discovery_paced(lambda: producer(restarted))
+
+    assert stats == {"published": 0, "skipped": 2, "duration_ms": stats["duration_ms"]}
+    restarted_paho.publish.assert_not_called()
+
+
+def _published(mock_paho) -> list[tuple[str, str]]:
+    return [(c.args[0], c.args[1]) for c in mock_paho.publish.call_args_list]
+
+
+def test_device_mode_folds_entities_into_one_device_config():
+    c = make_client(discovery_mode="device")
+    mock_paho = inject_mock_paho(c)
+
+    c.send_discovery(device_id="DEV01", table="tbl_actual", sensor_key="P", sensor_name="P", unit="W")
+    c.send_discovery(device_id="DEV01", table="tbl_actual", sensor_key="U", sensor_name="U")
+
+    device_topic = "homeassistant/device/oig_local_DEV01_inverter/config"
+    device_payloads = [json.loads(p) for t, p in _published(mock_paho) if t == device_topic]
+    last = device_payloads[-1]
+    assert set(last["cmps"]) == {"oig_local_dev01_tbl_actual_p", "oig_local_dev01_tbl_actual_u"}
+    assert last["cmps"]["oig_local_dev01_tbl_actual_p"]["p"] == "sensor"
+    assert last["cmps"]["oig_local_dev01_tbl_actual_p"]["unit_of_measurement"] == "W"
+    assert "device" not in last["cmps"]["oig_local_dev01_tbl_actual_p"]
+    assert last["dev"]["identifiers"] == ["oig_local_DEV01_inverter"]
+    assert last["availability"] == [{"topic": "oig_local/DEV01/availability"}]
+
+
+def test_device_mode_migrates_then_clears_entity_topics():
+    c = make_client(discovery_mode="device")
+    mock_paho = inject_mock_paho(c)
+    entity_topic = "homeassistant/sensor/oig_local_dev01_tbl_actual_p/config"
+    c._discovery.record(entity_topic, '{"name":"P"}')
+
+    c.send_discovery(device_id="DEV01", table="tbl_actual", sensor_key="P", sensor_name="P")
+
+    assert _published(mock_paho) == [
+        (entity_topic, '{"migrate_discovery":true}'),
+        ("homeassistant/device/oig_local_DEV01_inverter/config", mock_paho.publish.call_args_list[1].args[1]),
+        (entity_topic, ""),
+    ]
+
+    mock_paho.publish.reset_mock()
+    c._discovery_sent.clear()
+    c.send_discovery(device_id="DEV01", table="tbl_actual", sensor_key="P", sensor_name="P")
+    mock_paho.publish.assert_not_called()
+
+
+def test_device_mode_fresh_install_sends_no_migration_payloads():
+    c = make_client(discovery_mode="device")
+    mock_paho = inject_mock_paho(c)
+
+    c.send_discovery(device_id="DEV01", table="tbl_actual", sensor_key="P", sensor_name="P")
+
+    assert [t for t, _p in _published(mock_paho)] == ["homeassistant/device/oig_local_DEV01_inverter/config"]
+
+
+@pytest.mark.asyncio
+async def test_device_mode_migrates_retained_entity_config_seen_at_warm_start():
+    c = make_client(discovery_mode="device")
+    mock_paho = inject_mock_paho(c)
+    mock_paho.subscribe.return_value = (0, 1)
+    mock_paho.unsubscribe.return_value = (0, 2)
+    entity_topic = "homeassistant/sensor/oig_local_dev01_tbl_actual_p/config"
+    c.start_warm_start(window_s=0.01)
+    c.send_discovery(device_id="DEV01", table="tbl_actual", sensor_key="P", sensor_name="P")
+    await asyncio.sleep(0)  # device config flush
+    mock_paho.publish.reset_mock()
+
+    for topic, payload in ((entity_topic, b'{"name":"P"}'), ("homeassistant/sensor/other_x/config", b"{}")):
+        c._on_message(mock_paho, None, MagicMock(topic=topic, payload=payload, retain=True))
+    await asyncio.sleep(0.05)
+
+    assert _published(mock_paho) == [(entity_topic, '{"migrate_discovery":true}'), (entity_topic, "")]
+    assert "homeassistant/+/+/config" not in c._subscriptions
+
+
+def test_device_mode_keeps_removed_components_until_publish_succeeds():
+    c = make_client(discovery_mode="device")
+    mock_paho = inject_mock_paho(c)
+    c.send_discovery(device_id="DEV01", table="tbl_actual", sensor_key="P", sensor_name="P")
+    c.send_discovery(device_id="DEV01", table="tbl_actual", sensor_key="U", sensor_name="U")
+    mock_paho.publish.return_value = MagicMock(rc=4)
+
+    c.remove_discovery("DEV01", [("sensor", "tbl_actual", "u", "")])
+    assert c._device_removed["oig_local_DEV01_inverter"] == {"oig_local_dev01_tbl_actual_u": "sensor"}
+
+    mock_paho.publish.return_value = MagicMock(rc=0)
+    c._flush_device_discovery()
+    payload = json.loads(_published(mock_paho)[-1][1])
+    assert payload["cmps"]["oig_local_dev01_tbl_actual_u"] == {"p": "sensor"}
+    assert "oig_local_DEV01_inverter" not in c._device_removed
+
+
+def test_device_mode_removal_keeps_platform_only_component():
+    c = make_client(discovery_mode="device")
+    mock_paho = inject_mock_paho(c)
+    c.send_discovery(device_id="DEV01", table="tbl_actual", sensor_key="P", sensor_name="P")
+    c.send_discovery(device_id="DEV01", table="tbl_actual", sensor_key="U", sensor_name="U")
+    mock_paho.publish.reset_mock()
+
+    c.remove_discovery("DEV01", [("sensor", "tbl_actual", "u", "")])
+
+    device_topic = "homeassistant/device/oig_local_DEV01_inverter/config"
+    payload = json.loads(next(p for t, p in _published(mock_paho) if t == device_topic))
+    assert payload["cmps"]["oig_local_dev01_tbl_actual_u"] == {"p": "sensor"}
+    assert "p" in payload["cmps"]["oig_local_dev01_tbl_actual_p"]
+    assert "oig_local_dev01_tbl_actual_u" not in c._device_components["oig_local_DEV01_inverter"]
+
+
+@pytest.mark.asyncio
+async def test_device_mode_paced_run_publishes_device_configs_before_cleanup():
+    c = make_client(discovery_mode="device")
+    c.DISCOVERY_BURST_PAUSE = 0
+    mock_paho = inject_mock_paho(c)
+
+    for key in ("p", "u", "i"):
+        c._discovery.record(f"homeassistant/sensor/oig_local_dev01_tbl_actual_{key}/config", "{}")
+    c._discovery.record("homeassistant/sensor/oig_local_dev01_tbl_batt_bat_v/config", "{}")
+
+    def producer():
+        for key in ("P", "U", "I"):
+            c.send_discovery(device_id="DEV01", table="tbl_actual", sensor_key=key, sensor_name=key)
+        c.send_discovery(
+            device_id="DEV01", table="tbl_batt", sensor_key="BAT_V", sensor_name="V", device_mapping="battery"
+        )
+
+    stats = await c.publish_discovery_paced(producer)
+
+    topics = [topic for topic, _payload in _published(mock_paho)]
+    device_topics = [t for t in topics if t.startswith("homeassistant/device/")]
+    assert device_topics == [
+        "homeassistant/device/oig_local_DEV01_battery/config",
+        "homeassistant/device/oig_local_DEV01_inverter/config",
+    ]
+    first_device = topics.index(device_topics[0])
+    payloads = _published(mock_paho)
+    assert all(p != "" for _t, p in payloads[:first_device])
+    assert all(p == "" for _t, p in payloads[first_device + 2:])
+    assert stats["published"] == len(topics) == 4 + 2 + 4
+
+
+@pytest.mark.asyncio
+async def test_ha_birth_message_republishes_discovery():
+    c = make_client()
+    mock_paho = inject_mock_paho(c)
+    c.send_discovery(device_id="DEV01", table="tbl_actual", sensor_key="Temp", sensor_name="Teplota")
+    topic = "homeassistant/sensor/oig_local_dev01_tbl_actual_temp/config"
+    assert c._discovery.is_current(topic, mock_paho.publish.call_args_list[-1].args[1])
+    c._loop = asyncio.get_running_loop()
+    c._wake_event = asyncio.Event()
+
+    c._on_message(mock_paho, None, MagicMock(topic="homeassistant/status", payload=b"online", retain=True))
+    assert c._ha_birth_pending is False
+    c._on_message(mock_paho, None, MagicMock(topic="homeassistant/status", payload=b"online", retain=False))
+    await asyncio.sleep(0)
+    assert c._wake_event.is_set()
+
+    mock_paho.publish.reset_mock()
+    c.add_reconnect_callback(
+        lambda: c.send_discovery(device_id="DEV01", table="tbl_actual", sensor_key="Temp", sensor_name="Teplota")
+    )
+    await c._replay_after_reconnect()
+
+    assert topic in [p.args[0] for p in mock_paho.publish.call_args_list]
+
+
+def test_on_connect_resubscribes_existing_subscriptions():
+    c = make_client()
+    c._subscriptions["oig_local/DEV01/+/+/set"] = MagicMock()
+    mock_paho = MagicMock()
+    mock_paho._oig_device_id = "DEV01"
+
+    c._on_connect(mock_paho, None, None, rc=0)
+
+    assert mock_paho.subscribe.call_args_list == [
+        call("homeassistant/status", qos=1),
+        call("oig_local/DEV01/+/+/set", qos=1),
+    ]
+
+
 # ---------------------------------------------------------------------------
 # connect() — unit test s mock paho
 # ---------------------------------------------------------------------------
@@ -0,0 +1,133 @@
+"""
+Testy pro mqtt/discovery.py — DiscoveryPublisher.
+"""
+from __future__ import annotations
+
+# pyright: reportMissingImports=false
+
+import asyncio
+import json
+from unittest.mock import MagicMock
+
+import pytest
+
+from mqtt.discovery import DiscoveryPublisher
+
+
+def test_offer_skips_unchanged_and_publishes_changed():
+    pub = DiscoveryPublisher()
+
+    assert pub.offer("homeassistant/sensor/a/config", '{"name": "A"}') == "publish"
+    pub.record("homeassistant/sensor/a/config", '{"name": "A"}')
+
+    assert pub.offer("homeassistant/sensor/a/config", '{"name": "A"}') == "skip"
+    assert pub.offer("homeassistant/sensor/a/config", '{"name": "B"}') == "publish"
+    assert pub.skipped == 1
+
+
+def test_fingerprints_survive_restart_for_same_scope(tmp_path):
+    path = str(tmp_path / "fp.json")
+    first = DiscoveryPublisher(path, scope="broker:1883/oig_local")
+    first.record("t/config", "{}")
+    first.save()
+
+    same = DiscoveryPublisher(path, scope="broker:1883/oig_local")
+    other = DiscoveryPublisher(path, scope="other:1883/oig_local")
+
+    assert same.load() == 1
+    assert same.is_current("t/config", "{}")
+    assert other.load() == 0
+    assert json.loads((tmp_path / "fp.json").read_text())["scope"] == "broker:1883/oig_local"
+
+
+def test_load_ignores_corrupt_file(tmp_path):
+    path = tmp_path / "fp.json"
+    path.write_text("{broken", encoding="utf-8")
+
+    assert DiscoveryPublisher(str(path)).load() == 0
+
+
+@pytest.mark.asyncio
+async def test_drain_respects_inflight_window_and_reports_run_stats(tmp_path):
+    pub = DiscoveryPublisher(str(tmp_path / "fp.json"), window=2, burst_pause=0)
+    pub.record("t/0", "same")
+    pub.begin_bulk()
+    assert pub.offer("t/0", "same") == "skip"
+    for i in range(1, 6):
+        assert pub.offer(f"t/{i}", f"p{i}") == "queued"
+
+    infos = []
+    max_inflight = 0
+
+    def publish(topic, payload):
+        nonlocal max_inflight
+        # Předchozí zprávy se potvrdí až po dalším kole event loopu.
+        info = MagicMock(rc=0)
+        info.is_published.return_value = False
+        infos.append(info)
+        in_flight = sum(1 for item in infos if not item.is_published())
+        max_inflight = max(max_inflight, in_flight)
+        for older in infos[:-1]:
+            older.is_published.return_value = True
+        if len(infos) == 5:
+            asyncio.get_running_loop().call_later(0.01, setattr, info.is_published, "return_value", True)
+        return info
+
+    stats = await pub.drain(publish, lambda: True)
+
+    assert len(infos) == 5
+    assert max_inflight <= 2
+    assert stats["published"] == 5
+    assert stats["skipped"] == 1
+    assert pub.bulk is False
+    assert pub.pending_count() == 0
+    assert DiscoveryPublisher(str(tmp_path / "fp.json")).load() == 6
+
+
+@pytest.mark.asyncio
+async def test_drain_drops_queue_when_disconnected():
+    pub = DiscoveryPublisher(burst_pause=0)
+    pub.begin_bulk()
+    pub.offer("t/1", "p1")
+    publish = MagicMock()
+
+    stats = await pub.drain(publish, lambda: False)
+
+    publish.assert_not_called()
+    assert stats["published"] == 0
+    assert pub.pending_count() == 0
+    assert not pub.is_current("t/1", "p1")
+
+
+@pytest.mark.asyncio
+async def test_drain_records_only_acknowledged_publishes():
+    pub = DiscoveryPublisher(burst_pause=0, ack_timeout=0.05)
+    pub.begin_bulk()
+    pub.offer("t/acked", "p1")
+    pub.offer("t/lost", "p2")
+    pub.offer("t/failed", "p3")
+    acked = MagicMock(rc=0)
+    acked.is_published.return_value = True
+    lost = MagicMock(rc=0)
+    lost.is_published.return_value = False
+    failed = MagicMock(rc=0)
+    failed.is_published.side_effect = RuntimeError("no connection")
+    infos = iter((acked, lost, failed))
+
+    await pub.drain(lambda _topic, _payload: next(infos), lambda: True)
+
+    assert pub.is_current("t/acked", "p1")
+    assert not pub.is_current("t/lost", "p2")
+    assert not pub.is_current("t/failed", "p3")
+
+
+def test_reset_forgets_all_fingerprints(tmp_path):
+    path = str(tmp_path / "fp.json")
+    pub = DiscoveryPublisher(path)
+    pub.record("t/config", "{}")
+    pub.save()
+
+    pub.reset()
+    pub.save()
+
+    assert DiscoveryPublisher(path).load() == 0
@@ -0,0 +1,94 @@
+"""
+Testy pro mqtt/router.py — TopicRouter.
+"""
+from __future__ import annotations
+
+# pyright: reportMissingImports=false
+
+from mqtt.router import TopicRouter
+
+
+def _names(router: TopicRouter, topic: str) -> list[str]:
+    return [handler.__name__ for handler in router.match(topic)]
+
+
+def _handler(name: str):
+    def _h(_topic, _payload):
+        return None
+
+    _h.__name__ = name
+    return _h
+
+
+def test_match_supports_plus_and_hash_wildcards():
+    router = TopicRouter()
+    router.add("oig_local/+/set/#", _handler("set_all"))
+    router.add("oig_local/DEV01/+/state", _handler("state"))
+    router.add("oig/+/control/set", _handler("control"))
+
+    assert _names(router, "oig_local/DEV01/set/tbl_box_prms/MODE") == ["set_all"]
+    assert _names(router, "oig_local/DEV01/tbl_actual/state") == ["state"]
+    assert _names(router, "oig/DEV01/control/set") == ["control"]
+    assert _names(router, "oig/DEV01/control/set/extra") == []
+    assert _names(router, "oig_local/DEV01/tbl_actual") == []
+
+
+def test_hash_matches_parent_level():
+    router = TopicRouter()
+    router.add("oig_local/DEV01/set/#", _handler("set_all"))
+
+    assert _names(router, "oig_local/DEV01/set") == ["set_all"]
+
+
+def test_match_returns_all_overlapping_filters_in_subscription_order():
+    router = TopicRouter()
+    router.add("oig_local/DEV01/set/tbl_box_prms/MODE", _handler("exact"))
+    router.add("oig_local/+/set/#", _handler("wild"))
+    router.add("#", _handler("everything"))
+
+    assert _names(router, "oig_local/DEV01/set/tbl_box_prms/MODE") == ["exact", "wild", "everything"]
+
+
+def test_wildcards_do_not_match_system_topics():
+    router = TopicRouter()
+    router.add("#", _handler("everything"))
+    router.add("$SYS/#", _handler("sys"))
+
+    assert _names(router, "$SYS/broker/uptime") == ["sys"]
+
+
+def test_match_is_cached_and_invalidated_on_change():
+    router = TopicRouter()
+    router.add("a/+", _handler("first"))
+
+    assert _names(router, "a/b") == ["first"]
+    assert _names(router, "a/b") == ["first"]
+    assert router.cache_hits == 1
+
+    router.add("a/b", _handler("second"))
+    assert _names(router, "a/b") == ["first", "second"]
+
+    assert router.remove("a/+") is True
+    assert _names(router, "a/b") == ["second"]
+    assert router.remove("a/+") is False
+
+
+def test_remove_prunes_empty_branches():
+    router = TopicRouter()
+    router.add("a/b/c/#", _handler("deep"))
+
+    router.remove("a/b/c/#")
+
+    assert not router._root.children
+    assert len(router) == 0
+
+
+def test_match_cache_is_bounded():
+    router = TopicRouter()
+    router.MATCH_CACHE_MAX = 2
+    router.add("t/+", _handler("h"))
+
+    for topic in ("t/1", "t/2", "t/3"):
+        router.match(topic)
+
+    assert list(router._cache) == ["t/2", "t/3"]
@@ -0,0 +1,61 @@
+"""
+Testy pro mqtt/state_cache.py — StateCache.
+"""
+from __future__ import annotations
+
+# pyright: reportMissingImports=false
+
+from mqtt.state_cache import StateCache
+
+
+def test_put_reports_change_and_keeps_changed_at_for_same_payload():
+    cache = StateCache()
+
+    assert cache.put("a/state", '{"x": 1}', {"x": 1}) is True
+    first = cache.get("a/state")
+    assert cache.put("a/state", '{"x": 1}', {"x": 1}) is False
+    assert cache.get("a/state").changed_at == first.changed_at
+    assert cache.put("a/state", '{"x": 2}', {"x": 2}) is True
+    assert cache.get("a/state").data == {"x": 2}
+
+
+def test_put_copies_source_dict():
+    cache = StateCache()
+    data = {"x": 1}
+
+    cache.put("a/state", '{"x": 1}', data)
+    data["x"] = 99
+
+    assert cache.get("a/state").get("x") == 1
+
+
+def test_field_lookup_is_case_insensitive():
+    cache = StateCache()
+    cache.put("a/state", '{"LAT": 48}', {"LAT": 48})
+
+    entry = cache.get("a/state")
+    assert entry.get("LAT") == 48
+    assert entry.get("lat") == 48
+    assert entry.get("lon") is None
+
+
+def test_evicts_least_recent_topics_over_byte_budget():
+    cache = StateCache(max_bytes=20)
+
+    cache.put("a", "x" * 8, {})
+    cache.put("b", "y" * 8, {})
+    cache.put("a", "z" * 8, {})  # a je nyní nejnovější
+    cache.put("c", "w" * 8, {})
+
+    assert "b" not in cache
+    assert [topic for topic, _entry in cache.items()] == ["a", "c"]
+    assert cache.size_bytes == 16
+    assert cache.evicted == 1
+
+
+def test_keeps_single_oversized_entry():
+    cache = StateCache(max_bytes=4)
+
+    cache.put("a", "x" * 10, {})
+
+    assert len(cache) == 1
@@ -0,0 +1,167 @@
+"""
+Testy pro mqtt/transport.py — AsyncioMqttTransport.
+"""
+from __future__ import annotations
+
+# pyright: reportMissingImports=false
+
+import asyncio
+import socket
+from itertools import count
+from unittest.mock import MagicMock
+
+import pytest
+
+from mqtt.client import MQTTClient
+from mqtt.transport import AsyncioMqttTransport
+
+
+class FakePaho:
+    """Paho stand-in: publish vrací rostoucí mid, loop_* se jen počítají."""
+
+    def __init__(self) -> None:
+        self._mids = count(1)
+        self.published: list[tuple[str, object, int, bool]] = []
+        self.loop_read = MagicMock()
+        self.loop_write = MagicMock()
+        self.loop_misc = MagicMock()
+
+    def publish(self, topic, payload, qos=0, retain=False):
+        self.published.append((topic, payload, qos, retain))
+        return MagicMock(rc=0, mid=next(self._mids))
+
+
+@pytest.fixture
+def sockpair():
+    a, b = socket.socketpair()
+    yield a, b
+    a.close()
+    b.close()
+
+
+@pytest.mark.asyncio
+async def test_publish_waits_for_socket_then_respects_inflight_window(sockpair):
+    paho = FakePaho()
+    transport = AsyncioMqttTransport(paho, asyncio.get_running_loop(), max_inflight=2)
+
+    for i in range(3):
+        assert transport.publish(f"t/{i}", "x", qos=1).rc == 0
+    assert paho.published == []
+    assert transport.queue_depth() == 3
+
+    transport._on_socket_open(paho, None, sockpair[0])
+    assert [p[0] for p in paho.published] == ["t/0", "t/1"]
+    assert transport.inflight() == 2
+
+    transport._on_publish(paho, None, 1)
+    assert [p[0] for p in paho.published] == ["t/0", "t/1", "t/2"]
+    assert transport.published == 1
+    assert transport.stats()["queue_depth"] == 0
+    transport.close()
+
+
+@pytest.mark.asyncio
+async def test_full_queue_drops_oldest():
+    paho = FakePaho()
+    transport = AsyncioMqttTransport(paho, asyncio.get_running_loop(), max_queue=2)
+
+    for i in range(3):
+        transport.publish(f"t/{i}", "x")
+
+    assert transport.dropped == 1
+    assert [item.topic for item in transport._queue] == ["t/1", "t/2"]
+
+
+@pytest.mark.asyncio
+async def test_socket_close_detaches_and_resets_window(sockpair):
+    paho = FakePaho()
+    loop = asyncio.get_running_loop()
+    transport = AsyncioMqttTransport(paho, loop)
+    transport._on_socket_open(paho, None, sockpair[0])
+    transport.publish("t/0", "x", qos=1)
+
+    transport._on_socket_close(paho, None, sockpair[0])
+
+    assert transport.attached is False
+    assert transport.inflight() == 0
+    assert loop.remove_reader(sockpair[0]) is False
+
+
+@pytest.mark.asyncio
+async def test_unacked_qos1_is_requeued_and_resent_after_reconnect(sockpair):
+    paho = FakePaho()
+    transport = AsyncioMqttTransport(paho, asyncio.get_running_loop())
+    transport._on_socket_open(paho, None, sockpair[0])
+    transport.publish("t/qos0", "x", qos=0)
+    transport.publish("t/qos1", "x", qos=1)
+    transport.publish("t/acked", "x", qos=1)
+    transport._on_publish(paho, None, 3)
+
+    transport._on_socket_close(paho, None, sockpair[0])
+    assert [item.topic for item in transport._queue] == ["t/qos1"]
+    assert transport.dropped == 1
+
+    new_paho = FakePaho()
+    new_transport = AsyncioMqttTransport(new_paho, asyncio.get_running_loop())
+    new_transport.publish("t/new", "x", qos=1)
+    new_transport.requeue(transport.take_pending())
+    new_transport._on_socket_open(new_paho, None, sockpair[0])
+
+    assert [p[0] for p in new_paho.published] == ["t/qos1", "t/new"]
+    new_transport.close()
+
+
+@pytest.mark.asyncio
+async def test_close_counts_discarded_messages():
+    transport = AsyncioMqttTransport(FakePaho(), asyncio.get_running_loop())
+    transport.publish("t/0", "x")
+    transport.publish("t/1", "x")
+
+    transport.close()
+
+    assert transport.queue_depth() == 0
+    assert transport.dropped == 2
+
+
+@pytest.mark.asyncio
+async def test_socket_events_drive_paho_loop(sockpair):
+    paho = FakePaho()
+    transport = AsyncioMqttTransport(paho, asyncio.get_running_loop())
+    transport._on_socket_open(paho, None, sockpair[0])
+    transport._on_socket_register_write(paho, None, sockpair[0])
+
+    sockpair[1].send(b"\x00")
+    await asyncio.sleep(0.01)
+
+    paho.loop_read.assert_called()
+    paho.loop_write.assert_called()
+    transport.close()
+
+
+@pytest.mark.asyncio
+async def test_socket_open_from_other_thread_is_marshalled_to_loop(sockpair):
+    paho = FakePaho()
+    transport = AsyncioMqttTransport(paho, asyncio.get_running_loop())
+
+    await asyncio.to_thread(transport._on_socket_open, paho, None, sockpair[0])
+    await asyncio.sleep(0)
+
+    assert transport.attached is True
+    transport.close()
+
+
+@pytest.mark.asyncio
+async def test_mqtt_client_publish_state_goes_through_transport(sockpair):
+    paho = FakePaho()
+    c = MQTTClient(host="127.0.0.1", port=1883, async_transport=True)
+    c._client = paho
+    c.connected = True
+    c._transport = AsyncioMqttTransport(paho, asyncio.get_running_loop())
+    c._transport._on_socket_open(paho, None, sockpair[0])
+
+    assert c.publish_state("DEV01", "tbl_actual", {"P": 1}) is True
+
+    topics = [p[0] for p in paho.published]
+    assert "oig_local/DEV01/tbl_actual/state" in topics
+    assert c.transport_stats()["enqueued"] == len(topics)
+    c._transport.close()
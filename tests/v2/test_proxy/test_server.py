@@ -616,6 +616,60 @@ async def test_telemetry_record_response_called_on_cloud_to_box():
     mock_telemetry.record_frame_direction.assert_called_once_with("cloud_to_proxy")
 
 
+@pytest.mark.asyncio
+async def test_pipes_share_session_conn_id_for_telemetry():
+    """Obě pipe hlásí request/response pod stejným conn_id session."""
+    cfg = make_config()
+    mock_telemetry = MagicMock()
+    server = ProxyServer(cfg, telemetry_collector=mock_telemetry)
+
+    box_reader = MagicMock(spec=asyncio.StreamReader)
+    box_reader.read = AsyncMock(side_effect=[
+        build_frame("<TblName>tbl_actual</TblName><ID_Device>12345</ID_Device><P>1</P>").encode("utf-8"),
+        b"",
+    ])
+    cloud_reader = MagicMock(spec=asyncio.StreamReader)
+    cloud_reader.read = AsyncMock(side_effect=[build_frame("<Result>ACK</Result>").encode("utf-8"), b""])
+    writer = MagicMock(spec=asyncio.StreamWriter)
+    writer.drain = AsyncMock()
+
+    await server._pipe_box_to_cloud(box_reader, writer, writer, conn_id=77)
+    await server._pipe_cloud_to_box(cloud_reader, writer, conn_id=77)
+
+    mock_telemetry.record_request.assert_called_once_with("tbl_actual", 77)
+    assert mock_telemetry.record_response.call_args.kwargs["conn_id"] == 77
+
+
+@pytest.mark.asyncio
+async def test_isnewset_poll_injects_settings_up_to_session_window():
+    """Jeden IsNewSet poll nese tolik Settingů, kolik se vejde do okna session."""
+    from twin.delivery import TwinDelivery
+    from twin.state import TwinQueue
+
+    queue = TwinQueue()
+    for i in range(1, 5):
+        queue.enqueue("tbl_boiler_prms", f"ZONE{i}_S", i)
+    delivery = TwinDelivery(queue, MagicMock(), window=3)
+    server = ProxyServer(make_config(), twin_delivery=delivery)
+
+    box_reader = MagicMock(spec=asyncio.StreamReader)
+    box_reader.read = AsyncMock(side_effect=[
+        build_frame("<TblName>IsNewSet</TblName><ID_Device>12345</ID_Device>").encode("utf-8"),
+        b"",
+    ])
+    cloud_writer = MagicMock(spec=asyncio.StreamWriter)
+    cloud_writer.drain = AsyncMock()
+    box_writer = MagicMock(spec=asyncio.StreamWriter)
+    box_writer.drain = AsyncMock()
+
+    await server._pipe_box_to_cloud(box_reader, cloud_writer, box_writer, session_id="sess_1")
+
+    injected = [call.args[0] for call in box_writer.write.call_args_list]
+    assert len(injected) == 3
+    assert all(f"ZONE{i}_S".encode() in frame for i, frame in enumerate(injected, 1))
+    cloud_writer.write.assert_not_called()
+
+
 @pytest.mark.asyncio
 async def test_telemetry_not_called_when_collector_is_none():
     """Bez telemetry_collector _process_frame necrashuje."""
@@ -9,7 +9,7 @@ import tempfile
 
 import pytest
 
-from sensor.loader import SensorMapLoader
+from sensor.loader import SensorMapDiff, SensorMapLoader
 
 
 class TestSensorMapLoader:
@@ -138,3 +138,154 @@ class TestSensorMapLoader:
             assert ("tbl_batt", "BAT_V", {"name": "Napeti"}) in items
         finally:
             os.unlink(temp_path)
+
+    def test_iter_sensors_is_built_once_per_load(self, tmp_path):
+        map_file = tmp_path / "sensor_map.json"
+        map_file.write_text(json.dumps({"sensors": {"tbl_actual:Temp": {"name": "Teplota"}}}))
+
+        loader = SensorMapLoader(str(map_file))
+        loader.load()
+
+        assert loader.iter_sensors() is loader.iter_sensors()
+
+    def test_iter_table_returns_only_requested_table(self, tmp_path):
+        map_file = tmp_path / "sensor_map.json"
+        map_file.write_text(
+            json.dumps(
+                {
+                    "sensors": {
+                        "tbl_actual:Temp": {"name": "Teplota"},
+                        "proxy_control:PROXY_MODE": {"name": "Mode"},
+                        "invalid": {"name": "x"},
+                    }
+                }
+            )
+        )
+
+        loader = SensorMapLoader(str(map_file))
+        loader.load()
+
+        assert loader.iter_table("proxy_control") == [("proxy_control", "PROXY_MODE", {"name": "Mode"})]
+        assert loader.iter_table("tbl_missing") == []
+        assert len(loader.iter_sensors()) == 2
+
+
+class TestSensorMapCache:
+    """Test compiled sensor map cache."""
+
+    @staticmethod
+    def _write_map(path, sensors):
+        path.write_text(json.dumps({"sensors": sensors}), encoding="utf-8")
+
+    def test_load_writes_cache_and_reuses_it(self, tmp_path, monkeypatch):
+        map_file = tmp_path / "sensor_map.json"
+        cache_file = tmp_path / "sensor_map.cache"
+        self._write_map(map_file, {"tbl_actual:Temp": {"name": "Teplota"}})
+
+        first = SensorMapLoader(str(map_file), cache_path=str(cache_file))
+        first.load()
+        assert cache_file.exists()
+
+        def _fail(*_args, **_kwargs):
+            raise AssertionError("JSON must not be parsed when cache is valid")
+
+        monkeypatch.setattr("sensor.loader.json.loads", _fail)
+        second = SensorMapLoader(str(map_file), cache_path=str(cache_file))
+        second.load()
+
+        assert second.lookup("tbl_actual", "Temp") == {"name": "Teplota"}
+        assert second.iter_sensors() == [("tbl_actual", "Temp", {"name": "Teplota"})]
+        assert second.source_hash == first.source_hash
+
+    def test_cache_invalidated_when_source_changes(self, tmp_path):
+        map_file = tmp_path / "sensor_map.json"
+        cache_file = tmp_path / "sensor_map.cache"
+        self._write_map(map_file, {"tbl_actual:Temp": {"name": "Old"}})
+        SensorMapLoader(str(map_file), cache_path=str(cache_file)).load()
+
+        self._write_map(map_file, {"tbl_actual:Temp": {"name": "New"}, "tbl_batt:BAT_V": {"name": "V"}})
+        loader = SensorMapLoader(str(map_file), cache_path=str(cache_file))
+        loader.load()
+
+        assert loader.lookup("tbl_actual", "Temp") == {"name": "New"}
+        assert loader.sensor_count() == 2
+
+    def test_corrupt_cache_falls_back_to_json(self, tmp_path):
+        map_file = tmp_path / "sensor_map.json"
+        cache_file = tmp_path / "sensor_map.cache"
+        self._write_map(map_file, {"tbl_actual:Temp": {"name": "Teplota"}})
+        cache_file.write_bytes(b"not a marshal payload")
+
+        loader = SensorMapLoader(str(map_file), cache_path=str(cache_file))
+        loader.load()
+
+        assert loader.sensor_count() == 1
+
+    def test_invalid_json_is_not_cached(self, tmp_path):
+        map_file = tmp_path / "sensor_map.json"
+        cache_file = tmp_path / "sensor_map.cache"
+        map_file.write_text("{broken", encoding="utf-8")
+
+        loader = SensorMapLoader(str(map_file), cache_path=str(cache_file))
+        loader.load()
+
+        assert loader.sensor_count() == 0
+        assert not cache_file.exists()
+
+
+class TestSensorMapDiff:
+    """Test per table:key diff and atomic adopt used by hot reload."""
+
+    @staticmethod
+    def _loaded(tmp_path, name, sensors):
+        path = tmp_path / name
+        path.write_text(json.dumps({"sensors": sensors}), encoding="utf-8")
+        loader = SensorMapLoader(str(path))
+        loader.load()
+        return loader
+
+    def test_diff_reports_added_changed_removed(self, tmp_path):
+        old = self._loaded(
+            tmp_path,
+            "old.json",
+            {
+                "tbl_actual:Temp": {"name": "T"},
+                "tbl_actual:Gone": {"name": "G"},
+                "tbl_batt:BAT_V": {"name": "V"},
+            },
+        )
+        new = self._loaded(
+            tmp_path,
+            "new.json",
+            {
+                "tbl_actual:Temp": {"name": "T"},
+                "tbl_batt:BAT_V": {"name": "Voltage"},
+                "tbl_batt:BAT_C": {"name": "C"},
+            },
+        )
+
+        diff = old.diff(new)
+
+        assert diff.added == [("tbl_batt", "BAT_C", {"name": "C"})]
+        assert diff.changed == [
+            (("tbl_batt", "BAT_V", {"name": "V"}), ("tbl_batt", "BAT_V", {"name": "Voltage"}))
+        ]
+        assert diff.removed == [("tbl_actual", "Gone", {"name": "G"})]
+        assert diff.size == 3
+
+    def test_identical_maps_give_empty_diff(self, tmp_path):
+        sensors = {"tbl_actual:Temp": {"name": "T"}}
+        diff = self._loaded(tmp_path, "a.json", sensors).diff(self._loaded(tmp_path, "b.json", sensors))
+        assert diff.is_empty()
+        assert SensorMapDiff().size == 0
+
+    def test_adopt_swaps_lookup_and_indexes(self, tmp_path):
+        old = self._loaded(tmp_path, "old.json", {"tbl_actual:Temp": {"name": "T"}})
+        new = self._loaded(tmp_path, "new.json", {"tbl_batt:BAT_V": {"name": "V"}})
+
+        old.adopt(new)
+
+        assert old.lookup("tbl_actual", "Temp") is None
+        assert old.lookup("tbl_batt", "BAT_V") == {"name": "V"}
+        assert old.iter_table("tbl_batt") == [("tbl_batt", "BAT_V", {"name": "V"})]
+        assert old.source_hash == new.source_hash
@@ -0,0 +1,100 @@
+"""Tests for sensor/watcher.py — SensorMapWatcher hot reload."""
+# pylint: disable=missing-function-docstring,protected-access
+
+# pyright: reportMissingImports=false
+
+import json
+import os
+from unittest.mock import MagicMock
+
+import pytest
+
+from sensor.loader import SensorMapLoader
+from sensor.watcher import SensorMapWatcher
+
+
+def _write_map(path, sensors, mtime_ns=None):
+    path.write_text(json.dumps({"sensors": sensors}), encoding="utf-8")
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+@pytest.fixture
+def map_file(tmp_path):
+    path = tmp_path / "sensor_map.json"
+    _write_map(path, {"tbl_actual:Temp": {"name": "T"}}, mtime_ns=1_000_000_000)
+    return path
+
+
+@pytest.fixture
+def loader(map_file):
+    loader = SensorMapLoader(str(map_file))
+    loader.load()
+    return loader
+
+
+@pytest.mark.asyncio
+async def test_check_ignores_unchanged_file(loader, map_file):
+    on_reload = MagicMock()
+    watcher = SensorMapWatcher(loader, str(map_file), interval_s=1, on_reload=on_reload)
+    watcher._signature = watcher._stat()
+
+    assert await watcher.check() is None
+    on_reload.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_check_swaps_map_and_reports_diff(loader, map_file):
+    on_reload = MagicMock()
+    collector = MagicMock()
+    watcher = SensorMapWatcher(
+        loader,
+        str(map_file),
+        interval_s=1,
+        on_reload=on_reload,
+        telemetry_collector=collector,
+    )
+    watcher._signature = watcher._stat()
+
+    _write_map(map_file, {"tbl_actual:Temp": {"name": "Teplota"}, "tbl_batt:BAT_V": {"name": "V"}},
+               mtime_ns=2_000_000_000)
+    diff = await watcher.check()
+
+    assert diff is not None
+    assert [entry[:2] for entry in diff.added] == [("tbl_batt", "BAT_V")]
+    assert len(diff.changed) == 1
+    assert loader.lookup("tbl_actual", "Temp") == {"name": "Teplota"}
+    on_reload.assert_called_once_with(diff)
+    collector.record_sensor_map_reload.assert_called_once()
+    assert collector.record_sensor_map_reload.call_args.kwargs["added"] == 1
+    stats = watcher.stats()
+    assert stats["sensor_map_reloads"] == 1
+    assert stats["sensor_map_diff_size"] == 2
+
+
+@pytest.mark.asyncio
+async def test_check_keeps_old_map_when_new_file_is_invalid(loader, map_file):
+    on_reload = MagicMock()
+    watcher = SensorMapWatcher(loader, str(map_file), interval_s=1, on_reload=on_reload)
+    watcher._signature = watcher._stat()
+
+    map_file.write_text("{broken", encoding="utf-8")
+    os.utime(map_file, ns=(3_000_000_000, 3_000_000_000))
+
+    assert await watcher.check() is None
+    assert loader.lookup("tbl_actual", "Temp") == {"name": "T"}
+    assert watcher.reload_errors == 1
+    on_reload.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_check_skips_touch_without_content_change(loader, map_file):
+    on_reload = MagicMock()
+    watcher = SensorMapWatcher(loader, str(map_file), interval_s=1, on_reload=on_reload)
+    watcher._signature = watcher._stat()
+
+    os.utime(map_file, ns=(4_000_000_000, 4_000_000_000))
+
+    assert await watcher.check() is None
+    on_reload.assert_not_called()
+    assert watcher.reloads == 0
@@ -69,6 +69,7 @@ def test_settings_audit_contract_canonical_record_serializes_deterministically()
         "step",
         "result",
         "audit_id",
+        "batch_id",
         "key",
         "session_id",
         "msg_id",
@@ -365,3 +366,44 @@ def test_make_step_record_redacts_raw_text_for_sensitive_keys() -> None:
     assert step.raw_text_truncated is False
     assert step.raw_text_bytes_original == len("[REDACTED]".encode("utf-8"))
     assert step.confirmed_value_text == "[REDACTED]"
+
+
+def test_audit_tracking_expires_from_ttl_index_head(monkeypatch) -> None:
+    settings_audit = importlib.import_module("telemetry.settings_audit")
+    # pylint: disable=protected-access
+    _clear_audit_tracking_state(settings_audit)
+    ttl = settings_audit._AUDIT_TRACKING_TTL_SECONDS
+    clock = {"now": 1_000.0}
+    monkeypatch.setattr(settings_audit.time, "time", lambda: clock["now"])
+
+    settings_audit._apply_raw_text_limits("aud_a", "a")
+    clock["now"] += 10
+    settings_audit._apply_raw_text_limits("aud_b", "b")
+    clock["now"] += 10
+    settings_audit._touch_audit_tracking("aud_a")
+    assert list(settings_audit._audit_last_seen) == ["aud_b", "aud_a"]
+
+    clock["now"] = 1_010.0 + ttl + 1
+    settings_audit._apply_raw_text_limits("aud_c", "c")
+    assert list(settings_audit._audit_last_seen) == ["aud_a", "aud_c"]
+    assert set(settings_audit._audit_raw_bytes) == {"aud_a", "aud_c"}
+    _clear_audit_tracking_state(settings_audit)
+
+
+def test_raw_text_truncation_does_not_split_utf8_characters() -> None:
+    settings_audit = importlib.import_module("telemetry.settings_audit")
+    # pylint: disable=protected-access
+    _clear_audit_tracking_state(settings_audit)
+    limit = settings_audit._MAX_RAW_TEXT_BYTES
+    text = "x" + "č" * limit  # 2 bajty na znak, hranice padne doprostřed znaku
+
+    truncated, info = settings_audit.truncate_raw_text(text)
+    assert info.was_truncated is True
+    assert truncated == "x" + "č" * ((limit - 1) // 2)
+
+    capped, info, payload_capped = settings_audit._apply_raw_text_limits("aud_utf8", text)
+    assert capped == truncated
+    assert info.original_bytes == len(text.encode("utf-8"))
+    assert payload_capped is False
+    assert settings_audit._audit_raw_bytes["aud_utf8"] == len(truncated.encode("utf-8"))
+    _clear_audit_tracking_state(settings_audit)
@@ -120,6 +120,36 @@ def test_publish_when_mqtt_ready():
     assert isinstance(payload["last_data_age_s"], int)
 
 
+def test_publish_includes_discovery_stats():
+    """Status payload obsahuje počty publikovaných/přeskočených discovery."""
+    mqtt = make_mqtt_client(connected=True)
+    mqtt.transport_stats.return_value = {}
+    mqtt.discovery_stats.return_value = {"discovery_published": 12, "discovery_skipped": 400}
+    pub = ProxyStatusPublisher(mqtt, 60, "oig_proxy")
+
+    pub._publish()
+
+    payload = mqtt.publish_state.call_args[0][2]
+    assert payload["mqtt_discovery_published"] == 12
+    assert payload["mqtt_discovery_skipped"] == 400
+
+
+def test_publish_includes_setting_latency_stats():
+    """Status payload obsahuje percentily latence Settingů z getteru."""
+    mqtt = make_mqtt_client(connected=True)
+    mqtt.transport_stats.return_value = {}
+    mqtt.discovery_stats.return_value = {}
+    pub = ProxyStatusPublisher(
+        mqtt, 60, "oig_proxy",
+        get_setting_latency_stats=lambda: {"setting_end_to_end_p95_ms": 1830.0},
+    )
+
+    pub._publish()
+
+    payload = mqtt.publish_state.call_args[0][2]
+    assert payload["setting_end_to_end_p95_ms"] == 1830.0
+
+
 def test_publish_includes_cloud_counters_and_refreshes_discovery():
     """Status payload republishes cloud counters using missing-key-safe discovery."""
     mqtt = make_mqtt_client(connected=True)
@@ -309,7 +339,7 @@ def test_publish_sends_discovery_for_proxy_controls_when_loader_present():
         "device_mapping": "proxy",
         "entity_category": "diagnostic",
     }
-    loader.iter_sensors.return_value = [
+    loader.iter_table.return_value = [
         ("proxy_control", "PROXY_MODE", {"name_cs": "Proxy - Režim", "device_mapping": "proxy", "entity_category": "config"})
     ]
     pub = ProxyStatusPublisher(mqtt, 60, "oig_proxy", sensor_loader=loader)
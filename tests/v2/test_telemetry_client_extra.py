@@ -13,6 +13,20 @@ from unittest.mock import AsyncMock, MagicMock
 import pytest
 
 import telemetry.client as telemetry_client
+from telemetry.envelope import EnvelopeDecoder, unpack
+
+
+class FakeMessageInfo:
+    def __init__(self, rc: int, published: bool) -> None:
+        self.rc = rc
+        self.published = published
+        self.wait_timeouts: list[float | None] = []
+
+    def wait_for_publish(self, timeout: float | None = None) -> None:
+        self.wait_timeouts.append(timeout)
+
+    def is_published(self) -> bool:
+        return self.published
 
 
 class FakeMQTTClient:
@@ -25,12 +39,13 @@ class FakeMQTTClient:
         self.publish_rc = 0
         self.publish_rcs: list[int] = []
         self.raise_on_publish = False
+        self.broker_acks = True
         self.raise_on_reconnect = False
         self.loop_start_calls = 0
         self.loop_stop_calls = 0
         self.disconnect_calls = 0
         self.reconnect_calls = 0
-        self.published: list[tuple[str, dict[str, object], int]] = []
+        self.published: list[tuple[str, object, int]] = []
 
     def connect(self, host: str, port: int, keepalive: int = 60) -> None:
         # pylint: disable=attribute-defined-outside-init
@@ -63,12 +78,12 @@ class FakeMQTTClient:
             raise RuntimeError("reconnect failed")
         self.connected = True
 
-    def publish(self, topic: str, message: str, qos: int = 1):
+    def publish(self, topic: str, message: str | bytes, qos: int = 1):
         if self.raise_on_publish:
             raise RuntimeError("publish failed")
-        self.published.append((topic, json.loads(message), qos))
+        self.published.append((topic, message if isinstance(message, bytes) else json.loads(message), qos))
         rc = self.publish_rcs.pop(0) if self.publish_rcs else self.publish_rc
-        return SimpleNamespace(rc=rc)
+        return FakeMessageInfo(rc, rc == 0 and self.broker_acks)
 
 
 def _install_fake_mqtt(monkeypatch: pytest.MonkeyPatch, *, auto_connect: bool = True) -> list[FakeMQTTClient]:
@@ -105,13 +120,11 @@ def test_get_instance_hash_uses_supervisor_token_and_hostname(monkeypatch: pytes
 
 
 def test_telemetry_buffer_cleanup_invalid_json_and_close(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
-    monkeypatch.setattr(telemetry_client, "BUFFER_MAX_MESSAGES", 2)
+    monkeypatch.setattr(telemetry_client, "BUFFER_MAX_MESSAGES", 3)
     monkeypatch.setattr(telemetry_client, "BUFFER_MAX_AGE_HOURS", 1)
     monkeypatch.setattr(telemetry_client.time, "time", lambda: 10_000.0)
 
     buffer = telemetry_client.TelemetryBuffer(db_path=tmp_path / "buffer.db")
-    assert buffer.store("topic/1", {"value": 1}) is True
-
     assert buffer._conn is not None
     buffer._conn.execute(
         "INSERT INTO messages (topic, payload, timestamp) VALUES (?, ?, ?)",
@@ -123,14 +136,17 @@ def test_telemetry_buffer_cleanup_invalid_json_and_close(monkeypatch: pytest.Mon
     )
     buffer._conn.execute(
         "INSERT INTO messages (topic, payload, timestamp) VALUES (?, ?, ?)",
-        ("topic/2", json.dumps({"value": 2}), 9_999.5),
+        ("topic/legacy", json.dumps({"value": 0}), 9_999.5),
     )
     buffer._conn.commit()
+    assert buffer.store("topic/1", {"value": 1}) is True
 
     buffer._cleanup()
     pending = buffer.get_pending(limit=10)
 
-    assert [topic for _, topic, _ in pending] == ["topic/2", "topic/1"]
+    # Nekomprimované řádky starší verze se čtou dál, rozbité se smažou.
+    assert [topic for _, topic, _ in pending] == ["topic/legacy", "topic/1"]
+    assert pending[0][2] == {"value": 0}
     assert buffer.count() == 2
 
     buffer.remove(pending[0][0])
@@ -141,6 +157,30 @@ def test_telemetry_buffer_cleanup_invalid_json_and_close(monkeypatch: pytest.Mon
     assert buffer.count() == 0
 
 
+def test_telemetry_buffer_is_a_ring_with_compressed_payloads(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    monkeypatch.setattr(telemetry_client, "BUFFER_MAX_MESSAGES", 5)
+    db_path = tmp_path / "buffer.db"
+    buffer = telemetry_client.TelemetryBuffer(db_path=db_path)
+    for i in range(8):
+        assert buffer.store(f"topic/{i}", {"value": i, "logs": ["x" * 200] * 5}) is True
+
+    assert buffer.count() == 5
+    pending = buffer.get_pending(limit=10)
+    assert [payload["value"] for _, _, payload in pending] == [3, 4, 5, 6, 7]
+    assert buffer._conn is not None
+    raw = buffer._conn.execute("SELECT payload FROM messages LIMIT 1").fetchone()[0]
+    assert isinstance(raw, bytes) and len(raw) < 200
+    assert buffer._conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+    buffer.remove_many([message_id for message_id, _, _ in pending[:3]])
+    assert buffer.count() == 2
+    buffer.close()
+
+    reopened = telemetry_client.TelemetryBuffer(db_path=db_path)
+    assert reopened.count() == 2
+    reopened.close()
+
+
 def test_create_client_success_and_timeout_paths(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
     created = _install_fake_mqtt(monkeypatch)
 
@@ -219,6 +259,71 @@ def test_ensure_connected_publish_and_flush_buffer(monkeypatch: pytest.MonkeyPat
     assert client._publish_sync("oig/topic/live", {"value": 4}) is False
 
 
+def test_envelope_base_moves_only_after_broker_ack(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    _install_fake_mqtt(monkeypatch)
+    client = telemetry_client.TelemetryClient(
+        "dev-6",
+        "2.0.0",
+        telemetry_enabled=True,
+        db_path=tmp_path / "telemetry-envelope-ack.db",
+        payload_format="envelope",
+    )
+    fake = FakeMQTTClient(client_id="e")
+    fake.connected = True
+    client._client = fake
+    client._connected = True
+    topic = "oig/telemetry/dev-6/envelope"
+    decoder = EnvelopeDecoder()
+
+    assert client._publish_envelope_sync(topic, {"uptime_s": 300, "frames_received": 10}) is True
+    fake.broker_acks = False  # rc == 0, ale zpráva nikdy nedorazí
+    assert client._publish_envelope_sync(topic, {"uptime_s": 600, "frames_received": 20}) is False
+    fake.broker_acks = True
+    assert client._publish_envelope_sync(topic, {"uptime_s": 900, "frames_received": 35}) is True
+
+    first, _lost, third = (message for _topic, message, _qos in fake.published)
+    assert "base_seq" not in unpack(third)
+    decoder.feed(first)
+    assert decoder.feed(third)["frames_received"] == 35
+
+
+def test_envelope_publish_acknowledges_and_flushes_keyframes(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    _install_fake_mqtt(monkeypatch)
+    client = telemetry_client.TelemetryClient(
+        "dev-5",
+        "2.0.0",
+        telemetry_enabled=True,
+        db_path=tmp_path / "telemetry-envelope.db",
+        payload_format="envelope",
+    )
+    fake = FakeMQTTClient(client_id="e")
+    fake.connected = True
+    client._client = fake
+    client._connected = True
+    topic = "oig/telemetry/dev-5/envelope"
+    decoder = EnvelopeDecoder()
+
+    assert client._publish_envelope_sync(topic, {"uptime_s": 300, "frames_received": 10}) is True
+    fake.publish_rc = 1
+    assert client._publish_envelope_sync(topic, {"uptime_s": 600, "frames_received": 20}) is False
+    fake.publish_rc = 0
+    assert client._publish_envelope_sync(topic, {"uptime_s": 900, "frames_received": 35}) is True
+
+    first, failed, third = (unpack(message) for _topic, message, _qos in fake.published)
+    assert "base_seq" not in first and failed["base_seq"] == 1
+    assert "base_seq" not in third  # po nepotvrzeném okně jde keyframe
+    decoder.feed(fake.published[0][1])
+    assert decoder.feed(fake.published[2][1])["frames_received"] == 35
+    fake.published.clear()
+    assert client._publish_envelope_sync(topic, {"uptime_s": 1200, "frames_received": 40}) is True
+    assert unpack(fake.published[-1][1])["base_seq"] == 3
+
+    assert client._buffer is not None
+    client._buffer.store(topic, {"uptime_s": 600, "frames_received": 20})
+    assert client._flush_buffer_sync() == 1
+    assert "base_seq" not in unpack(fake.published[-1][1])
+
+
 @pytest.mark.asyncio
 async def test_send_telemetry_send_event_wrappers_and_status_properties(
     monkeypatch: pytest.MonkeyPatch,
@@ -97,6 +97,35 @@ def test_response_helpers_request_queue_and_timeout_stats() -> None:
     assert collector.cloud_failed_in_window is True
 
 
+def test_cloud_rtt_histograms_and_pending_gc(monkeypatch: pytest.MonkeyPatch) -> None:
+    clock = {"t": 1_000.0}
+    monkeypatch.setattr(telemetry_collector.time, "monotonic", lambda: clock["t"])
+    collector = _make_collector(get_mode=lambda: "online")
+
+    for rtt_s in (0.1, 0.2, 0.4):
+        collector.record_request("tbl_actual", 1)
+        clock["t"] += rtt_s
+        collector.record_response("<Result>ACK</Result>", source="cloud", conn_id=1)
+    collector.record_request("tbl_box", 1)
+    collector.record_timeout(conn_id=1)  # timeout nemá RTT
+    collector.record_request("tbl_batt", 2)
+    collector.record_request("tbl_batt", 3)
+    collector.record_connection_closed(2)
+    assert set(collector.req_pending) == {3}
+
+    window = collector._collect_and_clear_window_metrics(logs=[])
+    (rtt,) = window["cloud_rtt"]
+    assert (rtt["table"], rtt["mode"], rtt["count"]) == ("tbl_actual", "online", 3)
+    assert 180 <= rtt["p50_ms"] <= 220
+    assert rtt["max_ms"] == 400.0
+    assert not collector.cloud_rtt
+    assert set(collector.req_pending) == {3}
+
+    clock["t"] += telemetry_collector.REQ_PENDING_TTL_S + 1
+    collector._collect_and_clear_window_metrics(logs=[])
+    assert not collector.req_pending
+
+
 def test_record_context_sessions_tbl_events_and_window_flush(monkeypatch: pytest.MonkeyPatch) -> None:
     monkeypatch.setattr(telemetry_collector.time, "time", lambda: 200.0)
     collector = _make_collector()
@@ -116,6 +145,9 @@ def test_record_context_sessions_tbl_events_and_window_flush(monkeypatch: pytest
 
     assert window["error_context"][0]["event_type"] == "error_event"
     assert json.loads(window["error_context"][0]["details"]) == {"detail": "{'bad': {1, 2, 3}}"}
+    assert window["error_context"][0]["log_seq_start"] == 0
+    assert window["error_context"][0]["log_seq_end"] == 1
+    assert [entry["message"] for entry in window["error_context_logs"]] == ["inside context"]
     assert len(window["tbl_events"]) == 2
     assert window["tbl_events"][0]["event_time"] == "2026-03-12T12:00:00Z"
     assert window["box_sessions"][0]["peer"] == "1.2.3.4:5710"
@@ -132,6 +164,48 @@ def test_record_context_sessions_tbl_events_and_window_flush(monkeypatch: pytest
     assert not collector.settings_audit
 
 
+def test_error_context_logs_are_shared_across_errors(monkeypatch: pytest.MonkeyPatch) -> None:
+    now = {"t": 1_000.0}
+    monkeypatch.setattr(telemetry_collector.time, "time", lambda: now["t"])
+    collector = _make_collector()
+    collector.log_window_s = 60
+
+    _record_log(collector, created=900.0, level=logging.INFO, message="outside window")
+    for i in range(3):
+        _record_log(collector, created=990.0 + i, level=logging.INFO, message=f"before {i}")
+    for _ in range(100):
+        collector.record_error_context(event_type="error_cloud_connect_refused", details={"peer": "x"})
+    now["t"] = 1_010.0
+    _record_log(collector, created=1_005.0, level=logging.WARNING, message="after")
+    collector.record_error_context(event_type="error_cloud_timeout", details={})
+
+    window = collector._collect_and_clear_window_metrics(logs=[])
+
+    contexts = window["error_context"]
+    assert len(contexts) == 101
+    assert (contexts[0]["log_seq_start"], contexts[0]["log_seq_end"]) == (1, 4)
+    assert (contexts[-1]["log_seq_start"], contexts[-1]["log_seq_end"]) == (1, 5)
+    assert [entry["seq"] for entry in window["error_context_logs"]] == [1, 2, 3, 4]
+    assert window["error_context_logs"][-1]["message"] == "after"
+    assert contexts[-1]["log_lost"] == 0
+
+
+def test_error_context_reports_logs_overwritten_in_ring(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(telemetry_collector.time, "time", lambda: 1_000.0)
+    collector = _make_collector()
+    collector.log_max = 10
+    for i in range(4):
+        _record_log(collector, created=990.0 + i, level=logging.INFO, message=f"before {i}")
+    collector.record_error_context(event_type="error_cloud_timeout", details={})
+    for i in range(8):
+        _record_log(collector, created=995.0, level=logging.INFO, message=f"flood {i}")
+
+    window = collector._collect_and_clear_window_metrics(logs=[])
+
+    assert window["error_context"][0]["log_lost"] == 2
+    assert [entry["seq"] for entry in window["error_context_logs"]] == [2, 3]
+
+
 def test_cached_state_value_device_specific_metrics_and_collect_metrics(monkeypatch: pytest.MonkeyPatch) -> None:
     cache = {
         "oig_local/dev-1/IsNewSet/state": '{"LAT": 48}',
@@ -302,3 +376,22 @@ def test_init_handles_telemetry_client_failure(monkeypatch: pytest.MonkeyPatch)
     monkeypatch.setattr(telemetry_collector, "TelemetryClient", MagicMock(side_effect=RuntimeError("boom")))
     collector.init()
     assert collector.client is None
+
+
+def test_cached_state_value_prefers_parsed_field_getter() -> None:
+    lookups = []
+
+    def get_cached_field(topic, field_name):
+        lookups.append(topic)
+        return 77 if topic.endswith("/tbl_box/state") else None
+
+    mqtt_publisher = SimpleNamespace(
+        get_cached_field=get_cached_field,
+        get_cached_payload=lambda _topic: pytest.fail("payload path must not be used"),
+        is_ready=lambda: True,
+    )
+    collector = _make_collector(mqtt_publisher=mqtt_publisher)
+
+    assert collector._cached_state_value("dev-1", "tbl_box", "STRNGHT") == 77
+    assert collector._cached_state_value("dev-1", "isnewset", "lat") is None
+    assert lookups[-2:] == ["oig_local/dev-1/isnewset/state", "oig_local/dev-1/IsNewSet/state"]
@@ -0,0 +1,79 @@
+"""
+Testy pro telemetry/envelope.py — komprimovaná delta obálka telemetrie.
+"""
+# pylint: disable=protected-access
+from __future__ import annotations
+
+# pyright: reportMissingImports=false
+
+import pytest
+
+from telemetry.envelope import CUMULATIVE_COUNTERS, EnvelopeDecoder, TelemetryEnvelope, unpack
+
+
+def _window(step: int, logs: int = 0) -> dict:
+    payload = {name: 100 * step for name in CUMULATIVE_COUNTERS}
+    payload.update(
+        {
+            "device_id": "dev-1",
+            "mode": "online",
+            "set_commands": [],
+            "window_metrics": {"logs": [{"message": f"log {i}"} for i in range(logs)], "stats": []},
+        }
+    )
+    return payload
+
+
+def test_round_trip_with_chunks_and_deltas():
+    encoder = TelemetryEnvelope(chunk_items=10, keyframe_interval=100)
+    decoder = EnvelopeDecoder()
+
+    for step in range(1, 4):
+        payload = _window(step, logs=25)
+        window = encoder.encode(payload)
+        encoder.acknowledge(window, payload)
+        assert window.keyframe is (step == 1)
+        assert len(window.messages) == 3
+        result = None
+        for message in reversed(window.messages):  # pořadí doručení nehraje roli
+            result = decoder.feed(message)
+        assert result == payload
+
+    head = unpack(window.messages[0])
+    assert head["body"]["frames_received"] == 100
+    assert len(head["body"]["window_metrics"]["logs"]) == 10
+
+
+def test_keyframes_on_interval_and_counter_reset():
+    encoder = TelemetryEnvelope(keyframe_interval=3)
+    keyframes = []
+    for payload in (_window(1), _window(2), _window(3), _window(4), _window(1)):
+        window = encoder.encode(payload)
+        encoder.acknowledge(window, payload)
+        keyframes.append(window.keyframe)
+
+    # Každé třetí okno je keyframe, poslední po restartu proxy (čítače klesly).
+    assert keyframes == [True, False, False, True, True]
+
+
+def test_size_summary_and_foreign_messages():
+    encoder = TelemetryEnvelope()
+    encoder.encode(_window(1, logs=200))
+
+    summary = encoder.size_summary()
+    assert summary["raw_bytes"]["count"] == 1
+    assert summary["encoded_bytes"]["max"] < summary["raw_bytes"]["max"]
+    assert 0 < summary["ratio"] < 1
+    with pytest.raises(ValueError):
+        unpack(b'{"device_id": "dev-1"}')
+    with pytest.raises(ValueError):
+        EnvelopeDecoder().feed(TelemetryEnvelope().encode(_window(1)).messages[0][:-4])
+
+
+def test_decoder_rejects_delta_without_base():
+    encoder = TelemetryEnvelope()
+    first = encoder.encode(_window(1))
+    encoder.acknowledge(first, _window(1))
+
+    with pytest.raises(ValueError, match="missing base"):
+        EnvelopeDecoder().feed(encoder.encode(_window(2)).messages[0])
@@ -168,6 +168,21 @@ async def test_deliver_pending_records_selected_step() -> None:
     assert record["raw_text"] == "<Frame><TblItem>T_Room</TblItem><NewValue>22</NewValue></Frame>"
 
 
+@pytest.mark.asyncio
+async def test_deliver_pending_feeds_audit_store_without_telemetry() -> None:
+    queue = TwinQueue()
+    queue.enqueue("tbl_set", "T_Room", 22)
+    store = MagicMock()
+    delivery = TwinDelivery(queue, _MQTTStub(), audit_store=store)
+
+    pending = await delivery.deliver_pending("dev_1", session_id="sess_1")
+
+    store.put.assert_called_once()
+    record = store.put.call_args.args[0]
+    assert record["step"] == SettingStep.DELIVER_SELECTED.value
+    assert record["audit_id"] == pending[0].audit_id
+
+
 @pytest.mark.asyncio
 async def test_timeout_records_timeout_step() -> None:
     queue = TwinQueue()
@@ -268,6 +283,8 @@ def test_begin_cloud_setting_records_incoming_and_exposes_inflight() -> None:
     )
 
     assert delivery.is_cloud_inflight() is True
+    assert delivery.has_cloud_pending("tbl_box_prms", "MODE") is True
+    assert delivery.has_cloud_pending("tbl_box_prms", "SA") is False
     inflight = delivery.inflight_setting()
     assert inflight is not None
     setting, device_id = inflight
@@ -417,3 +434,172 @@ async def test_session_timeout_records_timeout_step() -> None:
     timeout_record = collector.settings_audit[1]
     assert timeout_record["step"] == SettingStep.TIMEOUT.value
     assert timeout_record["result"] == SettingResult.FAILED.value
+
+
+@pytest.mark.asyncio
+async def test_window_allows_multiple_inflight_one_per_poll() -> None:
+    queue = TwinQueue()
+    for i in range(1, 4):
+        queue.enqueue("tbl_boiler_prms", f"ZONE{i}_S", i)
+    delivery = TwinDelivery(queue, _MQTTStub(), window=2)
+
+    first = await delivery.deliver_pending("dev_1", session_id="sess_1")
+    second = await delivery.deliver_pending("dev_1", session_id="sess_1")
+    third = await delivery.deliver_pending("dev_1", session_id="sess_1")
+
+    assert [s.key for s in first + second] == ["ZONE1_S", "ZONE2_S"]
+    assert third == []
+
+    delivery.acknowledge("tbl_boiler_prms", "ZONE1_S")
+    fourth = await delivery.deliver_pending("dev_1", session_id="sess_1")
+    assert [s.key for s in fourth] == ["ZONE3_S"]
+
+
+@pytest.mark.asyncio
+async def test_deliver_pending_limit_bounded_by_window() -> None:
+    queue = TwinQueue()
+    for i in range(1, 5):
+        queue.enqueue("tbl_boiler_prms", f"ZONE{i}_E", i)
+    delivery = TwinDelivery(queue, _MQTTStub(), window=3)
+
+    pending = await delivery.deliver_pending("dev_1", limit=10)
+
+    assert [s.key for s in pending] == ["ZONE1_E", "ZONE2_E", "ZONE3_E"]
+
+
+@pytest.mark.asyncio
+async def test_inflight_setting_correlates_by_id_set_then_fifo() -> None:
+    queue = TwinQueue()
+    queue.enqueue("tbl_boiler_prms", "ZONE1_S", 1)
+    queue.enqueue("tbl_boiler_prms", "ZONE2_S", 2)
+    delivery = TwinDelivery(queue, _MQTTStub(), window=2)
+
+    for id_set, msg_id in ((1001, 501), (1002, 502)):
+        (setting,) = await delivery.deliver_pending("dev_1")
+        delivery.record_injected_box(setting, "dev_1", id_set=id_set, msg_id=msg_id)
+
+    by_id_set = delivery.inflight_setting(id_set=1002)
+    by_msg_id = delivery.inflight_setting(msg_id=502)
+    unknown = delivery.inflight_setting(id_set=9999)
+    assert by_id_set is not None and by_id_set[0].key == "ZONE2_S"
+    assert by_msg_id is not None and by_msg_id[0].key == "ZONE2_S"
+    assert unknown is not None and unknown[0].key == "ZONE1_S"
+    assert delivery.find_inflight("tbl_boiler_prms", "ZONE2_S") is not None
+    assert delivery.find_inflight("tbl_boiler_prms", "ZONE3_S") is None
+
+
+@pytest.mark.asyncio
+async def test_nack_falls_back_to_window_one_until_clean_acks() -> None:
+    queue = TwinQueue()
+    for i in range(1, 7):
+        queue.enqueue("tbl_boiler_prms", f"ZONE{i}_S", i)
+    delivery = TwinDelivery(queue, _MQTTStub(), window=2)
+
+    (first,) = await delivery.deliver_pending("dev_1")
+    (_second,) = await delivery.deliver_pending("dev_1")
+    delivery.record_nack(first, "dev_1")
+    delivery.acknowledge(first.table, first.key)
+
+    assert delivery.window == 1
+    assert delivery.nack_fallbacks == 1
+    # ZONE2_S je stále inflight a okno je 1.
+    assert await delivery.deliver_pending("dev_1") == []
+
+    delivery.acknowledge("tbl_boiler_prms", "ZONE2_S")
+    (third,) = await delivery.deliver_pending("dev_1")
+    assert await delivery.deliver_pending("dev_1") == []
+    delivery.acknowledge(third.table, third.key)
+
+    assert delivery.window == 2
+    assert len(await delivery.deliver_pending("dev_1")) == 1
+    assert len(await delivery.deliver_pending("dev_1")) == 1
+
+
+@pytest.mark.asyncio
+async def test_window_is_per_session() -> None:
+    queue = TwinQueue()
+    for i in range(1, 7):
+        queue.enqueue("tbl_boiler_prms", f"ZONE{i}_S", i)
+    delivery = TwinDelivery(queue, _MQTTStub(), window=2)
+
+    first = await delivery.deliver_pending("dev_1", session_id="sess_1", limit=delivery.window_for("sess_1"))
+    other = await delivery.deliver_pending("dev_1", session_id="sess_2", limit=delivery.window_for("sess_2"))
+    assert [s.key for s in first] == ["ZONE1_S", "ZONE2_S"]
+    assert [s.key for s in other] == ["ZONE3_S", "ZONE4_S"]
+
+    delivery.record_nack(first[0], "dev_1")
+    delivery.acknowledge(first[0].table, first[0].key)
+    assert delivery.window_for("sess_1") == 1
+    assert delivery.window_for("sess_2") == 2
+
+    delivery.clear_session("sess_1")
+    assert delivery.window_for("sess_1") == 2
+
+
+@pytest.mark.asyncio
+async def test_clear_session_keeps_setting_in_window() -> None:
+    queue = TwinQueue()
+    queue.enqueue("tbl_set", "T_Room", 22)
+    queue.enqueue("tbl_set", "T_Mode", "AUTO")
+    delivery = TwinDelivery(queue, _MQTTStub())
+
+    _ = await delivery.deliver_pending("dev_1", session_id="sess_1")
+    delivery.clear_session("sess_1")
+
+    assert delivery.inflight() == ("tbl_set", "T_Room")
+    assert await delivery.deliver_pending("dev_1", session_id="sess_2") == []
+
+
+def _begin_cloud(delivery: TwinDelivery, device_id: str, key: str, value: int = 1) -> None:
+    delivery.begin_cloud_setting(
+        device_id=device_id,
+        table="tbl_box_prms",
+        key=key,
+        value=value,
+        raw_text=f"frame-{key}",
+    )
+
+
+def test_cloud_pending_expires_in_deadline_order(monkeypatch: pytest.MonkeyPatch) -> None:
+    clock = [100.0]
+    monkeypatch.setattr("twin.delivery.time.monotonic", lambda: clock[0])
+    collector = _make_collector()
+    delivery = TwinDelivery(TwinQueue(), _MQTTStub(), inflight_timeout_s=10.0, telemetry_collector=collector)
+
+    _begin_cloud(delivery, "dev_1", "MODE")
+    clock[0] = 105.0
+    _begin_cloud(delivery, "dev_2", "SA")
+    _begin_cloud(delivery, "dev_1", "SB")
+
+    assert delivery.inflight() == ("tbl_box_prms", "MODE")
+    pending = delivery.mark_cloud_reason_setting("dev_2")
+    assert pending is not None and pending[0].key == "SA"
+
+    clock[0] = 110.0
+    assert delivery.inflight() == ("tbl_box_prms", "SA")
+    timeouts = [r for r in collector.settings_audit if r["step"] == SettingStep.TIMEOUT.value]
+    assert len(timeouts) == 1
+
+    clock[0] = 115.0
+    # SB vypršel, SA má kvůli Reason=Setting deadline posunutý na 115.
+    assert delivery.is_cloud_inflight() is False
+    reason_results = [r["result"] for r in collector.settings_audit if r["step"] == SettingStep.ACK_REASON_SETTING.value]
+    assert reason_results == [SettingResult.PENDING.value, SettingResult.CONFIRMED.value]
+
+
+def test_cloud_pending_removed_entry_does_not_expire(monkeypatch: pytest.MonkeyPatch) -> None:
+    clock = [0.0]
+    monkeypatch.setattr("twin.delivery.time.monotonic", lambda: clock[0])
+    collector = _make_collector()
+    delivery = TwinDelivery(TwinQueue(), _MQTTStub(), inflight_timeout_s=5.0, telemetry_collector=collector)
+
+    _begin_cloud(delivery, "dev_1", "MODE", value=3)
+    assert delivery.match_cloud_tbl_events("dev_1", "tbl_box_prms", "MODE", "3") is not None
+    assert delivery.is_cloud_inflight() is False
+
+    clock[0] = 60.0
+    assert delivery.has_pending_or_inflight() is False
+    assert [r["step"] for r in collector.settings_audit] == [
+        SettingStep.INCOMING.value,
+        SettingStep.ACK_TBL_EVENTS.value,
+    ]
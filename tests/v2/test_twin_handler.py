@@ -65,11 +65,12 @@ class TestTwinControlHandler:
         """Test start() subscribes to the control topic."""
         asyncio.run(handler.start())
 
-        assert mock_mqtt.subscribe.call_count == 2
+        assert mock_mqtt.subscribe.call_count == 3
         mock_mqtt.subscribe.assert_has_calls(
             [
                 call("oig/+/control/set", handler._on_message),
                 call("oig_local/+/set/#", handler._on_message),
+                call("oig/+/control/set_batch", handler._on_message),
             ]
         )
         assert handler._subscribed is True
@@ -90,11 +91,12 @@ class TestTwinControlHandler:
 
         asyncio.run(handler.stop())
 
-        assert mock_mqtt.unsubscribe.call_count == 2
+        assert mock_mqtt.unsubscribe.call_count == 3
         mock_mqtt.unsubscribe.assert_has_calls(
             [
                 call("oig/+/control/set"),
                 call("oig_local/+/set/#"),
+                call("oig/+/control/set_batch"),
             ]
         )
         assert handler._subscribed is False
@@ -370,6 +372,7 @@ class TestTwinControlHandlerEdgeCases:
 
     def test_on_message_routes_proxy_control_without_queue(self, mock_mqtt, twin_queue):
         called = []
+        store = MagicMock()
 
         def _cb(table, key, value):
             called.append((table, key, value))
@@ -380,6 +383,7 @@ class TestTwinControlHandlerEdgeCases:
             twin_queue=twin_queue,
             device_id="test_device_123",
             proxy_control_handler=_cb,
+            audit_store=store,
         )
 
         payload = json.dumps({"table": "proxy_control", "key": "PROXY_MODE", "value": 2})
@@ -387,6 +391,8 @@ class TestTwinControlHandlerEdgeCases:
 
         assert called == [("proxy_control", "PROXY_MODE", 2)]
         assert twin_queue.size() == 0
+        steps = [(c.args[0]["step"], c.args[0]["result"]) for c in store.put.call_args_list]
+        assert steps == [("incoming", "pending"), ("applied_locally", "confirmed")]
 
     def test_start_uses_custom_namespace_for_compat_topic(self, mock_mqtt, twin_queue):
         handler = TwinControlHandler(
@@ -560,3 +566,150 @@ class TestTwinControlHandlerSettingsAudit:
         assert setting.value == 1
         assert setting.audit_id == replacement_enqueued["audit_id"]
         assert getattr(setting, "raw_text", "") == payload2
+
+    def test_audit_store_is_fed_without_telemetry(self, mock_mqtt, twin_queue):
+        store = MagicMock()
+        handler = TwinControlHandler(
+            mqtt=mock_mqtt,
+            twin_queue=twin_queue,
+            device_id="test_device_123",
+            audit_store=store,
+        )
+
+        handler._on_message("oig/test_device_123/control/set", b'{"table": "tbl_box_prms", "key": "MODE", "value": 2}')
+
+        steps = [call.args[0]["step"] for call in store.put.call_args_list]
+        assert steps == ["incoming", "enqueued"]
+        assert store.put.call_args.args[0]["key"] == "MODE"
+
+    def test_setting_equal_to_reported_value_is_not_enqueued(self, mock_mqtt, twin_queue, telemetry_collector):
+        reported = {("tbl_box_prms", "MODE"): "2"}
+        handler = TwinControlHandler(
+            mqtt=mock_mqtt,
+            twin_queue=twin_queue,
+            device_id="test_device_123",
+            telemetry_collector=telemetry_collector,
+            get_reported_value=lambda table, key: reported.get((table, key)),
+        )
+        payload = json.dumps({"table": "tbl_box_prms", "key": "MODE", "value": 2})
+
+        handler._on_message("oig/test_device_123/control/set", payload.encode("utf-8"))
+
+        assert twin_queue.size() == 0
+        steps = [record["step"] for record in telemetry_collector.settings_audit]
+        assert steps == ["incoming", "noop_already_applied"]
+        assert telemetry_collector.settings_audit[-1]["result"] == "confirmed"
+
+        # Jiná hodnota i vynucené doručení jdou do fronty.
+        handler._on_message("oig_local/test_device_123/set/tbl_box_prms/MODE/force", b"2")
+        assert twin_queue.get("tbl_box_prms", "MODE").value == 2
+        handler._on_message(
+            "oig/test_device_123/control/set",
+            json.dumps({"table": "tbl_box_prms", "key": "MODE", "value": 2, "force": True}).encode("utf-8"),
+        )
+        assert [record["step"] for record in telemetry_collector.settings_audit][-2:] == ["superseded", "enqueued"]
+
+    def test_reported_value_is_ignored_while_cloud_setting_in_flight(self, mock_mqtt, twin_queue):
+        cloud_pending = {("tbl_box_prms", "MODE")}
+        handler = TwinControlHandler(
+            mqtt=mock_mqtt,
+            twin_queue=twin_queue,
+            device_id="test_device_123",
+            get_reported_value=lambda _table, _key: 0,
+            is_cloud_pending=lambda table, key: (table, key) in cloud_pending,
+        )
+        # Cloud právě mění MODE – návrat na hlášenou 0 se nesmí ztratit jako no-op.
+        handler._on_message("oig_local/test_device_123/set/tbl_box_prms/MODE", b"0")
+
+        assert twin_queue.get("tbl_box_prms", "MODE").value == 0
+
+    def test_reported_value_does_not_short_circuit_over_pending_setting(self, mock_mqtt, twin_queue):
+        handler = TwinControlHandler(
+            mqtt=mock_mqtt,
+            twin_queue=twin_queue,
+            device_id="test_device_123",
+            get_reported_value=lambda _table, _key: 0,
+        )
+        handler._on_message("oig_local/test_device_123/set/tbl_box_prms/MODE", b"3")
+        # Návrat na hlášenou hodnotu musí nahradit čekající 3, ne ji nechat doručit.
+        handler._on_message("oig_local/test_device_123/set/tbl_box_prms/MODE", b"0")
+
+        setting = twin_queue.get("tbl_box_prms", "MODE")
+        assert setting is not None
+        assert setting.value == 0
+
+    def test_batch_is_planned_by_table_under_shared_batch_id(self, handler, twin_queue, telemetry_collector):
+        payload = json.dumps(
+            [
+                {"table": "tbl_boiler_prms", "key": "ZONE1_S", "value": 6},
+                {"table": "tbl_box_prms", "key": "MODE", "value": 2},
+                {"table": "tbl_boiler_prms", "key": "ZONE1_E", "value": 9},
+                {"table": "tbl_boiler_prms", "key": "ZONE1_S", "value": 7},
+            ]
+        )
+
+        handler._on_message("oig/test_device_123/control/set_batch", payload.encode("utf-8"))
+
+        pending = twin_queue.get_pending()
+        assert [(s.table, s.key, s.value) for s in pending] == [
+            ("tbl_boiler_prms", "ZONE1_E", 9),
+            ("tbl_boiler_prms", "ZONE1_S", 7),
+            ("tbl_box_prms", "MODE", 2),
+        ]
+        batch_ids = {record["batch_id"] for record in telemetry_collector.settings_audit}
+        assert len(batch_ids) == 1
+        assert batch_ids.pop().startswith("bat_")
+        assert {s.batch_id for s in pending} == {telemetry_collector.settings_audit[0]["batch_id"]}
+        steps = [record["step"] for record in telemetry_collector.settings_audit]
+        assert steps.count("incoming") == 4
+        assert steps.count("superseded") == 1
+        assert steps.count("enqueued") == 3
+
+    def test_mixed_batch_with_proxy_control_closes_batch_complete(self, mock_mqtt, twin_queue, telemetry_collector):
+        handler = TwinControlHandler(
+            mqtt=mock_mqtt,
+            twin_queue=twin_queue,
+            device_id="test_device_123",
+            telemetry_collector=telemetry_collector,
+            proxy_control_handler=lambda _table, _key, _value: True,
+        )
+        payload = json.dumps(
+            [
+                {"table": "proxy_control", "key": "PROXY_MODE", "value": 2},
+                {"table": "tbl_box_prms", "key": "MODE", "value": 2},
+            ]
+        )
+
+        handler._on_message("oig/test_device_123/control/set_batch", payload.encode("utf-8"))
+
+        applied = [r for r in telemetry_collector.settings_audit if r["step"] == "applied_locally"]
+        assert [(r["key"], r["result"]) for r in applied] == [("PROXY_MODE", "confirmed")]
+        (setting,) = twin_queue.get_pending()
+        enqueued = telemetry_collector.settings_audit[-1]
+        telemetry_collector.record_setting_audit_step(
+            {**enqueued, "step": "ack_tbl_events", "result": "confirmed", "audit_id": setting.audit_id}
+        )
+        assert telemetry_collector.audit_latency.snapshot_window()["open_batches"] == 0
+        assert "setting_batch_complete_p50_ms" in telemetry_collector.audit_latency.status_fields()
+
+    def test_batch_with_invalid_item_enqueues_nothing(self, handler, twin_queue, telemetry_collector):
+        payload = json.dumps(
+            [
+                {"table": "tbl_box_prms", "key": "MODE", "value": 2},
+                {"table": "tbl_box_prms", "key": "NOT_A_SETTING", "value": 1},
+            ]
+        )
+
+        handler._on_message("oig/test_device_123/control/set_batch", payload.encode("utf-8"))
+
+        assert twin_queue.size() == 0
+        terminal = [r for r in telemetry_collector.settings_audit if r["step"] != "incoming"]
+        assert [r["step"] for r in terminal] == ["rejected_validation", "rejected_not_allowed"]
+        assert {r["result"] for r in terminal} == {"rejected"}
+
+    def test_batch_with_malformed_payload_is_ignored(self, handler, twin_queue, telemetry_collector):
+        handler._on_message("oig/test_device_123/control/set_batch", b'{"table": "tbl_box_prms"}')
+        handler._on_message("oig/test_device_123/control/set_batch", b'[{"table": "tbl_box_prms", "key": "MODE"}]')
+
+        assert twin_queue.size() == 0
+        assert len(telemetry_collector.settings_audit) == 0
@@ -0,0 +1,172 @@
+"""Tests for twin/journal.py — persistent TwinQueue.
+
+Run: PYTHONPATH=addon/oig-proxy pytest tests/v2/test_twin_journal.py -v
+"""
+
+# pyright: reportMissingImports=false
+
+# pylint: disable=missing-function-docstring,missing-class-docstring,protected-access
+
+import sqlite3
+
+import pytest
+
+from twin.journal import TwinJournal
+from twin.state import TwinQueue
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "twin_queue.db")
+
+
+def _reopen(db_path) -> TwinQueue:
+    return TwinQueue(journal=TwinJournal(db_path))
+
+
+class TestTwinJournal:
+    def test_pending_settings_survive_restart(self, db_path):
+        queue = _reopen(db_path)
+        queue.enqueue("tbl_box_prms", "MODE", 3, audit_id="aud_1")
+        queue.enqueue("tbl_boiler_prms", "ZONE1_S", 6)
+        queue._journal.flush()
+        queue.close()
+
+        restored = _reopen(db_path)
+        try:
+            assert restored.size() == 2
+            mode = restored.get("tbl_box_prms", "MODE")
+            assert mode is not None
+            assert mode.value == 3
+            assert mode.audit_id == "aud_1"
+            assert [s.key for s in restored.get_pending()] == ["MODE", "ZONE1_S"]
+        finally:
+            restored.close()
+
+    def test_supersede_and_acknowledge_are_persisted(self, db_path):
+        queue = _reopen(db_path)
+        queue.enqueue("tbl_box_prms", "MODE", 1)
+        queue.enqueue("tbl_box_prms", "MODE", 2)
+        queue.enqueue("tbl_boiler_prms", "ZONE1_S", 6)
+        queue.acknowledge("tbl_boiler_prms", "ZONE1_S")
+        queue.close()
+
+        restored = _reopen(db_path)
+        try:
+            assert restored.size() == 1
+            assert restored.get("tbl_box_prms", "MODE").value == 2
+        finally:
+            restored.close()
+
+    def test_ops_are_batched_into_few_commits(self, db_path):
+        journal = TwinJournal(db_path)
+        journal.BATCH_WINDOW_S = 0.5
+        queue = TwinQueue(journal=journal)
+        for i in range(50):
+            queue.enqueue("tbl_boiler_prms", f"ZONE{i}", i)
+        queue.close()
+
+        assert journal.batches <= 2
+        with sqlite3.connect(db_path) as conn:
+            assert conn.execute("SELECT COUNT(*) FROM twin_queue").fetchone()[0] == 50
+
+    def test_enqueue_many_lands_in_one_commit(self, db_path):
+        journal = TwinJournal(db_path)
+        journal.BATCH_MAX = 5
+        queue = TwinQueue(journal=journal)
+        queue.enqueue_many(
+            {"table": "tbl_boiler_prms", "key": f"ZONE{i}", "value": i, "batch_id": "bat_1"} for i in range(20)
+        )
+        queue.close()
+
+        assert journal.batches == 1
+        restored = _reopen(db_path)
+        try:
+            assert restored.size() == 20
+            assert {s.batch_id for s in restored.get_pending()} == {"bat_1"}
+        finally:
+            restored.close()
+
+    def test_clear_is_persisted(self, db_path):
+        queue = _reopen(db_path)
+        queue.enqueue("tbl_box_prms", "MODE", 1)
+        queue.clear()
+        queue.enqueue("tbl_box_prms", "SA", 0)
+        queue.close()
+
+        restored = _reopen(db_path)
+        try:
+            assert [s.key for s in restored.get_pending()] == ["SA"]
+        finally:
+            restored.close()
+
+    def test_restored_id_set_is_not_reused(self, db_path):
+        queue = _reopen(db_path)
+        queue._next_id_set = 9_000_000_000
+        queue.enqueue("tbl_box_prms", "MODE", 1)
+        queue.close()
+
+        restored = _reopen(db_path)
+        try:
+            restored.enqueue("tbl_box_prms", "SA", 0)
+            assert restored.get("tbl_box_prms", "SA").id_set > 9_000_000_000
+        finally:
+            restored.close()
+
+    def test_unreadable_rows_are_skipped(self, db_path):
+        queue = _reopen(db_path)
+        queue.enqueue("tbl_box_prms", "MODE", 1)
+        queue.close()
+        with sqlite3.connect(db_path) as conn:
+            conn.execute("INSERT INTO twin_queue VALUES ('t', 'k', 0, '{broken')")
+
+        restored = _reopen(db_path)
+        try:
+            assert restored.size() == 1
+        finally:
+            restored.close()
+
+    def test_reenqueued_key_is_recovered_in_queue_order(self, db_path, monkeypatch):
+        # Stejný enqueued_at by řazení podle času neurčil.
+        monkeypatch.setattr("twin.state.time.time", lambda: 1_700_000_000.0)
+        queue = _reopen(db_path)
+        queue.enqueue("tbl_box_prms", "MODE", 1)
+        queue.enqueue("tbl_boiler_prms", "ZONE1_S", 6)
+        queue._journal.flush()
+        queue.enqueue("tbl_box_prms", "MODE", 2)
+        expected = [s.key for s in queue.get_pending()]
+        queue.close()
+
+        restored = _reopen(db_path)
+        try:
+            assert [s.key for s in restored.get_pending()] == expected == ["ZONE1_S", "MODE"]
+        finally:
+            restored.close()
+
+    def test_failed_commit_is_retried(self, db_path, monkeypatch):
+        journal = TwinJournal(db_path)
+        journal.RETRY_DELAY_S = 0.05
+        queue = TwinQueue(journal=journal)
+        monkeypatch.setattr("twin.journal._UPSERT_SQL", "INSERT INTO missing VALUES (?,?,?,?)")
+        queue.enqueue("tbl_box_prms", "MODE", 3)
+
+        assert journal.flush(timeout=0.2) is False
+        assert journal.degraded is True
+        monkeypatch.undo()
+        assert journal.flush() is True
+        assert journal.degraded is False
+        queue.close()
+
+        restored = _reopen(db_path)
+        try:
+            assert restored.get("tbl_box_prms", "MODE").value == 3
+        finally:
+            restored.close()
+
+    def test_unwritable_path_falls_back_to_memory(self, tmp_path):
+        queue = TwinQueue(journal=TwinJournal(str(tmp_path / "missing" / "twin.db")))
+        try:
+            queue.enqueue("tbl_box_prms", "MODE", 1)
+            assert queue.size() == 1
+        finally:
+            queue.close()
@@ -5,6 +5,7 @@ Tests verify:
 - TwinQueue enqueue/acknowledge/size operations
 - Overwrite behavior for same (table, key)
 - get_pending returns sorted results
+- Supersede ordering, peek and priority classes
 
 Run: PYTHONPATH=addon/oig-proxy pytest tests/v2/test_twin_state.py -v
 """
@@ -249,3 +250,59 @@ class TestTwinQueueEdgeCases:
         result = queue.acknowledge("tbl_set", "T_Target")
         assert result is False
         assert queue.size() == 1
+
+    def test_supersede_moves_setting_to_tail(self):
+        """Test re-enqueuing a key supersedes it and moves it to the tail."""
+        queue = TwinQueue()
+        queue.enqueue("tbl_set", "T_Room", 22)
+        queue.enqueue("tbl_set", "T_Target", 21)
+        queue.enqueue("tbl_set", "T_Room", 23)
+
+        assert [s.key for s in queue.iter_pending()] == ["T_Target", "T_Room"]
+        assert queue.peek().key == "T_Target"
+        assert queue.get("tbl_set", "T_Room").value == 23
+
+    def test_peek_follows_acknowledge(self):
+        """Test peek returns the oldest remaining setting."""
+        queue = TwinQueue()
+        assert queue.peek() is None
+        queue.enqueue("tbl_set", "A", 1)
+        queue.enqueue("tbl_set", "B", 2)
+
+        queue.acknowledge("tbl_set", "A")
+        assert queue.peek().key == "B"
+        queue.acknowledge("tbl_set", "B")
+        assert queue.peek() is None
+
+    def test_priority_classes_served_first(self):
+        """Test priority keys go ahead of other settings, in class order."""
+        queue = TwinQueue(priorities=TwinQueue.parse_priorities("RQRESET,tbl_box_prms:MODE"))
+        queue.enqueue("tbl_boiler_prms", "ZONE1_S", 1)
+        queue.enqueue("tbl_box_prms", "MODE", 3)
+        queue.enqueue("tbl_boiler_prms", "ZONE1_E", 2)
+        queue.enqueue("tbl_invertor_prms", "RQRESET", 1)
+        queue.enqueue("tbl_set", "MODE", 5)  # jiná tabulka -> výchozí třída
+
+        assert [s.key for s in queue.get_pending()] == ["RQRESET", "MODE", "ZONE1_S", "ZONE1_E", "MODE"]
+        assert queue.peek().key == "RQRESET"
+        assert queue.size() == 5
+
+        queue.acknowledge("tbl_invertor_prms", "RQRESET")
+        assert queue.peek().table == "tbl_box_prms"
+
+    def test_enqueue_many_keeps_order_and_supersedes(self):
+        """Test enqueue_many appends in order and supersedes existing keys."""
+        queue = TwinQueue()
+        queue.enqueue("tbl_box_prms", "MODE", 1, audit_id="aud_old")
+        settings = queue.enqueue_many(
+            [
+                {"table": "tbl_boiler_prms", "key": "ZONE1_S", "value": 6, "batch_id": "bat_1"},
+                {"table": "tbl_box_prms", "key": "MODE", "value": 3, "audit_id": "aud_new", "batch_id": "bat_1"},
+            ]
+        )
+
+        assert [s.key for s in settings] == ["ZONE1_S", "MODE"]
+        assert [s.key for s in queue.get_pending()] == ["ZONE1_S", "MODE"]
+        assert queue.get("tbl_box_prms", "MODE").audit_id == "aud_new"
+        assert settings[0].audit_id.startswith("aud_")
+        assert settings[0].id_set != settings[1].id_set